@@ -16,9 +16,10 @@ locals {
 module "storage" {
   source = "./modules/storage"
 
-  bucket_name                     = var.s3_bucket_name
-  enable_versioning               = false
-  eventhub_checkpoints_table_name = "eventhub-checkpoints-${var.environment}"
+  bucket_name                      = var.s3_bucket_name
+  enable_versioning                = false
+  eventhub_checkpoints_table_name  = "eventhub-checkpoints-${var.environment}"
+  calendar_poller_state_table_name = "graph-calendar-poller-state-${var.environment}"
 
   tags = local.common_tags
 }
@@ -54,6 +55,7 @@ module "subscription_renewal" {
   azure_graph_client_id       = var.azure_graph_client_id
   azure_graph_client_secret   = var.azure_graph_client_secret
   renewal_schedule_expression = var.renewal_schedule_expression
+  webhook_client_state        = var.client_state
   alarm_actions               = [module.notifications.topic_arn]
 
   tags = local.common_tags
@@ -184,6 +186,29 @@ module "eventhub_processor" {
   tags = local.common_tags
 }
 
+//=============================================================================
+// CALENDAR POLLER - Scheduled calendarView/delta poller (state in DynamoDB)
+//=============================================================================
+
+module "calendar_poller" {
+  source = "./modules/calendar-poller"
+  count  = var.calendar_poller_package_path != "" ? 1 : 0
+
+  function_name             = "tmf-calendar-poller-${var.environment}"
+  package_path              = var.calendar_poller_package_path
+  state_table_name          = module.storage.calendar_poller_state_table_name
+  state_table_arn           = module.storage.calendar_poller_state_table_arn
+  azure_graph_tenant_id     = var.azure_graph_tenant_id
+  azure_graph_client_id     = var.azure_graph_client_id
+  azure_graph_client_secret = var.azure_graph_client_secret
+  entra_group_id            = var.azure_allowed_group_id
+  eventhub_namespace        = var.eventhub_namespace
+  eventhub_name             = var.eventhub_name
+  schedule_expression       = var.calendar_poller_schedule_expression
+
+  tags = local.common_tags
+}
+
 //=============================================================================
 // BOT API GATEWAY MODULE - Meeting Bot Webhooks
 //=============================================================================
@@ -0,0 +1,139 @@
+// Calendar Poller Module
+// Runs scripts/graph/graph-calendar-poller.py on a schedule with its state
+// (deltaLinks, member list, event fingerprints) in DynamoDB
+
+//=============================================================================
+// IAM ROLE FOR LAMBDA
+//=============================================================================
+
+resource "aws_iam_role" "calendar_poller_role" {
+  name = var.function_name
+
+  assume_role_policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Action = "sts:AssumeRole"
+        Effect = "Allow"
+        Principal = {
+          Service = "lambda.amazonaws.com"
+        }
+      }
+    ]
+  })
+
+  tags = var.tags
+}
+
+resource "aws_iam_role_policy_attachment" "calendar_poller_logs" {
+  role       = aws_iam_role.calendar_poller_role.name
+  policy_arn = "arn:aws:iam::aws:policy/service-role/AWSLambdaBasicExecutionRole"
+}
+
+// poller_state.DynamoPollerState: batch reads/writes of users and fingerprints,
+// member list get/put, user scan
+resource "aws_iam_role_policy" "calendar_poller_state" {
+  name = "${var.function_name}-state"
+  role = aws_iam_role.calendar_poller_role.id
+
+  policy = jsonencode({
+    Version = "2012-10-17"
+    Statement = [
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeTable",
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:DeleteItem",
+          "dynamodb:BatchGetItem",
+          "dynamodb:BatchWriteItem",
+          "dynamodb:Scan"
+        ]
+        Resource = var.state_table_arn
+      }
+    ]
+  })
+}
+
+//=============================================================================
+// LAMBDA FUNCTION - Calendar Poller
+//=============================================================================
+
+resource "aws_lambda_function" "calendar_poller" {
+  function_name = var.function_name
+  role          = aws_iam_role.calendar_poller_role.arn
+  handler       = "graph-calendar-poller.lambda_handler"
+  runtime       = "python3.11"
+  timeout       = var.timeout
+  memory_size   = var.memory_size
+
+  # One sweep at a time: overlapping runs would read the same deltaLinks and
+  # race each other's state writes
+  reserved_concurrent_executions = 1
+
+  filename         = var.package_path
+  source_code_hash = filebase64sha256(var.package_path)
+
+  environment {
+    variables = merge(
+      {
+        POLLER_STATE        = "dynamodb:${var.state_table_name}"
+        GRAPH_TENANT_ID     = var.azure_graph_tenant_id
+        GRAPH_CLIENT_ID     = var.azure_graph_client_id
+        GRAPH_CLIENT_SECRET = var.azure_graph_client_secret
+        ENTRA_GROUP_ID      = var.entra_group_id
+        POLLER_CONCURRENCY  = tostring(var.poller_concurrency)
+        POLLER_MAX_RPS      = tostring(var.poller_max_rps)
+      },
+      var.eventhub_namespace != "" ? {
+        EVENT_HUB_NAMESPACE = var.eventhub_namespace
+        EVENT_HUB_NAME      = var.eventhub_name
+      } : {}
+    )
+  }
+
+  tags = var.tags
+
+  depends_on = [
+    aws_cloudwatch_log_group.calendar_poller_logs,
+    aws_iam_role_policy_attachment.calendar_poller_logs
+  ]
+}
+
+//=============================================================================
+// CLOUDWATCH LOG GROUP
+//=============================================================================
+
+resource "aws_cloudwatch_log_group" "calendar_poller_logs" {
+  name              = "/aws/lambda/${var.function_name}"
+  retention_in_days = var.log_retention_days
+
+  tags = var.tags
+}
+
+//=============================================================================
+// EVENTBRIDGE RULE - Poll Schedule
+//=============================================================================
+
+resource "aws_cloudwatch_event_rule" "calendar_poller_schedule" {
+  name                = "${var.function_name}-schedule"
+  description         = "Poll due users' calendars for changes"
+  schedule_expression = var.schedule_expression
+
+  tags = var.tags
+}
+
+resource "aws_cloudwatch_event_target" "calendar_poller_lambda" {
+  rule      = aws_cloudwatch_event_rule.calendar_poller_schedule.name
+  target_id = "CalendarPollerLambda"
+  arn       = aws_lambda_function.calendar_poller.arn
+}
+
+resource "aws_lambda_permission" "allow_eventbridge" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.calendar_poller.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.calendar_poller_schedule.arn
+}
@@ -0,0 +1,9 @@
+output "function_name" {
+  description = "Calendar poller Lambda function name"
+  value       = aws_lambda_function.calendar_poller.function_name
+}
+
+output "function_arn" {
+  description = "Calendar poller Lambda function ARN"
+  value       = aws_lambda_function.calendar_poller.arn
+}
@@ -0,0 +1,96 @@
+variable "function_name" {
+  description = "Name of the calendar poller Lambda"
+  type        = string
+}
+
+variable "package_path" {
+  description = "Path to Lambda deployment package (zip of scripts/graph and its requirements)"
+  type        = string
+}
+
+variable "timeout" {
+  description = "Lambda timeout in seconds"
+  type        = number
+  default     = 300
+}
+
+variable "memory_size" {
+  description = "Lambda memory size in MB"
+  type        = number
+  default     = 512
+}
+
+variable "state_table_name" {
+  description = "DynamoDB table for poller state (POLLER_STATE)"
+  type        = string
+}
+
+variable "state_table_arn" {
+  description = "ARN of the poller state table"
+  type        = string
+}
+
+variable "azure_graph_tenant_id" {
+  description = "Microsoft Graph tenant ID"
+  type        = string
+  sensitive   = true
+}
+
+variable "azure_graph_client_id" {
+  description = "Microsoft Graph app client ID"
+  type        = string
+  sensitive   = true
+}
+
+variable "azure_graph_client_secret" {
+  description = "Microsoft Graph app client secret"
+  type        = string
+  sensitive   = true
+}
+
+variable "entra_group_id" {
+  description = "Entra group whose members' calendars are polled"
+  type        = string
+}
+
+variable "eventhub_namespace" {
+  description = "Event Hub namespace FQDN changes are sent to (empty: no sink)"
+  type        = string
+  default     = ""
+}
+
+variable "eventhub_name" {
+  description = "Event Hub name"
+  type        = string
+  default     = ""
+}
+
+variable "poller_concurrency" {
+  description = "Users polled concurrently (POLLER_CONCURRENCY)"
+  type        = number
+  default     = 32
+}
+
+variable "poller_max_rps" {
+  description = "Graph request-rate cap (POLLER_MAX_RPS)"
+  type        = number
+  default     = 50
+}
+
+variable "schedule_expression" {
+  description = "EventBridge schedule expression for poller runs"
+  type        = string
+  default     = "rate(1 minute)"
+}
+
+variable "log_retention_days" {
+  description = "CloudWatch log retention in days"
+  type        = number
+  default     = 14
+}
+
+variable "tags" {
+  description = "Tags to apply to resources"
+  type        = map(string)
+  default     = {}
+}
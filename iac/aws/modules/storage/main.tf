@@ -115,3 +115,29 @@ resource "aws_dynamodb_table" "eventhub_checkpoints" {
 
   depends_on = [aws_s3_bucket.webhook_payloads]
 }
+
+//=============================================================================
+// DYNAMODB TABLE - Calendar poller state
+//=============================================================================
+
+// deltaLinks, member list and event fingerprints of graph-calendar-poller.py
+// (scripts/graph/poller_state.py); Lambda /tmp does not survive cold starts
+resource "aws_dynamodb_table" "calendar_poller_state" {
+  name         = var.calendar_poller_state_table_name
+  billing_mode = "PAY_PER_REQUEST"
+  hash_key     = "pk"
+
+  attribute {
+    name = "pk"
+    type = "S"
+  }
+
+  ttl {
+    attribute_name = "expires_at"
+    enabled        = true
+  }
+
+  tags = var.tags
+
+  depends_on = [aws_s3_bucket.webhook_payloads]
+}
@@ -37,3 +37,13 @@ output "eventhub_checkpoints_table_arn" {
   description = "ARN of the Event Hub checkpoints table"
   value       = aws_dynamodb_table.eventhub_checkpoints.arn
 }
+
+output "calendar_poller_state_table_name" {
+  description = "Name of the calendar poller state table"
+  value       = aws_dynamodb_table.calendar_poller_state.name
+}
+
+output "calendar_poller_state_table_arn" {
+  description = "ARN of the calendar poller state table"
+  value       = aws_dynamodb_table.calendar_poller_state.arn
+}
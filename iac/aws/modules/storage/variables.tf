@@ -21,6 +21,12 @@ variable "eventhub_checkpoints_table_name" {
   default     = "eventhub-checkpoints"
 }
 
+variable "calendar_poller_state_table_name" {
+  description = "Name of the DynamoDB table for calendar poller state"
+  type        = string
+  default     = "graph-calendar-poller-state"
+}
+
 variable "tags" {
   description = "Tags to apply to resources"
   type        = map(string)
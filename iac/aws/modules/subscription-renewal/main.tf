@@ -42,7 +42,8 @@ resource "aws_iam_role_policy" "dynamodb_access" {
         Action = [
           "dynamodb:Query",
           "dynamodb:UpdateItem",
-          "dynamodb:GetItem"
+          "dynamodb:GetItem",
+          "dynamodb:PutItem"
         ]
         Resource = var.subscriptions_table_arn
       },
@@ -95,6 +96,9 @@ resource "aws_lambda_function" "subscription_renewal" {
       GRAPH_TENANT_ID     = var.azure_graph_tenant_id
       GRAPH_CLIENT_ID     = var.azure_graph_client_id
       GRAPH_CLIENT_SECRET = var.azure_graph_client_secret
+      RENEWAL_WORKER_COUNT  = var.renewal_worker_count
+      RENEWAL_LEASE_SECONDS = var.renewal_lease_seconds
+      WEBHOOK_AUTH_SECRET   = var.webhook_client_state
     }
   }
 
@@ -108,6 +112,17 @@ resource "aws_lambda_function" "subscription_renewal" {
   ]
 }
 
+//=============================================================================
+// LAMBDA FUNCTION URL - lifecycleNotificationUrl
+//=============================================================================
+
+// Graph delivers lifecycle notifications (and the validationToken handshake)
+// here; Graph cannot sign requests, so the handler checks clientState instead
+resource "aws_lambda_function_url" "subscription_renewal_lifecycle" {
+  function_name      = aws_lambda_function.subscription_renewal.function_name
+  authorization_type = "NONE"
+}
+
 //=============================================================================
 // ARCHIVE FILE - Lambda Code
 //=============================================================================
@@ -145,10 +160,18 @@ resource "aws_cloudwatch_event_rule" "subscription_renewal_schedule" {
 // EVENTBRIDGE TARGET - Link Rule to Lambda
 //=============================================================================
 
+// One target per shard so renewal workers run concurrently; each invocation
+// only renews subscriptions hashed to its worker_index.
 resource "aws_cloudwatch_event_target" "subscription_renewal_lambda" {
+  count = var.renewal_worker_count
+
   rule      = aws_cloudwatch_event_rule.subscription_renewal_schedule.name
-  target_id = "SubscriptionRenewalLambda"
+  target_id = count.index == 0 ? "SubscriptionRenewalLambda" : "SubscriptionRenewalLambda-${count.index}"
   arn       = aws_lambda_function.subscription_renewal.arn
+  input = jsonencode({
+    worker_index = count.index
+    worker_count = var.renewal_worker_count
+  })
 
   retry_policy {
     maximum_retry_attempts       = 2
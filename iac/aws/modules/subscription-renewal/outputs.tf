@@ -13,6 +13,11 @@ output "lambda_role_arn" {
   value       = aws_iam_role.subscription_renewal_role.arn
 }
 
+output "lifecycle_notification_url" {
+  description = "Function URL to use as the subscriptions' lifecycleNotificationUrl"
+  value       = aws_lambda_function_url.subscription_renewal_lifecycle.function_url
+}
+
 output "eventbridge_rule_name" {
   description = "Name of the EventBridge rule for scheduled renewal"
   value       = aws_cloudwatch_event_rule.subscription_renewal_schedule.name
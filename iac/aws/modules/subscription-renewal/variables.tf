@@ -48,12 +48,36 @@ variable "azure_graph_client_secret" {
   sensitive   = true
 }
 
+variable "webhook_client_state" {
+  description = "clientState used to validate lifecycle notifications and recreate subscriptions"
+  type        = string
+  default     = ""
+  sensitive   = true
+}
+
 variable "renewal_schedule_expression" {
   description = "AWS Events schedule expression (cron) for subscription renewal"
   type        = string
   default     = "cron(0 2 * * ? *)" // Daily at 2 AM UTC
 }
 
+variable "renewal_worker_count" {
+  description = "Number of concurrent renewal shards (one EventBridge target per shard)"
+  type        = number
+  default     = 1
+
+  validation {
+    condition     = var.renewal_worker_count >= 1 && var.renewal_worker_count <= 5 && floor(var.renewal_worker_count) == var.renewal_worker_count
+    error_message = "renewal_worker_count must be a whole number from 1 to 5 (EventBridge allows at most 5 targets per rule)."
+  }
+}
+
+variable "renewal_lease_seconds" {
+  description = "How long a renewal worker holds its lease on a subscription"
+  type        = number
+  default     = 300
+}
+
 variable "log_retention_days" {
   description = "CloudWatch log retention in days"
   type        = number
@@ -114,6 +114,11 @@ output "renewal_eventbridge_rule_name" {
   value       = module.subscription_renewal.eventbridge_rule_name
 }
 
+output "renewal_lifecycle_notification_url" {
+  description = "lifecycleNotificationUrl for Graph subscriptions (renewal Lambda function URL)"
+  value       = module.subscription_renewal.lifecycle_notification_url
+}
+
 output "renewal_log_group_name" {
   description = "CloudWatch log group for subscription renewal Lambda"
   value       = module.subscription_renewal.log_group_name
@@ -162,3 +167,13 @@ output "bot_callbacks_url" {
   description = "Bot callbacks URL"
   value       = module.bot_api_gateway.callbacks_url
 }
+
+output "calendar_poller_function_name" {
+  description = "Calendar poller Lambda function name (null when not deployed)"
+  value       = one(module.calendar_poller[*].function_name)
+}
+
+output "calendar_poller_state_table_name" {
+  description = "Calendar poller state table (POLLER_STATE=dynamodb:<name>)"
+  value       = module.storage.calendar_poller_state_table_name
+}
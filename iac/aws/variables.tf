@@ -121,6 +121,18 @@ variable "renewal_schedule_expression" {
   default     = "cron(0 2 * * ? *)"
 }
 
+variable "calendar_poller_package_path" {
+  description = "Path to the calendar poller Lambda zip (scripts/graph + requirements); empty skips the poller"
+  type        = string
+  default     = ""
+}
+
+variable "calendar_poller_schedule_expression" {
+  description = "EventBridge schedule expression for calendar poller runs"
+  type        = string
+  default     = "rate(1 minute)"
+}
+
 //=============================================================================
 // MEETING BOT VARIABLES
 //=============================================================================
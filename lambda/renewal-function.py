@@ -5,25 +5,62 @@ Auto-Renewal Lambda for Graph API Subscriptions
 Triggered daily to check subscriptions in DynamoDB
 and renew those expiring within 2 days.
 
+Several copies can run at once: each worker only looks at its own hash
+shard of the subscription keyspace and claims every item with a
+conditional lease (lease_owner / lease_expires) before calling Graph,
+so no subscription is PATCHed twice.
+
 Deploy as AWS Lambda function with:
-- IAM role: GetItem, Query on DynamoDB table
-- Trigger: CloudWatch Events (daily at 2 AM)
+- IAM role: GetItem, Query, UpdateItem on DynamoDB table
+- Trigger: CloudWatch Events (daily at 2 AM), one target per shard
 - Environment variables:
   - GRAPH_TENANT_ID
   - GRAPH_CLIENT_ID  
   - GRAPH_CLIENT_SECRET
   - SUBSCRIPTIONS_TABLE
+  - RENEWAL_WORKER_INDEX (optional, default 0)
+  - RENEWAL_WORKER_COUNT (optional, default 1)
+  - RENEWAL_LEASE_SECONDS (optional, default 300)
+  - RENEWAL_BATCH_CONCURRENCY (optional, default 8 $batch requests in flight)
+  - WEBHOOK_AUTH_SECRET (optional, clientState checked on lifecycle
+    notifications and sent when recreating subscriptions; same variable
+    as scripts/graph, unset or empty means 'default-client-state')
+
+The same handler is the subscriptions' lifecycleNotificationUrl (Lambda
+function URL or API Gateway): it echoes Graph's validationToken and reacts
+in-line to lifecycle notifications ({"value": [{"lifecycleEvent": ...}]}):
+reauthorize, recreate removed subscriptions from the stored definition, or
+flag missed notifications for resync (picked up and cleared by
+scripts/graph/process_transcript_notification.py --resync-flagged). HTTP
+requests never start a renewal sweep; only scheduled events do.
 """
 
+import base64
 import json
 import boto3
+import hashlib
 import requests
 import os
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from botocore.exceptions import ClientError
 
 dynamodb = boto3.resource('dynamodb')
 table = dynamodb.Table(os.environ.get('SUBSCRIPTIONS_TABLE', 'graph-subscriptions'))
 
+LEASE_SECONDS = int(os.environ.get('RENEWAL_LEASE_SECONDS', '300'))
+
+BATCH_URL = 'https://graph.microsoft.com/v1.0/$batch'
+BATCH_SIZE = 20  # Graph $batch limit
+BATCH_CONCURRENCY = int(os.environ.get('RENEWAL_BATCH_CONCURRENCY', '8'))
+MAX_THROTTLE_ROUNDS = 3
+
+# Same variable and default as scripts/graph (get_config()['webhook_secret']);
+# an empty value (the Terraform default) counts as unset
+CLIENT_STATE = (os.environ.get('WEBHOOK_AUTH_SECRET') or 'default-client-state')[:255]
+
 
 def get_graph_token():
     """Get fresh token for Graph API."""
@@ -69,70 +106,536 @@ def renew_subscription(sub_id: str, hours: int = 24) -> bool:
         return False
 
 
-def find_and_renew_expired() -> dict:
-    """Find subscriptions expiring within 2 days and renew."""
+def parse_retry_after(value, default: int = 5) -> int:
+    """Retry-After in seconds; the default when missing or not a number (e.g. an HTTP date)"""
+    value = str(value).strip() if value is not None else ''
+    return int(value) if value.isdigit() else default
+
+
+def send_renewal_batch(session: requests.Session, headers: dict, sub_ids: list, new_expiry: str) -> dict:
+    """PATCH up to 20 subscriptions in one $batch request; returns {sub_id: (status, retry_after)}."""
+    payload = {
+        'requests': [
+            {
+                'id': str(i),
+                'method': 'PATCH',
+                'url': f'/subscriptions/{sub_id}',
+                'headers': {'Content-Type': 'application/json'},
+                'body': {'expirationDateTime': new_expiry}
+            }
+            for i, sub_id in enumerate(sub_ids)
+        ]
+    }
     
-    cutoff_date = (datetime.utcnow() + timedelta(days=2)).isoformat()
+    response = session.post(BATCH_URL, headers=headers, json=payload, timeout=30)
+    if response.status_code != 200:
+        # Whole envelope failed (throttled or 5xx): every item gets that status
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+        return {sub_id: (response.status_code, retry_after) for sub_id in sub_ids}
     
-    # Query subscriptions by status and expiry date
-    response = table.query(
-        IndexName='expiry-date-index',
-        KeyConditionExpression='#status = :status AND expiry_date <= :cutoff',
-        ExpressionAttributeNames={'#status': 'status'},
-        ExpressionAttributeValues={
+    results = {}
+    for item in response.json().get('responses', []):
+        sub_id = sub_ids[int(item['id'])]
+        retry_after = parse_retry_after((item.get('headers') or {}).get('Retry-After'))
+        results[sub_id] = (item.get('status'), retry_after)
+    return results
+
+
+def send_renewal_batch_safe(session: requests.Session, headers: dict, sub_ids: list, new_expiry: str) -> dict:
+    """send_renewal_batch(), with a failed request (network error, bad response) failing only its own chunk"""
+    try:
+        return send_renewal_batch(session, headers, sub_ids, new_expiry)
+    except Exception as e:
+        print(f"❌ Renewal batch of {len(sub_ids)} failed: {e}")
+        return {sub_id: (None, 0) for sub_id in sub_ids}
+
+
+def renew_subscriptions_batch(sub_ids: list, headers: dict, hours: int = 24) -> dict:
+    """
+    Renew many subscriptions with $batch PATCH requests.
+    
+    Batches are sent concurrently over one pooled session. Per-item 429s are
+    retried after Retry-After for a few rounds; anything still throttled is
+    reported as deferred so the next sweep picks it up. A chunk whose request
+    fails outright is reported as failed without affecting the others.
+    
+    Returns:
+        dict with lists: renewed, gone (404), deferred (429), failed
+    """
+    new_expiry = (datetime.utcnow() + timedelta(hours=hours)).strftime('%Y-%m-%dT%H:%M:%S.0000000Z')
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=BATCH_CONCURRENCY, pool_maxsize=BATCH_CONCURRENCY)
+    session.mount('https://', adapter)
+    
+    outcome = {'renewed': [], 'gone': [], 'deferred': [], 'failed': []}
+    pending = list(sub_ids)
+    
+    for round_number in range(MAX_THROTTLE_ROUNDS + 1):
+        chunks = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+        with ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY) as executor:
+            results = {}
+            for chunk_results in executor.map(
+                    lambda chunk: send_renewal_batch_safe(session, headers, chunk, new_expiry), chunks):
+                results.update(chunk_results)
+        
+        throttled = []
+        wait = 0
+        for sub_id in pending:
+            status, retry_after = results.get(sub_id, (None, 0))
+            if status == 200:
+                outcome['renewed'].append(sub_id)
+            elif status == 404:
+                outcome['gone'].append(sub_id)
+            elif status == 429 or (status is not None and status >= 500):
+                throttled.append(sub_id)
+                wait = max(wait, retry_after)
+            else:
+                print(f"❌ Failed to renew {sub_id}: HTTP {status}")
+                outcome['failed'].append(sub_id)
+        
+        if not throttled:
+            break
+        if round_number == MAX_THROTTLE_ROUNDS:
+            outcome['deferred'].extend(throttled)
+            break
+        
+        print(f"⏳ {len(throttled)} renewal(s) throttled, retrying in {wait}s")
+        time.sleep(wait)
+        pending = throttled
+    
+    print(f"✅ Batch renewal: {len(outcome['renewed'])} renewed, {len(outcome['gone'])} gone, "
+          f"{len(outcome['deferred'])} deferred, {len(outcome['failed'])} failed")
+    return outcome
+
+
+def shard_for(sub_id: str, worker_count: int) -> int:
+    """Stable shard number for a subscription id (same on every worker)."""
+    digest = hashlib.sha1(sub_id.encode('utf-8')).hexdigest()
+    return int(digest[:8], 16) % worker_count
+
+
+def default_worker_id() -> str:
+    """Identify this renewer in lease attributes."""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def query_expiring(cutoff_date: str) -> list:
+    """Query all active subscriptions expiring before cutoff (all pages)."""
+    
+    items = []
+    kwargs = {
+        'IndexName': 'expiry-date-index',
+        'KeyConditionExpression': '#status = :status AND expiry_date <= :cutoff',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {
             ':status': 'active',
             ':cutoff': cutoff_date
         }
-    )
+    }
     
-    subscriptions = response.get('Items', [])
-    print(f"Found {len(subscriptions)} subscription(s) to renew")
+    while True:
+        response = table.query(**kwargs)
+        items.extend(response.get('Items', []))
+        if 'LastEvaluatedKey' not in response:
+            return items
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def claim_lease(sub: dict, owner: str, lease_seconds: int = LEASE_SECONDS) -> bool:
+    """
+    Claim a subscription for renewal with a conditional update.
     
-    renewed = 0
+    Succeeds only if nobody holds the lease, the previous lease has
+    expired, or we already own it. Returns False if another worker won.
+    """
+    now = int(time.time())
+    try:
+        table.update_item(
+            Key={
+                'subscription_id': sub['subscription_id'],
+                'created_at': sub['created_at']
+            },
+            UpdateExpression='SET lease_owner = :owner, lease_expires = :expires',
+            ConditionExpression='attribute_not_exists(lease_expires) OR lease_expires < :now OR lease_owner = :owner',
+            ExpressionAttributeValues={
+                ':owner': owner,
+                ':expires': now + lease_seconds,
+                ':now': now
+            }
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+
+def release_lease(sub: dict, owner: str) -> None:
+    """Drop our lease without recording a renewal (e.g. after a Graph failure)."""
+    try:
+        table.update_item(
+            Key={
+                'subscription_id': sub['subscription_id'],
+                'created_at': sub['created_at']
+            },
+            UpdateExpression='REMOVE lease_owner, lease_expires',
+            ConditionExpression='lease_owner = :owner',
+            ExpressionAttributeValues={':owner': owner}
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+
+
+def record_renewal(sub: dict, owner: str, new_expiry: str) -> bool:
+    """Store the new expiry, atomically bump renewal_count and release the lease."""
+    try:
+        table.update_item(
+            Key={
+                'subscription_id': sub['subscription_id'],
+                'created_at': sub['created_at']
+            },
+            UpdateExpression='SET expiry_date = :expiry, last_renewed = :now '
+                             'ADD renewal_count :one '
+                             'REMOVE lease_owner, lease_expires',
+            ConditionExpression='lease_owner = :owner',
+            ExpressionAttributeValues={
+                ':expiry': new_expiry,
+                ':now': datetime.utcnow().isoformat(),
+                ':one': 1,
+                ':owner': owner
+            }
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"⚠️  Lease on {sub['subscription_id'][:50]} was taken over before the update")
+            return False
+        raise
+
+
+def record_renewals(subs: list, owner: str, new_expiry: str) -> int:
+    """
+    record_renewal() for every renewed subscription; returns how many failed.
+    
+    Graph has already renewed these, so one failed write must not stop the
+    others (or the gone/deferred handling that follows). An unrecorded
+    renewal keeps its lease until it expires and is picked up next run.
+    """
     failed = 0
+    for sub in subs:
+        try:
+            if not record_renewal(sub, owner, new_expiry):
+                failed += 1
+        except Exception as e:
+            print(f"Exception recording renewal of {sub['subscription_id']}: {e}")
+            failed += 1
+    return failed
+
+
+def find_and_renew_expired(worker_index: int = 0, worker_count: int = 1,
+                           worker_id: str = None) -> dict:
+    """
+    Find subscriptions expiring within 2 days and renew.
+    
+    Only subscriptions in this worker's shard are considered, and each one
+    is leased before renewal so concurrent workers never duplicate a PATCH.
+    Renewals go out as $batch requests; subscriptions Graph reports as gone
+    are recreated from their stored definition.
+    """
+    
+    worker_id = worker_id or default_worker_id()
+    cutoff_date = (datetime.utcnow() + timedelta(days=2)).isoformat()
+    
+    # Query subscriptions by status and expiry date
+    subscriptions = [
+        sub for sub in query_expiring(cutoff_date)
+        if shard_for(sub['subscription_id'], worker_count) == worker_index
+    ]
+    print(f"Found {len(subscriptions)} subscription(s) to renew in shard {worker_index}/{worker_count}")
     
+    claimed = {}
+    skipped = 0
+    failed = 0
     for sub in subscriptions:
         try:
-            if renew_subscription(sub['subscription_id']):
-                # Update DynamoDB with new expiry
-                new_expiry = (datetime.utcnow() + timedelta(hours=24)).isoformat()
-                table.update_item(
-                    Key={
-                        'subscription_id': sub['subscription_id'],
-                        'created_at': sub['created_at']
-                    },
-                    UpdateExpression='SET expiry_date = :expiry, last_renewed = :now, renewal_count = renewal_count + :one',
-                    ExpressionAttributeValues={
-                        ':expiry': new_expiry,
-                        ':now': datetime.utcnow().isoformat(),
-                        ':one': 1
-                    }
-                )
-                renewed += 1
+            if claim_lease(sub, worker_id):
+                claimed[sub['subscription_id']] = sub
             else:
-                failed += 1
+                skipped += 1
         except Exception as e:
-            print(f"Exception renewing {sub['subscription_id']}: {e}")
+            print(f"Exception leasing {sub['subscription_id']}: {e}")
             failed += 1
     
+    if not claimed:
+        return {
+            'worker_index': worker_index,
+            'worker_count': worker_count,
+            'total_checked': len(subscriptions),
+            'renewed': 0,
+            'recreated': 0,
+            'deferred': 0,
+            'skipped': skipped,
+            'failed': failed
+        }
+    
+    headers = {
+        'Authorization': f'Bearer {get_graph_token()}',
+        'Content-Type': 'application/json'
+    }
+    outcome = renew_subscriptions_batch(list(claimed), headers)
+    
+    # Update DynamoDB with new expiry
+    new_expiry = (datetime.utcnow() + timedelta(hours=24)).isoformat()
+    failed += record_renewals([claimed[sub_id] for sub_id in outcome['renewed']], worker_id, new_expiry)
+    
+    recreated = 0
+    for sub_id in outcome['gone']:
+        try:
+            if recreate_subscription(sub_id, headers):
+                recreated += 1
+                continue
+            table.update_item(
+                Key={'subscription_id': sub_id, 'created_at': claimed[sub_id]['created_at']},
+                UpdateExpression='SET #status = :inactive REMOVE lease_owner, lease_expires',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={':inactive': 'inactive'}
+            )
+        except Exception as e:
+            print(f"Exception recreating {sub_id}: {e}")
+        failed += 1
+    
+    for sub_id in outcome['deferred'] + outcome['failed']:
+        release_lease(claimed[sub_id], worker_id)
+    failed += len(outcome['failed'])
+    
     return {
+        'worker_index': worker_index,
+        'worker_count': worker_count,
         'total_checked': len(subscriptions),
-        'renewed': renewed,
+        'renewed': len(outcome['renewed']),
+        'recreated': recreated,
+        'deferred': len(outcome['deferred']),
+        'skipped': skipped,
+        'failed': failed
+    }
+
+
+def get_subscription_item(sub_id: str):
+    """Most recent DynamoDB row for a subscription id (or None)."""
+    response = table.query(
+        KeyConditionExpression='subscription_id = :id',
+        ExpressionAttributeValues={':id': sub_id},
+        ScanIndexForward=False,
+        Limit=1
+    )
+    items = response.get('Items', [])
+    return items[0] if items else None
+
+
+def reauthorize_subscription(sub_id: str, headers: dict) -> bool:
+    """Reauthorize a subscription via Graph API."""
+    url = f"https://graph.microsoft.com/v1.0/subscriptions/{sub_id}/reauthorize"
+    response = requests.post(url, headers=headers, timeout=30)
+    
+    if response.status_code in (200, 204):
+        print(f"✅ Reauthorized subscription {sub_id[:50]}")
+        return True
+    print(f"❌ Failed to reauthorize {sub_id}: {response.text}")
+    return False
+
+
+def recreate_subscription(sub_id: str, headers: dict, hours: int = 24) -> dict:
+    """Recreate a removed subscription from its stored definition."""
+    item = get_subscription_item(sub_id)
+    if not item or not item.get('notification_url'):
+        print(f"❌ Cannot recreate {sub_id}: no stored definition with notification_url")
+        return None
+    
+    new_expiry = (datetime.utcnow() + timedelta(hours=hours)).strftime('%Y-%m-%dT%H:%M:%S.0000000Z')
+    payload = {
+        'changeType': item.get('change_types', 'created'),
+        'notificationUrl': item['notification_url'],
+        'resource': item['resource'],
+        'expirationDateTime': new_expiry,
+        'clientState': CLIENT_STATE
+    }
+    if item.get('lifecycle_notification_url'):
+        payload['lifecycleNotificationUrl'] = item['lifecycle_notification_url']
+    
+    response = requests.post('https://graph.microsoft.com/v1.0/subscriptions',
+                             headers=headers, json=payload, timeout=30)
+    if response.status_code != 201:
+        print(f"❌ Failed to recreate {sub_id}: {response.text}")
+        return None
+    
+    created = response.json()
+    now = datetime.utcnow().isoformat()
+    table.update_item(
+        Key={'subscription_id': sub_id, 'created_at': item['created_at']},
+        UpdateExpression='SET #status = :inactive, replaced_by = :new_id',
+        ExpressionAttributeNames={'#status': 'status'},
+        ExpressionAttributeValues={':inactive': 'inactive', ':new_id': created['id']}
+    )
+    new_item = {k: v for k, v in item.items() if k not in ('lease_owner', 'lease_expires', 'resync_requested')}
+    new_item.update({
+        'subscription_id': created['id'],
+        'created_at': now,
+        'expiry_date': created['expirationDateTime'],
+        'status': 'active',
+        'renewal_count': 0,
+        'last_renewed': None,
+        'recreated_from': sub_id
+    })
+    table.put_item(Item=new_item)
+    print(f"✅ Recreated {sub_id[:50]} as {created['id']}")
+    return created
+
+
+def flag_missed(sub_id: str) -> bool:
+    """
+    Record that notifications were missed. process_transcript_notification.py
+    --resync-flagged resyncs the resource and clears the flag.
+    """
+    item = get_subscription_item(sub_id)
+    if not item:
+        print(f"❌ Missed notifications for unknown subscription {sub_id}")
+        return False
+    table.update_item(
+        Key={'subscription_id': sub_id, 'created_at': item['created_at']},
+        UpdateExpression='SET resync_requested = :now',
+        ExpressionAttributeValues={':now': datetime.utcnow().isoformat()}
+    )
+    print(f"🔁 Flagged {item.get('resource', sub_id)[:70]} for delta resync")
+    return True
+
+
+def is_http_event(event: dict) -> bool:
+    """True for API Gateway (REST or HTTP API) and Lambda function URL requests."""
+    return 'requestContext' in event or 'httpMethod' in event or 'rawPath' in event
+
+
+def validation_token(event: dict):
+    """Graph's validationToken query parameter (subscription / lifecycle URL validation), or None."""
+    params = event.get('queryStringParameters') or {}
+    return params.get('validationToken')
+
+
+def extract_lifecycle_notifications(event: dict) -> list:
+    """Pull lifecycle notification items out of a direct or API Gateway / function URL event."""
+    body = event.get('body') if is_http_event(event) else event
+    if isinstance(body, str) and event.get('isBase64Encoded'):
+        try:
+            body = base64.b64decode(body).decode('utf-8')
+        except ValueError:
+            return []
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            return []
+    if not isinstance(body, dict):
+        return []
+    value = body.get('value')
+    if not isinstance(value, list):
+        return []
+    return [n for n in value if isinstance(n, dict) and n.get('lifecycleEvent')]
+
+
+def handle_lifecycle_notifications(notifications: list) -> dict:
+    """React in-line to reauthorizationRequired / subscriptionRemoved / missed."""
+    token = get_graph_token()
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    }
+    handled = 0
+    failed = 0
+    for notification in notifications:
+        sub_id = notification.get('subscriptionId', '')
+        lifecycle_event = notification['lifecycleEvent']
+        print(f"♻️  Lifecycle event {lifecycle_event} for {sub_id[:50]}")
+        
+        if notification.get('clientState') != CLIENT_STATE:
+            print("❌ clientState mismatch, ignoring")
+            failed += 1
+            continue
+        
+        try:
+            if lifecycle_event == 'reauthorizationRequired':
+                ok = reauthorize_subscription(sub_id, headers)
+            elif lifecycle_event == 'subscriptionRemoved':
+                ok = recreate_subscription(sub_id, headers) is not None
+            elif lifecycle_event == 'missed':
+                ok = flag_missed(sub_id)
+            else:
+                print(f"⚠️  Unknown lifecycle event {lifecycle_event}")
+                ok = False
+        except Exception as e:
+            print(f"Exception handling lifecycle event for {sub_id}: {e}")
+            ok = False
+        
+        if ok:
+            handled += 1
+        else:
+            failed += 1
+    
+    return {
+        'lifecycle_notifications': len(notifications),
+        'handled': handled,
         'failed': failed
     }
 
 
 def lambda_handler(event, context):
     """
-    Lambda entry point for scheduled subscription renewal.
+    Lambda entry point for scheduled subscription renewal and lifecycle notifications.
     
-    Event: CloudWatch Events (scheduled)
+    Scheduled (EventBridge) events run the renewal sweep. The event may carry
+    {"worker_index": i, "worker_count": n} to select a shard; otherwise
+    RENEWAL_WORKER_INDEX / RENEWAL_WORKER_COUNT are used.
+    
+    HTTP events (function URL / API Gateway) answer Graph's validationToken
+    with a text/plain echo and handle lifecycle notifications; anything else
+    gets 202 and no sweep. A direct invocation with a "value" list is treated
+    like a notification body.
     """
     
     try:
+        event = event or {}
+        http = is_http_event(event)
+        if http:
+            token = validation_token(event)
+            if token is not None:
+                print("✅ Answering lifecycleNotificationUrl validation")
+                return {
+                    'statusCode': 200,
+                    'headers': {'Content-Type': 'text/plain'},
+                    'body': token
+                }
+        
+        lifecycle = extract_lifecycle_notifications(event)
+        if lifecycle:
+            result = handle_lifecycle_notifications(lifecycle)
+            print(f"✅ Lifecycle handling complete: {result['handled']} handled, {result['failed']} failed")
+            return {
+                'statusCode': 202,
+                'body': json.dumps(result)
+            }
+        if http or 'value' in event:
+            print("⚠️  No lifecycle notifications in request; nothing to do")
+            return {
+                'statusCode': 202,
+                'body': json.dumps({'lifecycle_notifications': 0})
+            }
+        
         print("🔄 Starting subscription renewal check...")
         
-        result = find_and_renew_expired()
+        worker_count = int(event.get('worker_count', os.environ.get('RENEWAL_WORKER_COUNT', '1')))
+        worker_index = int(event.get('worker_index', os.environ.get('RENEWAL_WORKER_INDEX', '0')))
+        worker_id = getattr(context, 'aws_request_id', None)
+        
+        result = find_and_renew_expired(worker_index, worker_count, worker_id)
         
         response = {
             'statusCode': 200,
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Compact Webhook Payloads
+
+Rolls a day's worth of small webhook objects (one pretty-printed JSON file
+per notification) into a single compressed JSONL file so bulk reads cost a
+handful of GETs instead of one per notification.
+
+Output per day, under webhooks-compacted/YYYY/MM/DD/:
+    payloads.jsonl.gz | payloads.jsonl.zst   one line per original object:
+                                             {"key", "size", "last_modified", "sha256", "raw"}
+    records.parquet                          optional, flattened notification records
+    manifest.json                            counts, checksums, originals status (written last)
+
+Originals are only deleted or tiered after the compacted file has been read
+back and every object's checksum matched.
+
+A day that was already compacted is merged, not rewritten: payloads that
+arrived late under the live prefix are added to the existing compacted file
+(deduped by key), so neither late objects nor payloads whose originals were
+already deleted are lost. --force re-reads every live original as well.
+
+Usage:
+    # Compact yesterday (default)
+    python scripts/aws/compact-payloads.py
+
+    # A range of days, zstd + Parquet, then delete the originals
+    python scripts/aws/compact-payloads.py --from 2026-02-01 --to 2026-02-13 --codec zstd --parquet --delete-originals
+
+    # Move originals to a cheaper storage class instead of deleting them
+    python scripts/aws/compact-payloads.py --day 2026-02-13 --tier GLACIER_IR
+"""
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+from botocore.exceptions import ClientError
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from webhook_payloads import (
+    COMPACTED_PREFIX, DEFAULT_BUCKET, DEFAULT_PREFIX, RECORD_FIELDS, compacted_day_prefix, day_objects,
+    decompress, delete_objects, get_s3_client, map_objects, payload_records, payload_time, zstandard,
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # only needed for --parquet
+    pa = pq = None
+
+# Low-cardinality record columns stored dictionary-encoded in Parquet
+DICTIONARY_COLUMNS = ('subscription_id', 'change_type', 'kind', 'lifecycle_event', 'user_id')
+INTEGER_COLUMNS = ('position', 'size')
+
+# Storage classes tiered originals can move to: all readable with a plain GET.
+# GLACIER / DEEP_ARCHIVE would need a restore before replay or re-compaction.
+TIER_STORAGE_CLASSES = ('STANDARD_IA', 'ONEZONE_IA', 'INTELLIGENT_TIERING', 'GLACIER_IR')
+
+
+def entry_time(entry):
+    """Receive time of a compacted entry (same order as payload_time for listed objects)"""
+    return payload_time({'Key': entry['key'], 'LastModified': datetime.fromisoformat(entry['last_modified'])})
+
+
+def fetch_originals(s3, bucket, objects, workers):
+    """GET every object; returns entries sorted by receive time, plus failed keys"""
+    def fetch(obj):
+        raw = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read()
+        return {
+            'key': obj['Key'],
+            'size': len(raw),
+            'last_modified': obj['LastModified'].isoformat(),
+            'sha256': hashlib.sha256(raw).hexdigest(),
+            'raw': raw.decode('utf-8'),
+        }, payload_time(obj)
+
+    entries, failed = [], []
+    for obj, result, error in map_objects(fetch, objects, workers):
+        if error:
+            print(f"   ❌ {obj['Key']}: {error}")
+            failed.append(obj['Key'])
+        else:
+            entries.append(result)
+
+    entries.sort(key=lambda e: (e[1], e[0]['key']))
+    return [entry for entry, _ in entries], failed
+
+
+def encode_jsonl(entries, codec, level=None):
+    """(bytes, file extension) for the entries as compressed JSONL"""
+    data = ''.join(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries).encode('utf-8')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=level or 10).compress(data), '.jsonl.zst'
+    return gzip.compress(data, compresslevel=level or 6), '.jsonl.gz'
+
+
+def encode_parquet(entries):
+    """Flattened notification records as Parquet bytes"""
+    records = [r for e in entries for r in payload_records(e['key'], e['raw'].encode('utf-8'), e['size'])]
+    columns = {}
+    for field in RECORD_FIELDS:
+        values = [r.get(field) for r in records]
+        if field in INTEGER_COLUMNS:
+            columns[field] = pa.array(values, type=pa.int64())
+        elif field in DICTIONARY_COLUMNS:
+            columns[field] = pa.array(values, type=pa.string()).dictionary_encode()
+        else:
+            columns[field] = pa.array(values, type=pa.string())
+
+    buffer = io.BytesIO()
+    pq.write_table(pa.table(columns), buffer, compression='zstd')
+    return buffer.getvalue(), len(records)
+
+
+def file_entry(key, data, fmt, records):
+    return {
+        'key': key,
+        'format': fmt,
+        'records': records,
+        'size': len(data),
+        'sha256': hashlib.sha256(data).hexdigest(),
+    }
+
+
+def verify(s3, bucket, payloads, entries):
+    """Read the compacted file back and check it against the originals"""
+    data = s3.get_object(Bucket=bucket, Key=payloads['key'])['Body'].read()
+    if hashlib.sha256(data).hexdigest() != payloads['sha256']:
+        return False, "file checksum mismatch"
+
+    expected = {e['key']: e['sha256'] for e in entries}
+    found = 0
+    for line in decompress(data, payloads['key']).splitlines():
+        if not line:
+            continue
+        entry = json.loads(line)
+        if hashlib.sha256(entry['raw'].encode('utf-8')).hexdigest() != expected.get(entry['key']):
+            return False, f"checksum mismatch for {entry['key']}"
+        found += 1
+
+    if found != len(expected):
+        return False, f"expected {len(expected)} payloads, found {found}"
+    return True, None
+
+
+def delete_originals(s3, bucket, keys, workers):
+    """DeleteObjects in batches of 1000, concurrently; returns the number deleted"""
+    deleted, errors = delete_objects(s3, bucket, keys, workers)
+    for error in errors:
+        print(f"   ❌ {error['Key']}: {error.get('Message')}")
+    return deleted
+
+
+def tier_originals(s3, bucket, keys, storage_class, workers):
+    """Rewrite originals in place with a cheaper storage class; returns the number moved"""
+    def tier(key):
+        s3.copy_object(Bucket=bucket, Key=key, CopySource={'Bucket': bucket, 'Key': key},
+                       StorageClass=storage_class, MetadataDirective='COPY')
+
+    moved = 0
+    for key, _, error in map_objects(tier, keys, workers):
+        if error:
+            print(f"   ❌ {key}: {error}")
+        else:
+            moved += 1
+    return moved
+
+
+def load_manifest(s3, bucket, key):
+    """A day's manifest, or None if it was never compacted"""
+    try:
+        return json.loads(s3.get_object(Bucket=bucket, Key=key)['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+
+
+def read_compacted_entries(s3, bucket, manifest):
+    """Entries of an existing compacted file, in file order"""
+    key = manifest['payloads']['key']
+    data = decompress(s3.get_object(Bucket=bucket, Key=key)['Body'].read(), key)
+    return [json.loads(line) for line in data.splitlines() if line]
+
+
+def merge_entries(existing, fetched):
+    """Existing and newly fetched entries deduped by key (fetched wins), in receive order"""
+    merged = {e['key']: e for e in existing}
+    merged.update((e['key'], e) for e in fetched)
+    return sorted(merged.values(), key=lambda e: (entry_time(e), e['key']))
+
+
+def compact_day(s3, day, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, compacted_prefix=COMPACTED_PREFIX,
+                codec='gzip', parquet=False, delete=False, tier=None, workers=32, dry_run=False, force=False):
+    """
+    Compact one UTC day, merging into its existing compacted file if there is one.
+
+    Live objects already in the compacted file (same key and size) are not
+    fetched again unless force is set.
+
+    Returns:
+        The day's manifest, or None if there was nothing to do
+    """
+    if tier and tier not in TIER_STORAGE_CLASSES:
+        raise ValueError(f"Cannot tier originals to {tier}: use one of {', '.join(TIER_STORAGE_CLASSES)}")
+    out_prefix = compacted_day_prefix(day, compacted_prefix)
+    manifest_key = f"{out_prefix}manifest.json"
+
+    print(f"\n📅 {day}")
+    previous = load_manifest(s3, bucket, manifest_key)
+    existing = read_compacted_entries(s3, bucket, previous) if previous else []
+    compacted_sizes = {e['key']: e['size'] for e in existing}
+
+    objects = list(day_objects(s3, bucket, prefix, day))
+    new = objects if force else [obj for obj in objects if compacted_sizes.get(obj['Key']) != obj['Size']]
+    if previous:
+        print(f"   Already compacted: {len(existing)} payload(s), originals {previous.get('originals')}")
+    if not objects:
+        print("   No live payloads")
+        return None
+    if previous and not new and not (delete or tier):
+        print("   ⏭️  No live payloads missing from the compacted file")
+        return None
+
+    bytes_in = sum(obj['Size'] for obj in new)
+    print(f"   {len(new)} object(s) to add, {bytes_in / 1024:.0f} KiB")
+    if dry_run:
+        return None
+
+    fetched, failed = fetch_originals(s3, bucket, new, workers)
+    if failed:
+        print(f"   ⚠️  {len(failed)} object(s) could not be read; they stay in place and uncompacted")
+    entries = merge_entries(existing, fetched)
+
+    data, extension = encode_jsonl(entries, codec)
+    payloads_key = f"{out_prefix}payloads{extension}"
+    s3.put_object(Bucket=bucket, Key=payloads_key, Body=data, ContentType='application/x-ndjson')
+
+    manifest = {
+        'day': day.isoformat(),
+        'bucket': bucket,
+        'source_prefix': prefix,
+        'compacted_at': datetime.now(timezone.utc).isoformat(),
+        'objects': len(entries),
+        'bytes_in': sum(e['size'] for e in entries),
+        'payloads': file_entry(payloads_key, data, f"jsonl+{codec}", len(entries)),
+        'originals': 'kept',
+    }
+    if previous:
+        manifest['merged'] = {'previous_objects': len(existing), 'added': len(entries) - len(existing),
+                              'previous_compacted_at': previous['compacted_at']}
+
+    if parquet:
+        table, records = encode_parquet(entries)
+        parquet_key = f"{out_prefix}records.parquet"
+        s3.put_object(Bucket=bucket, Key=parquet_key, Body=table)
+        manifest['records'] = file_entry(parquet_key, table, 'parquet', records)
+
+    print(f"   📦 {payloads_key} ({len(data) / 1024:.0f} KiB, "
+          f"{manifest['bytes_in'] / max(len(data), 1):.1f}x smaller)")
+
+    ok, reason = verify(s3, bucket, manifest['payloads'], entries)
+    if not ok:
+        print(f"   ❌ Verification failed: {reason}; originals left in place, no manifest written")
+        return None
+    print("   ✅ Verified against originals")
+
+    # Manifest goes first so readers switch to the compacted file before originals disappear.
+    # Live originals already in the file from an earlier run are covered too.
+    compacted_keys = {e['key'] for e in entries}
+    compacted_keys.difference_update(failed)
+    keys = [obj['Key'] for obj in objects if obj['Key'] in compacted_keys]
+    if delete or tier:
+        manifest['originals'] = 'deleting' if delete else f"tiering:{tier}"
+    s3.put_object(Bucket=bucket, Key=manifest_key, Body=json.dumps(manifest, indent=2).encode('utf-8'),
+                  ContentType='application/json')
+
+    # Files of the previous compaction the new manifest no longer points at (codec change, no --parquet)
+    if previous:
+        current = {manifest['payloads']['key'], manifest.get('records', {}).get('key')}
+        stale = [f['key'] for f in (previous['payloads'], previous.get('records')) if f and f['key'] not in current]
+        if stale:
+            s3.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': key} for key in stale]})
+
+    if delete:
+        deleted = delete_originals(s3, bucket, keys, workers)
+        manifest['originals'] = 'deleted' if deleted == len(keys) else f"partially deleted ({deleted}/{len(keys)})"
+        print(f"   🗑️  Deleted {deleted} original(s)")
+    elif tier:
+        moved = tier_originals(s3, bucket, keys, tier, workers)
+        manifest['originals'] = f"tiered:{tier}" if moved == len(keys) else f"partially tiered:{tier} ({moved}/{len(keys)})"
+        print(f"   🧊 Moved {moved} original(s) to {tier}")
+
+    if delete or tier:
+        s3.put_object(Bucket=bucket, Key=manifest_key, Body=json.dumps(manifest, indent=2).encode('utf-8'),
+                      ContentType='application/json')
+
+    return manifest
+
+
+def days_to_compact(args):
+    if args.day:
+        return sorted(set(args.day))
+    yesterday = datetime.now(timezone.utc).date() - timedelta(days=1)
+    start = args.date_from or yesterday
+    end = args.date_to or yesterday
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact daily webhook payloads into compressed JSONL")
+    parser.add_argument("--bucket", default=DEFAULT_BUCKET)
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="Live payload prefix")
+    parser.add_argument("--compacted-prefix", default=COMPACTED_PREFIX)
+    parser.add_argument("--day", type=date.fromisoformat, action="append", help="Day to compact (repeatable)")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First day of a range")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last day of a range (default: yesterday)")
+    parser.add_argument("--codec", choices=["gzip", "zstd"], default="gzip")
+    parser.add_argument("--parquet", action="store_true", help="Also write flattened records as Parquet")
+    originals = parser.add_mutually_exclusive_group()
+    originals.add_argument("--delete-originals", action="store_true", help="Delete originals after verification")
+    originals.add_argument("--tier", metavar="STORAGE_CLASS", choices=TIER_STORAGE_CLASSES,
+                           help="Move originals to a storage class readable without a restore after "
+                                f"verification ({', '.join(TIER_STORAGE_CLASSES)})")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--dry-run", action="store_true", help="Only count what would be compacted")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-read every live original of already compacted days (merged, never dropped)")
+    args = parser.parse_args()
+
+    if args.codec == "zstd" and zstandard is None:
+        print("❌ --codec zstd needs the zstandard package: pip install zstandard")
+        return 1
+    if args.parquet and pa is None:
+        print("❌ --parquet needs pyarrow: pip install pyarrow")
+        return 1
+
+    today = datetime.now(timezone.utc).date()
+    days = days_to_compact(args)
+    if any(day >= today for day in days):
+        print("❌ Only closed days can be compacted (today and later are still being written)")
+        return 1
+
+    s3 = get_s3_client(max_pool_connections=args.workers)
+    manifests = [
+        m for m in (
+            compact_day(s3, day, args.bucket, args.prefix, args.compacted_prefix, args.codec, args.parquet,
+                        args.delete_originals, args.tier, args.workers, args.dry_run, args.force)
+            for day in days
+        ) if m
+    ]
+
+    print(f"\n✅ Compacted {len(manifests)} day(s), "
+          f"{sum(m['objects'] for m in manifests)} payload(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
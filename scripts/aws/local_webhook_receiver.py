@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Local Webhook Receiver
+
+Asyncio stand-in for the API Gateway + Lambda webhook (apps/aws-lambda/handler.js)
+so the integration tests, replay-webhooks.py and load-test-webhook.py can run
+offline.
+
+Contract:
+    ?validationToken=...        200 text/plain echo (any method)
+    POST invalid JSON           400
+    POST empty body             400 (tests profile) / treated as {} (handler profile)
+    clientState mismatch        403 (only when --client-state is set)
+    POST accepted               {"status": "ok", "key": ...} and the envelope
+                                {receivedAt, requestId, source, body} is stored
+
+Profiles:
+    tests    200, webhooks/YYYY/MM/DD/graph-webhook-... keys, body stored as JSON
+             (what test/integration/aws/test_webhook_delivery.py expects)
+    handler  202, flat webhooks/{timestamp}-{requestId}.json keys, body stored as
+             the raw string, empty notification lists rejected (deployed handler.js)
+
+Sinks:
+    dir:PATH                    one file per payload under PATH (default: .cache/webhooks)
+    sqlite:PATH                 raw payloads + payload_index.py records in one SQLite file
+    s3://BUCKET                 any S3-compatible endpoint (--endpoint-url for MinIO, moto server, ...)
+
+Usage:
+    python scripts/aws/local_webhook_receiver.py --port 8080
+    python scripts/aws/local_webhook_receiver.py --sink sqlite:.cache/webhook-index.sqlite --client-state secret
+    python scripts/aws/local_webhook_receiver.py --sink s3://tmf-webhook-payloads-dev --endpoint-url http://localhost:9000
+
+    # Then, for example:
+    AWS_WEBHOOK_ENDPOINT=http://localhost:8080/graph pytest test/integration/aws/test_webhook_delivery.py
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from webhook_payloads import DEFAULT_PREFIX, get_s3_client, payload_key
+from payload_index import PayloadIndex
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+
+PROFILES = {
+    'tests': {'status': 200, 'layout': 'partitioned', 'body_as_json': True, 'empty_body': 400,
+              'require_notifications': False},
+    'handler': {'status': 202, 'layout': 'flat', 'body_as_json': False, 'empty_body': None,
+                'require_notifications': True},
+}
+
+REASONS = {200: 'OK', 202: 'Accepted', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+           405: 'Method Not Allowed', 411: 'Length Required', 413: 'Payload Too Large',
+           500: 'Internal Server Error'}
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+
+class RequestError(Exception):
+    """A request the server can't read; carries the HTTP status to answer with"""
+
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+class DirectorySink:
+    """Writes each payload to ROOT/<key>"""
+
+    def __init__(self, root):
+        self.root = Path(root)
+
+    def put(self, key, data):
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+
+    def describe(self):
+        return f"directory {self.root}"
+
+
+class SqliteSink:
+    """Stores raw payloads and indexes them with payload_index.PayloadIndex"""
+
+    def __init__(self, path):
+        self.path = path
+        self._index = None
+
+    def put(self, key, data):
+        # Only ever called from the receiver's single sink thread, which owns the connection
+        if self._index is None:
+            self._index = PayloadIndex(self.path)
+            self._index.conn.execute("CREATE TABLE IF NOT EXISTS raw_payloads (key TEXT PRIMARY KEY, body BLOB)")
+        self._index.conn.execute("INSERT OR REPLACE INTO raw_payloads (key, body) VALUES (?, ?)", (key, data))
+        self._index.add_payload(key, data)
+
+    def describe(self):
+        return f"SQLite {self.path}"
+
+
+class S3Sink:
+    """put_object to S3 or any S3-compatible endpoint"""
+
+    def __init__(self, bucket, endpoint_url=None, profile=None):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.s3 = get_s3_client(profile, endpoint_url=endpoint_url)
+
+    def put(self, key, data):
+        self.s3.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType='application/json')
+
+    def describe(self):
+        return f"s3://{self.bucket}" + (f" via {self.endpoint_url}" if self.endpoint_url else "")
+
+
+def make_sink(spec, endpoint_url=None, profile=None):
+    """Sink from a dir:PATH, sqlite:PATH or s3://BUCKET spec"""
+    if spec.startswith("s3://"):
+        return S3Sink(spec[len("s3://"):].strip("/"), endpoint_url, profile)
+    if spec.startswith("sqlite:"):
+        return SqliteSink(spec[len("sqlite:"):])
+    if spec.startswith("dir:"):
+        return DirectorySink(spec[len("dir:"):])
+    raise ValueError(f"Unknown sink: {spec} (use dir:PATH, sqlite:PATH or s3://BUCKET)")
+
+
+class WebhookReceiver:
+    """The handler.js contract, independent of the HTTP plumbing"""
+
+    def __init__(self, sink, client_state=None, profile='tests', prefix=DEFAULT_PREFIX, sink_workers=8):
+        self.sink = sink
+        self.client_state = client_state
+        self.profile = PROFILES[profile]
+        self.prefix = prefix
+        # SQLite connections are per-thread, so that sink gets exactly one writer thread
+        workers = 1 if isinstance(sink, SqliteSink) else sink_workers
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.stats = {'requests': 0, 'stored': 0, 'rejected': 0, 'handler_ms': 0.0}
+
+    async def handle(self, method, target, body):
+        """Returns (status, content_type, response_body)"""
+        started = time.perf_counter()
+        self.stats['requests'] += 1
+        try:
+            status, content_type, response = await self._handle(method, target, body)
+        except Exception as e:
+            print(f"❌ Error handling request: {e}")
+            status, content_type, response = 500, 'application/json', {'error': str(e)}
+
+        if status >= 400:
+            self.stats['rejected'] += 1
+        self.stats['handler_ms'] += (time.perf_counter() - started) * 1000
+
+        if not isinstance(response, (bytes, str)):
+            response = json.dumps(response)
+        return status, content_type, response.encode('utf-8') if isinstance(response, str) else response
+
+    async def _handle(self, method, target, body):
+        query = parse_qs(urlsplit(target).query)
+        if query.get('validationToken'):
+            return 200, 'text/plain', query['validationToken'][0]
+
+        if method != 'POST':
+            return 405, 'application/json', {'error': 'Use POST for notifications'}
+
+        text = body.decode('utf-8', 'replace')
+        if not text.strip():
+            if self.profile['empty_body']:
+                return self.profile['empty_body'], 'application/json', {'error': 'Empty body'}
+            parsed = {}
+        else:
+            try:
+                parsed = json.loads(text)
+            except ValueError:
+                return 400, 'application/json', {'error': 'Invalid JSON body'}
+
+        if self.client_state is not None or self.profile['require_notifications']:
+            notifications = parsed.get('value', []) if isinstance(parsed, dict) else []
+            if self.profile['require_notifications'] and not notifications:
+                return 403, 'application/json', {'error': 'Invalid clientState'}
+            if self.client_state is not None and any(
+                    not isinstance(n, dict) or n.get('clientState') != self.client_state for n in notifications):
+                return 403, 'application/json', {'error': 'Invalid clientState'}
+
+        now = datetime.now(timezone.utc)
+        request_id = str(uuid.uuid4())
+        key = payload_key(now, request_id, self.prefix, self.profile['layout'])
+        envelope = {
+            'receivedAt': now.isoformat(timespec='milliseconds').replace('+00:00', 'Z'),
+            'requestId': request_id,
+            'source': 'graph-webhook',
+            'body': parsed if self.profile['body_as_json'] else text,
+        }
+
+        data = json.dumps(envelope, indent=2).encode('utf-8')
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.sink.put, key, data)
+        self.stats['stored'] += 1
+        return self.profile['status'], 'application/json', {'status': 'ok', 'key': key}
+
+
+async def read_request(reader):
+    """(method, target, version, headers, body) or None when the client closed the connection"""
+    request_line = await reader.readline()
+    if not request_line.strip():
+        return None
+    method, target, version = request_line.decode('latin-1').strip().split(' ', 2)
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+
+    if 'chunked' in headers.get('transfer-encoding', '').lower():
+        raise RequestError(411)
+    length = int(headers.get('content-length') or 0)
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413)
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, version, headers, body
+
+
+def write_response(writer, status, content_type, body, keep_alive):
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+
+
+async def serve(receiver, host='127.0.0.1', port=8080, ready=None):
+    """Run the HTTP server until cancelled; ready (an asyncio.Event-like) is set once listening"""
+
+    async def handle_connection(reader, writer):
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except RequestError as e:
+                    write_response(writer, e.status, 'application/json', b'{"error": "Unsupported request"}', False)
+                    break
+                except (ValueError, asyncio.IncompleteReadError, ConnectionError):
+                    break
+                if request is None:
+                    break
+
+                method, target, version, headers, body = request
+                status, content_type, response = await receiver.handle(method, target, body)
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                write_response(writer, status, content_type, response, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle_connection, host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the webhook Lambda")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--sink", default=f"dir:{REPO_ROOT / '.cache' / 'webhooks'}",
+                        help="dir:PATH, sqlite:PATH or s3://BUCKET (default: dir:.cache/webhooks)")
+    parser.add_argument("--endpoint-url", help="S3-compatible endpoint for an s3:// sink")
+    parser.add_argument("--profile-name", dest="aws_profile", help="AWS profile for an s3:// sink")
+    parser.add_argument("--client-state", default=os.getenv("WEBHOOK_AUTH_SECRET") or None,
+                        help="Expected clientState (default: WEBHOOK_AUTH_SECRET; unset = not checked)")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="tests",
+                        help="Response contract (default: tests)")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    args = parser.parse_args()
+
+    sink = make_sink(args.sink, args.endpoint_url, args.aws_profile)
+    receiver = WebhookReceiver(sink, args.client_state, args.profile, args.prefix)
+
+    def ready(port):
+        print(f"🚀 Webhook receiver on http://{args.host}:{port}/ ({args.profile} profile)")
+        print(f"   Sink: {sink.describe()}")
+        print(f"   clientState: {'checked' if args.client_state else 'not checked'}")
+
+    try:
+        asyncio.run(serve(receiver, args.host, args.port, ready))
+    except KeyboardInterrupt:
+        stats = receiver.stats
+        mean = stats['handler_ms'] / stats['requests'] if stats['requests'] else 0
+        print(f"\n📊 {stats['requests']} request(s), {stats['stored']} stored, "
+              f"{stats['rejected']} rejected, mean handler time {mean:.2f} ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
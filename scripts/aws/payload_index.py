@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Sidecar Index for Stored Webhook Payloads
+
+Keeps a compact index of key -> receivedAt, subscriptionId, changeType,
+resource class and meeting/transcript ids so queries over
+s3://tmf-webhook-payloads-dev/webhooks/ don't need a GET per object.
+
+The index is a local SQLite file; `build --manifests` also writes the new
+rows to S3 as day-sharded JSONL manifests that teammates can `pull`.
+
+Usage:
+    # Backfill (incremental: only keys not yet indexed are fetched)
+    python scripts/aws/payload_index.py build --manifests
+
+    # Load manifests written by someone else
+    python scripts/aws/payload_index.py pull
+
+    # Query
+    python scripts/aws/payload_index.py query --kind transcript --since 2026-02-13 --limit 20
+    python scripts/aws/payload_index.py query --count-by subscription_id
+"""
+import argparse
+import gzip
+import json
+import os
+import sqlite3
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from webhook_payloads import (
+    COMPACTED_PREFIX, DEFAULT_BUCKET, DEFAULT_PREFIX, RECORD_FIELDS, compacted_manifests, fetch_records,
+    get_s3_client, iter_payload_objects, map_objects, payload_records, read_compacted_day,
+)
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_INDEX_PATH = os.getenv("WEBHOOK_INDEX_DB", str(REPO_ROOT / ".cache" / "webhook-index.sqlite"))
+MANIFEST_PREFIX = os.getenv("WEBHOOK_INDEX_PREFIX", "webhooks-index/")
+
+QUERY_FILTERS = {
+    'kind': 'kind = ?',
+    'subscription': 'subscription_id = ?',
+    'change_type': 'change_type = ?',
+    'meeting': 'meeting_id = ?',
+    'user': 'user_id = ?',
+    'since': 'received_at >= ?',
+    'until': 'received_at < ?',
+}
+
+
+class PayloadIndex:
+    """SQLite index of flattened webhook notification records"""
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self._create_schema()
+
+    def _create_schema(self):
+        columns = ', '.join(
+            f"{name} INTEGER" if name in ('position', 'size') else f"{name} TEXT"
+            for name in RECORD_FIELDS
+        )
+        self.conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS payloads ({columns}, PRIMARY KEY (key, position));
+            CREATE INDEX IF NOT EXISTS payloads_received ON payloads (received_at);
+            CREATE INDEX IF NOT EXISTS payloads_subscription ON payloads (subscription_id, received_at);
+            CREATE INDEX IF NOT EXISTS payloads_kind ON payloads (kind, received_at);
+            CREATE INDEX IF NOT EXISTS payloads_meeting ON payloads (meeting_id);
+        """)
+
+    def add_records(self, records):
+        """Insert or replace flattened records; returns the number written"""
+        placeholders = ', '.join('?' for _ in RECORD_FIELDS)
+        rows = [tuple(r.get(f) for f in RECORD_FIELDS) for r in records]
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO payloads ({', '.join(RECORD_FIELDS)}) VALUES ({placeholders})",
+            rows
+        )
+        return len(rows)
+
+    def add_payload(self, key, raw, size=None):
+        """Index one stored payload at ingest time"""
+        written = self.add_records(payload_records(key, raw, size))
+        self.commit()
+        return written
+
+    def commit(self):
+        self.conn.commit()
+
+    def known_keys(self, keys):
+        """Subset of keys already present in the index"""
+        known = set()
+        keys = list(keys)
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows = self.conn.execute(
+                f"SELECT DISTINCT key FROM payloads WHERE key IN ({', '.join('?' for _ in chunk)})", chunk
+            )
+            known.update(row['key'] for row in rows)
+        return known
+
+    def query(self, limit=None, newest_first=True, **filters):
+        """Records matching filters (see QUERY_FILTERS), newest first by default"""
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is not None:
+                clauses.append(QUERY_FILTERS[name])
+                params.append(value)
+
+        sql = "SELECT * FROM payloads"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY received_at {'DESC' if newest_first else 'ASC'}, key, position"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def latest(self, n=1, kind=None):
+        """The n most recently received records"""
+        return self.query(limit=n, kind=kind)
+
+    def count_by(self, field, **filters):
+        """[(value, count)] grouped by one record field"""
+        if field not in RECORD_FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        clauses, params = [], []
+        for name, value in filters.items():
+            if value is not None:
+                clauses.append(QUERY_FILTERS[name])
+                params.append(value)
+        sql = f"SELECT {field} AS value, COUNT(*) AS count FROM payloads"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" GROUP BY {field} ORDER BY count DESC"
+        return [(row['value'], row['count']) for row in self.conn.execute(sql, params)]
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(DISTINCT key) FROM payloads").fetchone()[0]
+
+
+def open_index(path=None):
+    """PayloadIndex at path (or the default) if the file exists, else None"""
+    path = path or DEFAULT_INDEX_PATH
+    return PayloadIndex(path) if Path(path).exists() else None
+
+
+def manifest_key(day, run_id):
+    """webhooks-index/YYYY/MM/DD/part-<run>.jsonl.gz"""
+    return f"{MANIFEST_PREFIX}{day.replace('-', '/')}/part-{run_id}.jsonl.gz"
+
+
+def write_manifests(s3, bucket, records):
+    """Write new records to S3 as gzip JSONL, one object per received day"""
+    by_day = {}
+    for record in records:
+        day = (record.get('received_at') or 'unknown')[:10]
+        by_day.setdefault(day, []).append(record)
+
+    run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    for day, day_records in by_day.items():
+        body = gzip.compress('\n'.join(json.dumps(r) for r in day_records).encode('utf-8'))
+        s3.put_object(Bucket=bucket, Key=manifest_key(day, run_id), Body=body,
+                      ContentType='application/x-ndjson', ContentEncoding='gzip')
+    return len(by_day)
+
+
+def build(index, s3, bucket, prefix, workers=32, manifests=False, compacted_prefix=COMPACTED_PREFIX):
+    """Fetch and index every payload not yet in the index, compacted days included"""
+    started = time.monotonic()
+    new_records = []
+    listed = fetched = 0
+
+    for day in compacted_manifests(s3, bucket, compacted_prefix) if compacted_prefix else []:
+        day_objects = list(read_compacted_day(s3, bucket, day))
+        listed += len(day_objects)
+        for obj in _filter_known(index, day_objects):
+            records = payload_records(obj['Key'], obj['Raw'], obj['Size'])
+            index.add_records(records)
+            fetched += 1
+            if manifests:
+                new_records.extend(records)
+        index.commit()
+
+    def unindexed_objects():
+        nonlocal listed
+        page = []
+        for obj in iter_payload_objects(s3, bucket, prefix):
+            page.append(obj)
+            if len(page) == 1000:
+                yield from _filter_known(index, page)
+                listed += len(page)
+                page = []
+        if page:
+            yield from _filter_known(index, page)
+            listed += len(page)
+
+    for obj, records, error in map_objects(lambda o: fetch_records(s3, bucket, o), unindexed_objects(), workers):
+        if error:
+            print(f"Error indexing {obj['Key']}: {error}")
+            continue
+        index.add_records(records)
+        fetched += 1
+        if manifests:
+            new_records.extend(records)
+        if fetched % 1000 == 0:
+            index.commit()
+            print(f"   ... {fetched} new payloads indexed")
+
+    index.commit()
+    shards = write_manifests(s3, bucket, new_records) if manifests and new_records else 0
+
+    print(f"✅ Indexed {fetched} new payload(s) ({listed} listed) in {time.monotonic() - started:.1f}s")
+    if manifests:
+        print(f"   📝 Wrote {shards} manifest shard(s) under s3://{bucket}/{MANIFEST_PREFIX}")
+    return fetched
+
+
+def _filter_known(index, page):
+    known = index.known_keys(obj['Key'] for obj in page)
+    return [obj for obj in page if obj['Key'] not in known]
+
+
+def pull(index, s3, bucket):
+    """Load every S3 manifest shard into the local index"""
+    loaded = 0
+    for obj in iter_payload_objects(s3, bucket, MANIFEST_PREFIX):
+        raw = s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read()
+        text = gzip.decompress(raw).decode('utf-8') if obj['Key'].endswith('.gz') else raw.decode('utf-8')
+        loaded += index.add_records(json.loads(line) for line in text.splitlines() if line)
+    index.commit()
+    print(f"✅ Loaded {loaded} record(s) from manifests")
+    return loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index stored webhook payloads")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="SQLite index path")
+    parser.add_argument("--bucket", default=DEFAULT_BUCKET)
+    subparsers = parser.add_subparsers(dest="command")
+
+    build_parser = subparsers.add_parser("build", help="Index payloads not yet in the index")
+    build_parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    build_parser.add_argument("--workers", type=int, default=32)
+    build_parser.add_argument("--manifests", action="store_true", help="Also write S3 JSONL manifests")
+
+    subparsers.add_parser("pull", help="Load S3 manifests into the local index")
+
+    query_parser = subparsers.add_parser("query", help="Query the index")
+    for name in QUERY_FILTERS:
+        query_parser.add_argument(f"--{name.replace('_', '-')}", dest=name)
+    query_parser.add_argument("--limit", type=int, default=20)
+    query_parser.add_argument("--count-by", help="Group and count by a record field")
+    query_parser.add_argument("--json", action="store_true", help="Print records as JSON lines")
+
+    args = parser.parse_args()
+
+    if args.command == "build":
+        index = PayloadIndex(args.index)
+        build(index, get_s3_client(max_pool_connections=args.workers), args.bucket,
+              args.prefix, args.workers, args.manifests)
+
+    elif args.command == "pull":
+        pull(PayloadIndex(args.index), get_s3_client(), args.bucket)
+
+    elif args.command == "query":
+        index = open_index(args.index)
+        if index is None:
+            print(f"❌ No index at {args.index}. Run: python scripts/aws/payload_index.py build")
+            return 1
+        filters = {name: getattr(args, name) for name in QUERY_FILTERS}
+        started = time.perf_counter()
+        if args.count_by:
+            rows = index.count_by(args.count_by, **filters)
+            for value, count in rows:
+                print(f"{count:8}  {value}")
+        else:
+            rows = index.query(limit=args.limit, **filters)
+            for row in rows:
+                if args.json:
+                    print(json.dumps(row))
+                else:
+                    print(f"{row['received_at']}  {row['kind']:<10} {row['change_type'] or row['lifecycle_event'] or '-':<10} "
+                          f"{(row['subscription_id'] or '-')[:36]:<36}  {row['key']}")
+        print(f"\n{len(rows)} row(s) in {(time.perf_counter() - started) * 1000:.1f} ms "
+              f"({index.count()} payloads indexed)")
+
+    else:
+        parser.print_help()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Query Archived Webhook Payloads Offline
+
+Scans a local copy of the payload bucket (compacted days and/or raw payload
+files) without touching S3, one worker process per day partition:
+
+- partition pruning: only days inside --since/--until are opened
+- predicate pushdown: records.parquet is read with only the needed columns
+  and --since/--until/--where equality filters applied by pyarrow; JSONL and
+  raw files are skipped by key timestamp, and lines that can't contain a
+  --where subscription_id/change_type/lifecycle_event value are dropped
+  before any JSON parsing
+- streaming aggregation: each worker returns per-group counts and a
+  log-bucket histogram, merged as partitions finish
+
+Archive layout (what `download` writes, mirroring the bucket):
+    ARCHIVE/webhooks-compacted/YYYY/MM/DD/{manifest.json, payloads.jsonl.*, records.parquet}
+    ARCHIVE/webhooks/...                    raw payload JSON files, either key layout
+
+Usage:
+    # Fetch compacted days (and raw payloads of days not compacted yet)
+    python scripts/aws/query-payloads.py download --from 2026-02-06 --to 2026-02-13 --raw
+
+    # Notifications per subscription per hour, last week
+    python scripts/aws/query-payloads.py query --since 2026-02-06 --group-by subscription_id,hour
+
+    # Size percentiles of transcript notifications by change type
+    python scripts/aws/query-payloads.py query --where kind=transcript --group-by change_type --percentiles size
+
+    # Users with calendar updates but never a transcript notification
+    python scripts/aws/query-payloads.py query --where kind=calendar --where change_type=updated \\
+        --missing kind=transcript --on user_id
+
+    # Matching records themselves
+    python scripts/aws/query-payloads.py query --where change_type=deleted --select received_at,resource --limit 20
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sys
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent))
+from webhook_payloads import (
+    COMPACTED_PREFIX, DEFAULT_BUCKET, DEFAULT_PREFIX, RECORD_FIELDS, compacted_day_prefix, compacted_manifests,
+    day_objects, decompress, get_s3_client, key_timestamp, map_objects, payload_records, read_payload,
+)
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # records.parquet is then ignored in favour of the JSONL file
+    pq = None
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_ARCHIVE = os.getenv("WEBHOOK_ARCHIVE_DIR", str(REPO_ROOT / ".cache" / "archive"))
+
+# Derived grouping fields computed from received_at
+TIME_FIELDS = {'hour': 13, 'day': 10, 'minute': 16}
+
+# Fields whose values appear verbatim in the raw payload text
+PREFILTER_FIELDS = ('subscription_id', 'change_type', 'lifecycle_event')
+
+NUMERIC_FIELDS = ('size', 'position')
+
+# Compacted JSONL lines start with the original key (see compact-payloads.py)
+_LINE_KEY = re.compile(rb'^\{"key":\s*"([^"]*)"')
+
+# Histogram bucket width for percentiles (~1% relative error)
+HISTOGRAM_BASE = 1.02
+
+
+def parse_predicate(text):
+    """'field=value' or 'field!=value' -> (field, op, value)"""
+    for op in ('!=', '='):
+        if op in text:
+            field, _, value = text.partition(op)
+            field = field.strip()
+            if field not in RECORD_FIELDS:
+                raise argparse.ArgumentTypeError(f"Unknown field '{field}' (one of: {', '.join(RECORD_FIELDS)})")
+            return field, op, value.strip()
+    raise argparse.ArgumentTypeError(f"Expected field=value or field!=value, got '{text}'")
+
+
+def day_bound(text, end=False):
+    """ISO date/time string -> comparable ISO string; a bare --until date includes that day"""
+    if len(text) == 10:
+        day = date.fromisoformat(text) + timedelta(days=1 if end else 0)
+        return f"{day.isoformat()}T00:00:00"
+    return datetime.fromisoformat(text.replace('Z', '+00:00')).astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def record_time(record):
+    """received_at, falling back to the key timestamp"""
+    if record.get('received_at'):
+        return record['received_at']
+    ts = key_timestamp(record['key'])
+    return ts.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z' if ts else ''
+
+
+def matches(record, predicates):
+    for field, op, value in predicates:
+        actual = record.get(field)
+        actual = '' if actual is None else str(actual)
+        if (actual == value) != (op == '='):
+            return False
+    return True
+
+
+def in_range(stamp, plan):
+    return (not plan['since'] or stamp >= plan['since']) and (not plan['until'] or stamp < plan['until'])
+
+
+def key_in_range(key, plan):
+    """Cheap time check from the key alone (True when the key has no timestamp)"""
+    ts = key_timestamp(key)
+    return ts is None or in_range(ts.strftime('%Y-%m-%dT%H:%M:%S'), plan)
+
+
+def might_match(data, plan):
+    """False only when a pushed-down equality value is absent from the raw bytes"""
+    return all(value.encode('utf-8') in data for field, op, value in plan['pushdown']
+               if op == '=' and field in PREFILTER_FIELDS and value)
+
+
+def histogram_bucket(value):
+    return 0 if value <= 0 else int(math.log(value, HISTOGRAM_BASE)) + 1
+
+
+def histogram_percentile(histogram, p):
+    """Approximate percentile from a {bucket: count} histogram"""
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = max(1, math.ceil(p / 100 * total))
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return 0 if bucket == 0 else round(HISTOGRAM_BASE ** (bucket - 0.5), 1)
+
+
+# ---- Partitions -------------------------------------------------------------
+
+def archive_partitions(archive, since=None, until=None, prefix=DEFAULT_PREFIX, compacted_prefix=COMPACTED_PREFIX):
+    """
+    Day partitions of a local archive, oldest first:
+        [{'day', 'compacted': manifest path or None, 'files': [raw payload paths]}]
+    """
+    root = Path(archive)
+    days = defaultdict(lambda: {'compacted': None, 'files': []})
+
+    for manifest in (root / compacted_prefix).glob("*/*/*/manifest.json"):
+        day = date(*(int(part) for part in manifest.parent.relative_to(root / compacted_prefix).parts))
+        days[day]['compacted'] = str(manifest)
+
+    raw_root = root / prefix
+    if raw_root.is_dir():
+        for path in raw_root.rglob("*.json"):
+            ts = key_timestamp(path.name)
+            if ts is not None:
+                days[ts.date()]['files'].append(str(path))
+
+    first = date.fromisoformat(since[:10]) if since else None
+    # until is exclusive
+    last = (datetime.fromisoformat(until) - timedelta(seconds=1)).date() if until else None
+    return [
+        {'day': day.isoformat(), **days[day]}
+        for day in sorted(days)
+        if (first is None or day >= first) and (last is None or day <= last)
+    ]
+
+
+def _compacted_records(manifest_path, plan, columns, need_keys):
+    """(records, keys, bytes read) from a compacted day, from records.parquet when it has one"""
+    manifest = json.loads(Path(manifest_path).read_text())
+    day_dir = Path(manifest_path).parent
+    records_entry = manifest.get('records')
+
+    if pq is not None and records_entry:
+        # Only equality: pyarrow drops nulls on != where matches() keeps them
+        filters = [(field, '==', value) for field, op, value in plan['pushdown'] if op == '=']
+        if plan['since']:
+            filters.append(('received_at', '>=', plan['since']))
+        if plan['until']:
+            filters.append(('received_at', '<', plan['until']))
+        path = day_dir / Path(records_entry['key']).name
+        table = pq.read_table(path, columns=sorted(columns), filters=filters or None)
+        # Every key of the day, so kept originals are not counted twice
+        keys = set(pq.read_table(path, columns=['key']).column('key').to_pylist()) if need_keys else set()
+        return table.to_pylist(), keys, table.nbytes
+
+    data_name = Path(manifest['payloads']['key']).name
+    data = decompress((day_dir / data_name).read_bytes(), data_name)
+    records, keys = [], set()
+    for line in data.splitlines():
+        if not line:
+            continue
+        match = _LINE_KEY.match(line)
+        key = match.group(1).decode('utf-8') if match else json.loads(line)['key']
+        keys.add(key)
+        # Lines outside the time range or without the filtered values are never parsed
+        if not key_in_range(key, plan) or not might_match(line, plan):
+            continue
+        entry = json.loads(line)
+        records.extend(payload_records(key, entry['raw'].encode('utf-8'), entry['size']))
+    return records, keys, len(data)
+
+
+def _raw_records(paths, root, plan, skip_keys):
+    records, bytes_read = [], 0
+    for path in paths:
+        key = Path(path).relative_to(root).as_posix()
+        if key in skip_keys or not key_in_range(key, plan):
+            continue
+        raw = Path(path).read_bytes()
+        bytes_read += len(raw)
+        if might_match(raw, plan):
+            records.extend(payload_records(key, raw))
+    return records, bytes_read
+
+
+def scan_partition(partition, plan):
+    """
+    Scan one day and return its partial result (runs in a worker process).
+
+    Raw files already contained in the day's compacted file are skipped.
+    """
+    columns = set(plan['columns']) | {'key', 'received_at'}
+    records, keys, bytes_read = [], set(), 0
+    if partition['compacted']:
+        records, keys, bytes_read = _compacted_records(partition['compacted'], plan, columns,
+                                                       bool(partition['files']))
+    raw, raw_bytes = _raw_records(partition['files'], plan['root'], plan, keys)
+    records.extend(raw)
+
+    result = {'scanned': len(records), 'bytes': bytes_read + raw_bytes, 'groups': {}, 'rows': [],
+              'with': Counter(), 'without': set()}
+    for record in records:
+        stamp = record_time(record)
+        if not in_range(stamp[:19], plan):
+            continue
+        for field, width in TIME_FIELDS.items():
+            record[field] = stamp[:width]
+
+        if plan['on']:
+            value = record.get(plan['on'])
+            if value is None:
+                continue
+            if plan['missing'] and matches(record, plan['missing']):
+                result['without'].add(value)
+            if matches(record, plan['where']):
+                result['with'][value] += 1
+            continue
+
+        if not matches(record, plan['where']):
+            continue
+
+        if plan['select']:
+            if plan['limit'] is None or len(result['rows']) < plan['limit']:
+                result['rows'].append({field: record.get(field) for field in plan['select']})
+            continue
+
+        group = tuple(record.get(field) for field in plan['group_by'])
+        entry = result['groups'].setdefault(group, [0, Counter()])
+        entry[0] += 1
+        if plan['percentiles'] and record.get(plan['percentiles']) is not None:
+            entry[1][histogram_bucket(float(record[plan['percentiles']]))] += 1
+
+    return result
+
+
+def merge(total, part):
+    total['scanned'] += part['scanned']
+    total['bytes'] += part['bytes']
+    total['rows'].extend(part['rows'])
+    total['with'].update(part['with'])
+    total['without'] |= part['without']
+    for group, (count, histogram) in part['groups'].items():
+        entry = total['groups'].setdefault(group, [0, Counter()])
+        entry[0] += count
+        entry[1].update(histogram)
+    return total
+
+
+def run_query(partitions, plan, workers=None):
+    """Scan partitions (in parallel when workers > 1) and merge the partial results"""
+    total = {'scanned': 0, 'bytes': 0, 'groups': {}, 'rows': [], 'with': Counter(), 'without': set()}
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(partitions) <= 1:
+        for partition in partitions:
+            merge(total, scan_partition(partition, plan))
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(partitions))) as executor:
+            futures = [executor.submit(scan_partition, p, plan) for p in partitions]
+            for future in as_completed(futures):
+                merge(total, future.result())
+
+    if plan['select']:
+        total['rows'].sort(key=lambda r: str(r.get('received_at') or r.get('key') or ''))
+        if plan['limit'] is not None:
+            total['rows'] = total['rows'][:plan['limit']]
+    return total
+
+
+# ---- Download ---------------------------------------------------------------
+
+def download(s3, bucket, archive, first, last, raw=False, prefix=DEFAULT_PREFIX, workers=32):
+    """
+    Copy compacted days in [first, last] (and with raw, the live payloads of
+    days that are not compacted) into archive. Files already present with the
+    same size are not fetched again.
+    """
+    root = Path(archive)
+    compacted_days = set()
+    jobs = []
+    for manifest in compacted_manifests(s3, bucket):
+        day = date.fromisoformat(manifest['day'])
+        if not first <= day <= last:
+            continue
+        compacted_days.add(day)
+        for entry in (manifest['payloads'], manifest.get('records')):
+            if entry:
+                jobs.append({'Key': entry['key'], 'Size': entry['size']})
+        manifest_path = root / compacted_day_prefix(day) / "manifest.json"
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        manifest_path.write_text(json.dumps(manifest, indent=2))
+
+    if raw:
+        day = first
+        while day <= last:
+            if day not in compacted_days:
+                jobs.extend(day_objects(s3, bucket, prefix, day))
+            day += timedelta(days=1)
+
+    def fetch(obj):
+        path = root / obj['Key']
+        if path.exists() and path.stat().st_size == obj['Size']:
+            return 0
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = read_payload(s3, bucket, obj)
+        path.write_bytes(data)
+        return len(data)
+
+    fetched = errors = 0
+    total_bytes = 0
+    for obj, size, error in map_objects(fetch, jobs, workers):
+        if error:
+            errors += 1
+            print(f"   ❌ {obj['Key']}: {error}")
+        elif size:
+            fetched += 1
+            total_bytes += size
+    print(f"📥 {len(compacted_days)} compacted day(s), {fetched} file(s) fetched "
+          f"({total_bytes / 1024 / 1024:.1f} MiB), {len(jobs) - fetched - errors} up to date, {errors} error(s)")
+    return errors
+
+
+# ---- Output -----------------------------------------------------------------
+
+def print_groups(total, plan, top=None, as_json=False):
+    groups = total['groups']
+    if any(field in TIME_FIELDS for field in plan['group_by']):
+        ordered = sorted(groups.items(), key=lambda item: tuple(str(v) for v in item[0]))
+    else:
+        ordered = sorted(groups.items(), key=lambda item: -item[1][0])
+    ordered = ordered[:top] if top else ordered
+
+    metric_names = ['count'] + ([f"p{p}_{plan['percentiles']}" for p in (50, 95, 99)] if plan['percentiles'] else [])
+    if not as_json:
+        print("  ".join([f"{field[:40]:<40}" for field in plan['group_by']] + metric_names))
+
+    for group, (count, histogram) in ordered:
+        row = {field: value for field, value in zip(plan['group_by'], group)}
+        row['count'] = count
+        for p, name in zip((50, 95, 99), metric_names[1:]):
+            row[name] = histogram_percentile(histogram, p)
+        if as_json:
+            print(json.dumps(row))
+        else:
+            labels = [f"{str(value)[:40]:<40}" for value in group]
+            metrics = [f"{str(row[name]):<{len(name)}}" for name in metric_names]
+            print("  ".join(labels + metrics))
+
+    if not as_json and len(groups) > 1:
+        counts = sorted(count for count, _ in groups.values())
+        middle = counts[len(counts) // 2]
+        print(f"\n📊 {len(groups)} group(s), {sum(counts)} record(s); per group min {counts[0]}, "
+              f"median {middle}, max {counts[-1]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline queries over archived webhook payloads")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE, help="Local archive directory")
+    subparsers = parser.add_subparsers(dest="command")
+
+    download_parser = subparsers.add_parser("download", help="Copy compacted days (and raw payloads) locally")
+    download_parser.add_argument("--bucket", default=DEFAULT_BUCKET)
+    download_parser.add_argument("--prefix", default=DEFAULT_PREFIX)
+    download_parser.add_argument("--from", dest="first", help="First day (default: 7 days ago)")
+    download_parser.add_argument("--to", dest="last", help="Last day (default: today)")
+    download_parser.add_argument("--raw", action="store_true", help="Also fetch raw payloads of uncompacted days")
+    download_parser.add_argument("--workers", type=int, default=32)
+
+    query_parser = subparsers.add_parser("query", help="Scan the local archive")
+    query_parser.add_argument("--since", help="Received at or after (date or ISO time)")
+    query_parser.add_argument("--until", help="Received before (a bare date includes that day)")
+    query_parser.add_argument("--where", action="append", type=parse_predicate, default=[],
+                              help="field=value or field!=value (repeatable, ANDed)")
+    query_parser.add_argument("--group-by", default="",
+                              help=f"Comma-separated record fields and/or {', '.join(TIME_FIELDS)}")
+    query_parser.add_argument("--percentiles", choices=NUMERIC_FIELDS, help="p50/p95/p99 of a numeric field per group")
+    query_parser.add_argument("--select", help="Print matching records with these fields instead of aggregating")
+    query_parser.add_argument("--missing", action="append", type=parse_predicate, default=[],
+                              help="With --on: list values matching --where that never match this")
+    query_parser.add_argument("--on", choices=RECORD_FIELDS, help="Field compared by --missing")
+    query_parser.add_argument("--limit", type=int, help="Max records for --select")
+    query_parser.add_argument("--top", type=int, help="Only the N largest groups")
+    query_parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    query_parser.add_argument("--json", action="store_true", help="JSON lines output")
+
+    args = parser.parse_args()
+
+    if args.command == "download":
+        today = datetime.now(timezone.utc).date()
+        first = date.fromisoformat(args.first) if args.first else today - timedelta(days=7)
+        last = date.fromisoformat(args.last) if args.last else today
+        s3 = get_s3_client(max_pool_connections=args.workers)
+        print(f"📥 s3://{args.bucket} {first} .. {last} -> {args.archive}")
+        return 1 if download(s3, args.bucket, args.archive, first, last, args.raw, args.prefix, args.workers) else 0
+
+    if args.command != "query":
+        parser.print_help()
+        return 1
+
+    if args.missing and not args.on:
+        parser.error("--missing needs --on")
+
+    group_by = [f.strip() for f in args.group_by.split(",") if f.strip()]
+    select = [f.strip() for f in args.select.split(",")] if args.select else []
+    for field in group_by + select:
+        if field not in RECORD_FIELDS and field not in TIME_FIELDS:
+            parser.error(f"Unknown field '{field}'")
+
+    referenced = (group_by + select + [p[0] for p in args.where + args.missing]
+                  + [f for f in (args.on, args.percentiles) if f])
+    plan = {
+        'root': args.archive,
+        'since': day_bound(args.since) if args.since else None,
+        'until': day_bound(args.until, end=True) if args.until else None,
+        'where': args.where,
+        'missing': args.missing,
+        'on': args.on,
+        'group_by': group_by,
+        'select': select,
+        'percentiles': args.percentiles,
+        'limit': args.limit,
+        'columns': [f for f in referenced if f in RECORD_FIELDS],
+        # --missing needs rows that fail --where, so only the time range is pushed down then
+        'pushdown': [] if args.missing else args.where,
+    }
+
+    partitions = archive_partitions(args.archive, plan['since'], plan['until'])
+    if not partitions:
+        print(f"❌ No archived days in range under {args.archive} (run: query-payloads.py download)")
+        return 1
+
+    total = run_query(partitions, plan, args.workers)
+    print(f"🔎 {len(partitions)} day(s), {total['scanned']} record(s) read, "
+          f"{total['bytes'] / 1024 / 1024:.1f} MiB", file=sys.stderr)
+
+    if args.on:
+        missing = sorted((v, n) for v, n in total['with'].items() if v not in total['without'])
+        for value, count in missing:
+            print(json.dumps({args.on: value, 'count': count}) if args.json else f"{value}  {count}")
+        print(f"\n📊 {len(missing)} of {len(total['with'])} {args.on} value(s) never matched "
+              f"{' and '.join(f'{f}{o}{v}' for f, o, v in args.missing) or 'anything else'}", file=sys.stderr)
+    elif select:
+        for row in total['rows']:
+            print(json.dumps(row) if args.json else "  ".join(str(row.get(f)) for f in select))
+    else:
+        print_groups(total, plan, args.top, args.json)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -29,6 +29,8 @@ import argparse
 from datetime import datetime, timedelta
 from typing import List, Dict
 
+from botocore.exceptions import ClientError
+
 # Initialize DynamoDB
 dynamodb = boto3.resource('dynamodb', region_name='us-east-1')
 
@@ -94,8 +96,14 @@ class SubscriptionTracker:
             print(f"❌ Error: {e}")
     
     def save_subscription(self, sub_id: str, resource: str, expiry: str, 
-                         sub_type: str = 'other', change_types: str = 'created'):
-        """Save subscription metadata to DynamoDB."""
+                         sub_type: str = 'other', change_types: str = 'created',
+                         notification_url: str = None,
+                         lifecycle_notification_url: str = None):
+        """Save subscription metadata to DynamoDB.
+        
+        notification_url / lifecycle_notification_url are stored so a
+        removed subscription can be recreated from its definition.
+        """
         
         created_at = datetime.utcnow().isoformat()
         
@@ -110,6 +118,10 @@ class SubscriptionTracker:
             'renewal_count': 0,
             'last_renewed': None
         }
+        if notification_url:
+            item['notification_url'] = notification_url
+        if lifecycle_notification_url:
+            item['lifecycle_notification_url'] = lifecycle_notification_url
         
         try:
             self.table.put_item(Item=item)
@@ -194,6 +206,21 @@ class SubscriptionTracker:
             print(f"❌ Error finding expiring subscriptions: {e}")
             return []
     
+    def get_subscription(self, sub_id: str) -> Dict:
+        """Get the most recent tracker row for a subscription ID (or None)."""
+        try:
+            response = self.table.query(
+                KeyConditionExpression='subscription_id = :id',
+                ExpressionAttributeValues={':id': sub_id},
+                ScanIndexForward=False,
+                Limit=1
+            )
+            items = response.get('Items', [])
+            return items[0] if items else None
+        except Exception as e:
+            print(f"❌ Error reading subscription {sub_id}: {e}")
+            return None
+    
     def update_subscription(self, sub_id: str, created_at: str, **updates):
         """Update subscription metadata."""
         
@@ -225,13 +252,77 @@ class SubscriptionTracker:
             return False
     
     def mark_renewed(self, sub_id: str, created_at: str, new_expiry: str):
-        """Mark subscription as renewed."""
-        updates = {
-            'expiry_date': new_expiry,
-            'last_renewed': datetime.utcnow().isoformat(),
-            'renewal_count': 1  # Would need increment operation for real
+        """Mark subscription as renewed (atomically increments renewal_count)."""
+        try:
+            self.table.update_item(
+                Key={
+                    'subscription_id': sub_id,
+                    'created_at': created_at
+                },
+                UpdateExpression='SET expiry_date = :expiry, last_renewed = :now ADD renewal_count :one',
+                ExpressionAttributeValues={
+                    ':expiry': new_expiry,
+                    ':now': datetime.utcnow().isoformat(),
+                    ':one': 1
+                }
+            )
+            print("✅ Subscription marked renewed")
+            return True
+        except Exception as e:
+            print(f"❌ Error marking subscription renewed: {e}")
+            return False
+    
+    def find_resync_requested(self) -> List[Dict]:
+        """Active subscriptions flagged by the renewal Lambda after a 'missed' lifecycle event."""
+        items = []
+        kwargs = {
+            'FilterExpression': '#status = :status AND attribute_exists(resync_requested)',
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': {':status': 'active'}
         }
-        return self.update_subscription(sub_id, created_at, **updates)
+        while True:
+            response = self.table.scan(**kwargs)
+            items.extend(response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return items
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    
+    def finish_resync(self, sub_id: str, created_at: str, delta_link: str = None, requested: str = None):
+        """
+        Keep the deltaLink a resync ended with and clear the resync flag.
+        
+        With requested, the flag is only cleared if it still has that value,
+        so a 'missed' event flagged during the resync is not lost.
+        """
+        key = {'subscription_id': sub_id, 'created_at': created_at}
+        update = 'REMOVE resync_requested'
+        values = {}
+        if delta_link:
+            update = 'SET resync_delta_link = :link ' + update
+            values[':link'] = delta_link
+        kwargs = {'Key': key, 'UpdateExpression': update}
+        if requested:
+            kwargs['ConditionExpression'] = 'resync_requested = :requested'
+            values[':requested'] = requested
+        if values:
+            kwargs['ExpressionAttributeValues'] = values
+        
+        try:
+            self.table.update_item(**kwargs)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                print(f"❌ Error finishing resync of {sub_id}: {e}")
+                return False
+        
+        # Flagged again meanwhile: keep the flag, still save our progress
+        if delta_link:
+            self.table.update_item(
+                Key=key,
+                UpdateExpression='SET resync_delta_link = :link',
+                ExpressionAttributeValues={':link': delta_link}
+            )
+        return False
     
     def delete_subscription(self, sub_id: str, created_at: str):
         """Delete subscription (marks as inactive)."""
@@ -254,6 +345,9 @@ def main():
     save_parser.add_argument('--resource', required=True, help='Resource path')
     save_parser.add_argument('--expiry', required=True, help='Expiry datetime (ISO format)')
     save_parser.add_argument('--type', default='other', help='Subscription type')
+    save_parser.add_argument('--change-types', default='created', help='Comma-separated change types')
+    save_parser.add_argument('--notification-url', help='Notification URL (needed to recreate)')
+    save_parser.add_argument('--lifecycle-url', help='Lifecycle notification URL')
     
     # List subscriptions
     subparsers.add_parser('list', help='List all subscriptions')
@@ -276,7 +370,8 @@ def main():
     
     elif args.command == 'save':
         tracker = SubscriptionTracker(profile=args.profile)
-        tracker.save_subscription(args.id, args.resource, args.expiry, args.type)
+        tracker.save_subscription(args.id, args.resource, args.expiry, args.type,
+                                  args.change_types, args.notification_url, args.lifecycle_url)
     
     elif args.command == 'list':
         tracker = SubscriptionTracker(profile=args.profile)
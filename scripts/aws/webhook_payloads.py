@@ -0,0 +1,637 @@
+"""
+Webhook Payload Storage Helpers
+Shared S3 access for the webhook payloads written by apps/aws-lambda/handler.js
+
+Stored objects are envelopes:
+    {"receivedAt": ..., "requestId": ..., "source": "graph-webhook", "body": "<raw JSON string>"}
+where body is the Graph notification ({"value": [...]}) as received.
+
+Keys use one of two layouts, both ordered by time:
+    webhooks/2026-02-13T02-18-51-123Z-{requestId}.json                    (flat, handler.js)
+    webhooks/2026/02/13/graph-webhook-2026-02-13T02-18-51-123Z-{requestId}.json (partitioned)
+
+Closed days may be rolled up by compact-payloads.py into
+webhooks-compacted/YYYY/MM/DD/ (JSONL + manifest.json); the readers here
+return compacted payloads alongside live objects.
+"""
+import gzip
+import json
+import os
+import queue
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import date, datetime, timedelta, timezone
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError, ProfileNotFound
+
+try:
+    import zstandard
+except ImportError:  # only needed for .zst compacted days
+    zstandard = None
+
+DEFAULT_BUCKET = os.getenv("AWS_S3_BUCKET", "tmf-webhook-payloads-dev")
+DEFAULT_PREFIX = os.getenv("AWS_S3_PREFIX", "webhooks/")
+COMPACTED_PREFIX = os.getenv("AWS_S3_COMPACTED_PREFIX", "webhooks-compacted/")
+
+# Listing with this delimiter rolls keys up at the "T" of their ISO stamp: one
+# common prefix per UTC day in both layouts, each listed on its own thread
+PARTITION_DELIMITER = "T"
+
+# DeleteObjects accepts at most this many keys per call
+DELETE_BATCH_SIZE = 1000
+
+# Enough of a pretty-printed envelope to contain the first notification's resource
+CLASSIFY_RANGE_BYTES = 4096
+
+# Widening look-back windows tried when searching for the newest flat-layout keys
+LATEST_WINDOWS = (
+    timedelta(minutes=15), timedelta(hours=1), timedelta(hours=6),
+    timedelta(days=1), timedelta(days=7), timedelta(days=31), timedelta(days=366),
+)
+
+# Checked in order; the first marker found in the payload text decides the kind
+KIND_MARKERS = (
+    ('lifecycle', b'lifecycleevent'),
+    ('transcript', b'transcript'),
+    ('recording', b'recording'),
+    ('calendar', b'/events'),
+)
+
+
+def get_s3_client(profile=None, region=None, max_pool_connections=50, endpoint_url=None):
+    """
+    S3 client with a connection pool sized for concurrent GETs.
+
+    Falls back to the default credential chain if the profile is missing;
+    endpoint_url targets an S3-compatible store (MinIO, moto server).
+    """
+    profile = profile or os.getenv("AWS_PROFILE", "tmf-dev")
+    region = region or os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+
+    try:
+        session = boto3.Session(profile_name=profile, region_name=region)
+    except ProfileNotFound:
+        session = boto3.Session(region_name=region)
+
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        retries={'max_attempts': 10, 'mode': 'adaptive'},
+    )
+    return session.client("s3", config=config, endpoint_url=endpoint_url)
+
+
+def iter_payload_objects(s3, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, start_after=None):
+    """Yield every object summary under prefix (all pages, lazily)"""
+    params = {'Bucket': bucket, 'Prefix': prefix}
+    if start_after:
+        params['StartAfter'] = start_after
+
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(**params):
+        for obj in page.get('Contents', []):
+            yield obj
+
+
+def list_objects_parallel(s3, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, workers=16,
+                          delimiter=PARTITION_DELIMITER):
+    """
+    Yield every object summary under prefix, listing partitions concurrently.
+
+    One Delimiter listing splits the prefix into partitions (CommonPrefixes)
+    plus the keys that sit directly under it; any delimiter divides the key
+    space exactly, so keys of other shapes are still listed once. Partitions
+    are then paginated on `workers` threads and pages are yielded as they
+    arrive (not in key order), with at most workers * 2 pages buffered.
+    """
+    partitions = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter=delimiter):
+        yield from page.get('Contents', [])
+        partitions.extend(common['Prefix'] for common in page.get('CommonPrefixes', []))
+    if not partitions:
+        return
+
+    pages = queue.Queue(maxsize=workers * 2)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def list_partition(partition):
+        try:
+            for page in s3.get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=partition):
+                if stop.is_set():
+                    return
+                put(page.get('Contents', []))
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for partition in partitions:
+            executor.submit(list_partition, partition)
+        try:
+            remaining = len(partitions)
+            while remaining:
+                item = pages.get()
+                if item is done:
+                    remaining -= 1
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            # Unblock workers if the consumer stopped early
+            stop.set()
+
+
+def delete_objects(s3, bucket, keys, workers=8, batch_size=DELETE_BATCH_SIZE):
+    """
+    Delete a stream of keys with DeleteObjects, batches sent concurrently.
+
+    Keys are consumed lazily, so a listing generator can feed this directly.
+
+    Returns:
+        (number deleted, [error dicts from S3 or {'Key', 'Message'} for failed batches])
+    """
+    def batches():
+        batch = []
+        for key in keys:
+            batch.append(key)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def delete(batch):
+        response = s3.delete_objects(Bucket=bucket, Delete={'Objects': [{'Key': k} for k in batch], 'Quiet': True})
+        return response.get('Errors', [])
+
+    deleted = 0
+    errors = []
+    for batch, batch_errors, error in map_objects(delete, batches(), workers):
+        if error:
+            errors.append({'Key': batch[0], 'Message': f"batch of {len(batch)} failed: {error}"})
+        else:
+            deleted += len(batch) - len(batch_errors)
+            errors.extend(batch_errors)
+    return deleted, errors
+
+
+_KEY_STAMP = re.compile(r"(\d{4}-\d{2}-\d{2}T\d{2}-\d{2}-\d{2}-\d{3}Z)")
+_YEAR_PARTITION = re.compile(r"\d{4}/$")
+_PART_PARTITION = re.compile(r"\d{2}/$")
+
+
+def key_stamp(ts):
+    """Timestamp as written into keys: ISO-8601 with ':' and '.' replaced by '-'"""
+    ts = ts.astimezone(timezone.utc)
+    return f"{ts.strftime('%Y-%m-%dT%H-%M-%S')}-{ts.microsecond // 1000:03d}Z"
+
+
+def key_marker(ts, prefix=DEFAULT_PREFIX, layout='flat'):
+    """Key prefix up to and including the timestamp; usable as a StartAfter bound"""
+    if layout == 'partitioned':
+        return f"{prefix}{ts.astimezone(timezone.utc):%Y/%m/%d}/graph-webhook-{key_stamp(ts)}"
+    return f"{prefix}{key_stamp(ts)}"
+
+
+def payload_key(ts, request_id, prefix=DEFAULT_PREFIX, layout='flat'):
+    """Storage key for a payload received at ts"""
+    return f"{key_marker(ts, prefix, layout)}-{request_id}.json"
+
+
+def key_timestamp(key):
+    """UTC datetime encoded in a payload key (either layout), or None"""
+    match = _KEY_STAMP.search(key.rsplit('/', 1)[-1])
+    if not match:
+        return None
+    return datetime.strptime(match.group(1), '%Y-%m-%dT%H-%M-%S-%fZ').replace(tzinfo=timezone.utc)
+
+
+def payload_time(obj):
+    """When a listed object was received: key timestamp, else LastModified"""
+    return key_timestamp(obj['Key']) or obj['LastModified']
+
+
+def child_prefixes(s3, bucket, prefix, pattern=None):
+    """Sorted immediate "directories" under prefix (Delimiter listing)"""
+    children = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        for common in page.get('CommonPrefixes', []):
+            child = common['Prefix']
+            if pattern is None or pattern.fullmatch(child[len(prefix):]):
+                children.append(child)
+    return sorted(children)
+
+
+def objects_since(s3, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, since=None, now=None,
+                  layouts=('flat', 'partitioned')):
+    """
+    List payloads whose key timestamp is after since, without listing older keys.
+
+    Flat keys are listed per year prefix ("webhooks/2026-") with StartAfter at
+    the since marker; partitioned keys per day prefix from since's day on.
+    """
+    now = now or datetime.now(timezone.utc)
+    since = since.astimezone(timezone.utc)
+    # Tolerate writers whose clock is slightly ahead of ours
+    until = now + timedelta(minutes=5)
+
+    if 'flat' in layouts:
+        for year in range(since.year, until.year + 1):
+            start_after = key_marker(since, prefix) if year == since.year else None
+            yield from iter_payload_objects(s3, bucket, f"{prefix}{year}-", start_after)
+
+    if 'partitioned' in layouts:
+        day = since.date()
+        while day <= until.date():
+            start_after = key_marker(since, prefix, 'partitioned') if day == since.date() else None
+            yield from iter_payload_objects(s3, bucket, f"{prefix}{day:%Y/%m/%d}/", start_after)
+            day += timedelta(days=1)
+
+
+def day_objects(s3, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, day=None):
+    """Every live payload object received on one UTC day (both layouts)"""
+    yield from iter_payload_objects(s3, bucket, f"{prefix}{day:%Y-%m-%d}T")
+    yield from iter_payload_objects(s3, bucket, f"{prefix}{day:%Y/%m/%d}/")
+
+
+def compacted_day_prefix(day, compacted_prefix=COMPACTED_PREFIX):
+    """webhooks-compacted/YYYY/MM/DD/"""
+    return f"{compacted_prefix}{day:%Y/%m/%d}/"
+
+
+def decompress(data, key):
+    """Decode a compacted file by its extension (.gz, .zst or plain)"""
+    if key.endswith('.gz'):
+        return gzip.decompress(data)
+    if key.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"{key} is zstd-compressed; pip install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
+
+
+def compacted_manifests(s3, bucket=DEFAULT_BUCKET, compacted_prefix=COMPACTED_PREFIX):
+    """Manifests of every compacted day, oldest first"""
+    manifests = []
+    for obj in iter_payload_objects(s3, bucket, compacted_prefix):
+        if obj['Key'].endswith('/manifest.json'):
+            manifests.append(json.loads(s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read()))
+    return sorted(manifests, key=lambda m: m['day'])
+
+
+def read_compacted_day(s3, bucket, manifest):
+    """
+    Yield the payloads of one compacted day as object summaries.
+
+    Each carries the original Key/Size/LastModified plus 'Raw' (the original
+    bytes) and 'Compacted' (the file it was read from).
+    """
+    data_key = manifest['payloads']['key']
+    data = decompress(s3.get_object(Bucket=bucket, Key=data_key)['Body'].read(), data_key)
+    for line in data.splitlines():
+        if not line:
+            continue
+        entry = json.loads(line)
+        yield {
+            'Key': entry['key'],
+            'Size': entry['size'],
+            'LastModified': datetime.fromisoformat(entry['last_modified']),
+            'Raw': entry['raw'].encode('utf-8'),
+            'Compacted': data_key,
+        }
+
+
+def compacted_objects(s3, bucket=DEFAULT_BUCKET, compacted_prefix=COMPACTED_PREFIX):
+    """Payloads from every compacted day, oldest day first"""
+    for manifest in compacted_manifests(s3, bucket, compacted_prefix):
+        yield from read_compacted_day(s3, bucket, manifest)
+
+
+def compacted_day_matches(manifest, prefix):
+    """Whether any key of a compacted day could start with prefix"""
+    day = date.fromisoformat(manifest['day'])
+    source = manifest.get('source_prefix', DEFAULT_PREFIX)
+    for day_prefix in (f"{source}{day:%Y-%m-%d}T", f"{source}{day:%Y/%m/%d}/"):
+        if day_prefix.startswith(prefix) or prefix.startswith(day_prefix):
+            return True
+    return False
+
+
+def find_compacted(s3, bucket, key, compacted_prefix=COMPACTED_PREFIX):
+    """The compacted copy of a payload key, or None"""
+    ts = key_timestamp(key)
+    if ts is None:
+        return None
+
+    manifest_key = f"{compacted_day_prefix(ts.date(), compacted_prefix)}manifest.json"
+    try:
+        manifest = json.loads(s3.get_object(Bucket=bucket, Key=manifest_key)['Body'].read())
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'NoSuchKey':
+            return None
+        raise
+
+    return next((obj for obj in read_compacted_day(s3, bucket, manifest) if obj['Key'] == key), None)
+
+
+def read_payload(s3, bucket, obj):
+    """Raw bytes of a payload, live or compacted"""
+    if 'Raw' in obj:
+        return obj['Raw']
+    return s3.get_object(Bucket=bucket, Key=obj['Key'])['Body'].read()
+
+
+def _newest_flat_objects(s3, bucket, prefix, count, now):
+    for window in LATEST_WINDOWS:
+        found = list(objects_since(s3, bucket, prefix, now - window, now, layouts=('flat',)))
+        if len(found) >= count:
+            return found
+
+    # Nothing recent enough: top-level listing (partitions come back as CommonPrefixes)
+    found = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter='/'):
+        found.extend(page.get('Contents', []))
+    return found
+
+
+def _newest_partitioned_objects(s3, bucket, prefix, count):
+    found = []
+    for year in reversed(child_prefixes(s3, bucket, prefix, _YEAR_PARTITION)):
+        for month in reversed(child_prefixes(s3, bucket, year, _PART_PARTITION)):
+            for day in reversed(child_prefixes(s3, bucket, month, _PART_PARTITION)):
+                found.extend(iter_payload_objects(s3, bucket, day))
+                if len(found) >= count:
+                    return found
+    return found
+
+
+def latest_payload_objects(s3, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, count=10, now=None,
+                           compacted_prefix=COMPACTED_PREFIX):
+    """
+    The count newest payload objects, newest first.
+
+    Jumps to the newest keys of each layout instead of listing the bucket:
+    flat keys through widening StartAfter windows, partitioned keys by
+    walking year/month/day prefixes from the newest down. Compacted days
+    fill in when fewer than count live payloads remain.
+    """
+    now = now or datetime.now(timezone.utc)
+    objects = (_newest_flat_objects(s3, bucket, prefix, count, now)
+               + _newest_partitioned_objects(s3, bucket, prefix, count))
+
+    if len(objects) < count and compacted_prefix:
+        live = {obj['Key'] for obj in objects}
+        for manifest in reversed(compacted_manifests(s3, bucket, compacted_prefix)):
+            objects.extend(obj for obj in read_compacted_day(s3, bucket, manifest) if obj['Key'] not in live)
+            if len(objects) >= count:
+                break
+
+    objects.sort(key=lambda o: (payload_time(o), o['Key']), reverse=True)
+    return objects[:count]
+
+
+def tail_payloads(s3, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, since=None,
+                  min_interval=1.0, max_interval=30.0, lookback=timedelta(seconds=60),
+                  sleep=time.sleep):
+    """
+    Yield payload objects as they land, oldest first, forever.
+
+    Polls objects_since() from the newest timestamp seen (minus lookback, so
+    keys written slightly out of order are not missed). The interval resets
+    to min_interval whenever something arrives and doubles up to
+    max_interval while idle.
+    """
+    watermark = since or datetime.now(timezone.utc)
+    seen = {}
+    interval = min_interval
+
+    while True:
+        fresh = [o for o in objects_since(s3, bucket, prefix, watermark - lookback)
+                 if o['Key'] not in seen]
+        fresh.sort(key=lambda o: (payload_time(o), o['Key']))
+
+        for obj in fresh:
+            ts = payload_time(obj)
+            seen[obj['Key']] = ts
+            watermark = max(watermark, ts)
+            yield obj
+
+        # Keys older than the next look-back bound are never listed again
+        cutoff = watermark - lookback
+        seen = {key: ts for key, ts in seen.items() if ts >= cutoff}
+
+        interval = min_interval if fresh else min(interval * 2, max_interval)
+        sleep(interval)
+
+
+def parse_envelope(raw):
+    """
+    Decode a stored payload into (envelope, notifications).
+
+    Accepts the handler.js envelope (body as JSON string or object) as well
+    as a bare Graph notification body.
+    """
+    data = json.loads(raw) if isinstance(raw, (bytes, str)) else raw
+    body = data.get('body', data) if isinstance(data, dict) else data
+
+    if isinstance(body, str):
+        try:
+            body = json.loads(body) if body else {}
+        except ValueError:
+            body = {}
+
+    if isinstance(body, dict):
+        notifications = body.get('value', [body] if 'resource' in body or 'lifecycleEvent' in body else [])
+    elif isinstance(body, list):
+        notifications = body
+    else:
+        notifications = []
+
+    return data, [n for n in notifications if isinstance(n, dict)]
+
+
+def classify_bytes(data):
+    """Kind of payload from (a prefix of) its raw bytes, or None if no marker is present"""
+    lowered = data.lower()
+    for kind, marker in KIND_MARKERS:
+        if marker in lowered:
+            return kind
+    return None
+
+
+def classify_notification(notification):
+    """Kind of a single parsed notification"""
+    if notification.get('lifecycleEvent'):
+        return 'lifecycle'
+    return classify_bytes(notification.get('resource', '').encode('utf-8')) or 'other'
+
+
+_USER_PART = re.compile(r"users/([^/(]+)", re.IGNORECASE)
+_MEETING_PART = re.compile(r"onlineMeetings/([^/(]+)", re.IGNORECASE)
+_TRANSCRIPT_PART = re.compile(r"(?:transcripts|getAllTranscripts\([^)]*\))/([^/]+)", re.IGNORECASE)
+
+# Columns of a flattened notification record (index, compaction, query)
+RECORD_FIELDS = (
+    'key', 'position', 'received_at', 'request_id', 'subscription_id', 'change_type',
+    'kind', 'lifecycle_event', 'resource', 'user_id', 'meeting_id', 'transcript_id',
+    'resource_id', 'size',
+)
+
+
+def payload_records(key, raw, size=None):
+    """
+    Flatten one stored payload into a record per notification.
+
+    Payloads with no notifications (malformed or empty bodies) still yield a
+    single record so every key is represented.
+    """
+    envelope, notifications = parse_envelope(raw)
+    envelope = envelope if isinstance(envelope, dict) else {}
+    base = {
+        'key': key,
+        'received_at': envelope.get('receivedAt'),
+        'request_id': envelope.get('requestId'),
+        'size': size if size is not None else len(raw),
+    }
+
+    records = []
+    for position, n in enumerate(notifications or [{}]):
+        resource = n.get('resource', '') or ''
+        resource_data = n.get('resourceData') or {}
+        user = _USER_PART.search(resource)
+        meeting = _MEETING_PART.search(resource)
+        transcript = _TRANSCRIPT_PART.search(resource)
+        kind = classify_notification(n) if n else 'other'
+
+        records.append({
+            **base,
+            'position': position,
+            'subscription_id': n.get('subscriptionId'),
+            'change_type': n.get('changeType'),
+            'kind': kind,
+            'lifecycle_event': n.get('lifecycleEvent'),
+            'resource': resource,
+            'user_id': user.group(1) if user else None,
+            'meeting_id': meeting.group(1) if meeting else None,
+            'transcript_id': transcript.group(1) if transcript else (
+                resource_data.get('id') if kind == 'transcript' else None),
+            'resource_id': resource_data.get('id'),
+        })
+    return records
+
+
+def fetch_records(s3, bucket, obj):
+    """GET one payload and flatten it with payload_records()"""
+    raw = read_payload(s3, bucket, obj)
+    return payload_records(obj['Key'], raw, obj.get('Size'))
+
+
+def fetch_and_classify(s3, bucket, obj, range_bytes=CLASSIFY_RANGE_BYTES):
+    """
+    Classify one stored payload, reading only its first range_bytes when possible.
+
+    Returns:
+        (key, kind, bytes_read)
+    """
+    key = obj['Key']
+    size = obj.get('Size', 0)
+
+    if 'Raw' in obj:
+        range_bytes = 0
+
+    if range_bytes and size > range_bytes:
+        head = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{range_bytes - 1}")['Body'].read()
+        kind = classify_bytes(head)
+        if kind:
+            return key, kind, len(head)
+
+    raw = read_payload(s3, bucket, obj)
+    _, notifications = parse_envelope(raw)
+    kind = classify_notification(notifications[0]) if notifications else 'other'
+    return key, kind, len(raw)
+
+
+def map_objects(func, objects, workers=32):
+    """
+    Apply func(obj) to a stream of objects on a bounded thread pool.
+
+    At most workers * 4 calls are queued at once, so memory stays flat
+    however many objects the stream holds.
+
+    Yields:
+        (obj, result, error) in completion order
+    """
+    max_in_flight = workers * 4
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = {}
+        for obj in objects:
+            in_flight[executor.submit(func, obj)] = obj
+
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield _result(in_flight.pop(f), f)
+
+        for f in list(in_flight):
+            yield _result(in_flight.pop(f), f)
+
+
+def _result(obj, future):
+    try:
+        return obj, future.result(), None
+    except Exception as e:
+        return obj, None, e
+
+
+def scan_payloads(s3, bucket=DEFAULT_BUCKET, prefix=DEFAULT_PREFIX, workers=32,
+                  range_bytes=CLASSIFY_RANGE_BYTES, limit=None, compacted_prefix=COMPACTED_PREFIX):
+    """
+    List the whole prefix and classify every payload concurrently.
+
+    Compacted days are read first; live objects already contained in them
+    (originals kept after compaction) are skipped.
+
+    Yields:
+        (obj, kind, bytes_read) in completion order
+    """
+    compacted_keys = set()
+
+    def all_objects():
+        if compacted_prefix:
+            for obj in compacted_objects(s3, bucket, compacted_prefix):
+                compacted_keys.add(obj['Key'])
+                yield obj
+        for obj in iter_payload_objects(s3, bucket, prefix):
+            if obj['Key'] not in compacted_keys:
+                yield obj
+
+    objects = all_objects()
+    if limit is not None:
+        objects = (obj for count, obj in zip(range(limit), objects))
+
+    for obj, result, error in map_objects(
+            lambda o: fetch_and_classify(s3, bucket, o, range_bytes), objects, workers):
+        if error:
+            print(f"Error processing {obj['Key']}: {error}")
+            yield obj, 'error', 0
+        else:
+            _, kind, bytes_read = result
+            yield obj, kind, bytes_read
@@ -7,6 +7,7 @@ import json
 import requests
 from datetime import datetime, timedelta
 from auth_helper import get_graph_headers, get_config
+from graph_batch import build_request, execute_batches
 
 
 def list_subscriptions():
@@ -139,6 +140,44 @@ def renew_subscription(subscription_id, hours=24):
         return None
 
 
+def renew_subscriptions(subscription_ids, hours=24, concurrency=4):
+    """
+    Renew many subscriptions with $batch PATCH requests
+    
+    Returns:
+        dict with lists of ids: renewed, gone (404 - recreate these),
+        throttled (429 after retries), failed
+    """
+    print(f"\n🔄 Renewing {len(subscription_ids)} subscription(s) in batches...")
+    expiration = datetime.utcnow() + timedelta(hours=min(hours, 72))
+    body = {"expirationDateTime": expiration.strftime("%Y-%m-%dT%H:%M:%S.0000000Z")}
+    
+    batch = [build_request(sub_id, "PATCH", f"/subscriptions/{sub_id}", body) for sub_id in subscription_ids]
+    results = execute_batches(batch, get_graph_headers(), concurrency=concurrency)
+    
+    outcome = {'renewed': [], 'gone': [], 'throttled': [], 'failed': []}
+    for sub_id in subscription_ids:
+        status = results.get(sub_id, {}).get('status')
+        if status == 200:
+            outcome['renewed'].append(sub_id)
+        elif status == 404:
+            outcome['gone'].append(sub_id)
+        elif status == 429:
+            outcome['throttled'].append(sub_id)
+        else:
+            outcome['failed'].append(sub_id)
+            print(f"   ❌ {sub_id}: {status}")
+    
+    print(f"   ✅ Renewed: {len(outcome['renewed'])}")
+    if outcome['gone']:
+        print(f"   ➖ Gone (recreate needed): {len(outcome['gone'])}")
+    if outcome['throttled']:
+        print(f"   ⏳ Throttled (retry later): {len(outcome['throttled'])}")
+    if outcome['failed']:
+        print(f"   ❌ Failed: {len(outcome['failed'])}")
+    return outcome
+
+
 def main():
     """Interactive subscription management"""
     print("=" * 60)
@@ -155,9 +194,10 @@ def main():
     print("2. Create subscription for specific user")
     print("3. Delete subscription")
     print("4. Renew subscription")
-    print("5. Exit")
+    print("5. Renew all subscriptions (batched)")
+    print("6. Exit")
     
-    choice = input("\nSelect action (1-5): ").strip()
+    choice = input("\nSelect action (1-6): ").strip()
     
     if choice == "1":
         # Subscribe to all users' calendar events (requires Application permission)
@@ -191,6 +231,14 @@ def main():
             renew_subscription(sub_id, hours)
     
     elif choice == "5":
+        if not subscriptions:
+            print("No subscriptions to renew")
+        else:
+            hours = input("Hours to extend (default 24, max 72): ").strip()
+            hours = int(hours) if hours else 24
+            renew_subscriptions([sub['id'] for sub in subscriptions], hours)
+    
+    elif choice == "6":
         print("Exiting...")
     
     else:
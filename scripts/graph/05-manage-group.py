@@ -5,6 +5,7 @@ Add/remove users from the monitored Entra group
 import sys
 import requests
 from auth_helper import get_graph_headers, get_config
+from graph_projections import select_params
 
 
 def get_group_members(group_id):
@@ -14,7 +15,7 @@ def get_group_members(group_id):
     url = f"https://graph.microsoft.com/v1.0/groups/{group_id}/members"
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = requests.get(url, headers=headers, params=select_params('member.identity'), timeout=10)
         response.raise_for_status()
         
         members = response.json().get('value', [])
@@ -86,7 +87,7 @@ def find_user_by_email(user_email):
     url = f"https://graph.microsoft.com/v1.0/users/{user_email}"
     
     try:
-        response = requests.get(url, headers=headers, timeout=10)
+        response = requests.get(url, headers=headers, params=select_params('member.identity'), timeout=10)
         if response.status_code == 200:
             user = response.json()
             print(f"   ✅ Found: {user['displayName']}")
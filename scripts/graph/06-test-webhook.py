@@ -9,27 +9,71 @@ from datetime import datetime
 from auth_helper import get_config
 
 
-def send_webhook_notification(webhook_url, payload, auth_token=None):
-    """Send webhook notification"""
+def send_webhook_notification(webhook_url, payload, auth_token=None, session=None, timeout=10, verbose=True):
+    """Send webhook notification (pass a requests.Session to reuse connections)"""
     headers = {'Content-Type': 'application/json'}
     
     if auth_token:
         headers['Authorization'] = f'Bearer {auth_token}'
     
-    print(f"\n📤 Sending webhook notification...")
-    print(f"   URL: {webhook_url}")
-    print(f"   Auth: {'Yes' if auth_token else 'No'}")
+    if verbose:
+        print(f"\n📤 Sending webhook notification...")
+        print(f"   URL: {webhook_url}")
+        print(f"   Auth: {'Yes' if auth_token else 'No'}")
     
     try:
-        response = requests.post(webhook_url, json=payload, headers=headers, timeout=10)
-        print(f"\n✅ Response: {response.status_code}")
-        print(f"   Body: {response.text[:200]}")
+        response = (session or requests).post(webhook_url, json=payload, headers=headers, timeout=timeout)
+        if verbose:
+            print(f"\n✅ Response: {response.status_code}")
+            print(f"   Body: {response.text[:200]}")
         return response
     except Exception as e:
-        print(f"\n❌ Error: {e}")
+        if verbose:
+            print(f"\n❌ Error: {e}")
         return None
 
 
+def send_validation_request(webhook_url, validation_token, session=None, timeout=10):
+    """GET the endpoint the way Graph does when a subscription is created"""
+    return (session or requests).get(webhook_url, params={'validationToken': validation_token}, timeout=timeout)
+
+
+def event_notification_payload(change_type, client_state, subscription_id="test-subscription-id",
+                               user="test@example.com", event_id="AAMkATest123"):
+    """Graph calendar event change notification"""
+    return {
+        "value": [{
+            "subscriptionId": subscription_id,
+            "changeType": change_type,
+            "resource": f"users/{user}/events/{event_id}",
+            "resourceData": {
+                "@odata.type": "#Microsoft.Graph.event",
+                "id": event_id
+            },
+            "clientState": client_state,
+            "subscriptionExpirationDateTime": "2026-02-15T00:00:00.0000000Z"
+        }]
+    }
+
+
+def transcript_notification_payload(client_state, subscription_id="test-subscription-id",
+                                    user_id="test-user-id", meeting_id="MSoTestMeeting", transcript_id="TestTranscript"):
+    """Graph transcript created notification"""
+    return {
+        "value": [{
+            "subscriptionId": subscription_id,
+            "changeType": "created",
+            "resource": f"users/{user_id}/onlineMeetings/{meeting_id}/transcripts/{transcript_id}",
+            "resourceData": {
+                "@odata.type": "#Microsoft.Graph.callTranscript",
+                "id": transcript_id
+            },
+            "clientState": client_state,
+            "subscriptionExpirationDateTime": "2026-02-15T00:00:00.0000000Z"
+        }]
+    }
+
+
 def test_meeting_created_notification():
     """Test meeting created webhook"""
     config = get_config()
@@ -39,19 +83,7 @@ def test_meeting_created_notification():
         print("❌ No webhook URL configured")
         return False
     
-    payload = {
-        "value": [{
-            "subscriptionId": "test-subscription-id",
-            "changeType": "created",
-            "resource": "users/test@example.com/events/AAMkATest123",
-            "resourceData": {
-                "@odata.type": "#Microsoft.Graph.event",
-                "id": "AAMkATest123"
-            },
-            "clientState": config.get('webhook_secret', 'test-state'),
-            "subscriptionExpirationDateTime": "2026-02-15T00:00:00.0000000Z"
-        }]
-    }
+    payload = event_notification_payload("created", config.get('webhook_secret', 'test-state'))
     
     response = send_webhook_notification(webhook_url, payload, config.get('webhook_secret'))
     return response and response.status_code == 200
@@ -62,19 +94,7 @@ def test_meeting_updated_notification():
     config = get_config()
     webhook_url = config['webhook_url']
     
-    payload = {
-        "value": [{
-            "subscriptionId": "test-subscription-id",
-            "changeType": "updated",
-            "resource": "users/test@example.com/events/AAMkATest123",
-            "resourceData": {
-                "@odata.type": "#Microsoft.Graph.event",
-                "id": "AAMkATest123"
-            },
-            "clientState": config.get('webhook_secret'),
-            "subscriptionExpirationDateTime": "2026-02-15T00:00:00.0000000Z"
-        }]
-    }
+    payload = event_notification_payload("updated", config.get('webhook_secret'))
     
     response = send_webhook_notification(webhook_url, payload, config.get('webhook_secret'))
     return response and response.status_code == 200
@@ -86,13 +106,12 @@ def test_validation_token():
     webhook_url = config['webhook_url']
     
     validation_token = "test-validation-token-12345"
-    url_with_token = f"{webhook_url}?validationToken={validation_token}"
     
     print(f"\n🔍 Testing validation token...")
-    print(f"   URL: {url_with_token}")
+    print(f"   URL: {webhook_url}?validationToken={validation_token}")
     
     try:
-        response = requests.get(url_with_token, timeout=10)
+        response = send_validation_request(webhook_url, validation_token)
         if response.status_code == 200 and response.text == validation_token:
             print(f"\n✅ Validation token returned correctly")
             return True
@@ -175,4 +194,5 @@ def main():
     return 0
 
 
-if __name__ == \"__main__\":\n    sys.exit(main())
+if __name__ == "__main__":
+    sys.exit(main())
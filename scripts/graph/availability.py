@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Bulk Availability Probe
+
+Answers "who is busy in window X" for many users without a calendarView
+call per user: /calendar/getSchedule takes up to 100 mailboxes per call,
+so 5000 users cost 50 getSchedule calls.
+
+Every call runs against a requester mailbox, and Outlook allows only 4
+concurrent requests per mailbox, so each requester has at most
+MAX_IN_FLIGHT_PER_MAILBOX calls in flight: its calls go out in $batch
+envelopes of that size, one envelope at a time (13 sequential $batch
+requests for 5000 users). Calls are spread round-robin over several
+requester mailboxes (--requester, repeatable), which are probed in parallel.
+
+Each user's availabilityView ('0' free, '1' tentative, '2' busy, '3' oof,
+'4' working elsewhere per slot) is reduced to an int bitmap, bit i set when
+slot i is busy.
+
+Usage:
+    python scripts/graph/availability.py --minutes 60 --interval 15
+    python scripts/graph/availability.py --users a@contoso.com,b@contoso.com --tentative
+"""
+import argparse
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from graph_batch import build_request, execute_batches
+from graph_projections import select_params
+
+MAX_SCHEDULES = 100          # mailboxes per getSchedule call
+MAX_IN_FLIGHT_PER_MAILBOX = 4   # Outlook's concurrent request limit per mailbox
+MAX_WINDOW = timedelta(days=62)
+DEFAULT_INTERVAL = int(os.getenv('AVAILABILITY_INTERVAL_MINUTES', '15'))
+BUSY = '23'                  # busy, out of office
+TENTATIVE = '1'
+
+GRAPH_TIME = '%Y-%m-%dT%H:%M:%S'
+
+
+def _bitmap(view, busy):
+    """int with bit i set where view[i] is one of the busy statuses"""
+    bits = 0
+    for i, status in enumerate(view):
+        if status in busy:
+            bits |= 1 << i
+    return bits
+
+
+class Availability:
+    """Busy bitmaps for a set of users over slots of `interval` minutes from `start`"""
+
+    def __init__(self, start, interval, slots):
+        self.start = start
+        self.interval = interval
+        self.slots = slots
+        self.busy = {}
+        self.errors = {}
+
+    def slot(self, when):
+        """Slot index containing when (None outside the window)"""
+        index = int((when - self.start).total_seconds() // (self.interval * 60))
+        return index if 0 <= index < self.slots else None
+
+    def slot_start(self, index):
+        return self.start + timedelta(minutes=self.interval * index)
+
+    def is_busy(self, user, when):
+        index = self.slot(when)
+        return index is not None and bool(self.busy.get(user.lower(), 0) >> index & 1)
+
+    def busy_at(self, when):
+        """Users busy in the slot containing when"""
+        index = self.slot(when)
+        if index is None:
+            return []
+        return [user for user, bits in self.busy.items() if bits >> index & 1]
+
+    def free_during(self, start, end):
+        """Users with no busy slot overlapping [start, end)"""
+        span = self.interval * 60
+        first = max(int((start - self.start).total_seconds() // span), 0)
+        last = min(int(((end - self.start).total_seconds() - 1e-6) // span), self.slots - 1)
+        if last < first:
+            return list(self.busy)
+        mask = ((1 << (last - first + 1)) - 1) << first
+        return [user for user, bits in self.busy.items() if not bits & mask]
+
+    def occupancy(self):
+        """Number of busy users per slot"""
+        counts = [0] * self.slots
+        for bits in self.busy.values():
+            while bits:
+                low = bits & -bits
+                counts[low.bit_length() - 1] += 1
+                bits ^= low
+        return counts
+
+
+def schedule_requests(requesters, users, start, end, interval):
+    """getSchedule $batch items, MAX_SCHEDULES users each, round-robin over the requester mailbox(es)"""
+    requesters = [requesters] if isinstance(requesters, str) else list(requesters)
+    items = []
+    for n in range(0, len(users), MAX_SCHEDULES):
+        requester = requesters[len(items) % len(requesters)]
+        body = {
+            'schedules': users[n:n + MAX_SCHEDULES],
+            'startTime': {'dateTime': start.strftime(GRAPH_TIME), 'timeZone': 'UTC'},
+            'endTime': {'dateTime': end.strftime(GRAPH_TIME), 'timeZone': 'UTC'},
+            'availabilityViewInterval': interval,
+        }
+        items.append(build_request(len(items), 'POST', f"/users/{requester}/calendar/getSchedule", body))
+    return items
+
+
+def execute_per_requester(items, headers, concurrency, per_mailbox=MAX_IN_FLIGHT_PER_MAILBOX):
+    """
+    execute_batches() with at most per_mailbox calls in flight per requester.
+
+    Each requester's calls are sent in $batch envelopes of per_mailbox, one
+    envelope at a time; up to `concurrency` requesters run in parallel.
+    """
+    by_requester = {}
+    for item in items:
+        by_requester.setdefault(item['url'], []).append(item)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(by_requester)))) as executor:
+        for batch_results in executor.map(
+                lambda chunk: execute_batches(chunk, headers, concurrency=1, batch_size=per_mailbox),
+                by_requester.values()):
+            results.update(batch_results)
+    return results
+
+
+def probe(users, start, end, requester, interval=DEFAULT_INTERVAL, headers=None, concurrency=4,
+          include_tentative=False):
+    """
+    Busy bitmaps for users over [start, end).
+
+    Args:
+        users: mailbox addresses
+        start, end: aware datetimes (at most 62 days apart)
+        requester: mailbox (or list of mailboxes) whose calendar runs getSchedule
+        interval: slot length in minutes (5-1440)
+        concurrency: requester mailboxes probed in parallel
+        include_tentative: count tentative slots as busy
+
+    Returns:
+        Availability (per-user failures in .errors)
+    """
+    if not 5 <= interval <= 1440:
+        raise ValueError("interval must be between 5 and 1440 minutes")
+    if not timedelta(0) < end - start <= MAX_WINDOW:
+        raise ValueError("window must be positive and at most 62 days")
+
+    start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+    slots = -(-int((end - start).total_seconds()) // (interval * 60))
+    availability = Availability(start, interval, slots)
+    busy = BUSY + (TENTATIVE if include_tentative else '')
+
+    items = schedule_requests(requester, list(users), start, end, interval)
+    results = execute_per_requester(items, headers, concurrency)
+    for item in items:
+        result = results.get(item['id']) or {}
+        if result.get('status') != 200:
+            error = f"HTTP {result.get('status')}"
+            availability.errors.update((user.lower(), error) for user in item['body']['schedules'])
+            continue
+        for schedule in result['body'].get('value', []):
+            user = schedule['scheduleId'].lower()
+            if schedule.get('error'):
+                availability.errors[user] = schedule['error'].get('message') or schedule['error'].get('responseCode')
+            else:
+                availability.busy[user] = _bitmap(schedule.get('availabilityView', ''), busy)
+    return availability
+
+
+def group_mailboxes(group_id, headers):
+    """Mail addresses of a group's user members"""
+    url = f"https://graph.microsoft.com/v1.0/groups/{group_id}/members"
+    params = select_params('member.identity', {'$top': 999})
+    users = []
+    while url:
+        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response.raise_for_status()
+        body = response.json()
+        users.extend(m.get('mail') or m['userPrincipalName'] for m in body.get('value', [])
+                     if m.get('@odata.type', '#microsoft.graph.user') == '#microsoft.graph.user'
+                     and (m.get('mail') or m.get('userPrincipalName')))
+        url, params = body.get('@odata.nextLink'), None
+    return users
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Who is busy: bulk getSchedule over a group or user list")
+    parser.add_argument("--users", default=None, help="Comma-separated mailboxes (default: ENTRA_GROUP_ID members)")
+    parser.add_argument("--minutes", type=int, default=60, help="Window length from now")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL, help="Slot length in minutes")
+    parser.add_argument("--tentative", action="store_true", help="Count tentative as busy")
+    parser.add_argument("--requester", action="append", dest="requesters",
+                        help="Mailbox running getSchedule (repeat to spread calls; default: USER_EMAIL)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Requester mailboxes probed in parallel")
+    args = parser.parse_args()
+
+    from auth_helper import get_config, get_graph_headers
+
+    config = get_config()
+    headers = get_graph_headers()
+    users = args.users.split(',') if args.users else group_mailboxes(config['group_id'], headers)
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    end = start + timedelta(minutes=args.minutes)
+
+    requesters = args.requesters or [config['user_email']]
+    print(f"🗓️  Probing {len(users)} user(s), {args.minutes} min in {args.interval}-min slots "
+          f"({-(-len(users) // MAX_SCHEDULES)} getSchedule call(s) over {len(requesters)} requester mailbox(es))")
+    availability = probe(users, start, end, requesters, args.interval, headers,
+                         args.concurrency, args.tentative)
+
+    for index, count in enumerate(availability.occupancy()):
+        bar = '█' * round(40 * count / len(availability.busy)) if availability.busy else ''
+        print(f"   {availability.slot_start(index):%H:%M}  {count:>5}  {bar}")
+    busy_now = availability.busy_at(start)
+    print(f"\n🔴 Busy now: {len(busy_now)}")
+    for user in sorted(busy_now)[:20]:
+        print(f"   {user}")
+    if availability.errors:
+        print(f"\n⚠️  {len(availability.errors)} user(s) without availability")
+        for user, error in list(availability.errors.items())[:10]:
+            print(f"   {user}: {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
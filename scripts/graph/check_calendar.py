@@ -3,32 +3,36 @@ import sys
 sys.path.append('scripts/graph')
 import requests
 from auth_helper import get_graph_headers, get_config
-from datetime import datetime, timedelta
+from graph_projections import select_params
+from recurrence import SeriesCache, single_events
+from datetime import datetime, timedelta, timezone
 
 config = get_config()
 user_email = config['user_email']
 headers = get_graph_headers()
 
 # Get last 3 days + next 3 days
-start = (datetime.utcnow() - timedelta(days=3)).strftime("%Y-%m-%dT00:00:00Z")
-end = (datetime.utcnow() + timedelta(days=3)).strftime("%Y-%m-%dT23:59:59Z")
+now = datetime.now(timezone.utc)
+start = (now - timedelta(days=3)).replace(hour=0, minute=0, second=0, microsecond=0)
+end = (now + timedelta(days=3)).replace(hour=23, minute=59, second=59, microsecond=0)
 
-url = f"https://graph.microsoft.com/v1.0/users/{user_email}/calendarview"
-params = {
-    "startDateTime": start,
-    "endDateTime": end,
-    "$top": 20,
-    "$orderby": "start/dateTime desc"
-}
-
-resp = requests.get(url, headers=headers, params=params, timeout=15)
+# Recurring meetings are expanded locally from cached series masters; only
+# single-instance events are listed, instead of every occurrence via calendarView
+error = None
+try:
+    series = SeriesCache()
+    series.refresh(user_email, headers)
+    events = single_events(user_email, start, end, headers, select_params('event.summary')['$select'])
+    events += series.occurrences(user_email, start, end)
+    events = sorted(events, key=lambda e: e['start']['dateTime'], reverse=True)[:20]
+except requests.HTTPError as e:
+    error = e.response
 
 print("=" * 70)
 print(f"📅 Calendar for {user_email}")
 print("=" * 70)
 
-if resp.status_code == 200:
-    events = resp.json().get('value', [])
+if error is None:
     print(f"\nFound {len(events)} events\n")
     
     for event in events:
@@ -53,5 +57,5 @@ if resp.status_code == 200:
         
         print()
 else:
-    print(f"Error: {resp.status_code}")
-    print(resp.text[:300])
+    print(f"Error: {error.status_code}")
+    print(error.text[:300])
@@ -1,56 +1,135 @@
 #!/usr/bin/env python3
+"""
+Show the latest webhook payloads stored in S3.
+
+Usage:
+    python scripts/graph/check_latest_webhook.py
+
+    # Answer from the sidecar index (scripts/aws/payload_index.py) instead of S3
+    python scripts/graph/check_latest_webhook.py --index
+
+    # Keep watching and print payloads as they arrive (Ctrl+C to stop)
+    python scripts/graph/check_latest_webhook.py --follow
+"""
+import argparse
 import json
 import os
-from datetime import datetime
+import sys
+import time
+from datetime import datetime, timezone
 from pathlib import Path
 
-import boto3
-from botocore.exceptions import ProfileNotFound
 from dotenv import load_dotenv
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 ENV_FILE = REPO_ROOT / ".env.local"
 load_dotenv(ENV_FILE)
 
-AWS_PROFILE = os.getenv("AWS_PROFILE", "tmf-dev")
-AWS_REGION = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+sys.path.append(str(REPO_ROOT / "scripts" / "aws"))
+from webhook_payloads import (
+    classify_notification, get_s3_client, latest_payload_objects, parse_envelope, payload_time, read_payload,
+    tail_payloads,
+)
+from payload_index import DEFAULT_INDEX_PATH, open_index
+
 AWS_BUCKET = os.getenv("AWS_S3_BUCKET", "tmf-webhook-payloads-dev")
 AWS_PREFIX = os.getenv("AWS_S3_PREFIX", "webhooks/")
 
-try:
-    session = boto3.Session(profile_name=AWS_PROFILE, region_name=AWS_REGION)
-except ProfileNotFound:
-    # Fall back to default credentials chain if profile is missing
-    session = boto3.Session(region_name=AWS_REGION)
 
-s3 = session.client("s3")
+def latest_from_index(index, count):
+    """Newest payloads from the sidecar index"""
+    started = time.perf_counter()
+    rows = index.latest(count)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print(f"Latest {len(rows)} webhook payloads (index, {elapsed_ms:.1f} ms):\n")
+    for i, row in enumerate(rows, 1):
+        print(f"  {i:2}. {row['key'].split('/')[-1]} ({row['size']} bytes) - {row['received_at']}")
+
+    print(f"\nTotal payloads indexed: {index.count()}")
+
+    if rows:
+        latest = rows[0]
+        print("\nLatest webhook payload (MOST RECENT):")
+        print(f"   File: {latest['key'].split('/')[-1]}")
+        print(f"   Type: {latest['kind'].capitalize()}")
+        print(f"   Resource: {(latest['resource'] or 'N/A')[:70]}...")
+
+
+def describe_payload(s3, obj):
+    """(kind, resource) of a stored payload, live or compacted"""
+    raw = read_payload(s3, AWS_BUCKET, obj)
+    _, notifications = parse_envelope(raw)
+    if not notifications:
+        return "Other", "N/A"
+    return classify_notification(notifications[0]).capitalize(), notifications[0].get("resource", "N/A")
+
 
-# List latest files
-resp = s3.list_objects_v2(Bucket=AWS_BUCKET, Prefix=AWS_PREFIX, MaxKeys=20)
-objects = sorted(resp.get("Contents", []), key=lambda x: x["LastModified"], reverse=True)
+def latest_from_s3(s3, count):
+    """Newest payloads, found by jumping to the newest keys rather than listing the bucket"""
+    started = time.perf_counter()
+    objects = latest_payload_objects(s3, AWS_BUCKET, AWS_PREFIX, count)
+    elapsed_ms = (time.perf_counter() - started) * 1000
 
-print("Latest 10 webhook payloads in S3:\n")
-for i, obj in enumerate(objects[:10], 1):
-    key = obj["Key"]
-    size = obj["Size"]
-    mod_time = obj["LastModified"].strftime("%Y-%m-%d %H:%M:%S UTC")
-    print(f"  {i:2}. {key.split('/')[-1]} ({size} bytes) - {mod_time}")
+    print(f"Latest {len(objects)} webhook payloads in S3 ({elapsed_ms:.0f} ms):\n")
+    for i, obj in enumerate(objects, 1):
+        key = obj["Key"]
+        size = obj["Size"]
+        received = payload_time(obj).strftime("%Y-%m-%d %H:%M:%S UTC")
+        print(f"  {i:2}. {key.split('/')[-1]} ({size} bytes) - {received}")
 
-print(f"\nTotal files in S3: {len(objects)}")
+    # Show the MOST RECENT file
+    if objects:
+        latest_key = objects[0]["Key"]
+        webhook_type, resource = describe_payload(s3, objects[0])
 
-# Show the MOST RECENT file
-if objects:
-    latest_key = objects[0]["Key"]
-    latest_obj = s3.get_object(Bucket=AWS_BUCKET, Key=latest_key)
-    data = json.loads(latest_obj["Body"].read())
+        print("\nLatest webhook payload (MOST RECENT):")
+        print(f"   File: {latest_key.split('/')[-1]}")
+        print(f"   Type: {webhook_type}")
+        print(f"   Resource: {resource[:70]}...")
 
-    webhook_type = "Transcript" if "transcript" in str(data).lower() else "Calendar"
+    return objects
 
-    print("\nLatest webhook payload (MOST RECENT):")
-    print(f"   File: {latest_key.split('/')[-1]}")
-    print(f"   Type: {webhook_type}")
-    if "resourceData" in data:
-        resource = data["resourceData"].get("resource", "N/A")
+
+def follow(s3, since, min_interval, max_interval):
+    """Print new payloads as they land until interrupted"""
+    print(f"\n👀 Following s3://{AWS_BUCKET}/{AWS_PREFIX} (polling every {min_interval:g}-{max_interval:g}s, Ctrl+C to stop)\n")
+    try:
+        for obj in tail_payloads(s3, AWS_BUCKET, AWS_PREFIX, since, min_interval, max_interval):
+            webhook_type, resource = describe_payload(s3, obj)
+            received = payload_time(obj).strftime("%H:%M:%S")
+            print(f"  📨 {received} {webhook_type:<10} {resource[:60]}  ({obj['Key'].split('/')[-1]})")
+    except KeyboardInterrupt:
+        print("\nStopped following")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the latest stored webhook payloads")
+    parser.add_argument("--count", type=int, default=10, help="Payloads to list (default: 10)")
+    parser.add_argument("--index", nargs="?", const=DEFAULT_INDEX_PATH,
+                        help="Answer from the sidecar index (default path if no value)")
+    parser.add_argument("--follow", action="store_true", help="Keep polling and print new payloads")
+    parser.add_argument("--interval", type=float, default=1.0, help="Fastest poll interval in seconds (default: 1)")
+    parser.add_argument("--max-interval", type=float, default=30.0,
+                        help="Slowest poll interval while idle in seconds (default: 30)")
+    args = parser.parse_args()
+
+    index = open_index(args.index) if args.index else None
+    if args.index and index is None:
+        print(f"⚠️  No index at {args.index}; listing S3 instead\n")
+
+    if index is not None:
+        latest_from_index(index, args.count)
+        objects = []
     else:
-        resource = data.get("resource", "N/A")
-    print(f"   Resource: {resource[:70]}...")
+        objects = latest_from_s3(get_s3_client(), args.count)
+
+    if args.follow:
+        since = payload_time(objects[0]) if objects else datetime.now(timezone.utc)
+        follow(get_s3_client(), since, args.interval, args.max_interval)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,58 +1,101 @@
 #!/usr/bin/env python3
-import boto3
-import json
-
-s3 = boto3.client('s3', region_name='us-east-1', profile_name='tmf-dev')
-
-# List recent objects
-response = s3.list_objects_v2(
-    Bucket='tmf-webhook-payloads-dev', 
-    Prefix='webhooks/',
-    MaxKeys=100
-)
-
-objects = sorted(response.get('Contents', []), key=lambda x: x['LastModified'], reverse=True)
-
-print(f"Total webhook payloads in S3: {len(objects)}\n")
-print("="*80)
-
-transcript_count = 0
-calendar_count = 0
-transcript_files = []
-
-for obj in objects:
-    key = obj['Key']
-    try:
-        resp = s3.get_object(Bucket='tmf-webhook-payloads-dev', Key=key)
-        content = json.loads(resp['Body'].read().decode('utf-8'))
-        resource = content.get('resourceData', {}).get('resource', '')
-        
-        if 'transcript' in resource.lower():
-            print(f"✅ TRANSCRIPT NOTIFICATION: {key}")
-            print(f"   Resource: {resource}")
-            transcript_count += 1
-            transcript_files.append(key)
-        elif 'event' in resource.lower():
-            calendar_count += 1
-        
-    except Exception as e:
-        print(f"Error processing {key}: {e}")
-
-print("="*80)
-print(f"\n📊 Summary:")
-print(f"   ✅ Transcript notifications: {transcript_count}")
-print(f"   📅 Calendar event webhooks: {calendar_count}")
-
-if transcript_count == 0:
-    print(f"\n⏳ STATUS: No transcript notifications in S3 yet")
-    print(f"   Last calendar event was at: 2026-02-13T02:18:51")
-    print(f"   Meeting ended at: 2026-02-13T00:19:46")
-    print(f"   Time elapsed: ~1h 59m")
-    print(f"\n   Expected behavior: Transcript should arrive within 5-30 minutes after meeting ends")
-    print(f"   Possible issues:")
-    print(f"   1. Meeting recording may not have completed successfully")
-    print(f"   2. Transcript subscription may not be active")
-    print(f"   3. Teams backend may not have generated transcript yet")
-else:
-    print(f"\n✅ SUCCESS: Transcripts are being delivered!")
-    print(f"\nFirst transcript file: {transcript_files[0]}")
+"""
+Check whether transcript notifications have been delivered to S3.
+
+Scans the whole webhook prefix with the paginator and classifies payloads
+concurrently, reading only the first few KB of each object where possible.
+
+Usage:
+    python scripts/graph/check_transcript_delivery.py
+    python scripts/graph/check_transcript_delivery.py --prefix webhooks/2026/02/13/ --workers 64
+
+    # Answer from the sidecar index (scripts/aws/payload_index.py) instead of S3
+    python scripts/graph/check_transcript_delivery.py --index
+"""
+import sys
+import argparse
+import time
+from collections import Counter
+
+sys.path.append("scripts/aws")
+from webhook_payloads import DEFAULT_BUCKET, DEFAULT_PREFIX, get_s3_client, scan_payloads
+from payload_index import DEFAULT_INDEX_PATH, open_index
+
+
+def summarize_from_index(index, show):
+    """Counts and newest transcript keys straight from the sidecar index"""
+    counts = Counter(dict(index.count_by('kind')))
+    transcript_files = [(row['received_at'], row['key']) for row in index.latest(show, kind='transcript')]
+    return counts, transcript_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check transcript notification delivery in S3")
+    parser.add_argument("--bucket", default=DEFAULT_BUCKET, help="Webhook payload bucket")
+    parser.add_argument("--prefix", default=DEFAULT_PREFIX, help="Key prefix to scan")
+    parser.add_argument("--workers", type=int, default=32, help="Concurrent GETs (default: 32)")
+    parser.add_argument("--range-bytes", type=int, default=4096,
+                        help="Classify from this many leading bytes (0 = always full GET)")
+    parser.add_argument("--limit", type=int, help="Stop after this many objects")
+    parser.add_argument("--show", type=int, default=10, help="Transcript keys to print")
+    parser.add_argument("--index", nargs="?", const=DEFAULT_INDEX_PATH,
+                        help="Answer from the sidecar index (default path if no value)")
+    args = parser.parse_args()
+
+    counts = Counter()
+    bytes_read = 0
+    transcript_files = []
+    started = time.monotonic()
+
+    index = open_index(args.index) if args.index else None
+    if args.index and index is None:
+        print(f"⚠️  No index at {args.index}; scanning S3 instead")
+
+    if index is not None:
+        counts, transcript_files = summarize_from_index(index, args.show)
+        source = "notifications from index"
+    else:
+        s3 = get_s3_client(max_pool_connections=args.workers)
+        for obj, kind, read in scan_payloads(s3, args.bucket, args.prefix, args.workers,
+                                             args.range_bytes, args.limit):
+            counts[kind] += 1
+            bytes_read += read
+            if kind == 'transcript':
+                transcript_files.append((obj['LastModified'].strftime('%Y-%m-%d %H:%M:%S'), obj['Key']))
+        source = f"payloads from S3, {bytes_read / 1024:.0f} KiB read"
+
+    elapsed = time.monotonic() - started
+    total = sum(counts.values())
+
+    transcript_files.sort(reverse=True)
+    if transcript_files:
+        print(f"Newest transcript notifications:")
+        for received, key in transcript_files[:args.show]:
+            print(f"✅ {received} {key}")
+
+    print("=" * 80)
+    print(f"\n📊 Summary ({total} {source} in {elapsed:.2f}s):")
+    print(f"   ✅ Transcript notifications: {counts['transcript']}")
+    print(f"   🎥 Recording notifications: {counts['recording']}")
+    print(f"   📅 Calendar event webhooks: {counts['calendar']}")
+    print(f"   ♻️  Lifecycle notifications: {counts['lifecycle']}")
+    print(f"   ❔ Other: {counts['other']}")
+    if counts['error']:
+        print(f"   ❌ Errors: {counts['error']}")
+
+    if not transcript_files:
+        print(f"\n⏳ STATUS: No transcript notifications in S3 yet")
+        print(f"\n   Expected behavior: Transcript should arrive within 5-30 minutes after meeting ends")
+        print(f"   Possible issues:")
+        print(f"   1. Meeting recording may not have completed successfully")
+        print(f"   2. Transcript subscription may not be active")
+        print(f"   3. Teams backend may not have generated transcript yet")
+    else:
+        print(f"\n✅ SUCCESS: Transcripts are being delivered!")
+        print(f"\nMost recent transcript file: {transcript_files[0][1]}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
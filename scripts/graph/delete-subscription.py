@@ -14,6 +14,13 @@ Usage:
     
     # Delete all subscriptions (use with caution!)
     python scripts/graph/delete-subscription.py --all --confirm
+    
+    # Show the exact $batch plan without deleting
+    python scripts/graph/delete-subscription.py --filter-webhook --dry-run
+
+Bulk deletes are grouped into $batch requests (20 per batch) sent with
+bounded concurrency, and deleted subscriptions are marked inactive in
+the DynamoDB subscription tracker.
 """
 import sys
 import argparse
@@ -21,6 +28,8 @@ import requests
 
 sys.path.append("scripts/graph")
 from auth_helper import get_graph_headers
+from graph_batch import MAX_BATCH_SIZE, build_request, chunked, execute_batches
+from tracker_client import get_tracker
 
 
 def list_subscriptions():
@@ -58,6 +67,46 @@ def delete_subscription(subscription_id):
         return False
 
 
+def bulk_delete_subscriptions(subscriptions, concurrency=4):
+    """
+    Delete subscriptions through $batch requests.
+    
+    Returns:
+        dict of subscription id -> HTTP status of its DELETE
+    """
+    batch = [
+        build_request(sub['id'], "DELETE", f"/subscriptions/{sub['id']}")
+        for sub in subscriptions
+    ]
+    results = execute_batches(batch, get_graph_headers(), concurrency=concurrency)
+    return {sub_id: result.get('status') for sub_id, result in results.items()}
+
+
+def mark_inactive_in_tracker(tracker, subscription_ids):
+    """Mark deleted subscriptions inactive in DynamoDB; returns count updated."""
+    if tracker is None:
+        return 0
+    
+    updated = 0
+    for sub_id in subscription_ids:
+        row = tracker.get_subscription(sub_id)
+        if row and row.get('status') == 'active':
+            if tracker.delete_subscription(sub_id, row['created_at']):
+                updated += 1
+    return updated
+
+
+def print_plan(to_delete, concurrency):
+    """Print the exact batches that would be sent."""
+    batches = chunked(to_delete, MAX_BATCH_SIZE)
+    print(f"\n📝 Plan: {len(to_delete)} DELETE(s) in {len(batches)} $batch request(s), "
+          f"{concurrency} in flight")
+    for i, batch in enumerate(batches, 1):
+        print(f"  Batch {i} ({len(batch)} item(s)):")
+        for sub in batch:
+            print(f"    DELETE /subscriptions/{sub['id']}  ({sub.get('resource', 'N/A')[:60]})")
+
+
 def main():
     parser = argparse.ArgumentParser(description="Delete Microsoft Graph subscriptions")
     
@@ -74,6 +123,10 @@ def main():
                        help="Confirm deletion (required for --all)")
     parser.add_argument("--dry-run", action="store_true",
                        help="Show what would be deleted without actually deleting")
+    parser.add_argument("--concurrency", type=int, default=4,
+                       help="Number of $batch requests in flight (default: 4)")
+    parser.add_argument("--no-tracker", action="store_true",
+                       help="Do not mark deleted subscriptions inactive in DynamoDB")
     
     args = parser.parse_args()
     
@@ -86,6 +139,8 @@ def main():
         print(f"Deleting subscription: {args.id}")
         if delete_subscription(args.id):
             print(f"✅ Deleted subscription: {args.id}")
+            if not args.no_tracker:
+                mark_inactive_in_tracker(get_tracker(), [args.id])
         else:
             sys.exit(1)
         return
@@ -120,15 +175,10 @@ def main():
         return
     
     # Show what will be deleted
-    print("\nSubscriptions to delete:")
-    for sub in to_delete:
-        print(f"  • {sub['id']}")
-        print(f"    Resource: {sub.get('resource', 'N/A')}")
-        print(f"    Notification URL: {sub.get('notificationUrl', 'N/A')[:80]}")
-        print()
+    print_plan(to_delete, args.concurrency)
     
     if args.dry_run:
-        print(f"[DRY RUN] Would delete {len(to_delete)} subscriptions")
+        print(f"\n[DRY RUN] Would delete {len(to_delete)} subscriptions")
         return
     
     # Confirm before deleting
@@ -140,22 +190,38 @@ def main():
     
     # Delete subscriptions
     print(f"\nDeleting {len(to_delete)} subscriptions...")
-    deleted = 0
-    failed = 0
+    statuses = bulk_delete_subscriptions(to_delete, args.concurrency)
+    
+    deleted = []
+    gone = []
+    failed = []
     
     for sub in to_delete:
         sub_id = sub['id']
-        if delete_subscription(sub_id):
-            deleted += 1
+        status = statuses.get(sub_id)
+        if status == 204:
+            deleted.append(sub_id)
             print(f"  ✅ Deleted: {sub_id}")
+        elif status == 404:
+            gone.append(sub_id)
+            print(f"  ➖ Already gone: {sub_id}")
         else:
-            failed += 1
-            print(f"  ❌ Failed: {sub_id}")
+            failed.append(sub_id)
+            print(f"  ❌ Failed ({status}): {sub_id}")
+    
+    tracker_updated = 0
+    if not args.no_tracker and (deleted or gone):
+        tracker_updated = mark_inactive_in_tracker(get_tracker(), deleted + gone)
     
     print(f"\n📊 Summary:")
-    print(f"   Deleted: {deleted}")
-    print(f"   Failed: {failed}")
+    print(f"   Deleted: {len(deleted)}")
+    print(f"   Already gone: {len(gone)}")
+    print(f"   Failed: {len(failed)}")
     print(f"   Total: {len(to_delete)}")
+    print(f"   Tracker rows marked inactive: {tracker_updated}")
+    
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == "__main__":
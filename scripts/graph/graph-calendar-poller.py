@@ -4,36 +4,139 @@ Poll Graph API directly for calendar changes instead of relying on change notifi
 This is more reliable than Event Hub or webhook delivery.
 
 This function will:
-1. Query the user's calendar events from the last poll
-2. Compare with stored state to detect new/modified events
-3. Send to Event Hub for processing
+1. Load the members of ENTRA_GROUP_ID (cached, refreshed hourly) - or poll the
+   single USER_EMAIL mailbox when no group is configured
+2. Query every member's calendarView/delta concurrently (bounded pool, global
+   request-rate limit) with the deltaLink saved by the last poll, so only
+   created/updated/deleted events come back
+3. Drop changes whose content is unchanged since the event was last emitted
+   (per-event fingerprints in the poller state store, see poller_state.py),
+   so resyncs and attendee-response churn produce no output
+4. Send the merged change stream to Event Hub in batches (poller_sink.py;
+   POLLER_SINK, or EVENT_HUB_NAMESPACE/EVENT_HUB_NAME)
+5. Save the new deltaLinks only once their changes were delivered; on 410 Gone
+   (or once the sync window needs to move forward) start a full resync of that user
+
+Each run only polls the users that are due (poll_scheduler.py): short
+intervals for users with an online meeting about to start or a busy
+calendar, long ones for idle calendars, within a request budget
+(POLLER_ADAPTIVE=false polls everyone, least recently polled first). No new
+user is started once the Lambda is about to time out.
+
+Request latency, pages, bytes, throttle waits, events/sec and detection lag
+are recorded as histograms (poller_metrics.py) and emitted as CloudWatch EMF
+from Lambda, Prometheus text locally (POLLER_METRICS).
+
+Long-running pollers can keep an index of upcoming online meetings
+(meeting_index.py) current from the same change events, so join scheduling
+needs no extra Graph reads.
 """
 
+import asyncio
 import json
 import os
+import sys
+import time
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
+import httpx
 import requests
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from poller_state import open_poller_state
+from poller_sink import open_sink
+from poll_scheduler import PollScheduler, graph_timestamp
+from graph_projections import prefer_headers, project, select_params
+from meeting_index import MeetingIndex, DEFAULT_INDEX
+from poller_metrics import PollerMetrics, emit as emit_metrics
+
 load_dotenv('.env.local.azure')
 load_dotenv('nobots-eventhub/.env')
 
 logger = logging.getLogger(__name__)
 
+# calendarView/delta tracks a fixed window; it is re-synced once less than
+# half the look-ahead is left before its end
+DELTA_DAYS_BACK = 1
+DELTA_DAYS_AHEAD = 30
+DELTA_PAGE_SIZE = 100
+
+# Mailboxes polled at once and the request-rate ceiling shared by all of them
+DEFAULT_CONCURRENCY = int(os.getenv('POLLER_CONCURRENCY', '32'))
+DEFAULT_MAX_RPS = float(os.getenv('POLLER_MAX_RPS', '50'))
+
+MEMBER_REFRESH = timedelta(hours=1)
+
+# Stop starting new users this long before the Lambda deadline
+DEADLINE_MARGIN_SECONDS = 30
+
+# Keep the Lambda response well under its 6 MB limit
+MAX_RETURNED_EVENTS = 500
+
+class DeltaTokenExpired(Exception):
+    """The saved deltaLink was rejected with 410 Gone; a full resync is needed"""
+
+
+class RateLimiter:
+    """Token bucket shared by every request of a sweep"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def pause(self, seconds):
+        """Stop handing out requests for a while (after a 429)"""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
 class GraphCalendarPoller:
-    def __init__(self):
+    def __init__(self, user_ids=None, group_id=None, state=None,
+                 concurrency=DEFAULT_CONCURRENCY, max_rps=DEFAULT_MAX_RPS, sink=None, scheduler=None, index=None):
         self.graph_endpoint = "https://graph.microsoft.com/v1.0"
-        self.user_id = "boldoriole@ibuyspy.net"
+        self.user_id = os.getenv('USER_EMAIL', "boldoriole@ibuyspy.net")
+        self.user_ids = user_ids
+        self.group_id = group_id or os.getenv('ENTRA_GROUP_ID')
+        self.concurrency = concurrency
+        self.max_rps = max_rps
         # Load credentials from environment
         self.client_id = os.getenv('GRAPH_CLIENT_ID')
         self.client_secret = os.getenv('GRAPH_CLIENT_SECRET')
         self.tenant_id = os.getenv('GRAPH_TENANT_ID')
         self.access_token = None
+        self.token_expires = 0
+        # deltaLinks, member cache and event fingerprints (POLLER_STATE)
+        self.state = open_poller_state(state)
+        # Where sweep() delivers changes (poller_sink.py); None keeps them in the summary only
+        self.sink = sink
+        # Which users are due each run; None polls everyone
+        if scheduler is None and os.getenv('POLLER_ADAPTIVE', 'true').lower() != 'false':
+            scheduler = PollScheduler()
+        self.scheduler = scheduler
+        # Upcoming online meetings (meeting_index.py), kept current from committed delta results
+        self.index = index
+        # Hot-path counters and histograms (poller_metrics.py)
+        self.metrics = PollerMetrics()
+        self.plan = None
+        self.limiter = None
         
     def get_access_token(self):
-        """Get Microsoft Graph access token"""
-        if self.access_token:
+        """Get Microsoft Graph access token (renewed 5 minutes before it expires)"""
+        if self.access_token and time.time() < self.token_expires - 300:
             return self.access_token
             
         token_url = f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token"
@@ -49,7 +152,9 @@ class GraphCalendarPoller:
         if response.status_code != 200:
             raise Exception(f"Failed to get token: {response.text}")
             
-        self.access_token = response.json()['access_token']
+        token = response.json()
+        self.access_token = token['access_token']
+        self.token_expires = time.time() + int(token.get('expires_in', 3600))
         return self.access_token
     
     def get_headers(self):
@@ -96,75 +201,390 @@ class GraphCalendarPoller:
         logger.info(f"✅ Found {len(events)} events in last {minutes_back} minutes")
         return events
     
-    def get_recently_modified_events(self, minutes_back=60):
+    async def graph_get(self, client, url, params=None, max_retries=3, projection=None):
+        """Rate-limited GET, honouring Retry-After on 429/503 (projection adds its Prefer headers)"""
+        headers = {**self.get_headers(), 'Prefer': f'odata.maxpagesize={DELTA_PAGE_SIZE}'}
+        if projection:
+            headers = prefer_headers(projection, headers)
+        for attempt in range(max_retries + 1):
+            queued = time.perf_counter()
+            await self.limiter.acquire()
+            sent = time.perf_counter()
+            if sent - queued > 0.001:
+                self.metrics.rate_limited(sent - queued)
+            response = await client.get(url, headers=headers, params=params)
+            self.metrics.request((time.perf_counter() - sent) * 1000, response.status_code)
+            if response.status_code not in (429, 503) or attempt == max_retries:
+                return response
+            retry_after = response.headers.get('Retry-After', '').strip()
+            # Seconds normally; anything else (an HTTP date) falls back to exponential backoff
+            wait = int(retry_after) if retry_after.isdigit() else 2 ** attempt
+            logger.warning(f"⏳ Throttled ({response.status_code}), retrying in {wait}s")
+            self.metrics.throttle(wait)
+            self.limiter.pause(wait)
+            await asyncio.sleep(wait)
+
+    async def get_group_members(self, client):
         """
-        Get events that were MODIFIED in the last N minutes
-        (not just scheduled during that time)
-        
+        [{'id', 'upn'}] for the transitive user members of the group.
+
+        Cached in the poller state and refreshed every MEMBER_REFRESH; users
+        who left the group have their delta state dropped.
+        """
+        cached = self.state.get_members()
+        if cached and datetime.now(timezone.utc) - datetime.fromisoformat(cached[0]) < MEMBER_REFRESH:
+            return cached[1]
+
+        url = f"{self.graph_endpoint}/groups/{self.group_id}/transitiveMembers/microsoft.graph.user"
+        params = select_params('member.identity', {'$top': 999})
+        users = []
+        while url:
+            response = await self.graph_get(client, url, params)
+            if response.status_code != 200:
+                if cached:
+                    logger.warning(f"⚠️  Could not refresh group members ({response.status_code}), using cache")
+                    return cached[1]
+                raise Exception(f"Failed to list group members: {response.status_code} - {response.text[:300]}")
+            body = response.json()
+            users.extend({'id': m['id'], 'upn': m.get('userPrincipalName') or m.get('mail')}
+                         for m in body.get('value', []) if m.get('id'))
+            url, params = body.get('@odata.nextLink'), None
+
+        current = {u['id'] for u in users}
+        for user_id in [u for u in self.state.known_users() if u not in current]:
+            self.state.drop(user_id)
+        self.state.put_members(users)
+        logger.info(f"👥 {len(users)} member(s) in group {self.group_id}")
+        return users
+
+    async def get_calendar_delta(self, client, user_id, delta_link=None, window=None):
+        """
+        Run one calendarView/delta round for a user.
+
+        With delta_link only the events changed since that round come back;
+        without it (initial sync) every event in window does.
+
         Args:
-            minutes_back: How many minutes to look back
-            
+            client: httpx.AsyncClient
+            user_id: User id or UPN
+            delta_link: deltaLink from the previous round, or None for a full sync
+            window: (start, end) datetimes for a full sync
+
         Returns:
-            list: Recently modified events
+            dict: changed (events, event.meeting fields), removed (event ids), delta_link,
+                  pages, bytes, full_sync
+
+        Raises:
+            DeltaTokenExpired: the service no longer knows delta_link (410 Gone)
         """
-        # Get all future events first
-        url = f"{self.graph_endpoint}/users/{self.user_id}/events"
-        
-        response = requests.get(
-            url,
-            headers=self.get_headers(),
-            params={
-                '$filter': f"lastModifiedDateTime ge {(datetime.now(timezone.utc) - timedelta(minutes=minutes_back)).isoformat()}",
-                '$orderby': 'lastModifiedDateTime desc',
-                '$top': 20
-            },
-            timeout=10
-        )
-        
-        if response.status_code != 200:
-            logger.error(f"Failed to get modified events: {response.status_code}")
-            return []
-        
-        events = response.json().get('value', [])
-        logger.info(f"✅ Found {len(events)} recently MODIFIED events")
-        return events
+        if delta_link:
+            url, params = delta_link, None
+        else:
+            start, end = window
+            url = f"{self.graph_endpoint}/users/{user_id}/calendarView/delta"
+            params = {'startDateTime': start.isoformat(), 'endDateTime': end.isoformat()}
+
+        # calendarView/delta takes no $select: bodies come back as text and the
+        # event.meeting projection is applied here instead
+        # An event can come back more than once in a round (changed, then
+        # changed again or removed on a later page); only its last state counts
+        latest, pages, size = {}, 0, 0
+        while True:
+            response = await self.graph_get(client, url, params, projection='event.meeting')
+            if response.status_code == 410 and delta_link:
+                raise DeltaTokenExpired(response.text[:200])
+            if response.status_code != 200:
+                raise Exception(f"calendarView/delta failed for {user_id}: "
+                                f"{response.status_code} - {response.text[:300]}")
+
+            pages += 1
+            size += len(response.content)
+            self.metrics.page(len(response.content))
+            body = response.json()
+            for item in body.get('value', []):
+                latest.pop(item['id'], None)
+                latest[item['id']] = None if '@removed' in item else project('event.meeting', item)
+
+            if '@odata.nextLink' in body:
+                url, params = body['@odata.nextLink'], None
+                continue
+            return {
+                'changed': [event for event in latest.values() if event is not None],
+                'removed': [event_id for event_id, event in latest.items() if event is None],
+                'delta_link': body.get('@odata.deltaLink'),
+                'pages': pages,
+                'bytes': size,
+                'full_sync': not delta_link,
+            }
+
+    async def poll_user(self, client, user_id):
+        """
+        Changes in one user's calendar since the last poll.
+
+        A full resync (every event in the window comes back as changed) happens
+        on the first poll, on 410 Gone, and when the window is about to run out;
+        only events whose content changed since they were last emitted are kept
+        ('fetched' counts what Graph returned). The new deltaLink is returned
+        for commit() rather than saved here.
+        """
+        now = datetime.now(timezone.utc)
+        saved = self.state.get(user_id)
+
+        delta_link = saved.get('delta_link') if saved else None
+        if delta_link and datetime.fromisoformat(saved['window_end']) - now < timedelta(days=DELTA_DAYS_AHEAD / 2):
+            logger.info(f"🔄 Sync window for {user_id} ends {saved['window_end']}, moving it forward")
+            delta_link = None
+
+        result = None
+        if delta_link:
+            try:
+                result = await self.get_calendar_delta(client, user_id, delta_link)
+                window_start, window_end = saved['window_start'], saved['window_end']
+            except DeltaTokenExpired:
+                logger.warning(f"⚠️  deltaLink for {user_id} expired (410 Gone), resyncing")
+
+        if result is None:
+            start = now - timedelta(days=DELTA_DAYS_BACK)
+            end = now + timedelta(days=DELTA_DAYS_AHEAD)
+            result = await self.get_calendar_delta(client, user_id, window=(start, end))
+            window_start, window_end = start.isoformat(), end.isoformat()
+
+        result['fetched'] = len(result['changed']) + len(result['removed'])
+        if self.index is not None:
+            # The index needs every event Graph returned, not only those
+            # change suppression lets through to the sink: after a restart
+            # without an index snapshot the resync is what rebuilds it
+            result['index_changed'], result['index_removed'] = result['changed'], result['removed']
+        if result['fetched']:
+            result['changed'], result['removed'] = await asyncio.to_thread(
+                self.state.filter_changes, user_id, result['changed'], result['removed'])
+
+        result.update(user_id=user_id, window_start=window_start, window_end=window_end)
+        return result
+
+    def commit(self, result):
+        """Keep a polled user's new deltaLink (and event fingerprints) once its changes were handed on"""
+        if result.get('delta_link'):
+            self.state.put(result['user_id'], result['delta_link'], result['window_start'], result['window_end'])
+            if self.scheduler is not None:
+                schedule = self.scheduler.observe(self.state.get_schedule(result['user_id']),
+                                                  result['changed'], result['removed'])
+                self.state.put_schedule(result['user_id'], schedule)
+            if self.index is not None:
+                self.index.apply(result['user_id'], result.get('index_changed', result['changed']),
+                                 result.get('index_removed', result['removed']))
+
+    async def checkpoint(self):
+        """Deliver everything handed to the sink, then persist the committed state"""
+        if self.sink is not None:
+            await self.sink.flush()
+        # Index first: a crash before the state flush only replays changes it already has
+        if self.index is not None and self.index.path is not None:
+            self.index.prune(time.time() - 3600)
+            await asyncio.to_thread(self.index.save)
+        await asyncio.to_thread(self.state.flush)
+
+    async def resolve_users(self, client):
+        """[{'id', 'upn'}] to poll: explicit user_ids, else the group, else USER_EMAIL"""
+        if self.user_ids:
+            return [{'id': u, 'upn': u} for u in self.user_ids]
+        if self.group_id:
+            return await self.get_group_members(client)
+        return [{'id': self.user_id, 'upn': self.user_id}]
+
+    async def iter_changes(self, deadline=None):
+        """
+        Poll every user concurrently and yield each user's result as it completes.
+
+        Results carry user_id and upn, plus 'error' instead of changes when
+        that user's poll failed. Users not started before deadline (a
+        time.monotonic() value) are left for the next sweep. A user's deltaLink
+        is committed once the caller resumes the iteration after its result.
+        """
+        self.limiter = RateLimiter(self.max_rps)
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+            users = await self.resolve_users(client)
+            await asyncio.to_thread(self.state.load_users, [u['id'] for u in users])
+            if self.scheduler is not None:
+                # Due users only, most overdue first
+                by_id = {u['id']: u for u in users}
+                self.plan = self.scheduler.plan({u: self.state.get_schedule(u) for u in by_id})
+                users = [by_id[u] for u in self.plan['due']]
+                logger.info(f"📅 {len(users)}/{len(by_id)} mailbox(es) due, {len(self.plan['urgent'])} with a "
+                            f"meeting about to start, ~{self.plan['requests_per_hour']:.0f} requests/hour")
+            else:
+                # Least recently polled first, so a sweep cut short by the deadline stays fair
+                users.sort(key=lambda u: self.state.last_synced(u['id']))
+            slots = asyncio.Semaphore(self.concurrency)
+
+            async def poll(user):
+                async with slots:
+                    if deadline is not None and time.monotonic() > deadline:
+                        return {'user_id': user['id'], 'upn': user['upn'], 'skipped': True}
+                    try:
+                        result = await self.poll_user(client, user['id'])
+                    except Exception as e:
+                        logger.error(f"❌ {user['upn']}: {e}")
+                        return {'user_id': user['id'], 'upn': user['upn'], 'error': str(e)}
+                    result['upn'] = user['upn']
+                    return result
+
+            done = 0
+            tasks = [asyncio.ensure_future(poll(u)) for u in users]
+            try:
+                for next_result in asyncio.as_completed(tasks):
+                    result = await next_result
+                    yield result
+                    self.commit(result)
+                    done += 1
+                    if done % 500 == 0:
+                        await self.checkpoint()
+                        logger.info(f"   ... {done}/{len(users)} mailboxes polled")
+            finally:
+                # Sweep aborted (e.g. the sink failed): stop polling the rest
+                for task in tasks:
+                    task.cancel()
+        await self.checkpoint()
+
+    async def sweep(self, deadline=None):
+        """
+        One pass over all users, handing each user's changes to the sink (if any).
+
+        Returns:
+            dict: changes ([{'user_id', 'upn', 'type': 'changed'|'removed', 'event' | 'id'}]),
+                  users, polled, skipped, errors, pages, bytes, full_syncs, unchanged, seconds,
+                  detection_lag (seconds from lastModifiedDateTime to poll: p50, p95 as
+                  histogram bucket bounds, max), events_per_second, metrics (poller_metrics
+                  snapshot), schedule (members, due, urgent, requests_per_hour, floor) when adaptive
+        """
+        started = time.monotonic()
+        summary = {'changes': [], 'users': 0, 'polled': 0, 'skipped': 0, 'errors': 0, 'pages': 0,
+                   'bytes': 0, 'full_syncs': 0, 'unchanged': 0}
+        metrics = self.metrics
+        async for result in self.iter_changes(deadline):
+            summary['users'] += 1
+            if result.get('skipped'):
+                summary['skipped'] += 1
+                continue
+            if 'error' in result:
+                summary['errors'] += 1
+                metrics.user(error=True)
+                continue
+            summary['polled'] += 1
+            summary['pages'] += result['pages']
+            summary['bytes'] += result['bytes']
+            summary['full_syncs'] += result['full_sync']
+            unchanged = result['fetched'] - len(result['changed']) - len(result['removed'])
+            summary['unchanged'] += unchanged
+            metrics.user(len(result['changed']), len(result['removed']), unchanged)
+            polled_at = datetime.now(timezone.utc)
+            user = {'user_id': result['user_id'], 'upn': result['upn'], 'polled_at': polled_at.isoformat()}
+            if not result['full_sync']:
+                polled_ts = polled_at.timestamp()
+                for e in result['changed']:
+                    modified = graph_timestamp(e.get('lastModifiedDateTime'))
+                    if modified is not None:
+                        metrics.lag(polled_ts - modified)
+            changes = ([{**user, 'type': 'changed', 'event': e} for e in result['changed']] +
+                       [{**user, 'type': 'removed', 'id': i} for i in result['removed']])
+            if changes and self.sink is not None:
+                await self.sink.add([change_record(c) for c in changes])
+            summary['changes'].extend(changes)
+
+        summary['seconds'] = round(time.monotonic() - started, 2)
+        lag = metrics.histograms['detection_lag_seconds']
+        summary['detection_lag'] = {'p50': lag.quantile(0.5), 'p95': lag.quantile(0.95),
+                                    'max': round(lag.max, 1) if lag.count else None}
+        summary['events_per_second'] = round(metrics.events_per_second(), 2)
+        summary['metrics'] = metrics.snapshot()
+        if self.plan is not None:
+            summary['schedule'] = {'members': len(self.plan['intervals']), 'due': len(self.plan['due']),
+                                   'urgent': len(self.plan['urgent']),
+                                   'requests_per_hour': self.plan['requests_per_hour'],
+                                   'floor': self.plan['floor']}
+        logger.info(f"✅ {summary['polled']}/{summary['users']} mailbox(es) in {summary['seconds']}s: "
+                    f"{len(summary['changes'])} change(s) ({summary['unchanged']} unchanged skipped), "
+                    f"{summary['pages']} page(s) ({summary['bytes'] / 1024:.0f} KB), "
+                    f"{summary['full_syncs']} full sync(s), {summary['errors']} error(s), "
+                    f"{summary['skipped']} left for next run")
+        return summary
+
+
+def change_record(change):
+    """Record sent to the sink: the change with its event (event.meeting fields, no OData annotations)"""
+    record = {'type': change['type'], 'userId': change['user_id'], 'upn': change['upn'],
+              'polledAt': change.get('polled_at')}
+    if change['type'] == 'removed':
+        record['id'] = change['id']
+        return record
+    event = change['event']
+    record['id'] = event.get('id')
+    record['event'] = {k: v for k, v in event.items() if not k.startswith('@')}
+    return record
+
+
+def summarize_change(change):
+    """Compact form of a change for the Lambda response"""
+    if change['type'] == 'removed':
+        return {'user': change['upn'], 'type': 'removed', 'id': change['id']}
+    e = change['event']
+    return {
+        'user': change['upn'],
+        'type': 'changed',
+        'id': e.get('id'),
+        'subject': e.get('subject'),
+        'modified': e.get('lastModifiedDateTime'),
+        'start': e.get('start', {}).get('dateTime'),
+        'isOnlineMeeting': e.get('isOnlineMeeting', False),
+        'onlineMeetingUrl': e.get('onlineMeetingUrl')
+    }
+
+
+async def run_sweep(poller, deadline=None):
+    """sweep(), then release the sink's connections and emit the metrics (POLLER_METRICS)"""
+    try:
+        return await poller.sweep(deadline)
+    finally:
+        if poller.sink is not None:
+            await poller.sink.close()
+        emit_metrics(poller.metrics)
+
 
 def lambda_handler(event, context):
     """
     AWS Lambda handler for polling Graph API calendar changes
     """
-    poller = GraphCalendarPoller()
+    poller = GraphCalendarPoller(sink=open_sink())
     
     try:
-        # Get recently modified events (more reliable than calendarview)
-        events = poller.get_recently_modified_events(minutes_back=15)
+        deadline = None
+        if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+            deadline = time.monotonic() + context.get_remaining_time_in_millis() / 1000 - DEADLINE_MARGIN_SECONDS
+        
+        # Only events changed since each user's last poll (deltaLink), deletions included
+        summary = asyncio.run(run_sweep(poller, deadline))
+        changes = summary.pop('changes')
+        if poller.sink is not None:
+            summary['sink'] = {'target': poller.sink.describe(), **poller.sink.stats}
         
-        if not events:
+        if not changes:
             logger.info("No recent changes detected")
             return {
                 'statusCode': 200,
-                'body': json.dumps({'message': 'No changes', 'events_checked': 0})
+                'body': json.dumps({'message': 'No changes', 'events_checked': 0, **summary})
             }
         
-        logger.info(f"📝 Processing {len(events)} events...")
-        
-        # TODO: Send events to Event Hub for downstream processing
-        # For now, just return the events
+        # Already delivered batch by batch during the sweep; the response only lists them
+        if poller.sink is not None:
+            logger.info(f"📤 Sent {len(changes)} change(s) to {poller.sink.describe()}")
         return {
             'statusCode': 200,
             'body': json.dumps({
-                'message': 'Events polled successfully',
-                'events': [
-                    {
-                        'id': e.get('id'),
-                        'subject': e.get('subject'),
-                        'modified': e.get('lastModifiedDateTime'),
-                        'start': e.get('start', {}).get('dateTime'),
-                        'isOnlineMeeting': e.get('isOnlineMeeting', False),
-                        'onlineMeetingUrl': e.get('onlineMeetingUrl')
-                    }
-                    for e in events
-                ]
+                'message': 'Events sent' if poller.sink is not None else 'Events polled successfully',
+                **summary,
+                'truncated': len(changes) > MAX_RETURNED_EVENTS,
+                'events': [summarize_change(c) for c in changes[:MAX_RETURNED_EVENTS]]
             })
         }
     
@@ -178,12 +598,24 @@ def lambda_handler(event, context):
 if __name__ == '__main__':
     # Test locally
     logging.basicConfig(level=logging.INFO)
-    poller = GraphCalendarPoller()
+    poller = GraphCalendarPoller(sink=open_sink(), index=MeetingIndex(DEFAULT_INDEX).load())
     
-    print("\n🔍 Polling recent calendar changes...")
-    events = poller.get_recently_modified_events(minutes_back=120)
+    print("\n🔍 Polling calendar changes since the last run...")
+    summary = asyncio.run(run_sweep(poller))
+    changes = summary['changes']
+    print(f"   {len(changes)} change(s) across {summary['polled']} mailbox(es), "
+          f"{summary['full_syncs']} full sync(s)")
     
-    for event in events[:5]:
-        print(f"\n  📅 {event.get('subject')}")
+    for change in changes[:5]:
+        if change['type'] == 'removed':
+            print(f"\n  🗑️  Removed from {change['upn']}: {change['id'][:40]}...")
+            continue
+        event = change['event']
+        print(f"\n  📅 {event.get('subject')} ({change['upn']})")
         print(f"     Modified: {event.get('lastModifiedDateTime')}")
         print(f"     ID: {event.get('id')[:40]}...")
+
+    upcoming = poller.index.starting_within(time.time(), 15 * 60)
+    print(f"\n⏰ {len(upcoming)} online meeting(s) starting in the next 15 min ({len(poller.index)} indexed)")
+    for meeting in upcoming:
+        print(f"  {meeting.subject} ({meeting.user_id})")
@@ -0,0 +1,118 @@
+"""
+JSON Batching Helper for Microsoft Graph
+Groups individual requests into $batch envelopes (max 20 per batch)
+and sends the batches concurrently with one token and connection pool
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from auth_helper import get_graph_headers
+
+BATCH_URL = "https://graph.microsoft.com/v1.0/$batch"
+MAX_BATCH_SIZE = 20  # Graph limit per $batch request
+
+
+def chunked(items, size=MAX_BATCH_SIZE):
+    """Split a list into consecutive chunks of at most size items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def make_session(pool_size=8):
+    """requests.Session with a connection pool sized for concurrent batches"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+
+def build_request(request_id, method, url, body=None):
+    """
+    One item of a $batch envelope.
+
+    url is relative to the API version root, e.g. "/subscriptions/{id}".
+    """
+    item = {"id": str(request_id), "method": method, "url": url}
+    if body is not None:
+        item["body"] = body
+        item["headers"] = {"Content-Type": "application/json"}
+    return item
+
+
+def _retry_after(responses):
+    """Longest Retry-After (seconds) among throttled batch items"""
+    waits = [
+        int(r.get("headers", {}).get("Retry-After", 1))
+        for r in responses if r.get("status") == 429
+    ]
+    return max(waits) if waits else 0
+
+
+def send_batch(batch, headers, session=None, max_retries=3):
+    """
+    POST one $batch envelope and return {id: response} for its items.
+
+    Items answered with 429 are resent (after Retry-After) up to max_retries
+    times; whatever is still throttled is returned with status 429.
+    """
+    session = session or requests
+    pending = {item["id"]: item for item in batch}
+    results = {}
+
+    for attempt in range(max_retries + 1):
+        response = session.post(BATCH_URL, headers=headers, json={"requests": list(pending.values())}, timeout=60)
+
+        if response.status_code == 429 or response.status_code >= 500:
+            # Whole envelope rejected; treat every item the same way
+            wait = int(response.headers.get("Retry-After", 2 ** attempt))
+            item_responses = [{"id": i, "status": response.status_code, "headers": {"Retry-After": wait}}
+                              for i in pending]
+        elif response.status_code != 200:
+            return {**results, **{i: {"id": i, "status": response.status_code, "body": response.text[:500]}
+                                  for i in pending}}
+        else:
+            item_responses = response.json().get("responses", [])
+
+        throttled = []
+        for item in item_responses:
+            if item.get("status") == 429 and attempt < max_retries:
+                throttled.append(item)
+            else:
+                results[item["id"]] = item
+                pending.pop(item["id"], None)
+
+        if not throttled:
+            break
+
+        time.sleep(_retry_after(throttled))
+
+    for request_id in pending:
+        results.setdefault(request_id, {"id": request_id, "status": 429})
+
+    return results
+
+
+def execute_batches(requests_list, headers=None, concurrency=4, batch_size=MAX_BATCH_SIZE):
+    """
+    Send many Graph requests as $batch envelopes with bounded concurrency.
+
+    Args:
+        requests_list: items from build_request() (ids must be unique)
+        headers: Graph headers (one token is reused for every batch)
+        concurrency: number of $batch requests in flight
+
+    Returns:
+        dict of request id -> {"id", "status", "headers", "body"}
+    """
+    headers = headers or get_graph_headers()
+    batches = chunked(requests_list, batch_size)
+    session = make_session(concurrency)
+    results = {}
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for batch_results in executor.map(lambda b: send_batch(b, headers, session), batches):
+            results.update(batch_results)
+
+    return results
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Graph Field Projections
+
+Named field sets for Graph reads, so scripts ask only for what they print
+or process instead of full entities (event bodies, attendee lists, HTML).
+
+    select_params('event.summary', {'$top': 20})
+        -> {'$top': 20, '$select': 'id,subject,start,end,...'}
+
+Some endpoints ignore or reject $select (calendarView/delta, /subscriptions);
+their projections are applied client-side with project(), and events can
+still have their body returned as text instead of HTML (prefer_headers()).
+
+Usage:
+    python scripts/graph/graph_projections.py list
+    python scripts/graph/graph_projections.py measure --days 7 --runs 3
+"""
+import argparse
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+PROJECTIONS = {
+    # What listing scripts print
+    'event.summary': {
+        'select': ('id', 'subject', 'start', 'end', 'isCancelled', 'isOnlineMeeting', 'onlineMeeting',
+                   'createdDateTime', 'lastModifiedDateTime'),
+    },
+    # What the calendar poller, its state store and scheduler use
+    'event.meeting': {
+        'select': ('id', 'changeKey', 'subject', 'start', 'end', 'isAllDay', 'isCancelled', 'isOnlineMeeting',
+                   'onlineMeetingProvider', 'onlineMeeting', 'onlineMeetingUrl', 'location', 'organizer',
+                   'attendees', 'recurrence', 'type', 'seriesMasterId', 'showAs', 'sensitivity',
+                   'lastModifiedDateTime'),
+        'prefer': ('outlook.body-content-type="text"',),
+    },
+    # Series masters cached by recurrence.py, with their moved/edited occurrences
+    'event.series': {
+        'select': ('id', 'changeKey', 'subject', 'start', 'end', 'isAllDay', 'isCancelled', 'isOnlineMeeting',
+                   'onlineMeeting', 'onlineMeetingProvider', 'organizer', 'location', 'showAs', 'type',
+                   'originalStartTimeZone', 'recurrence', 'cancelledOccurrences'),
+        'expand': {'exceptionOccurrences': 'event.exception'},
+    },
+    'event.exception': {
+        'select': ('id', 'changeKey', 'subject', 'start', 'end', 'isAllDay', 'isCancelled', 'isOnlineMeeting',
+                   'onlineMeeting', 'onlineMeetingProvider', 'organizer', 'location', 'showAs', 'type',
+                   'seriesMasterId', 'originalStart'),
+    },
+    'member.identity': {
+        'select': ('id', 'displayName', 'mail', 'userPrincipalName'),
+    },
+    'group.members': {
+        'select': ('id', 'displayName'),
+        'expand': {'members': 'member.identity'},
+    },
+    # GET /subscriptions supports no query options; client-side only
+    'subscription.summary': {
+        'select': ('id', 'resource', 'notificationUrl', 'changeType', 'expirationDateTime'),
+        'server_select': False,
+    },
+}
+
+
+def projection(name):
+    try:
+        return PROJECTIONS[name]
+    except KeyError:
+        raise ValueError(f"Unknown projection: {name} (known: {', '.join(sorted(PROJECTIONS))})")
+
+
+def select_clause(name):
+    """'$select=...;$expand=...' body of a projection, as used inside $expand"""
+    spec = projection(name)
+    parts = [f"$select={','.join(spec['select'])}"]
+    if spec.get('expand'):
+        parts.append(f"$expand={expand_value(spec['expand'])}")
+    return ';'.join(parts)
+
+
+def expand_value(expand):
+    return ','.join(f"{nav}({select_clause(inner)})" for nav, inner in expand.items())
+
+
+def select_params(name, params=None):
+    """Query parameters with the projection's $select/$expand merged in"""
+    spec = projection(name)
+    params = dict(params or {})
+    if spec.get('server_select', True):
+        params['$select'] = ','.join(spec['select'])
+        if spec.get('expand'):
+            params['$expand'] = expand_value(spec['expand'])
+    return params
+
+
+def prefer_headers(name, headers=None):
+    """Headers with the projection's Prefer values added (e.g. text instead of HTML bodies)"""
+    headers = dict(headers or {})
+    prefer = projection(name).get('prefer')
+    if prefer:
+        headers['Prefer'] = ', '.join(filter(None, [headers.get('Prefer'), *prefer]))
+    return headers
+
+
+def project(name, entity):
+    """Client-side projection for endpoints that ignore $select (OData annotations kept)"""
+    fields = projection(name)['select']
+    return {k: v for k, v in entity.items() if k in fields or k.startswith('@')}
+
+
+def measure(user, days, runs, headers):
+    """Bytes and median latency of a calendarView page, full vs event.summary / event.meeting"""
+    now = datetime.now(timezone.utc)
+    url = f"https://graph.microsoft.com/v1.0/users/{user}/calendarView"
+    base = {'startDateTime': (now - timedelta(days=days)).isoformat(),
+            'endDateTime': (now + timedelta(days=days)).isoformat(), '$top': 100}
+    variants = [
+        ('full', base, headers),
+        ('event.summary', select_params('event.summary', base), headers),
+        ('event.meeting', select_params('event.meeting', base), prefer_headers('event.meeting', headers)),
+    ]
+    results = []
+    for name, params, variant_headers in variants:
+        sizes, latencies, events = [], [], 0
+        for _ in range(runs):
+            started = time.perf_counter()
+            response = requests.get(url, headers=variant_headers, params=params, timeout=30)
+            latencies.append((time.perf_counter() - started) * 1000)
+            response.raise_for_status()
+            sizes.append(len(response.content))
+            events = len(response.json().get('value', []))
+        results.append({'name': name, 'events': events, 'bytes': statistics.median(sizes),
+                        'ms': statistics.median(latencies)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Graph field projections")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("list", help="Show the registered projections")
+    measure_parser = subparsers.add_parser("measure", help="Payload bytes and latency saved on calendarView")
+    measure_parser.add_argument("--user", default=None, help="Mailbox (default USER_EMAIL)")
+    measure_parser.add_argument("--days", type=int, default=7, help="Days before and after now")
+    measure_parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for name in sorted(PROJECTIONS):
+            params = select_params(name)
+            print(f"🔎 {name}")
+            print(f"   {'&'.join(f'{k}={v}' for k, v in params.items()) or '(client-side only)'}")
+        return 0
+    if args.command != "measure":
+        parser.print_help()
+        return 1
+
+    from auth_helper import get_config, get_graph_headers
+
+    user = args.user or get_config()['user_email']
+    print(f"📏 calendarView for {user}, ±{args.days} day(s), median of {args.runs} run(s)")
+    results = measure(user, args.days, args.runs, get_graph_headers())
+    full = results[0]
+    print(f"\n   {'projection':<15} {'events':>6} {'bytes':>10} {'saved':>7} {'latency':>9}")
+    for r in results:
+        saved = 1 - r['bytes'] / full['bytes'] if full['bytes'] else 0
+        print(f"   {r['name']:<15} {r['events']:>6} {r['bytes']:>10.0f} {saved:>6.0%} {r['ms']:>7.0f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Latency Report Helpers
+Shared latency/status bookkeeping for the webhook replay and load-test tools
+"""
+import math
+from collections import Counter
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2000, 3000, 5000, 10000)
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list (None if empty)"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class LatencyRecorder:
+    """Collects per-request latency, HTTP status and error counts"""
+
+    def __init__(self, ok_statuses=(200, 202)):
+        self.ok_statuses = set(ok_statuses)
+        self.latencies_ms = []
+        self.statuses = Counter()
+        self.errors = Counter()
+        self._sorted = None
+
+    def record(self, latency_ms, status=None, error=None):
+        """Record one request; status is None when it failed without a response"""
+        self.latencies_ms.append(latency_ms)
+        self._sorted = None
+        if error is not None:
+            self.errors[error] += 1
+        else:
+            self.statuses[status] += 1
+
+    @classmethod
+    def merged(cls, *recorders):
+        """One recorder holding the samples of all the given recorders"""
+        total = cls(recorders[0].ok_statuses if recorders else (200, 202))
+        for recorder in recorders:
+            total.latencies_ms.extend(recorder.latencies_ms)
+            total.statuses.update(recorder.statuses)
+            total.errors.update(recorder.errors)
+        return total
+
+    @property
+    def count(self):
+        return len(self.latencies_ms)
+
+    @property
+    def ok(self):
+        return sum(n for status, n in self.statuses.items() if status in self.ok_statuses)
+
+    def percentile(self, p):
+        if self._sorted is None:
+            self._sorted = sorted(self.latencies_ms)
+        return percentile(self._sorted, p)
+
+    def histogram(self):
+        """[(label, count)] over BUCKETS_MS"""
+        counts = [0] * (len(BUCKETS_MS) + 1)
+        for latency in self.latencies_ms:
+            for i, bound in enumerate(BUCKETS_MS):
+                if latency <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+
+        labels = [f"<= {bound} ms" for bound in BUCKETS_MS] + [f"> {BUCKETS_MS[-1]} ms"]
+        return list(zip(labels, counts))
+
+    def summary(self):
+        """Machine-readable summary"""
+        count = self.count
+        return {
+            'requests': count,
+            'ok': self.ok,
+            'error_rate': round((count - self.ok) / count, 4) if count else 0.0,
+            'latency_ms': {
+                'p50': _round(self.percentile(50)),
+                'p95': _round(self.percentile(95)),
+                'p99': _round(self.percentile(99)),
+                'max': _round(max(self.latencies_ms)) if count else None,
+                'mean': _round(sum(self.latencies_ms) / count) if count else None,
+            },
+            'statuses': {str(status): n for status, n in sorted(self.statuses.items())},
+            'errors': dict(self.errors),
+        }
+
+    def print_report(self, title="Results"):
+        summary = self.summary()
+        latency = summary['latency_ms']
+
+        print(f"\n📊 {title}")
+        print(f"   Requests: {summary['requests']}   OK: {summary['ok']}   "
+              f"Error rate: {summary['error_rate'] * 100:.2f}%")
+        if self.count:
+            print(f"   Latency: p50 {latency['p50']} ms | p95 {latency['p95']} ms | "
+                  f"p99 {latency['p99']} ms | max {latency['max']} ms")
+
+        print("\n   Status codes:")
+        for status, n in summary['statuses'].items():
+            print(f"     {status}: {n}")
+        for error, n in summary['errors'].items():
+            print(f"     ❌ {error}: {n}")
+
+        histogram = self.histogram()
+        widest = max((n for _, n in histogram), default=0) or 1
+        print("\n   Latency histogram:")
+        for label, n in histogram:
+            if n:
+                print(f"     {label:>12} | {'█' * max(1, round(40 * n / widest)):<40} {n}")
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
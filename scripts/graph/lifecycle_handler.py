@@ -0,0 +1,329 @@
+"""
+Lifecycle Notification Handler for Microsoft Graph subscriptions
+
+Reacts in-line to Graph lifecycle notifications instead of waiting for the
+daily renewal sweep:
+
+- reauthorizationRequired -> POST /subscriptions/{id}/reauthorize
+- subscriptionRemoved     -> recreate from the tracker's stored definition
+- missed                  -> resync of the subscribed resource, fed back into the
+                             normal processing paths: calendar resources make the
+                             user due for the calendar poller (its saved deltaLink
+                             returns what was missed); transcript resources are
+                             delta-queried (from the deltaLink the last resync kept)
+                             and come back as change notifications for the
+                             transcript processor
+"""
+import re
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+from auth_helper import get_graph_headers, get_config
+
+GRAPH_ENDPOINT = "https://graph.microsoft.com/v1.0"
+
+LIFECYCLE_EVENTS = ('reauthorizationRequired', 'subscriptionRemoved', 'missed')
+
+# Without a saved deltaLink a transcript delta returns every transcript ever
+# made; only those this recent are treated as possibly missed
+RESYNC_LOOKBACK = timedelta(hours=24)
+
+# users/{id}/events, users/{id}/calendar/events, /users/{id}/calendars/{cal}/events
+_EVENTS_RESOURCE = re.compile(r"^/?users/([^/]+)/(?:calendar/|calendars/[^/]+/)?events$", re.IGNORECASE)
+
+
+def is_lifecycle_notification(notification):
+    """True if a notification item is a lifecycle event rather than a change"""
+    return bool(notification.get('lifecycleEvent'))
+
+
+def reauthorize_subscription(subscription_id, headers=None):
+    """Reauthorize a subscription so Graph keeps delivering notifications"""
+    headers = headers or get_graph_headers()
+    response = requests.post(
+        f"{GRAPH_ENDPOINT}/subscriptions/{subscription_id}/reauthorize",
+        headers=headers,
+        timeout=30
+    )
+
+    if response.status_code in (200, 204):
+        print(f"   ✅ Reauthorized subscription {subscription_id}")
+        return True
+
+    print(f"   ❌ Reauthorize failed: {response.status_code} {response.text[:200]}")
+    return False
+
+
+def recreate_subscription(subscription_id, tracker, headers=None, config=None, expiration_hours=24):
+    """
+    Recreate a removed subscription from its tracker row.
+
+    The old row is marked inactive and the new subscription is saved so the
+    renewal Lambda picks it up. Returns the new Graph subscription or None.
+    """
+    if tracker is None:
+        print("   ❌ Cannot recreate: subscription tracker unavailable")
+        return None
+
+    definition = tracker.get_subscription(subscription_id)
+    if not definition:
+        print(f"   ❌ Cannot recreate: {subscription_id} is not in the tracker")
+        return None
+
+    config = config or get_config()
+    notification_url = definition.get('notification_url') or config['webhook_url']
+    if not notification_url:
+        print("   ❌ Cannot recreate: no notification URL stored or configured")
+        return None
+
+    headers = headers or get_graph_headers()
+    expiration = datetime.now(timezone.utc) + timedelta(hours=expiration_hours)
+
+    payload = {
+        "changeType": definition.get('change_types', 'created'),
+        "notificationUrl": notification_url,
+        "resource": definition['resource'],
+        "expirationDateTime": expiration.strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+        "clientState": (config.get('webhook_secret') or 'default-client-state')[:255]
+    }
+    if definition.get('lifecycle_notification_url'):
+        payload["lifecycleNotificationUrl"] = definition['lifecycle_notification_url']
+
+    response = requests.post(f"{GRAPH_ENDPOINT}/subscriptions", headers=headers, json=payload, timeout=30)
+
+    if response.status_code != 201:
+        print(f"   ❌ Recreate failed: {response.status_code} {response.text[:200]}")
+        return None
+
+    subscription = response.json()
+    tracker.delete_subscription(subscription_id, definition['created_at'])
+    tracker.save_subscription(
+        subscription['id'],
+        subscription['resource'],
+        subscription['expirationDateTime'],
+        definition.get('type', 'other'),
+        subscription['changeType'],
+        notification_url,
+        definition.get('lifecycle_notification_url')
+    )
+    print(f"   ✅ Recreated {subscription_id} as {subscription['id']}")
+    return subscription
+
+
+def delta_url_for_resource(resource):
+    """
+    Map a subscription resource to the delta query that covers it.
+
+    Returns None when Graph has no delta query for the resource (calendar
+    resources are resynced by the calendar poller instead).
+    """
+    resource = resource.strip('/')
+    if 'getAllTranscripts' in resource or 'getAllRecordings' in resource:
+        return f"{GRAPH_ENDPOINT}/{resource}/delta"
+    return None
+
+
+def delta_resync(resource, headers=None, delta_link=None):
+    """
+    Run a delta query over a resource to recover missed notifications.
+
+    Starts from delta_link (the one the previous resync ended with) when given.
+    Returns (items, delta_link); items is None if the resource has no delta
+    or the query failed.
+    """
+    url = delta_link or delta_url_for_resource(resource)
+    if not url:
+        print(f"   ⚠️  No delta query for resource {resource}; manual resync required")
+        return None, None
+
+    headers = headers or get_graph_headers()
+    items = []
+    delta_link = None
+
+    while url:
+        response = requests.get(url, headers=headers, timeout=30)
+        if response.status_code == 410 and delta_link:
+            print("   ⚠️  Saved deltaLink expired, resyncing from scratch")
+            return delta_resync(resource, headers)
+        if response.status_code != 200:
+            print(f"   ❌ Delta resync failed: {response.status_code} {response.text[:200]}")
+            return None, None
+        data = response.json()
+        items.extend(data.get('value', []))
+        url = data.get('@odata.nextLink')
+        delta_link = data.get('@odata.deltaLink', delta_link)
+
+    print(f"   🔁 Resynced {len(items)} item(s) from {resource}")
+    return items, delta_link
+
+
+def transcript_notifications(subscription_id, items, since=None):
+    """
+    Change notifications for transcripts returned by a delta resync, shaped
+    like the ones Graph delivers (so parsing, de-duplication and fetching
+    are the same). since drops transcripts created before it.
+    """
+    notifications = []
+    for item in items:
+        if '@removed' in item or not item.get('id') or not item.get('meetingId'):
+            continue
+        organizer = ((item.get('meetingOrganizer') or {}).get('user') or {}).get('id')
+        created = item.get('createdDateTime')
+        if not organizer or (since and created and
+                             datetime.fromisoformat(created.replace('Z', '+00:00')) < since):
+            continue
+        notifications.append({
+            'subscriptionId': subscription_id,
+            'changeType': 'created',
+            'resource': f"users/{organizer}/onlineMeetings/{item['meetingId']}/transcripts/{item['id']}",
+            'resourceData': {'id': item['id']},
+        })
+    return notifications
+
+
+def request_calendar_poll(user_id, state=None):
+    """Make the calendar poller poll a user on its next run, whatever its schedule"""
+    from poller_state import open_poller_state
+
+    state = state or open_poller_state()
+    state.load_users([user_id])
+    state.put_schedule(user_id, {**(state.get_schedule(user_id) or {}), 'polled': 0})
+    state.flush()
+    print(f"   📅 Calendar poller will resync {user_id} on its next run")
+
+
+def resync_resource(subscription_id, resource, headers=None, delta_link=None, state=None):
+    """
+    Recover what a 'missed' lifecycle event lost, through the normal processing paths.
+
+    Returns:
+        dict: ok, notifications (change notifications to process like
+              delivered ones), delta_link (to keep for the next resync)
+    """
+    match = _EVENTS_RESOURCE.match(resource.strip('/'))
+    if match:
+        request_calendar_poll(match.group(1), state)
+        return {'ok': True, 'notifications': [], 'delta_link': None}
+
+    since = None if delta_link else datetime.now(timezone.utc) - RESYNC_LOOKBACK
+    items, new_link = delta_resync(resource, headers, delta_link)
+    if items is None:
+        return {'ok': False, 'notifications': [], 'delta_link': None}
+    return {'ok': True, 'notifications': transcript_notifications(subscription_id, items, since),
+            'delta_link': new_link}
+
+
+def resync_flagged(tracker, headers=None):
+    """
+    resync_resource() for every subscription the renewal Lambda flagged after
+    a 'missed' event. Call finish_resync() for each result once its
+    notifications were processed.
+    """
+    if tracker is None:
+        print("   ❌ Cannot resync flagged subscriptions: subscription tracker unavailable")
+        return []
+
+    headers = headers or get_graph_headers()
+    results = []
+    for item in tracker.find_resync_requested():
+        subscription_id = item['subscription_id']
+        print(f"\n♻️  Resync requested {item['resync_requested']} for subscription {subscription_id}")
+        result = {'event': 'missed', 'action': 'resync', 'subscription_id': subscription_id,
+                  'created_at': item['created_at'], 'requested': item['resync_requested'],
+                  'resource': item['resource']}
+        result.update(resync_resource(subscription_id, item['resource'], headers, item.get('resync_delta_link')))
+        results.append(result)
+    return results
+
+
+def finish_resync(tracker, result):
+    """Keep a processed resync's deltaLink and clear the Lambda's flag (if it set one)"""
+    if tracker is None or not result.get('created_at'):
+        return False
+    return tracker.finish_resync(result['subscription_id'], result['created_at'],
+                                 result.get('delta_link'), result.get('requested'))
+
+
+def handle_lifecycle_notification(notification, tracker=None, headers=None, config=None, resync=None):
+    """
+    Act on one lifecycle notification.
+
+    Args:
+        notification: Graph notification item with a lifecycleEvent
+        tracker: SubscriptionTracker (needed for recreate and resource lookup)
+        resync: Optional callable(subscription_id, resource) -> dict like
+                resync_resource(), used for 'missed'; defaults to resync_resource
+
+    Returns:
+        dict describing the action taken
+    """
+    config = config or get_config()
+    event = notification.get('lifecycleEvent')
+    subscription_id = notification.get('subscriptionId', '')
+    result = {'event': event, 'subscription_id': subscription_id, 'ok': False}
+
+    print(f"\n♻️  Lifecycle event '{event}' for subscription {subscription_id}")
+
+    # Same clientState the subscriptions were created with (recreate_subscription, plan-subscriptions)
+    expected_state = (config.get('webhook_secret') or 'default-client-state')[:255]
+    if notification.get('clientState') != expected_state:
+        print("   ❌ clientState mismatch; ignoring lifecycle notification")
+        result['action'] = 'rejected'
+        return result
+
+    headers = headers or get_graph_headers()
+
+    if event == 'reauthorizationRequired':
+        result['action'] = 'reauthorize'
+        result['ok'] = reauthorize_subscription(subscription_id, headers)
+
+    elif event == 'subscriptionRemoved':
+        result['action'] = 'recreate'
+        subscription = recreate_subscription(subscription_id, tracker, headers, config)
+        result['ok'] = subscription is not None
+        if subscription:
+            result['new_subscription_id'] = subscription['id']
+
+    elif event == 'missed':
+        result['action'] = 'resync'
+        resource = notification.get('resource')
+        definition = tracker.get_subscription(subscription_id) if tracker is not None else None
+        if definition:
+            resource = resource or definition.get('resource')
+            result['created_at'] = definition['created_at']
+        if not resource:
+            response = requests.get(f"{GRAPH_ENDPOINT}/subscriptions/{subscription_id}", headers=headers, timeout=10)
+            if response.status_code == 200:
+                resource = response.json().get('resource')
+        if not resource:
+            print("   ❌ Cannot resync: resource unknown")
+            return result
+
+        if resync is not None:
+            outcome = resync(subscription_id, resource)
+        else:
+            delta_link = definition.get('resync_delta_link') if definition else None
+            outcome = resync_resource(subscription_id, resource, headers, delta_link)
+        result.update(outcome, resource=resource)
+
+    else:
+        print(f"   ⚠️  Unknown lifecycle event: {event}")
+        result['action'] = 'ignored'
+
+    return result
+
+
+def handle_lifecycle_notifications(payload, tracker=None, resync=None):
+    """Handle every lifecycle item in a notification payload ({'value': [...]} or single item)"""
+    notifications = payload.get('value', [payload]) if isinstance(payload, dict) else payload
+    lifecycle = [n for n in notifications if is_lifecycle_notification(n)]
+    if not lifecycle:
+        return []
+
+    headers = get_graph_headers()
+    config = get_config()
+    return [
+        handle_lifecycle_notification(n, tracker=tracker, headers=headers, config=config, resync=resync)
+        for n in lifecycle
+    ]
@@ -8,6 +8,7 @@ from datetime import datetime, timedelta, timezone
 
 sys.path.append("scripts/graph")
 from auth_helper import get_graph_headers
+from graph_projections import select_params
 
 
 def list_calendar_events():
@@ -26,12 +27,11 @@ def list_calendar_events():
     response = requests.get(
         'https://graph.microsoft.com/v1.0/users/boldoriole@ibuyspy.net/events',
         headers=headers,
-        params={
+        params=select_params('event.summary', {
             '$filter': filter_query,
             '$top': 10,
-            '$select': 'id,subject,start,end,createdDateTime,lastModifiedDateTime',
             '$orderby': 'createdDateTime desc'
-        },
+        }),
         timeout=30
     )
     
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Webhook Endpoint Load Test
+
+Ramps concurrency against the notification endpoint with the same requests
+06-test-webhook.py sends (validation-token GETs and notification POSTs) and
+reports p50/p95/p99, error rates and the concurrency at which p99 exceeds
+Graph's ~3 second response deadline.
+
+Each stage runs `concurrency` workers back to back for --stage-seconds; the
+ramp stops early once the deadline or the error budget is blown.
+
+Usage:
+    python scripts/graph/load-test-webhook.py
+    python scripts/graph/load-test-webhook.py --url http://localhost:8080/webhook --levels 1,4,16,64 \\
+        --stage-seconds 15 --report reports/webhook-load.json
+"""
+import argparse
+import importlib.util
+import json
+import random
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import requests
+
+from auth_helper import get_config
+from latency_report import LatencyRecorder
+
+GRAPH_DEADLINE_MS = 3000
+DEFAULT_LEVELS = (1, 2, 4, 8, 16, 32, 64)
+REPORT_VERSION = 1
+
+
+def load_webhook_test_module():
+    """Import 06-test-webhook.py (its file name is not a valid module name)"""
+    path = Path(__file__).resolve().parent / "06-test-webhook.py"
+    spec = importlib.util.spec_from_file_location("webhook_test", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+webhook_test = load_webhook_test_module()
+
+
+def random_notification(client_state):
+    """A calendar or transcript notification with unique ids, so nothing downstream dedupes it"""
+    unique = uuid.uuid4().hex[:12]
+    subscription_id = f"load-test-{unique[:4]}"
+    if random.random() < 0.2:
+        return webhook_test.transcript_notification_payload(
+            client_state, subscription_id, meeting_id=f"MSoLoad{unique}", transcript_id=f"T{unique}")
+    return webhook_test.event_notification_payload(
+        random.choice(("created", "updated")), client_state, subscription_id, event_id=f"AAMkLoad{unique}")
+
+
+def one_request(url, session, config, posts, validations, validation_ratio, timeout):
+    """Send one GET or POST and record it"""
+    started = time.perf_counter()
+
+    if random.random() < validation_ratio:
+        token = f"load-test-{uuid.uuid4().hex}"
+        try:
+            response = webhook_test.send_validation_request(url, token, session, timeout)
+        except requests.RequestException as e:
+            validations.record((time.perf_counter() - started) * 1000, error=type(e).__name__)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if response.status_code == 200 and response.text != token:
+            validations.record(elapsed_ms, error="token not echoed")
+        else:
+            validations.record(elapsed_ms, status=response.status_code)
+        return
+
+    payload = random_notification(config['client_state'])
+    response = webhook_test.send_webhook_notification(
+        url, payload, config['auth_token'], session=session, timeout=timeout, verbose=False)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if response is None:
+        posts.record(elapsed_ms, error="no response")
+    else:
+        posts.record(elapsed_ms, status=response.status_code)
+
+
+def run_stage(url, concurrency, seconds, config, validation_ratio, timeout):
+    """
+    Closed-loop stage: `concurrency` workers send back to back until time is up.
+
+    Returns:
+        (notification recorder, validation recorder, elapsed seconds)
+    """
+    deadline = time.monotonic() + seconds
+
+    def worker():
+        posts, validations = LatencyRecorder(), LatencyRecorder()
+        with requests.Session() as session:
+            while time.monotonic() < deadline:
+                one_request(url, session, config, posts, validations, validation_ratio, timeout)
+        return posts, validations
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = [f.result() for f in [executor.submit(worker) for _ in range(concurrency)]]
+    elapsed = time.monotonic() - started
+
+    return LatencyRecorder.merged(*(p for p, _ in results)), LatencyRecorder.merged(*(v for _, v in results)), elapsed
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ramp load against the webhook endpoint")
+    parser.add_argument("--url", help="Webhook URL (default: AWS_WEBHOOK_ENDPOINT or AZURE_WEBHOOK_ENDPOINT)")
+    parser.add_argument("--levels", default=",".join(str(n) for n in DEFAULT_LEVELS),
+                        help="Comma-separated concurrency levels (default: 1,2,4,...,64)")
+    parser.add_argument("--stage-seconds", type=float, default=20.0, help="Duration of each stage")
+    parser.add_argument("--validation-ratio", type=float, default=0.1,
+                        help="Share of requests that are validation-token GETs (default: 0.1)")
+    parser.add_argument("--deadline-ms", type=float, default=GRAPH_DEADLINE_MS,
+                        help="Response-time SLO for p99 (default: 3000, Graph's limit)")
+    parser.add_argument("--max-error-rate", type=float, default=0.05,
+                        help="Stop ramping once a stage exceeds this error rate (default: 0.05)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Per-request timeout")
+    parser.add_argument("--keep-going", action="store_true", help="Run every level even after the SLO is breached")
+    parser.add_argument("--client-state", help="clientState to send (default: WEBHOOK_AUTH_SECRET)")
+    parser.add_argument("--report", help="JSON report path (default: webhook-load-<timestamp>.json)")
+    args = parser.parse_args()
+
+    config = get_config()
+    url = args.url or config['webhook_url']
+    if not url:
+        print("❌ No webhook URL (use --url or set AWS_WEBHOOK_ENDPOINT / AZURE_WEBHOOK_ENDPOINT)")
+        return 1
+
+    levels = [int(n) for n in args.levels.split(",")]
+    request_config = {
+        'client_state': args.client_state or config.get('webhook_secret') or 'test-client-state',
+        'auth_token': config.get('webhook_secret'),
+    }
+
+    print("=" * 80)
+    print(f"Webhook load test: {url}")
+    print(f"Levels: {levels}, {args.stage_seconds:g}s each, SLO p99 <= {args.deadline_ms:g} ms")
+    print("=" * 80)
+
+    stages = []
+    breached_at = None
+    for concurrency in levels:
+        posts, validations, elapsed = run_stage(
+            url, concurrency, args.stage_seconds, request_config, args.validation_ratio, args.timeout)
+        total = LatencyRecorder.merged(posts, validations)
+        summary = total.summary()
+        p99 = summary['latency_ms']['p99']
+
+        stage = {
+            'concurrency': concurrency,
+            'duration_s': round(elapsed, 2),
+            'throughput_rps': round(total.count / elapsed, 1) if elapsed else 0.0,
+            **summary,
+            'notifications': posts.summary(),
+            'validation': validations.summary(),
+            'within_slo': p99 is not None and p99 <= args.deadline_ms,
+        }
+        stages.append(stage)
+
+        marker = "✅" if stage['within_slo'] and summary['error_rate'] <= args.max_error_rate else "❌"
+        print(f"{marker} c={concurrency:<4} {stage['throughput_rps']:>7.1f} req/s  "
+              f"p50 {summary['latency_ms']['p50']} ms  p95 {summary['latency_ms']['p95']} ms  "
+              f"p99 {p99} ms  errors {summary['error_rate'] * 100:.1f}%")
+
+        if breached_at is None and not stage['within_slo']:
+            breached_at = concurrency
+        if not args.keep_going and (breached_at is not None or summary['error_rate'] > args.max_error_rate):
+            break
+
+    within = [s['concurrency'] for s in stages if s['within_slo'] and s['error_rate'] <= args.max_error_rate]
+    report = {
+        'report_version': REPORT_VERSION,
+        'tool': 'load-test-webhook',
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': git_commit(),
+        'url': url,
+        'stage_seconds': args.stage_seconds,
+        'validation_ratio': args.validation_ratio,
+        'slo': {
+            'p99_deadline_ms': args.deadline_ms,
+            'max_error_rate': args.max_error_rate,
+            'p99_breached_at_concurrency': breached_at,
+            'max_concurrency_within_slo': max(within) if within else None,
+        },
+        'stages': stages,
+    }
+
+    print("\n" + "=" * 80)
+    if stages[-1]['error_rate'] > args.max_error_rate:
+        print(f"❌ Error rate {stages[-1]['error_rate'] * 100:.1f}% at concurrency {stages[-1]['concurrency']} "
+              f"(statuses: {stages[-1]['statuses']}, errors: {stages[-1]['errors']})")
+    elif breached_at is None:
+        print(f"✅ p99 stayed under {args.deadline_ms:g} ms up to concurrency {stages[-1]['concurrency']}")
+    else:
+        print(f"⚠️  p99 exceeded {args.deadline_ms:g} ms at concurrency {breached_at} "
+              f"(Graph drops or throttles notifications past its deadline)")
+
+    report_path = Path(args.report or f"webhook-load-{datetime.now():%Y%m%d-%H%M%S}.json")
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    report_path.write_text(json.dumps(report, indent=2))
+    print(f"📝 Report written to {report_path}")
+
+    return 0 if breached_at is None and stages[-1]['error_rate'] <= args.max_error_rate else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
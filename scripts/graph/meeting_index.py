@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Upcoming Online Meeting Index
+
+In-memory index of online meetings across all monitored users, fed by the
+calendar poller's change events instead of re-querying Graph:
+
+- starting_within(t, delta): meetings starting in [t, t + delta]
+- in_progress(t): meetings with start <= t < end
+
+Meetings are kept in start order (parallel sorted arrays, bisect), so both
+queries cost O(log n) plus the meetings they look at. in_progress() only
+scans starts back to t minus the longest indexed meeting; meetings longer
+than max_span (all-day or multi-day) are kept apart and checked directly.
+
+The index is updated incrementally with apply() (poller results) or
+apply_record() (sink records), and can be saved to / loaded from a JSON
+snapshot so a restarted poller, which only sees new changes, starts
+complete.
+
+Usage:
+    python scripts/graph/meeting_index.py upcoming --minutes 15
+    python scripts/graph/meeting_index.py now
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import NamedTuple
+
+from poll_scheduler import graph_timestamp
+
+STATE_DIR = Path('/tmp') if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else Path(__file__).resolve().parents[2] / '.cache'
+DEFAULT_INDEX = os.getenv('MEETING_INDEX', str(STATE_DIR / 'meeting-index.json'))
+MAX_SPAN = int(os.getenv('MEETING_INDEX_MAX_SPAN_SECONDS', str(4 * 3600)))
+
+
+class Meeting(NamedTuple):
+    start: float
+    end: float
+    user_id: str
+    event_id: str
+    subject: str
+    join_url: str
+
+
+def meeting_from_event(user_id, event):
+    """Meeting for an event that should be indexed, else None (not online, cancelled, no times)"""
+    if not event.get('isOnlineMeeting') or event.get('isCancelled') or event.get('type') == 'seriesMaster':
+        return None
+    start = graph_timestamp((event.get('start') or {}).get('dateTime'))
+    end = graph_timestamp((event.get('end') or {}).get('dateTime'))
+    if start is None or end is None:
+        return None
+    join_url = (event.get('onlineMeeting') or {}).get('joinUrl') or event.get('onlineMeetingUrl') or ''
+    return Meeting(start, max(end, start), user_id, event['id'], event.get('subject') or '', join_url)
+
+
+class MeetingIndex:
+    """Online meetings by start time, updated from poller change events"""
+
+    def __init__(self, path=None, max_span=MAX_SPAN):
+        self.path = Path(path) if path else None
+        self.max_span = max_span
+        self.meetings = {}       # (user_id, event_id) -> Meeting
+        self.start_times = []    # sorted starts of the regular (<= max_span) meetings
+        self.keys = []           # their keys, in the same order
+        self.long = {}           # key -> Meeting longer than max_span
+        self.longest = 0.0       # upper bound on regular meeting length (in_progress lookback)
+
+    def __len__(self):
+        return len(self.meetings)
+
+    def add(self, meeting):
+        key = (meeting.user_id, meeting.event_id)
+        self.remove(*key)
+        self.meetings[key] = meeting
+        if meeting.end - meeting.start > self.max_span:
+            self.long[key] = meeting
+            return
+        self.longest = max(self.longest, meeting.end - meeting.start)
+        i = bisect_right(self.start_times, meeting.start)
+        self.start_times.insert(i, meeting.start)
+        self.keys.insert(i, key)
+
+    def remove(self, user_id, event_id):
+        key = (user_id, event_id)
+        meeting = self.meetings.pop(key, None)
+        if meeting is None or self.long.pop(key, None) is not None:
+            return meeting
+        i = bisect_left(self.start_times, meeting.start)
+        while self.keys[i] != key:
+            i += 1
+        del self.start_times[i]
+        del self.keys[i]
+        return meeting
+
+    def apply(self, user_id, changed, removed):
+        """Apply one user's poll result (changed events, removed event ids)"""
+        for event_id in removed:
+            self.remove(user_id, event_id)
+        for event in changed:
+            meeting = meeting_from_event(user_id, event)
+            if meeting is None:
+                # Cancelled, no longer online, or moved out of scope
+                self.remove(user_id, event['id'])
+            else:
+                self.add(meeting)
+
+    def apply_record(self, record):
+        """Apply one poller_sink record ({'type', 'userId', 'id', 'event'})"""
+        if record['type'] == 'removed':
+            self.apply(record['userId'], [], [record['id']])
+        else:
+            self.apply(record['userId'], [record['event']], [])
+
+    def starting_within(self, t, delta):
+        """Meetings starting in [t, t + delta], by start"""
+        lo = bisect_left(self.start_times, t)
+        hi = bisect_right(self.start_times, t + delta)
+        found = [self.meetings[k] for k in self.keys[lo:hi]]
+        found.extend(m for m in self.long.values() if t <= m.start <= t + delta)
+        return sorted(found) if self.long else found
+
+    def in_progress(self, t):
+        """Meetings with start <= t < end, by start"""
+        lo = bisect_left(self.start_times, t - self.longest)
+        hi = bisect_right(self.start_times, t)
+        found = [m for m in (self.meetings[k] for k in self.keys[lo:hi]) if m.end > t]
+        found.extend(m for m in self.long.values() if m.start <= t < m.end)
+        return sorted(found) if self.long else found
+
+    def prune(self, before):
+        """Drop meetings that ended before the given time; returns how many"""
+        ended = [k for k, m in self.meetings.items() if m.end < before]
+        for key in ended:
+            self.remove(*key)
+        self.longest = max((self.meetings[k].end - self.meetings[k].start for k in self.keys), default=0.0)
+        return len(ended)
+
+    def save(self, path=None):
+        path = Path(path) if path else self.path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps([list(m) for m in self.meetings.values()]))
+        tmp.replace(path)
+
+    def load(self, path=None):
+        """Add the meetings of a snapshot (if it exists); returns self"""
+        path = Path(path) if path else self.path
+        if path and path.exists():
+            for fields in json.loads(path.read_text()):
+                self.add(Meeting(*fields))
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the upcoming online meeting index snapshot")
+    parser.add_argument("--index", default=DEFAULT_INDEX, help="Snapshot path (MEETING_INDEX)")
+    subparsers = parser.add_subparsers(dest="command")
+    upcoming_parser = subparsers.add_parser("upcoming", help="Meetings starting in the next N minutes")
+    upcoming_parser.add_argument("--minutes", type=int, default=15)
+    subparsers.add_parser("now", help="Meetings in progress")
+    args = parser.parse_args()
+    if args.command not in ("upcoming", "now"):
+        parser.print_help()
+        return 1
+
+    index = MeetingIndex(args.index).load()
+    now = time.time()
+    if args.command == "upcoming":
+        meetings = index.starting_within(now, args.minutes * 60)
+        print(f"⏰ {len(meetings)} meeting(s) starting in the next {args.minutes} min ({len(index)} indexed)")
+    else:
+        meetings = index.in_progress(now)
+        print(f"🟢 {len(meetings)} meeting(s) in progress ({len(index)} indexed)")
+    for m in meetings:
+        print(f"   {time.strftime('%H:%M', time.gmtime(m.start))}-{time.strftime('%H:%M', time.gmtime(m.end))} UTC"
+              f"  {m.user_id}  {m.subject}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Notification De-duplication
+
+Graph delivers change notifications at least once, so the same
+(subscriptionId, resource, changeType, sequenceNumber / resourceData id)
+can arrive several times. NotificationDeduper answers "already processed?"
+before a consumer spends Graph calls on it:
+
+- an in-memory Bloom filter over a sliding time window (bounded memory,
+  catches repeats within one process without a round trip)
+- a persistent TTL store shared across processes: SQLite (local) or a
+  DynamoDB conditional put (deployed consumers)
+
+Bloom hits are confirmed against the store when there is one, so a false
+positive never drops a new notification. A consumer releases the claim of a
+notification it failed to process, so the redelivery is processed again.
+
+Lifecycle notifications are never de-duplicated: Graph can send the same
+reauthorizationRequired or missed event for a subscription again and again,
+and each one needs acting on.
+
+Usage:
+    # Duplicate rate over every stored payload (from scripts/aws/payload_index.py)
+    python scripts/graph/notification_dedupe.py report
+
+    # What the live store has seen
+    python scripts/graph/notification_dedupe.py stats --store sqlite:.cache/notification-dedupe.sqlite
+
+    # Create the DynamoDB table (TTL on expires_at)
+    python scripts/graph/notification_dedupe.py create-table --table graph-notification-dedupe
+"""
+import argparse
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+import boto3
+from botocore.exceptions import ClientError
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_STORE = os.getenv("NOTIFICATION_DEDUPE_STORE",
+                          f"sqlite:{REPO_ROOT / '.cache' / 'notification-dedupe.sqlite'}")
+DEFAULT_TABLE = "graph-notification-dedupe"
+
+# Graph retries undelivered notifications for up to 4 hours
+DEFAULT_WINDOW_SECONDS = 6 * 3600
+
+
+def dedupe_key(notification):
+    """
+    Stable key for one change notification.
+
+    (subscriptionId, resource, changeType, sequenceNumber or resourceData id)
+    """
+    resource_data = notification.get('resourceData') or {}
+    sequence = (notification.get('sequenceNumber') or resource_data.get('sequenceNumber')
+                or resource_data.get('id') or '')
+    parts = (
+        notification.get('subscriptionId') or '',
+        (notification.get('resource') or '').strip('/').lower(),
+        notification.get('changeType') or '',
+        str(sequence),
+    )
+    return hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+class RotatingBloomFilter:
+    """
+    Bloom filter over a sliding time window.
+
+    The window is split into `generations` slots, each with its own bit
+    array; adds go to the current slot and lookups check every live slot, so
+    a key is remembered for between (generations - 1) and `generations`
+    slots. Memory is fixed at generations * bits / 8 bytes.
+    """
+
+    def __init__(self, window_seconds=DEFAULT_WINDOW_SECONDS, capacity=100_000, error_rate=0.001,
+                 generations=4, clock=time.time):
+        self.bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.slot_seconds = window_seconds / generations
+        self.generations = generations
+        self.clock = clock
+        self._slots = {}
+
+    @property
+    def memory_bytes(self):
+        return len(self._slots) * ((self.bits + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.sha256(key.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _live_slots(self):
+        current = int(self.clock() // self.slot_seconds)
+        for slot in [s for s in self._slots if s <= current - self.generations]:
+            del self._slots[slot]
+        if current not in self._slots:
+            self._slots[current] = bytearray((self.bits + 7) // 8)
+        return current
+
+    def add(self, key):
+        bits = self._slots[self._live_slots()]
+        for position in self._positions(key):
+            bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        self._live_slots()
+        positions = self._positions(key)
+        return any(
+            all(bits[p >> 3] & (1 << (p & 7)) for p in positions)
+            for bits in self._slots.values()
+        )
+
+
+class SqliteDedupeStore:
+    """Seen-keys table with expiry in a local SQLite file"""
+
+    def __init__(self, path):
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS seen (
+                dedupe_key TEXT PRIMARY KEY,
+                first_seen REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                duplicates INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS seen_expires ON seen (expires_at);
+        """)
+
+    def claim(self, key, ttl_seconds, now=None):
+        """True if key is new (or its previous claim expired); False for a duplicate"""
+        now = now or time.time()
+        cursor = self.conn.execute("""
+            INSERT INTO seen (dedupe_key, first_seen, expires_at, duplicates) VALUES (?, ?, ?, 0)
+            ON CONFLICT (dedupe_key) DO UPDATE
+                SET first_seen = excluded.first_seen, expires_at = excluded.expires_at, duplicates = 0
+                WHERE seen.expires_at < excluded.first_seen
+        """, (key, now, now + ttl_seconds))
+        claimed = cursor.rowcount == 1
+        if not claimed:
+            self.conn.execute("UPDATE seen SET duplicates = duplicates + 1 WHERE dedupe_key = ?", (key,))
+        self.conn.commit()
+        return claimed
+
+    def release(self, key):
+        """Forget a claim so the key is new again"""
+        self.conn.execute("DELETE FROM seen WHERE dedupe_key = ?", (key,))
+        self.conn.commit()
+
+    def purge(self, now=None):
+        """Drop expired keys; returns the number removed"""
+        removed = self.conn.execute("DELETE FROM seen WHERE expires_at < ?", (now or time.time(),)).rowcount
+        self.conn.commit()
+        return removed
+
+    def stats(self):
+        keys, duplicates = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(duplicates), 0) FROM seen").fetchone()
+        return {'keys': keys, 'duplicates': duplicates}
+
+    def describe(self):
+        return f"SQLite {self.path}"
+
+
+class DynamoDedupeStore:
+    """Seen-keys table in DynamoDB; a conditional put makes the claim atomic across consumers"""
+
+    def __init__(self, table_name=DEFAULT_TABLE, profile=None, region='us-east-1'):
+        profile = profile or os.getenv('AWS_PROFILE', 'tmf-dev')
+        session = boto3.Session(profile_name=profile, region_name=region)
+        self.dynamodb = session.resource('dynamodb')
+        self.table_name = table_name
+        self.table = self.dynamodb.Table(table_name)
+
+    def check(self):
+        """Raise if the table is missing or unreachable"""
+        self.table.table_status
+
+    def claim(self, key, ttl_seconds, now=None):
+        now = int(now or time.time())
+        try:
+            self.table.put_item(
+                Item={'dedupe_key': key, 'first_seen': now, 'expires_at': now + int(ttl_seconds), 'duplicates': 0},
+                ConditionExpression='attribute_not_exists(dedupe_key) OR expires_at < :now',
+                ExpressionAttributeValues={':now': now},
+            )
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+        self.table.update_item(
+            Key={'dedupe_key': key},
+            UpdateExpression='ADD duplicates :one',
+            ExpressionAttributeValues={':one': 1},
+        )
+        return False
+
+    def release(self, key):
+        self.table.delete_item(Key={'dedupe_key': key})
+
+    def purge(self, now=None):
+        # Expired items are removed by DynamoDB TTL on expires_at
+        return 0
+
+    def stats(self):
+        keys = duplicates = 0
+        params = {'ProjectionExpression': 'duplicates'}
+        while True:
+            page = self.table.scan(**params)
+            keys += len(page['Items'])
+            duplicates += sum(int(item.get('duplicates', 0)) for item in page['Items'])
+            if 'LastEvaluatedKey' not in page:
+                return {'keys': keys, 'duplicates': duplicates}
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    def create_table(self):
+        print(f"📝 Creating DynamoDB table '{self.table_name}'...")
+        table = self.dynamodb.create_table(
+            TableName=self.table_name,
+            KeySchema=[{'AttributeName': 'dedupe_key', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'dedupe_key', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        table.meta.client.get_waiter('table_exists').wait(TableName=self.table_name)
+        table.meta.client.update_time_to_live(
+            TableName=self.table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'},
+        )
+        print(f"✅ Table created with TTL on expires_at")
+
+    def describe(self):
+        return f"DynamoDB {self.table_name}"
+
+
+def open_store(spec=DEFAULT_STORE, profile=None):
+    """Store from a sqlite:PATH or dynamodb:TABLE spec; 'memory' or empty means Bloom filter only"""
+    if not spec or spec == 'memory':
+        return None
+    if spec.startswith('sqlite:'):
+        return SqliteDedupeStore(spec[len('sqlite:'):])
+    if spec.startswith('dynamodb:'):
+        store = DynamoDedupeStore(spec[len('dynamodb:'):] or DEFAULT_TABLE, profile)
+        store.check()
+        return store
+    raise ValueError(f"Unknown dedupe store: {spec} (use sqlite:PATH, dynamodb:TABLE or memory)")
+
+
+class NotificationDeduper:
+    """Bloom filter in front of an optional persistent TTL store"""
+
+    def __init__(self, store=None, window_seconds=DEFAULT_WINDOW_SECONDS, capacity=100_000, error_rate=0.001):
+        self.store = store
+        self.window_seconds = window_seconds
+        self.bloom = RotatingBloomFilter(window_seconds, capacity, error_rate)
+        self.released = set()    # keys the Bloom filter still holds but that are new again
+        self.stats = {'checked': 0, 'duplicates': 0, 'bloom_hits': 0, 'bloom_false_positives': 0,
+                      'store_claims': 0}
+
+    def is_duplicate(self, notification):
+        """Claim the notification and say whether it was already seen (lifecycle events never are)"""
+        if notification.get('lifecycleEvent'):
+            return False
+        key = dedupe_key(notification)
+        self.stats['checked'] += 1
+        in_bloom = key in self.bloom and key not in self.released
+        self.released.discard(key)
+        if in_bloom:
+            self.stats['bloom_hits'] += 1
+
+        if self.store is None:
+            duplicate = in_bloom
+        else:
+            self.stats['store_claims'] += 1
+            duplicate = not self.store.claim(key, self.window_seconds)
+            if in_bloom and not duplicate:
+                self.stats['bloom_false_positives'] += 1
+
+        self.bloom.add(key)
+        if duplicate:
+            self.stats['duplicates'] += 1
+        return duplicate
+
+    def release(self, notification):
+        """Undo the claim of a notification that failed, so its redelivery is processed"""
+        if notification.get('lifecycleEvent'):
+            return
+        key = dedupe_key(notification)
+        self.released.add(key)
+        if self.store is not None:
+            self.store.release(key)
+
+    def filter(self, notifications):
+        """(new, duplicates) partition of a list of notifications"""
+        new, duplicates = [], []
+        for notification in notifications:
+            (duplicates if self.is_duplicate(notification) else new).append(notification)
+        return new, duplicates
+
+    @property
+    def duplicate_rate(self):
+        return self.stats['duplicates'] / self.stats['checked'] if self.stats['checked'] else 0.0
+
+    def print_stats(self):
+        s = self.stats
+        print(f"♻️  Dedupe: {s['checked']} checked, {s['duplicates']} duplicate(s) skipped "
+              f"({self.duplicate_rate * 100:.1f}%), Bloom {self.bloom.memory_bytes / 1024:.0f} KiB")
+
+
+def get_deduper(spec=None, profile=None):
+    """
+    NotificationDeduper on the configured store.
+
+    Like get_tracker(), an unreachable store degrades to the in-memory
+    filter rather than stopping the consumer.
+    """
+    spec = spec if spec is not None else DEFAULT_STORE
+    try:
+        return NotificationDeduper(open_store(spec, profile))
+    except Exception as e:
+        print(f"⚠️  Dedupe store unavailable ({e}); de-duplicating in memory only")
+        return NotificationDeduper()
+
+
+def report_from_index(index):
+    """Duplicate rate over indexed payloads, grouped by subscription"""
+    rows = index.conn.execute("""
+        SELECT subscription_id, COUNT(*) AS deliveries, COUNT(DISTINCT dedupe) AS unique_notifications
+        FROM (
+            SELECT subscription_id,
+                   subscription_id || '|' || LOWER(TRIM(COALESCE(resource, ''), '/')) || '|' ||
+                   COALESCE(change_type, '') || '|' || COALESCE(resource_id, '') AS dedupe
+            FROM payloads WHERE subscription_id IS NOT NULL AND lifecycle_event IS NULL
+        )
+        GROUP BY subscription_id ORDER BY deliveries DESC
+    """).fetchall()
+    return [(row[0], row[1], row[2]) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Notification de-duplication store tools")
+    subparsers = parser.add_subparsers(dest="command")
+
+    report_parser = subparsers.add_parser("report", help="Duplicate rate over the stored payload index")
+    report_parser.add_argument("--index", help="Payload index path (default: scripts/aws/payload_index.py default)")
+
+    stats_parser = subparsers.add_parser("stats", help="Keys and duplicates recorded by a store")
+    stats_parser.add_argument("--store", default=DEFAULT_STORE)
+
+    purge_parser = subparsers.add_parser("purge", help="Remove expired keys from a SQLite store")
+    purge_parser.add_argument("--store", default=DEFAULT_STORE)
+
+    table_parser = subparsers.add_parser("create-table", help="Create the DynamoDB dedupe table")
+    table_parser.add_argument("--table", default=DEFAULT_TABLE)
+    table_parser.add_argument("--profile", default=None)
+
+    args = parser.parse_args()
+
+    if args.command == "report":
+        sys.path.append(str(REPO_ROOT / "scripts" / "aws"))
+        from payload_index import open_index
+        index = open_index(args.index)
+        if index is None:
+            print("❌ No payload index. Run: python scripts/aws/payload_index.py build")
+            return 1
+        rows = report_from_index(index)
+        deliveries = sum(r[1] for r in rows)
+        unique = sum(r[2] for r in rows)
+        print(f"{'Subscription':<38} {'Delivered':>10} {'Unique':>8} {'Dup %':>7}")
+        for subscription_id, delivered, distinct in rows:
+            print(f"{subscription_id[:38]:<38} {delivered:>10} {distinct:>8} "
+                  f"{(delivered - distinct) / delivered * 100:>6.1f}%")
+        if deliveries:
+            print(f"\n📊 {deliveries - unique} of {deliveries} deliveries were duplicates "
+                  f"({(deliveries - unique) / deliveries * 100:.1f}%): Graph fetches de-duplication avoids")
+
+    elif args.command in ("stats", "purge"):
+        store = open_store(args.store)
+        if store is None:
+            print("Memory-only dedupe keeps no persistent state")
+            return 0
+        if args.command == "purge":
+            print(f"🧹 Removed {store.purge()} expired key(s) from {store.describe()}")
+        stats = store.stats()
+        seen = stats['keys'] + stats['duplicates']
+        rate = stats['duplicates'] / seen * 100 if seen else 0.0
+        print(f"📊 {store.describe()}: {stats['keys']} key(s), {stats['duplicates']} duplicate(s) ({rate:.1f}%)")
+
+    elif args.command == "create-table":
+        DynamoDedupeStore(args.table, args.profile).create_table()
+
+    else:
+        parser.print_help()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,473 @@
+#!/usr/bin/env python3
+"""
+Plan (and optionally apply) the Graph subscription fleet for a group.
+
+Given ENTRA_GROUP_ID membership and the resources we need (events,
+transcripts, recordings), computes the minimal set of subscriptions,
+checks it against per-resource subscription limits, shards it across one
+or more notification URLs / Event Hubs, and diffs it against the
+subscriptions that already exist (recreating those whose notification or
+lifecycle URL changed).
+
+Usage:
+    # Dry-run cost report for calendar events + transcripts
+    python scripts/graph/plan-subscriptions.py --resources events,transcripts \
+        --lifecycle-url https://a.example.com/lifecycle
+
+    # Shard across two webhook URLs and apply the diff
+    python scripts/graph/plan-subscriptions.py --resources events \\
+        --notification-url https://a.example.com/graph \\
+        --notification-url https://b.example.com/graph --apply
+
+    # Use tenant-wide transcript/recording subscriptions instead of per user
+    python scripts/graph/plan-subscriptions.py --resources transcripts,recordings --tenant-wide \
+        --lifecycle-url https://a.example.com/lifecycle
+
+    # Override a per-resource limit
+    python scripts/graph/plan-subscriptions.py --resources events --limit events=5000
+"""
+import sys
+import argparse
+import math
+import re
+import zlib
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import requests
+
+sys.path.append("scripts/graph")
+from auth_helper import get_graph_headers, get_config
+from graph_batch import MAX_BATCH_SIZE, build_request, execute_batches
+from tracker_client import get_tracker
+
+GRAPH_ENDPOINT = "https://graph.microsoft.com/v1.0"
+
+# Per-resource subscription definitions. max_hours is the longest expiry we
+# request; resources with needs_lifecycle_url only get more than one hour
+# with a lifecycleNotificationUrl, so they are not planned without one.
+RESOURCE_TYPES = {
+    'events': {
+        'template': "users/{user_id}/events",
+        'tenant_resource': None,
+        'change_type': "created,updated,deleted",
+        'max_hours': 70,
+        'needs_lifecycle_url': False,
+        'tracker_type': 'calendar',
+    },
+    'transcripts': {
+        'template': "users/{user_id}/onlineMeetings/getAllTranscripts(meetingOrganizerUserId='{user_id}')",
+        'tenant_resource': "communications/onlineMeetings/getAllTranscripts",
+        'change_type': "created",
+        'max_hours': 70,
+        'needs_lifecycle_url': True,
+        'tracker_type': 'transcript',
+    },
+    'recordings': {
+        'template': "users/{user_id}/onlineMeetings/getAllRecordings(meetingOrganizerUserId='{user_id}')",
+        'tenant_resource': "communications/onlineMeetings/getAllRecordings",
+        'change_type': "created",
+        'max_hours': 70,
+        'needs_lifecycle_url': True,
+        'tracker_type': 'recording',
+    },
+}
+
+# Default ceiling on subscriptions this app may hold in the tenant, all
+# resources together; override with --max-subscriptions.
+DEFAULT_MAX_SUBSCRIPTIONS = 10000
+
+# Default per-resource ceilings (subscriptions of that kind per app and
+# tenant). Graph quotas differ per resource and tenant; override with
+# --limit KIND=N. A kind over its limit is collapsed to its tenant-wide
+# subscription when it has one.
+RESOURCE_LIMITS = {
+    'events': 10000,
+    'transcripts': 1000,
+    'recordings': 1000,
+}
+
+_QUOTED_USER = re.compile(r"='([^']+)'")
+
+# How often the renewal Lambda runs (hours) - a subscription is renewed at
+# least once per sweep.
+RENEWAL_INTERVAL_HOURS = 24
+
+
+def get_paged(url, headers, params=None):
+    """GET every page of a Graph collection"""
+    items = []
+    while url:
+        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response.raise_for_status()
+        data = response.json()
+        items.extend(data.get('value', []))
+        url = data.get('@odata.nextLink')
+        params = None  # nextLink already carries the query
+    return items
+
+
+def list_group_members(group_id, headers):
+    """Transitive user members of the group (id + mail/UPN only)"""
+    members = get_paged(
+        f"{GRAPH_ENDPOINT}/groups/{group_id}/transitiveMembers/microsoft.graph.user",
+        headers,
+        params={'$select': 'id,mail,userPrincipalName', '$top': 999}
+    )
+    return [m for m in members if m.get('id')]
+
+
+def normalize_resource(resource, alias_to_id):
+    """Canonical resource string: no leading slash, user aliases mapped to ids, lowercase"""
+    parts = resource.strip('/').lower().split('/')
+    if len(parts) > 1 and parts[0] == 'users':
+        parts[1] = alias_to_id.get(parts[1], parts[1])
+    normalized = '/'.join(parts)
+    return _QUOTED_USER.sub(lambda m: f"='{alias_to_id.get(m.group(1), m.group(1))}'", normalized)
+
+
+def resource_kind(normalized):
+    """Which RESOURCE_TYPES entry a normalized resource belongs to (or None)"""
+    if normalized.startswith('users/') and normalized.endswith('/events') and normalized.count('/') == 2:
+        return 'events'
+    if normalized.startswith(('users/', 'communications/')):
+        if 'getalltranscripts' in normalized:
+            return 'transcripts'
+        if 'getallrecordings' in normalized:
+            return 'recordings'
+    return None
+
+
+def shard_url(key, urls):
+    """Stable notification URL for a key, spreading load across URLs"""
+    return urls[zlib.crc32(key.encode('utf-8')) % len(urls)]
+
+
+def lifecycle_url_error(resource_names, lifecycle_url):
+    """Why the plan cannot go ahead without a lifecycle URL, or None"""
+    missing = [name for name in resource_names
+               if RESOURCE_TYPES[name]['needs_lifecycle_url'] and not lifecycle_url]
+    if not missing:
+        return None
+    return (f"{', '.join(missing)} need --lifecycle-url: without one Graph caps their expiry "
+            "at 1 hour (24 renewals/day per subscription)")
+
+
+def plan_limits(resource_names, limits=None):
+    """Per-resource limits for the planned kinds: RESOURCE_LIMITS with overrides applied"""
+    merged = {**RESOURCE_LIMITS, **(limits or {})}
+    return {name: merged[name] for name in resource_names}
+
+
+def over_limit(desired, limits, max_subscriptions=DEFAULT_MAX_SUBSCRIPTIONS):
+    """Messages for every per-resource limit (and the overall limit) the plan exceeds"""
+    by_kind = Counter(d['kind'] for d in desired)
+    problems = [f"{name}: {by_kind[name]} subscriptions, over its limit of {limit}"
+                for name, limit in limits.items() if by_kind[name] > limit]
+    if len(desired) > max_subscriptions:
+        problems.append(f"{len(desired)} subscriptions in total, over the limit of {max_subscriptions}")
+    return problems
+
+
+def build_plan(members, resource_names, urls, tenant_wide=False, lifecycle_url=None,
+               max_subscriptions=DEFAULT_MAX_SUBSCRIPTIONS, limits=None):
+    """
+    Compute the desired subscriptions.
+
+    A resource whose per-user plan exceeds its limit (limits, default
+    RESOURCE_LIMITS), or that pushes the plan over max_subscriptions, is
+    collapsed into its tenant-wide subscription when it has one.
+
+    Raises:
+        ValueError: a planned resource needs a lifecycleNotificationUrl and
+                    none was given (its subscriptions would expire hourly)
+
+    Returns:
+        (desired, notes) - desired is a list of subscription definitions
+    """
+    error = lifecycle_url_error(resource_names, lifecycle_url)
+    if error:
+        raise ValueError(error)
+
+    notes = []
+    limits = plan_limits(resource_names, limits)
+
+    def expand(name, collapse):
+        spec = RESOURCE_TYPES[name]
+        if collapse and spec['tenant_resource']:
+            resources = [(spec['tenant_resource'], 'tenant')]
+        else:
+            resources = [(spec['template'].format(user_id=m['id']), m['id']) for m in members]
+        return [{
+            'kind': name,
+            'resource': resource,
+            'change_type': spec['change_type'],
+            'notification_url': shard_url(shard_key, urls),
+            'lifecycle_url': lifecycle_url if spec['needs_lifecycle_url'] else None,
+            'hours': spec['max_hours'],
+        } for resource, shard_key in resources]
+
+    by_kind = {name: expand(name, tenant_wide) for name in resource_names}
+    total = sum(len(planned) for planned in by_kind.values())
+    for name in resource_names:
+        planned = by_kind[name]
+        if len(planned) <= limits[name] and total <= max_subscriptions:
+            continue
+        collapsed = expand(name, True)
+        if len(collapsed) < len(planned):
+            notes.append(f"{name}: per-user plan needs {len(planned)} subscriptions "
+                         f"(limit {limits[name]}, {total} in total); using the tenant-wide subscription")
+            by_kind[name] = collapsed
+            total -= len(planned) - len(collapsed)
+
+    desired = [d for name in resource_names for d in by_kind[name]]
+    notes.extend(f"Plan still over a limit: {problem}"
+                 for problem in over_limit(desired, limits, max_subscriptions))
+    return desired, notes
+
+
+def diff_plan(desired, existing, alias_to_id, urls, resource_names):
+    """
+    Diff desired subscriptions against existing ones.
+
+    Existing subscriptions are only scheduled for deletion when they point at
+    one of our notification URLs and are a per-user or tenant-wide resource
+    of a kind being planned (e.g. a member who has left the group).
+
+    A desired resource that exists with a different notificationUrl or
+    lifecycleNotificationUrl (a re-shard, a moved endpoint) is recreated:
+    Graph does not let either URL be changed on an existing subscription,
+    so it is in both to_create and to_delete, and listed in to_recreate.
+
+    Returns:
+        (to_create, to_keep, to_delete, to_recreate) - to_recreate holds
+        (existing, desired) pairs
+    """
+    desired_keys = {normalize_resource(d['resource'], alias_to_id): d for d in desired}
+    existing_keys = {}
+    for sub in existing:
+        existing_keys.setdefault(normalize_resource(sub.get('resource', ''), alias_to_id), sub)
+
+    to_create, to_keep, to_delete, to_recreate = [], [], [], []
+    for key, d in desired_keys.items():
+        sub = existing_keys.get(key)
+        if sub is None:
+            to_create.append(d)
+        elif (sub.get('notificationUrl') != d['notification_url']
+              or (sub.get('lifecycleNotificationUrl') or None) != d['lifecycle_url']):
+            to_create.append(d)
+            to_delete.append(sub)
+            to_recreate.append((sub, d))
+        else:
+            to_keep.append(sub)
+
+    to_delete.extend(
+        sub for key, sub in existing_keys.items()
+        if key not in desired_keys
+        and sub.get('notificationUrl') in urls
+        and resource_kind(key) in resource_names
+    )
+
+    return to_create, to_keep, to_delete, to_recreate
+
+
+def cost_report(desired, to_create, to_keep, to_delete, notes, to_recreate=()):
+    """Print subscription counts and expected renewal volume"""
+    by_kind = Counter(d['kind'] for d in desired)
+    by_url = Counter(d['notification_url'] for d in desired)
+
+    renewals_per_day = sum(math.ceil(RENEWAL_INTERVAL_HOURS / d['hours']) for d in desired)
+
+    print("\n" + "=" * 60)
+    print("SUBSCRIPTION PLAN")
+    print("=" * 60)
+    print(f"\n📦 Desired subscriptions: {len(desired)}")
+    for kind, count in sorted(by_kind.items()):
+        print(f"   {kind}: {count}")
+    print("\n🔀 Notification URL shards:")
+    for url, count in sorted(by_url.items()):
+        print(f"   {count:6}  {url[:80]}")
+    print("\n🧮 Diff against existing:")
+    print(f"   Create: {len(to_create)}")
+    print(f"   Keep:   {len(to_keep)}")
+    print(f"   Delete: {len(to_delete)}")
+    print(f"   (of which recreated with a new notification/lifecycle URL: {len(to_recreate)})")
+    print("\n💰 Expected renewal volume:")
+    print(f"   Renewal PATCHes/day: {renewals_per_day}")
+    print(f"   $batch requests/day: {math.ceil(renewals_per_day / MAX_BATCH_SIZE)}")
+    print(f"   Create calls now:    {len(to_create)} "
+          f"({math.ceil(len(to_create) / MAX_BATCH_SIZE)} $batch requests)")
+
+    for note in notes:
+        print(f"\n⚠️  {note}")
+
+    return {
+        'desired': len(desired),
+        'by_kind': dict(by_kind),
+        'by_url': dict(by_url),
+        'create': len(to_create),
+        'keep': len(to_keep),
+        'delete': len(to_delete),
+        'recreate': len(to_recreate),
+        'renewals_per_day': renewals_per_day,
+    }
+
+
+def apply_plan(to_create, to_delete, headers, concurrency=4, tracker=None, to_recreate=()):
+    """
+    Create and delete subscriptions in $batch requests; returns (created, deleted, failed)
+
+    Creates go first. A subscription being recreated (to_recreate) is only
+    deleted once its replacement returned 201, so a failed create leaves the
+    old subscription delivering; other deletes always go.
+    """
+    client_state = (get_config().get('webhook_secret') or 'default-client-state')[:255]
+
+    batch = []
+    for i, d in enumerate(to_create):
+        expiration = datetime.now(timezone.utc) + timedelta(hours=d['hours'])
+        body = {
+            "changeType": d['change_type'],
+            "notificationUrl": d['notification_url'],
+            "resource": d['resource'],
+            "expirationDateTime": expiration.strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+            "clientState": client_state,
+        }
+        if d['lifecycle_url']:
+            body["lifecycleNotificationUrl"] = d['lifecycle_url']
+        batch.append(build_request(f"create-{i}", "POST", "/subscriptions", body))
+
+    results = execute_batches(batch, headers, concurrency=concurrency) if batch else {}
+
+    created = deleted = failed = 0
+    created_ok = set()
+    for i, d in enumerate(to_create):
+        result = results.get(f"create-{i}", {})
+        if result.get('status') == 201:
+            created += 1
+            created_ok.add(id(d))
+            if tracker is not None:
+                sub = result['body']
+                tracker.save_subscription(sub['id'], sub['resource'], sub['expirationDateTime'],
+                                          RESOURCE_TYPES[d['kind']]['tracker_type'], sub['changeType'],
+                                          d['notification_url'], d['lifecycle_url'])
+        else:
+            failed += 1
+            print(f"  ❌ Create failed ({result.get('status')}): {d['resource'][:70]}")
+
+    replacement = {sub['id']: d for sub, d in to_recreate}
+    deletes = []
+    for sub in to_delete:
+        d = replacement.get(sub['id'])
+        if d is not None and id(d) not in created_ok:
+            print(f"  ⏭️  Keeping {sub['id']}: its replacement was not created")
+            continue
+        deletes.append(sub)
+
+    batch = [build_request(f"delete-{sub['id']}", "DELETE", f"/subscriptions/{sub['id']}") for sub in deletes]
+    results = execute_batches(batch, headers, concurrency=concurrency) if batch else {}
+
+    for sub in deletes:
+        status = results.get(f"delete-{sub['id']}", {}).get('status')
+        if status in (204, 404):
+            deleted += 1
+            if tracker is not None:
+                row = tracker.get_subscription(sub['id'])
+                if row:
+                    tracker.delete_subscription(sub['id'], row['created_at'])
+        else:
+            failed += 1
+            print(f"  ❌ Delete failed ({status}): {sub['id']}")
+
+    return created, deleted, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plan the Graph subscription fleet for a group")
+    parser.add_argument("--group-id", help="Entra group ID (default: ENTRA_GROUP_ID)")
+    parser.add_argument("--resources", default="events,transcripts",
+                        help="Comma-separated: events, transcripts, recordings")
+    parser.add_argument("--notification-url", action="append", dest="urls",
+                        help="Notification URL or EventHub: URL (repeat to shard)")
+    parser.add_argument("--lifecycle-url", help="lifecycleNotificationUrl for transcript/recording subscriptions")
+    parser.add_argument("--tenant-wide", action="store_true",
+                        help="Use tenant-wide transcript/recording subscriptions")
+    parser.add_argument("--max-subscriptions", type=int, default=DEFAULT_MAX_SUBSCRIPTIONS,
+                        help=f"Subscription limit for this app (default: {DEFAULT_MAX_SUBSCRIPTIONS})")
+    parser.add_argument("--limit", action="append", default=[], metavar="KIND=N",
+                        help="Per-resource subscription limit (repeatable; defaults: "
+                             + ", ".join(f"{k}={v}" for k, v in RESOURCE_LIMITS.items()) + ")")
+    parser.add_argument("--concurrency", type=int, default=4, help="$batch requests in flight")
+    parser.add_argument("--apply", action="store_true", help="Apply the diff (default is a dry run)")
+    args = parser.parse_args()
+
+    config = get_config()
+    group_id = args.group_id or config['group_id']
+    urls = args.urls or [config['webhook_url']]
+    resource_names = [r.strip() for r in args.resources.split(',') if r.strip()]
+
+    unknown = [r for r in resource_names if r not in RESOURCE_TYPES]
+    if unknown:
+        print(f"❌ Unknown resource(s): {', '.join(unknown)}")
+        return 1
+    if not group_id:
+        print("❌ No group configured. Set ENTRA_GROUP_ID or pass --group-id")
+        return 1
+    if not all(urls):
+        print("❌ No notification URL. Set AWS_WEBHOOK_ENDPOINT or pass --notification-url")
+        return 1
+    try:
+        limits = {kind.strip(): int(n) for kind, n in (item.split('=', 1) for item in args.limit)}
+    except ValueError:
+        print("❌ --limit takes KIND=N, e.g. --limit transcripts=500")
+        return 1
+    if set(limits) - set(RESOURCE_TYPES):
+        print(f"❌ Unknown resource(s) in --limit: {', '.join(sorted(set(limits) - set(RESOURCE_TYPES)))}")
+        return 1
+    error = lifecycle_url_error(resource_names, args.lifecycle_url)
+    if error:
+        print(f"❌ {error}")
+        return 1
+
+    headers = get_graph_headers()
+
+    print(f"👥 Loading members of group {group_id}...")
+    members = list_group_members(group_id, headers)
+    print(f"   {len(members)} user(s)")
+
+    alias_to_id = {}
+    for m in members:
+        for alias in (m.get('mail'), m.get('userPrincipalName'), m['id']):
+            if alias:
+                alias_to_id[alias.lower()] = m['id'].lower()
+
+    print("📋 Loading existing subscriptions...")
+    existing = get_paged(f"{GRAPH_ENDPOINT}/subscriptions", headers)
+    print(f"   {len(existing)} subscription(s)")
+
+    limits = plan_limits(resource_names, limits)
+    desired, notes = build_plan(members, resource_names, urls, args.tenant_wide,
+                                args.lifecycle_url, args.max_subscriptions, limits)
+    to_create, to_keep, to_delete, to_recreate = diff_plan(desired, existing, alias_to_id, urls, resource_names)
+    cost_report(desired, to_create, to_keep, to_delete, notes, to_recreate)
+
+    if not args.apply:
+        print("\n[DRY RUN] Pass --apply to create/delete subscriptions")
+        return 0
+
+    if over_limit(desired, limits, args.max_subscriptions):
+        print("\n❌ Refusing to apply a plan over a subscription limit")
+        return 1
+
+    print(f"\n🚀 Applying: {len(to_create)} create(s), {len(to_delete)} delete(s)...")
+    created, deleted, failed = apply_plan(to_create, to_delete, headers, args.concurrency, get_tracker(), to_recreate)
+
+    print(f"\n📊 Summary:")
+    print(f"   Created: {created}")
+    print(f"   Deleted: {deleted}")
+    print(f"   Failed: {failed}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
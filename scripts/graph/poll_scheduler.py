@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Adaptive Poll Scheduler
+
+Decides which mailboxes graph-calendar-poller.py polls on each run. Every
+user gets their own interval between POLLER_MIN_INTERVAL and
+POLLER_MAX_INTERVAL:
+
+- an online meeting starting within LEAD_SECONDS (or just started) pins the
+  user to the minimum, so the bot learns about last-minute changes fast
+- further out, the interval shrinks as the next meeting approaches
+  (a few polls in the time left before the lead window)
+- a busy calendar (decayed change rate) is polled more often than an idle one
+
+The sum over users is held under POLLER_BUDGET_PER_HOUR requests by raising
+the shortest intervals of users without an imminent meeting first.
+
+The per-user record (change rate, upcoming meeting starts, last poll) is
+kept with the user's deltaLink in the poller state.
+
+Usage:
+    python scripts/graph/poll_scheduler.py plan
+    python scripts/graph/poll_scheduler.py simulate --users 500 --hours 24
+"""
+import argparse
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+from datetime import datetime, timezone
+
+from latency_report import percentile
+
+MIN_INTERVAL = float(os.getenv('POLLER_MIN_INTERVAL', '60'))
+MAX_INTERVAL = float(os.getenv('POLLER_MAX_INTERVAL', '3600'))
+BUDGET_PER_HOUR = float(os.getenv('POLLER_BUDGET_PER_HOUR', '30000'))
+
+# Meetings starting this soon (or started this recently) keep the user at MIN_INTERVAL
+LEAD_SECONDS = 10 * 60
+GRACE_SECONDS = 5 * 60
+# Polls wanted in the time left before a meeting's lead window
+POLLS_BEFORE_LEAD = 3
+# Poll often enough to expect about one change per poll
+CHANGES_PER_POLL = 1.0
+RATE_HALF_LIFE = 6 * 3600
+# Users due within this much of now are polled in this run (the poller runs every minute)
+RUN_SLACK_SECONDS = 30
+
+
+def meeting_key(event_id):
+    return hashlib.blake2b(event_id.encode('utf-8'), digest_size=6).hexdigest()
+
+
+def graph_timestamp(value):
+    """Epoch seconds of a Graph UTC date-time ('2026-02-12T09:00:00.0000000' or '...Z'), or None"""
+    try:
+        return datetime.fromisoformat(value.rstrip('Z')[:26]).replace(tzinfo=timezone.utc).timestamp()
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def event_start(event):
+    """Start of a Graph event as epoch seconds (calendarView/delta returns UTC)"""
+    return graph_timestamp((event.get('start') or {}).get('dateTime'))
+
+
+class PollScheduler:
+    """Per-user poll intervals from meeting proximity and change rate, under a request budget"""
+
+    def __init__(self, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL, budget_per_hour=BUDGET_PER_HOUR,
+                 lead=LEAD_SECONDS, slack=RUN_SLACK_SECONDS):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.budget_per_hour = budget_per_hour
+        self.lead = lead
+        self.slack = slack
+
+    def desired_interval(self, schedule, now):
+        """(seconds, urgent) for one user before the budget is applied"""
+        if not schedule:
+            return self.min_interval, False
+        interval = self.max_interval
+        rate = self.current_rate(schedule, now)
+        if rate > 0:
+            interval = min(interval, 3600 * CHANGES_PER_POLL / rate)
+
+        upcoming = [s for s in schedule.get('meetings', {}).values() if s >= now - GRACE_SECONDS]
+        if upcoming:
+            until = min(upcoming) - now
+            if until <= self.lead:
+                return self.min_interval, True
+            interval = min(interval, (until - self.lead) / POLLS_BEFORE_LEAD)
+        return max(self.min_interval, interval), False
+
+    def current_rate(self, schedule, now):
+        """Changes per hour, decayed since the last poll"""
+        elapsed = max(0.0, now - schedule.get('polled', now))
+        return schedule.get('rate', 0.0) * 0.5 ** (elapsed / RATE_HALF_LIFE)
+
+    def apply_budget(self, intervals, urgent):
+        """
+        Raise the shortest intervals until the expected requests per hour fit the budget.
+
+        Users with an imminent meeting are only slowed down once everyone
+        else is at the longest interval the budget allows.
+
+        Returns:
+            (intervals, floor): floor is the raised minimum (None if within budget)
+        """
+        def demand(floor, protected):
+            return sum(3600 / (i if u in protected else max(i, floor)) for u, i in intervals.items())
+
+        if not intervals or demand(self.min_interval, ()) <= self.budget_per_hour:
+            return intervals, None
+
+        for protected in (urgent, ()):
+            low, high = self.min_interval, max(self.max_interval, 3600 * len(intervals) / self.budget_per_hour)
+            if demand(high, protected) > self.budget_per_hour:
+                continue
+            for _ in range(40):
+                mid = (low + high) / 2
+                low, high = (mid, high) if demand(mid, protected) > self.budget_per_hour else (low, mid)
+            return {u: i if u in protected else max(i, high) for u, i in intervals.items()}, high
+
+        floor = 3600 * len(intervals) / self.budget_per_hour
+        return {u: max(i, floor) for u, i in intervals.items()}, floor
+
+    def plan(self, schedules, now=None):
+        """
+        Which users to poll now.
+
+        Args:
+            schedules: {user_id: schedule record or None}
+
+        Returns:
+            dict: due (user ids, most overdue first), intervals, urgent, floor,
+                  requests_per_hour (expected at these intervals)
+        """
+        now = now if now is not None else time.time()
+        intervals, urgent = {}, set()
+        for user_id, schedule in schedules.items():
+            intervals[user_id], is_urgent = self.desired_interval(schedule, now)
+            if is_urgent:
+                urgent.add(user_id)
+        intervals, floor = self.apply_budget(intervals, urgent)
+
+        next_poll = {u: (schedules[u] or {}).get('polled', 0) + i for u, i in intervals.items()}
+        due = sorted((u for u, t in next_poll.items() if t <= now + self.slack), key=next_poll.get)
+        return {
+            'due': due,
+            'intervals': intervals,
+            'urgent': urgent,
+            'floor': floor,
+            'requests_per_hour': round(sum(3600 / i for i in intervals.values()), 1),
+        }
+
+    def observe(self, schedule, changed, removed, now=None):
+        """Updated schedule record after a successful poll that returned these changes"""
+        now = now if now is not None else time.time()
+        schedule = dict(schedule or {})
+        previous = schedule.get('polled')
+        meetings = dict(schedule.get('meetings', {}))
+
+        for event in changed:
+            key = meeting_key(event['id'])
+            start = event_start(event)
+            if event.get('isOnlineMeeting') and not event.get('isCancelled') and start:
+                meetings[key] = start
+            else:
+                meetings.pop(key, None)
+        for event_id in removed:
+            meetings.pop(meeting_key(event_id), None)
+
+        count = len(changed) + len(removed)
+        if previous is None:
+            # The first poll is a full sync; its events say nothing about the change rate
+            rate = 0.0
+        else:
+            elapsed = max(now - previous, 60.0)
+            decay = 0.5 ** (elapsed / RATE_HALF_LIFE)
+            rate = schedule.get('rate', 0.0) * decay + (1 - decay) * count * 3600 / elapsed
+
+        schedule.update(
+            polled=now,
+            rate=round(rate, 4),
+            meetings={k: s for k, s in meetings.items() if s >= now - GRACE_SECONDS},
+        )
+        return schedule
+
+
+def simulate(scheduler, users, hours, fixed_interval=None, seed=7, tick=60):
+    """
+    Replay a synthetic day against a policy.
+
+    Each user gets online meetings during working hours; every meeting is
+    created a while before it starts and edited a few times, more often
+    close to its start. A change is detected at the first poll after it;
+    meetings created before the replay are known from the first poll.
+
+    Returns:
+        dict: requests, latencies (seconds), critical (latencies of changes
+              in the LEAD_SECONDS before a meeting)
+    """
+    rng = random.Random(seed)
+    start, end = 0.0, hours * 3600
+    changes = {}
+    for u in range(users):
+        events = []
+        for m in range(rng.randint(0, 8)):
+            day = rng.randrange(max(1, math.ceil(hours / 24)))
+            meeting_start = day * 86400 + rng.uniform(8, 18) * 3600
+            if meeting_start >= end:
+                continue
+            event_id = f"u{u}-m{m}"
+            created = meeting_start - rng.uniform(0.5, 72) * 3600
+            events.append((created, event_id, meeting_start))
+            for _ in range(rng.randint(0, 3)):
+                events.append((meeting_start - rng.expovariate(1 / 3600), event_id, meeting_start))
+        events += [(rng.uniform(start, end), f"u{u}-x{i}", None) for i in range(rng.randint(0, 4))]
+        # (time, event id, meeting start, counted): earlier creations are the initial sync
+        changes[f"u{u}"] = sorted((max(t, start), event_id, meeting_start, t >= start)
+                                  for t, event_id, meeting_start in events if t < end)
+
+    schedules = {u: None for u in changes}
+    cursor = {u: 0 for u in changes}
+    requests, latencies, critical = 0, [], []
+    last_poll = {u: start for u in changes}
+    now = start
+    while now < end:
+        if fixed_interval:
+            due = [u for u in changes if now - last_poll[u] >= fixed_interval or now == start]
+        else:
+            due = scheduler.plan(schedules, now)['due']
+        for u in due:
+            requests += 1
+            seen = []
+            while cursor[u] < len(changes[u]) and changes[u][cursor[u]][0] <= now:
+                changed_at, event_id, meeting_start, counted = changes[u][cursor[u]]
+                if counted:
+                    latencies.append(now - changed_at)
+                    if meeting_start is not None and 0 <= meeting_start - changed_at <= scheduler.lead:
+                        critical.append(now - changed_at)
+                seen.append({
+                    'id': event_id,
+                    'isOnlineMeeting': meeting_start is not None,
+                    'start': {'dateTime': datetime.fromtimestamp(
+                        meeting_start or 0, timezone.utc).replace(tzinfo=None).isoformat()},
+                })
+                cursor[u] += 1
+            # The replay clock counts from the epoch, so these start dates line up with `now`
+            schedules[u] = scheduler.observe(schedules[u], seen, [], now)
+            last_poll[u] = now
+        now += tick
+    return {'requests': requests, 'latencies': sorted(latencies), 'critical': sorted(critical)}
+
+
+def print_simulation(args):
+    scheduler = PollScheduler(args.min_interval, args.max_interval, args.budget)
+    policies = [(f"fixed {int(i // 60)} min", i) for i in (60, 300, 900)] + [("adaptive", None)]
+    print(f"🧪 {args.users} user(s) over {args.hours} h "
+          f"(adaptive: {int(args.min_interval)}-{int(args.max_interval)} s, budget {int(args.budget)}/h)")
+    print(f"\n   {'policy':<14} {'req/hour':>9} {'p50 lag':>8} {'p95 lag':>8} {'p95 lag <10 min before start':>30}")
+    for name, interval in policies:
+        result = simulate(scheduler, args.users, args.hours, fixed_interval=interval, seed=args.seed)
+        lat, crit = result['latencies'], result['critical']
+        fmt = lambda v: f"{v:.0f}s" if v is not None else "-"  # noqa: E731
+        print(f"   {name:<14} {result['requests'] / args.hours:>9.0f} {fmt(percentile(lat, 50)):>8} "
+              f"{fmt(percentile(lat, 95)):>8} {fmt(percentile(crit, 95)):>30}")
+
+
+def print_plan(args):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from poller_state import open_poller_state
+
+    state = open_poller_state(args.state)
+    users = sorted(state.known_users())
+    state.load_users(users)
+    scheduler = PollScheduler(args.min_interval, args.max_interval, args.budget)
+    plan = scheduler.plan({u: state.get_schedule(u) for u in users})
+    intervals = sorted(plan['intervals'].values())
+
+    print(f"📅 {len(users)} user(s) in {state.describe()}")
+    print(f"   Due now:          {len(plan['due'])}")
+    print(f"   Imminent meeting: {len(plan['urgent'])}")
+    print(f"   Requests/hour:    {plan['requests_per_hour']} (budget {int(args.budget)})")
+    if plan['floor']:
+        print(f"   ⚠️  Over budget: intervals raised to at least {plan['floor']:.0f}s")
+    if intervals:
+        print(f"   Interval p50/p95: {percentile(intervals, 50):.0f}s / {percentile(intervals, 95):.0f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive calendar poll scheduling")
+    parser.add_argument("--min-interval", type=float, default=MIN_INTERVAL)
+    parser.add_argument("--max-interval", type=float, default=MAX_INTERVAL)
+    parser.add_argument("--budget", type=float, default=BUDGET_PER_HOUR, help="Requests per hour for all users")
+    subparsers = parser.add_subparsers(dest="command")
+    plan_parser = subparsers.add_parser("plan", help="Show the current schedule from the poller state")
+    plan_parser.add_argument("--state", default=None, help="sqlite:PATH or dynamodb:TABLE (default POLLER_STATE)")
+    sim_parser = subparsers.add_parser("simulate", help="Detection lag vs request volume, fixed vs adaptive")
+    sim_parser.add_argument("--users", type=int, default=500)
+    sim_parser.add_argument("--hours", type=float, default=24)
+    sim_parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.command == "plan":
+        print_plan(args)
+    elif args.command == "simulate":
+        print_simulation(args)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
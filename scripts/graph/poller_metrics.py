@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+"""
+Calendar Poller Metrics
+
+Hot-path instrumentation for graph-calendar-poller.py, cheap enough to leave
+on in production: fixed-bucket histograms and plain counters, so recording a
+request, page or event only bumps integers (no per-event lists or objects).
+
+Recorded per poller:
+- request latency (ms), page size (bytes), pages, bytes, requests, errors
+- throttle waits (Retry-After sleeps) and rate-limiter waits (seconds)
+- events, removals and unchanged events skipped; events/sec over the run
+- detection lag: event lastModifiedDateTime -> emitted (seconds)
+
+Exported as CloudWatch Embedded Metric Format (one JSON log line: counters,
+histogram percentiles as metrics, bucket counts as properties) or as
+Prometheus text (textfile collector) for local runs:
+
+    POLLER_METRICS=emf                         (default in Lambda)
+    POLLER_METRICS=prometheus:.cache/poller-metrics.prom   (default locally)
+    POLLER_METRICS=off
+
+Usage:
+    python scripts/graph/poller_metrics.py show --file .cache/poller-metrics.prom
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from latency_report import BUCKETS_MS
+
+STATE_DIR = Path('/tmp') if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else Path(__file__).resolve().parents[2] / '.cache'
+DEFAULT_TARGET = os.getenv('POLLER_METRICS',
+                           'emf' if os.getenv('AWS_LAMBDA_FUNCTION_NAME')
+                           else f"prometheus:{STATE_DIR / 'poller-metrics.prom'}")
+NAMESPACE = os.getenv('POLLER_METRICS_NAMESPACE', 'TeamsMeetingFetcher/CalendarPoller')
+
+PAGE_BYTES = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+WAIT_SECONDS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60)
+LAG_SECONDS = (5, 15, 30, 60, 120, 300, 600, 1800, 3600, 21600, 86400)
+
+COUNTERS = ('requests', 'http_errors', 'throttled', 'pages', 'bytes', 'events', 'removed', 'unchanged',
+            'users_polled', 'user_errors')
+# Histograms whose sum is also emitted as an EMF metric (<name>_total)
+TOTALS = ('throttle_wait_seconds', 'rate_limit_wait_seconds')
+
+
+class Histogram:
+    """Fixed upper-bound buckets (the last one open-ended) with count, sum and max"""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (capped at max; None if empty)"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        seen = 0
+        for bound, n in zip(self.bounds, self.counts):
+            seen += n
+            if seen >= rank:
+                return round(min(bound, self.max), 3)
+        return round(self.max, 3)
+
+
+class PollerMetrics:
+    """Counters and histograms for one poller process"""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.histograms = {
+            'request_ms': Histogram(BUCKETS_MS),
+            'page_bytes': Histogram(PAGE_BYTES),
+            'throttle_wait_seconds': Histogram(WAIT_SECONDS),
+            'rate_limit_wait_seconds': Histogram(WAIT_SECONDS),
+            'detection_lag_seconds': Histogram(LAG_SECONDS),
+        }
+
+    def request(self, ms, status):
+        self.counters['requests'] += 1
+        if status >= 400:
+            self.counters['http_errors'] += 1
+        self.histograms['request_ms'].observe(ms)
+
+    def page(self, size):
+        self.counters['pages'] += 1
+        self.counters['bytes'] += size
+        self.histograms['page_bytes'].observe(size)
+
+    def throttle(self, seconds):
+        self.counters['throttled'] += 1
+        self.histograms['throttle_wait_seconds'].observe(seconds)
+
+    def rate_limited(self, seconds):
+        self.histograms['rate_limit_wait_seconds'].observe(seconds)
+
+    def user(self, changed=0, removed=0, unchanged=0, error=False):
+        if error:
+            self.counters['user_errors'] += 1
+            return
+        self.counters['users_polled'] += 1
+        self.counters['events'] += changed
+        self.counters['removed'] += removed
+        self.counters['unchanged'] += unchanged
+
+    def lag(self, seconds):
+        self.histograms['detection_lag_seconds'].observe(max(seconds, 0.0))
+
+    def events_per_second(self):
+        elapsed = time.monotonic() - self.started
+        return (self.counters['events'] + self.counters['removed']) / elapsed if elapsed > 0 else 0.0
+
+    def snapshot(self):
+        """Counters plus count/sum/p50/p95/p99/max per histogram"""
+        data = dict(self.counters)
+        data['events_per_second'] = round(self.events_per_second(), 2)
+        for name, histogram in self.histograms.items():
+            data[name] = {'count': histogram.count, 'sum': round(histogram.total, 3), 'p50': histogram.quantile(0.5),
+                          'p95': histogram.quantile(0.95), 'p99': histogram.quantile(0.99),
+                          'max': round(histogram.max, 3) if histogram.count else None}
+        return data
+
+    def emf(self, namespace=NAMESPACE, dimensions=None):
+        """One CloudWatch Embedded Metric Format record"""
+        dimensions = dimensions or {'Function': os.getenv('AWS_LAMBDA_FUNCTION_NAME', 'graph-calendar-poller')}
+        units = {'bytes': 'Bytes', 'page_bytes': 'Bytes', 'request_ms': 'Milliseconds',
+                 'events_per_second': 'Count/Second'}
+        record, metrics = dict(dimensions), []
+
+        def metric(name, value, unit):
+            record[name] = value
+            metrics.append({'Name': name, 'Unit': unit})
+
+        for name, value in self.counters.items():
+            metric(name, value, units.get(name, 'Count'))
+        metric('events_per_second', round(self.events_per_second(), 2), units['events_per_second'])
+        histograms = {}
+        for name, histogram in self.histograms.items():
+            histograms[name] = {'bounds': list(histogram.bounds), 'counts': histogram.counts,
+                                'count': histogram.count, 'sum': round(histogram.total, 3)}
+            if name in TOTALS:
+                metric(f"{name}_total", round(histogram.total, 3), 'Seconds')
+            if not histogram.count:
+                continue
+            unit = 'Seconds' if name.endswith('_seconds') else units[name]
+            for label, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                metric(f"{name}_{label}", histogram.quantile(q), unit)
+            metric(f"{name}_max", round(histogram.max, 3), unit)
+
+        record['histograms'] = histograms
+        record['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{'Namespace': namespace, 'Dimensions': [list(dimensions)], 'Metrics': metrics}],
+        }
+        return record
+
+    def prometheus(self, prefix='graph_poller'):
+        """Prometheus text exposition format"""
+        lines = []
+        for name, value in self.counters.items():
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        lines += [f"# TYPE {prefix}_events_per_second gauge",
+                  f"{prefix}_events_per_second {self.events_per_second():.3f}"]
+        for name, histogram in self.histograms.items():
+            lines.append(f"# TYPE {prefix}_{name} histogram")
+            cumulative = 0
+            for bound, n in zip(histogram.bounds, histogram.counts):
+                cumulative += n
+                lines.append(f'{prefix}_{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines += [f'{prefix}_{name}_bucket{{le="+Inf"}} {histogram.count}',
+                      f"{prefix}_{name}_sum {histogram.total:.3f}",
+                      f"{prefix}_{name}_count {histogram.count}"]
+        return '\n'.join(lines) + '\n'
+
+
+def emit(metrics, target=DEFAULT_TARGET):
+    """Write the metrics to target ('emf' -> stdout, 'prometheus:<path>', 'off'); returns target"""
+    if not target or target == 'off':
+        return None
+    if target == 'emf':
+        print(json.dumps(metrics.emf()), flush=True)
+    elif target.startswith('prometheus:'):
+        path = Path(target.split(':', 1)[1])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(metrics.prometheus())
+        tmp.replace(path)
+    else:
+        raise ValueError(f"Unknown POLLER_METRICS target: {target}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the calendar poller's last Prometheus metrics file")
+    subparsers = parser.add_subparsers(dest="command")
+    show_parser = subparsers.add_parser("show", help="Print counters and histogram totals")
+    show_parser.add_argument("--file", default=str(STATE_DIR / 'poller-metrics.prom'))
+    args = parser.parse_args()
+    if args.command != "show":
+        parser.print_help()
+        return 1
+
+    path = Path(args.file)
+    if not path.exists():
+        print(f"❌ No metrics at {path} (run the poller locally first)")
+        return 1
+    print(f"📊 {path}")
+    for line in path.read_text().splitlines():
+        if not line.startswith('#') and '_bucket{' not in line:
+            name, value = line.rsplit(' ', 1)
+            print(f"   {name:<55} {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
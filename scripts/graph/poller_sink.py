@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Calendar Poller Sink
+
+Delivers the changes emitted by graph-calendar-poller.py downstream in
+batches: records are buffered and sent once a batch reaches its byte or
+count limit, or after a short linger, with a few sends in flight at once.
+A failed send is retried with backoff (Retry-After honoured, oversized
+batches split in half); flush() raises SinkError if anything could not be
+delivered, so the poller keeps its old deltaLinks and re-emits next run.
+
+Sinks (same interface):
+    eventhub:NAMESPACE/HUB   Event Hubs REST batch send, AAD app credentials
+    file:PATH                local JSON Lines stand-in, one line per message
+
+With compression on, up to PACK_RECORDS records travel as one gzip'd JSON
+Lines message (UserProperties contentEncoding=gzip, base64 body), which
+cuts Event Hub ingress several-fold; off by default so consumers that read
+event bodies as JSON keep working.
+
+Usage:
+    python scripts/graph/poller_sink.py cat .cache/poller-events.jsonl
+"""
+import argparse
+import asyncio
+import base64
+import gzip
+import json
+import os
+import random
+import sys
+import time
+
+import httpx
+import requests
+
+DEFAULT_SINK = os.getenv('POLLER_SINK')
+DEFAULT_COMPRESS = os.getenv('POLLER_SINK_COMPRESS', '').lower() in ('1', 'true', 'gzip')
+
+# Event Hubs (Standard) rejects requests over 1 MB; leave room for the REST envelope
+MAX_BATCH_BYTES = 1000 * 1024
+MAX_BATCH_COUNT = 500
+LINGER_SECONDS = 1.0
+MAX_IN_FLIGHT = 4
+MAX_RETRIES = 5
+PACK_RECORDS = 200
+
+EVENTHUB_SCOPE = 'https://eventhubs.azure.net/.default'
+
+
+class SinkError(Exception):
+    """Records could not be delivered"""
+
+
+class RetryableSend(Exception):
+    """Transient send failure (throttled, server error, connection problem)"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class BatchTooLarge(Exception):
+    """The receiver rejected the batch for its size"""
+
+
+def encode_json(record):
+    return json.dumps(record, separators=(',', ':'), default=str)
+
+
+def message_size(message):
+    return len(encode_json(message).encode('utf-8'))
+
+
+def decode_message(message):
+    """Records carried by one message (either form)"""
+    props = message.get('UserProperties') or {}
+    if props.get('contentEncoding') == 'gzip':
+        lines = gzip.decompress(base64.b64decode(message['Body'])).decode('utf-8').splitlines()
+        return [json.loads(line) for line in lines if line]
+    return [json.loads(message['Body'])]
+
+
+class BatchingSink:
+    """
+    Buffers records into size/count-bounded batches and sends them concurrently.
+
+    Subclasses implement _send(messages) (one request) and may override close().
+    Call flush() when records must be delivered; close() only releases resources.
+    """
+
+    def __init__(self, max_batch_bytes=MAX_BATCH_BYTES, max_batch_count=MAX_BATCH_COUNT,
+                 linger=LINGER_SECONDS, max_in_flight=MAX_IN_FLIGHT, compress=DEFAULT_COMPRESS,
+                 max_retries=MAX_RETRIES, pack_records=PACK_RECORDS):
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_count = max_batch_count
+        self.linger = linger
+        self.max_in_flight = max_in_flight
+        self.compress = compress
+        self.max_retries = max_retries
+        self.pack_records = pack_records
+        self.batch, self.batch_bytes = [], 0
+        self.packed = []
+        self.slots = None
+        self.in_flight = set()
+        self.timer = None
+        self.failed = []
+        self.stats = {'records': 0, 'messages': 0, 'requests': 0, 'bytes': 0, 'retries': 0,
+                      'splits': 0, 'failed_records': 0}
+
+    # -- building messages --
+
+    def record_message(self, record):
+        return {
+            'Body': encode_json(record),
+            'UserProperties': {'contentType': 'application/json', 'type': record.get('type', '')},
+        }
+
+    def pack_message(self, records):
+        lines = ''.join(encode_json(r) + '\n' for r in records).encode('utf-8')
+        return {
+            'Body': base64.b64encode(gzip.compress(lines, compresslevel=6)).decode('ascii'),
+            'UserProperties': {'contentType': 'application/x-ndjson', 'contentEncoding': 'gzip',
+                               'records': len(records)},
+        }
+
+    async def add(self, records):
+        """Queue records; waits while max_in_flight batches are being sent"""
+        for record in records:
+            self.stats['records'] += 1
+            if self.compress:
+                self.packed.append(record)
+                if len(self.packed) >= self.pack_records:
+                    await self._seal_pack()
+            else:
+                await self._append(self.record_message(record), 1)
+        if (self.batch or self.packed) and self.timer is None and self.linger is not None:
+            self.timer = asyncio.create_task(self._linger())
+
+    async def _seal_pack(self, records=None):
+        records = records if records is not None else self.packed
+        if records is self.packed:
+            self.packed = []
+        if not records:
+            return
+        message = self.pack_message(records)
+        if message_size(message) > self.max_batch_bytes and len(records) > 1:
+            half = len(records) // 2
+            await self._seal_pack(records[:half])
+            await self._seal_pack(records[half:])
+            return
+        await self._append(message, len(records))
+
+    async def _append(self, message, count):
+        size = message_size(message)
+        if size > self.max_batch_bytes:
+            self.stats['failed_records'] += count
+            self.failed.append(f"message of {size} bytes exceeds the {self.max_batch_bytes} byte batch limit")
+            return
+        if self.batch and (self.batch_bytes + size > self.max_batch_bytes or len(self.batch) >= self.max_batch_count):
+            await self._dispatch()
+        self.batch.append((message, count))
+        self.batch_bytes += size
+        if len(self.batch) >= self.max_batch_count:
+            await self._dispatch()
+
+    # -- sending --
+
+    async def _linger(self):
+        await asyncio.sleep(self.linger)
+        # Past the sleep flush() no longer cancels this task; it waits for it
+        self.timer = None
+        task = asyncio.current_task()
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+        await self._seal_pack()
+        await self._dispatch()
+
+    async def _dispatch(self):
+        if not self.batch:
+            return
+        if self.slots is None:
+            self.slots = asyncio.Semaphore(self.max_in_flight)
+        # Take the batch only once a slot is held, so a cancelled wait loses nothing
+        await self.slots.acquire()
+        if not self.batch:
+            self.slots.release()
+            return
+        batch, self.batch, self.batch_bytes = self.batch, [], 0
+        task = asyncio.create_task(self._deliver(batch))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def _deliver(self, batch):
+        try:
+            await self._send_with_retry(batch)
+        finally:
+            self.slots.release()
+
+    async def _send_with_retry(self, batch):
+        messages = [m for m, _ in batch]
+        for attempt in range(self.max_retries + 1):
+            try:
+                await self._send(messages)
+            except BatchTooLarge:
+                if len(batch) == 1:
+                    break
+                self.stats['splits'] += 1
+                half = len(batch) // 2
+                await self._send_with_retry(batch[:half])
+                await self._send_with_retry(batch[half:])
+                return
+            except RetryableSend as e:
+                if attempt == self.max_retries:
+                    break
+                self.stats['retries'] += 1
+                await asyncio.sleep(e.retry_after or min(30, 0.5 * 2 ** attempt) * (0.5 + random.random()))
+                continue
+            except Exception as e:
+                self.failed.append(str(e))
+                break
+            self.stats['requests'] += 1
+            self.stats['messages'] += len(messages)
+            self.stats['bytes'] += sum(message_size(m) for m in messages)
+            return
+        self.stats['failed_records'] += sum(count for _, count in batch)
+        self.failed.append(f"batch of {len(batch)} message(s) not delivered after {attempt + 1} attempt(s)")
+
+    async def _send(self, messages):
+        raise NotImplementedError
+
+    async def flush(self):
+        """Send everything buffered and wait for it; raises SinkError if anything was not delivered"""
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        await self._seal_pack()
+        await self._dispatch()
+        while self.in_flight:
+            await asyncio.gather(*list(self.in_flight))
+        if self.failed:
+            failed, self.failed = self.failed, []
+            raise SinkError(f"{self.stats['failed_records']} record(s) not delivered: {failed[0]}")
+
+    async def close(self):
+        """Release connections (does not flush)"""
+
+
+class FileSink(BatchingSink):
+    """Appends each message as a JSON line with its batch number; local stand-in for tests"""
+
+    def __init__(self, path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.batches = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    async def _send(self, messages):
+        self.batches += 1
+        lines = ''.join(encode_json({'batch': self.batches, **m}) + '\n' for m in messages)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def describe(self):
+        return f"file {self.path}"
+
+
+class EventHubSink(BatchingSink):
+    """Event Hubs REST 'send batch' with an AAD client-credentials token"""
+
+    def __init__(self, namespace, hub, tenant_id=None, client_id=None, client_secret=None, **kwargs):
+        super().__init__(**kwargs)
+        host = namespace if '.' in namespace else f"{namespace}.servicebus.windows.net"
+        self.url = f"https://{host}/{hub}/messages"
+        self.hub = hub
+        self.tenant_id = tenant_id or os.getenv('AZURE_TENANT_ID') or os.getenv('GRAPH_TENANT_ID')
+        self.client_id = client_id or os.getenv('AZURE_CLIENT_ID') or os.getenv('GRAPH_CLIENT_ID')
+        self.client_secret = client_secret or os.getenv('AZURE_CLIENT_SECRET') or os.getenv('GRAPH_CLIENT_SECRET')
+        self.access_token = None
+        self.token_expires = 0
+        self.client = None
+
+    def get_access_token(self):
+        """Event Hubs access token (renewed 5 minutes before it expires)"""
+        if self.access_token and time.time() < self.token_expires - 300:
+            return self.access_token
+        response = requests.post(
+            f"https://login.microsoftonline.com/{self.tenant_id}/oauth2/v2.0/token",
+            data={
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'scope': EVENTHUB_SCOPE,
+                'grant_type': 'client_credentials',
+            },
+            timeout=10,
+        )
+        if response.status_code != 200:
+            raise SinkError(f"Failed to get Event Hubs token: {response.text[:300]}")
+        token = response.json()
+        self.access_token = token['access_token']
+        self.token_expires = time.time() + int(token.get('expires_in', 3600))
+        return self.access_token
+
+    async def _send(self, messages):
+        if self.client is None:
+            limits = httpx.Limits(max_connections=self.max_in_flight)
+            self.client = httpx.AsyncClient(limits=limits, timeout=60)
+        token = await asyncio.to_thread(self.get_access_token)
+        try:
+            response = await self.client.post(
+                self.url,
+                params={'timeout': 60, 'api-version': '2014-01'},
+                headers={'Authorization': f'Bearer {token}',
+                         'Content-Type': 'application/vnd.microsoft.servicebus.json'},
+                content=encode_json(messages),
+            )
+        except httpx.TransportError as e:
+            raise RetryableSend(f"{type(e).__name__}: {e}")
+        if response.status_code in (200, 201):
+            return
+        if response.status_code == 413:
+            raise BatchTooLarge(response.text[:200])
+        if response.status_code == 401:
+            self.access_token = None
+            raise RetryableSend("401 Unauthorized")
+        if response.status_code in (408, 429) or response.status_code >= 500:
+            retry_after = response.headers.get('Retry-After')
+            raise RetryableSend(f"{response.status_code}",
+                                float(retry_after) if retry_after and retry_after.isdigit() else None)
+        raise SinkError(f"Event Hub send failed: {response.status_code} - {response.text[:300]}")
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def describe(self):
+        return f"Event Hub {self.hub}"
+
+
+def open_sink(spec=None, **kwargs):
+    """
+    Sink from an eventhub:NAMESPACE/HUB or file:PATH spec (default: POLLER_SINK,
+    else EVENT_HUB_NAMESPACE/EVENT_HUB_NAME when both are set). None if neither.
+    """
+    spec = spec or DEFAULT_SINK
+    if not spec and os.getenv('EVENT_HUB_NAMESPACE') and os.getenv('EVENT_HUB_NAME'):
+        spec = f"eventhub:{os.getenv('EVENT_HUB_NAMESPACE')}/{os.getenv('EVENT_HUB_NAME')}"
+    if not spec:
+        return None
+    if spec.startswith('file:'):
+        return FileSink(spec[len('file:'):], **kwargs)
+    if spec.startswith('eventhub:'):
+        namespace, _, hub = spec[len('eventhub:'):].rpartition('/')
+        if not namespace or not hub:
+            raise ValueError(f"Event Hub sink needs eventhub:NAMESPACE/HUB, got {spec}")
+        return EventHubSink(namespace, hub, **kwargs)
+    raise ValueError(f"Unknown poller sink: {spec} (use eventhub:NAMESPACE/HUB or file:PATH)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calendar poller sink tools")
+    subparsers = parser.add_subparsers(dest="command")
+    cat_parser = subparsers.add_parser("cat", help="Print the records in a file sink")
+    cat_parser.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command != "cat":
+        parser.print_help()
+        return 1
+
+    with open(args.path, encoding='utf-8') as f:
+        for line in f:
+            for record in decode_message(json.loads(line)):
+                print(encode_json(record))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+"""
+Calendar Poller State Store
+
+Everything graph-calendar-poller.py has to remember between runs:
+
+- per-user delta state (deltaLink, sync window, last sync time)
+- the cached ENTRA_GROUP_ID member list
+- per-event fingerprints, so an event is only emitted when its content
+  changed (a full resync after 410 Gone re-emits nothing that is unchanged)
+
+Events are stored compactly: a 16-byte hash of (user, event id) as the key
+and 8-byte hashes of the changeKey and of the fields downstream cares about
+(no bodies), about 40 bytes per event.
+
+Backends (same interface):
+    sqlite:PATH         local runs and tests (default)
+    dynamodb:TABLE      deployed poller; single table, pk 'u#<user>' / 'e#<hash>' / 'members'
+
+In Lambda POLLER_STATE must name a DynamoDB table: /tmp does not survive a
+cold start, and losing the deltaLinks means a full resync of every user.
+
+Usage:
+    python scripts/graph/poller_state.py stats
+    python scripts/graph/poller_state.py purge
+    python scripts/graph/poller_state.py create-table --table graph-calendar-poller-state
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import boto3
+from boto3.dynamodb.types import Binary
+
+IN_LAMBDA = bool(os.getenv('AWS_LAMBDA_FUNCTION_NAME'))
+STATE_DIR = Path(__file__).resolve().parents[2] / '.cache'
+# No local default in Lambda (see open_poller_state)
+DEFAULT_STATE = os.getenv('POLLER_STATE', None if IN_LAMBDA else f"sqlite:{STATE_DIR / 'calendar-poller-state.sqlite'}")
+DEFAULT_TABLE = 'graph-calendar-poller-state'
+
+# Fingerprints are kept this long after the event ends
+EVENT_RETENTION = timedelta(days=30)
+
+# Fields whose changes matter downstream; attendee responses and other churn are ignored
+CONTENT_FIELDS = (
+    'subject', 'start', 'end', 'isAllDay', 'isCancelled', 'isOnlineMeeting', 'onlineMeetingProvider',
+    'onlineMeeting', 'onlineMeetingUrl', 'location', 'organizer', 'recurrence', 'type',
+    'seriesMasterId', 'showAs', 'sensitivity',
+)
+
+
+def event_key(user_id, event_id):
+    """16-byte store key of one user's event"""
+    return hashlib.blake2b(f"{user_id}\x1f{event_id}".encode('utf-8'), digest_size=16).digest()
+
+
+def content_hash(event):
+    """8-byte hash of the CONTENT_FIELDS (attendees reduced to who is invited)"""
+    content = {field: event.get(field) for field in CONTENT_FIELDS}
+    content['attendees'] = sorted(
+        ((a.get('emailAddress') or {}).get('address', '').lower(), a.get('type'))
+        for a in event.get('attendees') or []
+    )
+    return hashlib.blake2b(json.dumps(content, sort_keys=True, default=str).encode('utf-8'), digest_size=8).digest()
+
+
+def change_hash(event):
+    change_key = event.get('changeKey')
+    return hashlib.blake2b(change_key.encode('utf-8'), digest_size=8).digest() if change_key else b''
+
+
+def event_expiry(event):
+    """Epoch seconds after which the event's fingerprint can be dropped"""
+    end = (event.get('end') or {}).get('dateTime')
+    try:
+        ends = datetime.fromisoformat(end[:26]).replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        ends = datetime.now(timezone.utc)
+    return int((max(ends, datetime.now(timezone.utc)) + EVENT_RETENTION).timestamp())
+
+
+class PollerState:
+    """
+    Shared logic; backends implement the _load/_save primitives.
+
+    User records are cached in memory (load_users() fetches many at once).
+    Fingerprints from filter_changes() are staged until put() stores that
+    user's new deltaLink, and only written by flush(); a run that dies
+    before its changes were delivered re-fetches and re-emits them instead
+    of losing them.
+    """
+
+    def __init__(self):
+        # filter_changes() and flush() are called from worker threads
+        self.pending_lock = threading.Lock()
+        self.pending_events = {}
+        self.pending_deletes = set()
+        self.staged = {}
+        self.users = {}
+        self.dirty_users = set()
+        self.dropped_users = set()
+        self.members = None
+        self.members_dirty = False
+        self.stats = {'changed_in': 0, 'changed_out': 0, 'removed_in': 0, 'removed_out': 0}
+
+    # -- delta state (same interface the poller used with its JSON file) --
+
+    def load_users(self, user_ids):
+        missing = [u for u in user_ids if u not in self.users]
+        if missing:
+            self.users.update(self._load_users(missing))
+
+    def get(self, user_id):
+        if user_id not in self.users:
+            self.load_users([user_id])
+        return self.users.get(user_id)
+
+    def put(self, user_id, delta_link, window_start, window_end):
+        with self.pending_lock:
+            # New dicts rather than in-place updates: flush() may be serializing the old one
+            self.users[user_id] = {
+                **(self.users.get(user_id) or {}),
+                'delta_link': delta_link,
+                'window_start': window_start,
+                'window_end': window_end,
+                'synced_at': datetime.now(timezone.utc).isoformat(),
+            }
+            self.dirty_users.add(user_id)
+            self.dropped_users.discard(user_id)
+            writes, deletes = self.staged.pop(user_id, ({}, set()))
+            self.pending_events.update(writes)
+            self.pending_deletes.difference_update(writes)
+            self.pending_deletes.update(deletes)
+
+    def drop(self, user_id):
+        with self.pending_lock:
+            self.users.pop(user_id, None)
+            self.dirty_users.discard(user_id)
+            self.staged.pop(user_id, None)
+            self.dropped_users.add(user_id)
+
+    def last_synced(self, user_id):
+        """When the user was last polled ('' if never), for oldest-first ordering"""
+        return (self.users.get(user_id) or {}).get('synced_at', '')
+
+    def get_schedule(self, user_id):
+        """The poll scheduler's record for the user (see poll_scheduler.py), or None"""
+        return (self.users.get(user_id) or {}).get('schedule')
+
+    def put_schedule(self, user_id, schedule):
+        with self.pending_lock:
+            self.users[user_id] = {**(self.users.get(user_id) or {}), 'schedule': schedule}
+            self.dirty_users.add(user_id)
+            self.dropped_users.discard(user_id)
+
+    def known_users(self):
+        return set(self._all_user_ids()) | set(self.users)
+
+    def get_members(self):
+        """(fetched_at, [{'id', 'upn'}]) of the cached group membership, or None"""
+        if self.members is None:
+            self.members = self._load_members()
+        return (self.members['fetched_at'], self.members['users']) if self.members else None
+
+    def put_members(self, users):
+        self.members = {'fetched_at': datetime.now(timezone.utc).isoformat(), 'users': users}
+        self.members_dirty = True
+
+    def flush(self):
+        # Take everything pending first; put() may run while this writes
+        with self.pending_lock:
+            dirty, dropped = self.dirty_users, self.dropped_users
+            self.dirty_users, self.dropped_users = set(), set()
+            members_dirty, self.members_dirty = self.members_dirty, False
+            writes, deletes = self.pending_events, self.pending_deletes
+            self.pending_events, self.pending_deletes = {}, set()
+        if dirty or dropped:
+            self._save_users({u: self.users[u] for u in dirty if u in self.users}, dropped)
+        if members_dirty:
+            self._save_members(self.members)
+        if writes or deletes:
+            self._save_events(writes, list(deletes))
+
+    # -- change suppression --
+
+    def filter_changes(self, user_id, changed, removed):
+        """
+        Drop events whose content is unchanged since they were last emitted.
+
+        changed and removed should hold each id once, at its last state in
+        the round (iter_changes collapses them); a repeated changed id keeps
+        its last version and an id in both is treated as removed.
+
+        Returns:
+            (changed events to emit, removed ids to emit); removals are only
+            emitted for events that were emitted before. The new fingerprints
+            are staged until put() records the deltaLink they belong to.
+        """
+        removed = list(dict.fromkeys(removed))
+        removed_keys = {event_id: event_key(user_id, event_id) for event_id in removed}
+        changed = list({event['id']: event for event in changed if event['id'] not in removed_keys}.values())
+        keys = {event['id']: event_key(user_id, event['id']) for event in changed}
+        known = self._load_events(list(keys.values()) + list(removed_keys.values()))
+
+        emit, writes = [], {}
+        for event in changed:
+            key = keys[event['id']]
+            previous = known.get(key)
+            change = change_hash(event)
+            if previous and change and previous[0] == change:
+                continue
+            content = content_hash(event)
+            writes[key] = (change, content, event_expiry(event))
+            if previous and previous[1] == content:
+                continue
+            emit.append(event)
+
+        emit_removed = [event_id for event_id, key in removed_keys.items() if key in known]
+
+        with self.pending_lock:
+            self.staged[user_id] = (writes, {removed_keys[i] for i in emit_removed})
+            self.stats['changed_in'] += len(changed)
+            self.stats['removed_in'] += len(removed)
+            self.stats['changed_out'] += len(emit)
+            self.stats['removed_out'] += len(emit_removed)
+        return emit, emit_removed
+
+
+class SqlitePollerState(PollerState):
+    """Poller state in one local SQLite file"""
+
+    def __init__(self, path):
+        super().__init__()
+        if path != ':memory:':
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        # The poller calls in from worker threads; one connection behind a lock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                state TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS events (
+                k BLOB PRIMARY KEY,
+                change BLOB NOT NULL,
+                content BLOB NOT NULL,
+                expires_at INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (
+                name TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            );
+        """)
+
+    def _load_users(self, user_ids):
+        found = {}
+        with self.lock:
+            for i in range(0, len(user_ids), 500):
+                chunk = user_ids[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT user_id, state FROM users WHERE user_id IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((user_id, json.loads(state)) for user_id, state in rows)
+        return found
+
+    def _all_user_ids(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute("SELECT user_id FROM users")]
+
+    def _save_users(self, users, dropped):
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO users (user_id, state) VALUES (?, ?)",
+                                  [(u, json.dumps(s)) for u, s in users.items()])
+            self.conn.executemany("DELETE FROM users WHERE user_id = ?", [(u,) for u in dropped])
+            self.conn.commit()
+
+    def _load_members(self):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE name = 'members'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _save_members(self, members):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('members', ?)",
+                              (json.dumps(members),))
+            self.conn.commit()
+
+    def _load_events(self, keys):
+        found = {}
+        with self.lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                rows = self.conn.execute(
+                    f"SELECT k, change, content FROM events WHERE k IN ({','.join('?' * len(chunk))})", chunk)
+                found.update((k, (change, content)) for k, change, content in rows)
+        return found
+
+    def _save_events(self, writes, deletes):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO events (k, change, content, expires_at) VALUES (?, ?, ?, ?)",
+                [(k, *v) for k, v in writes.items()])
+            self.conn.executemany("DELETE FROM events WHERE k = ?", [(k,) for k in deletes])
+            self.conn.commit()
+
+    def purge(self, now=None):
+        """Drop fingerprints of events that ended more than EVENT_RETENTION ago"""
+        with self.lock:
+            removed = self.conn.execute("DELETE FROM events WHERE expires_at < ?",
+                                        (int(now or time.time()),)).rowcount
+            self.conn.commit()
+        return removed
+
+    def counts(self):
+        with self.lock:
+            users = self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+            events = self.conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+        return {'users': users, 'events': events}
+
+    def describe(self):
+        return f"SQLite {self.path}"
+
+
+class DynamoPollerState(PollerState):
+    """Poller state in one DynamoDB table (TTL on expires_at drops old event fingerprints)"""
+
+    def __init__(self, table_name=DEFAULT_TABLE, profile=None, region=None):
+        super().__init__()
+        if profile is None and not os.getenv('AWS_LAMBDA_FUNCTION_NAME'):
+            profile = os.getenv('AWS_PROFILE', 'tmf-dev')
+        session = boto3.Session(profile_name=profile, region_name=region or os.getenv('AWS_REGION', 'us-east-1'))
+        self.dynamodb = session.resource('dynamodb')
+        self.table_name = table_name
+        self.table = self.dynamodb.Table(table_name)
+
+    def check(self):
+        """Raise if the table is missing or unreachable"""
+        self.table.table_status
+
+    def _batch_get(self, pks, projection):
+        # BatchGetItem rejects a request that names the same key twice
+        pks = list(dict.fromkeys(pks))
+        items = []
+        for i in range(0, len(pks), 100):
+            request = {self.table_name: {'Keys': [{'pk': pk} for pk in pks[i:i + 100]],
+                                         'ProjectionExpression': projection}}
+            while request:
+                response = self.dynamodb.batch_get_item(RequestItems=request)
+                items.extend(response['Responses'].get(self.table_name, []))
+                request = response.get('UnprocessedKeys') or None
+        return items
+
+    def _load_users(self, user_ids):
+        items = self._batch_get([f"u#{u}" for u in user_ids], 'pk, d')
+        return {item['pk'][2:]: json.loads(item['d']) for item in items}
+
+    def _all_user_ids(self):
+        ids = []
+        params = {'FilterExpression': 'begins_with(pk, :u)', 'ExpressionAttributeValues': {':u': 'u#'},
+                  'ProjectionExpression': 'pk'}
+        while True:
+            page = self.table.scan(**params)
+            ids.extend(item['pk'][2:] for item in page['Items'])
+            if 'LastEvaluatedKey' not in page:
+                return ids
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    def _save_users(self, users, dropped):
+        with self.table.batch_writer() as batch:
+            for user_id, state in users.items():
+                batch.put_item(Item={'pk': f"u#{user_id}", 'd': json.dumps(state)})
+            for user_id in dropped:
+                batch.delete_item(Key={'pk': f"u#{user_id}"})
+
+    def _load_members(self):
+        item = self.table.get_item(Key={'pk': 'members'}).get('Item')
+        # gzip keeps thousands of members well under the 400 KB item limit
+        return json.loads(gzip.decompress(bytes(item['m']))) if item else None
+
+    def _save_members(self, members):
+        self.table.put_item(Item={'pk': 'members', 'm': Binary(gzip.compress(json.dumps(members).encode('utf-8')))})
+
+    def _load_events(self, keys):
+        items = self._batch_get([f"e#{k.hex()}" for k in keys], 'pk, c, h')
+        return {bytes.fromhex(item['pk'][2:]): (bytes(item['c']), bytes(item['h'])) for item in items}
+
+    def _save_events(self, writes, deletes):
+        with self.table.batch_writer(overwrite_by_pkeys=['pk']) as batch:
+            for k, (change, content, expires_at) in writes.items():
+                batch.put_item(Item={'pk': f"e#{k.hex()}", 'c': Binary(change), 'h': Binary(content),
+                                     'expires_at': expires_at})
+            for k in deletes:
+                batch.delete_item(Key={'pk': f"e#{k.hex()}"})
+
+    def purge(self, now=None):
+        # Expired fingerprints are removed by DynamoDB TTL on expires_at
+        return 0
+
+    def counts(self):
+        users = events = 0
+        params = {'ProjectionExpression': 'pk'}
+        while True:
+            page = self.table.scan(**params)
+            users += sum(1 for item in page['Items'] if item['pk'].startswith('u#'))
+            events += sum(1 for item in page['Items'] if item['pk'].startswith('e#'))
+            if 'LastEvaluatedKey' not in page:
+                return {'users': users, 'events': events}
+            params['ExclusiveStartKey'] = page['LastEvaluatedKey']
+
+    def create_table(self):
+        print(f"📝 Creating DynamoDB table '{self.table_name}'...")
+        table = self.dynamodb.create_table(
+            TableName=self.table_name,
+            KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST',
+        )
+        table.meta.client.get_waiter('table_exists').wait(TableName=self.table_name)
+        table.meta.client.update_time_to_live(
+            TableName=self.table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expires_at'},
+        )
+        print("✅ Table created with TTL on expires_at")
+
+    def describe(self):
+        return f"DynamoDB {self.table_name}"
+
+
+def open_poller_state(spec=None, profile=None):
+    """State store from a sqlite:PATH or dynamodb:TABLE spec (default: POLLER_STATE)"""
+    spec = spec or DEFAULT_STATE
+    if IN_LAMBDA and not (spec or '').startswith('dynamodb:'):
+        raise RuntimeError(f"POLLER_STATE must be dynamodb:TABLE in Lambda (got {spec!r}); "
+                           "local state is lost on every cold start")
+    if spec.startswith('sqlite:'):
+        return SqlitePollerState(spec[len('sqlite:'):])
+    if spec.startswith('dynamodb:'):
+        store = DynamoPollerState(spec[len('dynamodb:'):] or DEFAULT_TABLE, profile)
+        store.check()
+        return store
+    raise ValueError(f"Unknown poller state: {spec} (use sqlite:PATH or dynamodb:TABLE)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calendar poller state store tools")
+    parser.add_argument("--state", default=DEFAULT_STATE, help="sqlite:PATH or dynamodb:TABLE")
+    parser.add_argument("--profile", default=None)
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("stats", help="Users and event fingerprints stored")
+    subparsers.add_parser("purge", help="Drop fingerprints of long-finished events (SQLite)")
+    table_parser = subparsers.add_parser("create-table", help="Create the DynamoDB state table")
+    table_parser.add_argument("--table", default=DEFAULT_TABLE)
+    args = parser.parse_args()
+
+    if args.command == "create-table":
+        DynamoPollerState(args.table, args.profile).create_table()
+        return 0
+    if args.command not in ("stats", "purge"):
+        parser.print_help()
+        return 1
+
+    state = open_poller_state(args.state, args.profile)
+    if args.command == "purge":
+        print(f"🧹 Removed {state.purge()} expired fingerprint(s) from {state.describe()}")
+    counts = state.counts()
+    print(f"📊 {state.describe()}: {counts['users']} user(s), {counts['events']} event fingerprint(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
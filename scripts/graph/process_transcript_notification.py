@@ -3,7 +3,12 @@
 Process webhook notification and fetch transcript.
 
 This script simulates processing a webhook notification by extracting
-transcript details and fetching the content.
+transcript details and fetching the content. Lifecycle notifications
+(reauthorizationRequired, subscriptionRemoved, missed) in the same payload
+are handled by lifecycle_handler; transcripts a 'missed' resync recovers are
+processed like delivered notifications. Notifications already processed (Graph
+delivers at least once) are skipped via notification_dedupe; a transcript that
+fails to fetch has its claim released, so Graph's redelivery is processed.
 
 Usage:
     # From S3 notification file
@@ -11,6 +16,9 @@ Usage:
     
     # From notification JSON string
     python process_transcript_notification.py --json '{"subscriptionId": "...", ...}'
+
+    # Resync subscriptions the renewal Lambda flagged after 'missed' events
+    python process_transcript_notification.py --resync-flagged
 """
 
 import sys
@@ -23,6 +31,11 @@ from pathlib import Path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'scripts', 'graph'))
 
 from auth_helper import get_graph_headers
+from lifecycle_handler import (
+    is_lifecycle_notification, handle_lifecycle_notifications, resync_flagged, finish_resync
+)
+from notification_dedupe import DEFAULT_STORE, get_deduper
+from tracker_client import get_tracker
 import requests
 
 
@@ -40,6 +53,10 @@ def parse_notification(notification: dict) -> dict:
     results = []
     
     for notif in notifications:
+        if is_lifecycle_notification(notif):
+            # Handled separately by handle_lifecycle_notifications()
+            continue
+        
         resource = notif.get('resource', '')
         resource_data = notif.get('resourceData', {})
         subscription_id = notif.get('subscriptionId', '')
@@ -76,7 +93,8 @@ def parse_notification(notification: dict) -> dict:
                 'resource_type': 'onlineMeetings' if 'onlineMeetings' in parts else 'adhocCalls',
                 'subscription_id': subscription_id,
                 'resource': resource,
-                'resource_data': resource_data
+                'resource_data': resource_data,
+                'notification': notif
             }
             
             print(f"  ✅ Parsed:")
@@ -146,12 +164,20 @@ Examples:
   
   # Save transcripts to directory
   python process_transcript_notification.py notification.json --output ./transcripts
+
+  # Resync subscriptions flagged by the renewal Lambda after 'missed' events
+  python process_transcript_notification.py --resync-flagged
         """
     )
     
     parser.add_argument('file', nargs='?', help='Path to notification JSON file')
     parser.add_argument('--json', help='Notification JSON string (use "-" for stdin)')
     parser.add_argument('--output', '-o', help='Directory to save transcript files')
+    parser.add_argument('--dedupe-store', default=DEFAULT_STORE,
+                        help='sqlite:PATH, dynamodb:TABLE or memory (default: local SQLite)')
+    parser.add_argument('--no-dedupe', action='store_true', help='Process duplicates again')
+    parser.add_argument('--resync-flagged', action='store_true',
+                        help="Resync subscriptions the renewal Lambda flagged after 'missed' events")
     
     args = parser.parse_args()
     
@@ -170,28 +196,86 @@ Examples:
         print(f"📥 Loading from file: {args.file}")
         with open(args.file, 'r', encoding='utf-8') as f:
             notification = json.load(f)
+    elif args.resync_flagged:
+        notification = {'value': []}
     else:
         parser.print_help()
         sys.exit(1)
     
+    notifications = notification.get('value', [notification])
+    
+    # Skip notifications Graph has already delivered
+    deduper = None if args.no_dedupe else get_deduper(args.dedupe_store)
+    if deduper:
+        notifications, duplicates = deduper.filter(notifications)
+        for dup in duplicates:
+            print(f"⏭️  Duplicate delivery skipped: {dup.get('changeType') or dup.get('lifecycleEvent')} "
+                  f"{dup.get('resource', dup.get('subscriptionId', ''))}")
+        notification = {'value': notifications}
+        if not notifications and not args.resync_flagged:
+            deduper.print_stats()
+            print("\n✅ Nothing new to process")
+            return
+    
+    # Lifecycle notifications (reauthorize / recreate / resync) first
+    lifecycle_results = []
+    tracker = None
+    if any(is_lifecycle_notification(n) for n in notifications) or args.resync_flagged:
+        tracker = get_tracker()
+    if any(is_lifecycle_notification(n) for n in notifications):
+        lifecycle_results = handle_lifecycle_notifications(notification, tracker=tracker)
+    if args.resync_flagged:
+        lifecycle_results += resync_flagged(tracker)
+    for result in lifecycle_results:
+        status = "✅" if result['ok'] else "❌"
+        print(f"{status} {result['event']} -> {result.get('action')} ({result['subscription_id']})")
+    
+    # Transcripts recovered by 'missed' resyncs go through the normal path
+    resyncs = [r for r in lifecycle_results if r.get('action') == 'resync' and r['ok']]
+    recovered = [n for r in resyncs for n in r.get('notifications', [])]
+    if recovered:
+        if deduper:
+            recovered, _ = deduper.filter(recovered)
+        print(f"\n🔁 {len(recovered)} transcript(s) recovered by resync")
+        notification = {'value': notifications + recovered}
+    
     # Parse notification(s)
     parsed_list = parse_notification(notification)
     
     if not parsed_list:
+        for result in resyncs:
+            finish_resync(tracker, result)
+        if lifecycle_results or args.resync_flagged:
+            print("\n✅ Lifecycle notifications processed")
+            if deduper:
+                deduper.print_stats()
+            return
         print("\n❌ No transcripts found in notification")
         sys.exit(1)
     
     print(f"\n✅ Found {len(parsed_list)} transcript(s)")
     
     # Fetch each transcript
+    failed_subscriptions = set()
+    failed = 0
     for idx, parsed in enumerate(parsed_list, 1):
         print(f"\n{'=' * 80}")
         print(f"Processing transcript {idx}/{len(parsed_list)}")
         print('=' * 80)
         
-        content = fetch_transcript(parsed, output_dir=args.output)
+        try:
+            content = fetch_transcript(parsed, output_dir=args.output)
+        except Exception as e:
+            # Any failure (network, auth, disk) releases the claim so the redelivery is processed
+            print(f"   ❌ Fetch failed: {e}")
+            content = None
         
-        if content:
+        if not content:
+            failed += 1
+            failed_subscriptions.add(parsed['subscription_id'])
+            if deduper:
+                deduper.release(parsed['notification'])
+        else:
             # Show preview
             lines = content.split('\n')
             preview_lines = min(20, len(lines))
@@ -202,6 +286,18 @@ Examples:
                 print(f"... ({len(lines) - preview_lines} more lines)")
             print("-" * 80)
     
+    # A resync is done (deltaLink kept, flag cleared) once its transcripts are fetched
+    for result in resyncs:
+        if result['subscription_id'] in failed_subscriptions:
+            print(f"⚠️  Resync of {result['subscription_id']} left pending: transcript fetch failed")
+        else:
+            finish_resync(tracker, result)
+    
+    if deduper:
+        deduper.print_stats()
+    if failed:
+        print(f"\n❌ {failed} of {len(parsed_list)} transcript(s) failed; left for redelivery")
+        sys.exit(1)
     print("\n✅ All transcripts processed!")
 
 
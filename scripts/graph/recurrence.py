@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+Recurring Series Expansion
+
+Computes the occurrences of recurring meetings locally from their series
+masters, instead of pulling every expanded occurrence (with bodies) from
+calendarView each time:
+
+- series masters are fetched once per user and cached; a refresh lists
+  only master ids + changeKeys and refetches the changed ones ($batch)
+- expand_series() turns a master into its occurrences in any window:
+  daily / weekly / absolute+relative monthly and yearly patterns, end-date,
+  numbered and open ranges, exceptions (moved/edited occurrences) and
+  cancelled occurrences, in the series' time zone so DST keeps the
+  meeting at the same wall-clock time
+
+Usage:
+    python scripts/graph/recurrence.py expand --days 7
+    python scripts/graph/recurrence.py verify --days 14     # compare with calendarView
+"""
+import argparse
+import calendar
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import requests
+
+from graph_batch import build_request, execute_batches
+from graph_projections import select_params
+
+GRAPH = "https://graph.microsoft.com/v1.0"
+STATE_DIR = Path('/tmp') if os.getenv('AWS_LAMBDA_FUNCTION_NAME') else Path(__file__).resolve().parents[2] / '.cache'
+SERIES_CACHE_DIR = STATE_DIR / 'series'
+
+GRAPH_TIME = '%Y-%m-%dT%H:%M:%S.0000000'
+WEEKDAYS = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+INDEXES = {'first': 0, 'second': 1, 'third': 2, 'fourth': 3, 'last': -1}
+
+# Master fields copied onto generated occurrences
+OCCURRENCE_FIELDS = ('subject', 'isAllDay', 'isOnlineMeeting', 'onlineMeeting', 'onlineMeetingProvider',
+                     'organizer', 'location', 'showAs')
+
+# Outlook (Windows) time zone names seen in originalStartTimeZone / recurrenceTimeZone
+WINDOWS_ZONES = {
+    'UTC': 'UTC', 'Coordinated Universal Time': 'UTC', 'tzone://Microsoft/Utc': 'UTC',
+    'GMT Standard Time': 'Europe/London', 'Greenwich Standard Time': 'Atlantic/Reykjavik',
+    'W. Europe Standard Time': 'Europe/Berlin', 'Romance Standard Time': 'Europe/Paris',
+    'Central Europe Standard Time': 'Europe/Budapest', 'Central European Standard Time': 'Europe/Warsaw',
+    'E. Europe Standard Time': 'Europe/Chisinau', 'FLE Standard Time': 'Europe/Kiev',
+    'GTB Standard Time': 'Europe/Bucharest', 'Russian Standard Time': 'Europe/Moscow',
+    'Turkey Standard Time': 'Europe/Istanbul', 'Israel Standard Time': 'Asia/Jerusalem',
+    'South Africa Standard Time': 'Africa/Johannesburg', 'Egypt Standard Time': 'Africa/Cairo',
+    'Arabian Standard Time': 'Asia/Dubai', 'Arab Standard Time': 'Asia/Riyadh',
+    'Pakistan Standard Time': 'Asia/Karachi', 'India Standard Time': 'Asia/Kolkata',
+    'SE Asia Standard Time': 'Asia/Bangkok', 'China Standard Time': 'Asia/Shanghai',
+    'Singapore Standard Time': 'Asia/Singapore', 'Taipei Standard Time': 'Asia/Taipei',
+    'Tokyo Standard Time': 'Asia/Tokyo', 'Korea Standard Time': 'Asia/Seoul',
+    'W. Australia Standard Time': 'Australia/Perth', 'AUS Central Standard Time': 'Australia/Darwin',
+    'Cen. Australia Standard Time': 'Australia/Adelaide', 'E. Australia Standard Time': 'Australia/Brisbane',
+    'AUS Eastern Standard Time': 'Australia/Sydney', 'New Zealand Standard Time': 'Pacific/Auckland',
+    'Hawaiian Standard Time': 'Pacific/Honolulu', 'Alaskan Standard Time': 'America/Anchorage',
+    'Pacific Standard Time': 'America/Los_Angeles', 'US Mountain Standard Time': 'America/Phoenix',
+    'Mountain Standard Time': 'America/Denver', 'Central Standard Time': 'America/Chicago',
+    'Central America Standard Time': 'America/Guatemala', 'Canada Central Standard Time': 'America/Regina',
+    'Eastern Standard Time': 'America/New_York', 'US Eastern Standard Time': 'America/Indianapolis',
+    'Atlantic Standard Time': 'America/Halifax', 'Newfoundland Standard Time': 'America/St_Johns',
+    'SA Pacific Standard Time': 'America/Bogota', 'Pacific SA Standard Time': 'America/Santiago',
+    'E. South America Standard Time': 'America/Sao_Paulo', 'Argentina Standard Time': 'America/Buenos_Aires',
+    'Central Standard Time (Mexico)': 'America/Mexico_City',
+}
+
+
+def zone(name):
+    """ZoneInfo for a Windows or IANA zone name (UTC if unknown)"""
+    try:
+        return ZoneInfo(WINDOWS_ZONES.get(name, name or 'UTC'))
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.utc
+
+
+def parse_graph_time(value, tz=timezone.utc):
+    """Aware datetime from a Graph dateTime ('2026-02-12T09:00:00.0000000', tz-less)"""
+    return datetime.fromisoformat(value.rstrip('Z')[:26]).replace(tzinfo=tz)
+
+
+def graph_time(dt):
+    return {'dateTime': dt.astimezone(timezone.utc).strftime(GRAPH_TIME), 'timeZone': 'UTC'}
+
+
+def _month_day(year, month, day):
+    """date(year, month, day), clamped to the month's last day (as Outlook does)"""
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def _relative_day(year, month, days_of_week, index):
+    """The index-th (or last) day in the month that falls on one of days_of_week"""
+    wanted = {WEEKDAYS.index(d) for d in days_of_week}
+    days = [date(year, month, d) for d in range(1, calendar.monthrange(year, month)[1] + 1)
+            if date(year, month, d).weekday() in wanted]
+    position = INDEXES.get(index or 'first', 0)
+    return days[position] if position < len(days) else days[-1]
+
+
+def pattern_dates(pattern, first):
+    """Dates matching a recurrence pattern, in order, from the range start date on (endless)"""
+    kind = pattern['type']
+    interval = max(1, pattern.get('interval') or 1)
+    days_of_week = pattern.get('daysOfWeek') or []
+
+    if kind == 'daily':
+        current = first
+        while True:
+            yield current
+            current += timedelta(days=interval)
+
+    elif kind == 'weekly':
+        week_start = WEEKDAYS.index(pattern.get('firstDayOfWeek') or 'sunday')
+        weekdays = sorted((WEEKDAYS.index(d) - week_start) % 7 for d in days_of_week)
+        week = first - timedelta(days=(first.weekday() - week_start) % 7)
+        while True:
+            for offset in weekdays:
+                day = week + timedelta(days=offset)
+                if day >= first:
+                    yield day
+            week += timedelta(weeks=interval)
+
+    elif kind in ('absoluteMonthly', 'relativeMonthly', 'absoluteYearly', 'relativeYearly'):
+        yearly = kind.endswith('Yearly')
+        step = 12 * interval if yearly else interval
+        month_index = first.year * 12 + ((pattern.get('month') or first.month) if yearly else first.month) - 1
+        while True:
+            year, month = divmod(month_index, 12)
+            month += 1
+            if kind.startswith('absolute'):
+                day = _month_day(year, month, pattern.get('dayOfMonth') or first.day)
+            else:
+                day = _relative_day(year, month, days_of_week, pattern.get('index'))
+            if day >= first:
+                yield day
+            month_index += step
+
+    else:
+        raise ValueError(f"Unsupported recurrence pattern: {kind}")
+
+
+def _cancelled_dates(master):
+    """Original dates of cancelled occurrences ('OID.<masterId>.<yyyy-mm-dd>')"""
+    dates = set()
+    for occurrence_id in master.get('cancelledOccurrences') or []:
+        try:
+            dates.add(date.fromisoformat(occurrence_id.rsplit('.', 1)[1][:10]))
+        except (IndexError, ValueError):
+            continue
+    return dates
+
+
+def expand_series(master, window_start, window_end):
+    """
+    Occurrences of a series master overlapping [window_start, window_end).
+
+    Args:
+        master: seriesMaster event (start/end in UTC) with recurrence and
+                optionally exceptionOccurrences / cancelledOccurrences
+        window_start, window_end: aware datetimes
+
+    Returns:
+        list of occurrence dicts (Graph event shape: id, seriesMasterId, type
+        'occurrence' | 'exception', start, end, subject, ...), by start
+    """
+    recurrence = master.get('recurrence') or {}
+    pattern, rng = recurrence.get('pattern'), recurrence.get('range') or {}
+    if not pattern:
+        return []
+
+    tz = zone(rng.get('recurrenceTimeZone') or master.get('originalStartTimeZone'))
+    start = parse_graph_time(master['start']['dateTime'], zone(master['start'].get('timeZone')))
+    duration = parse_graph_time(master['end']['dateTime'], zone(master['end'].get('timeZone'))) - start
+    local_time = start.astimezone(tz).time()
+    first = date.fromisoformat(rng['startDate']) if rng.get('startDate') else start.astimezone(tz).date()
+    last = date.fromisoformat(rng['endDate']) if rng.get('type') == 'endDate' and rng.get('endDate') else None
+    count = rng.get('numberOfOccurrences') if rng.get('type') == 'numbered' else None
+
+    exceptions = {}
+    for exception in master.get('exceptionOccurrences') or []:
+        if exception.get('originalStart'):
+            exceptions[parse_graph_time(exception['originalStart'])] = exception
+    cancelled = _cancelled_dates(master)
+    stop = (window_end.astimezone(tz) + duration).date() + timedelta(days=1)
+
+    occurrences = []
+    for n, day in enumerate(pattern_dates(pattern, first)):
+        if (count is not None and n >= count) or (last and day > last) or day > stop:
+            break
+        occurrence_start = datetime.combine(day, local_time, tzinfo=tz).astimezone(timezone.utc)
+        if day in cancelled or occurrence_start in exceptions:
+            continue
+        occurrence_end = occurrence_start + duration
+        if occurrence_start < window_end and occurrence_end > window_start:
+            occurrences.append({
+                'id': f"OID.{master['id']}.{day.isoformat()}",
+                'seriesMasterId': master['id'],
+                'type': 'occurrence',
+                'isCancelled': False,
+                'start': graph_time(occurrence_start),
+                'end': graph_time(occurrence_end),
+                **{k: master[k] for k in OCCURRENCE_FIELDS if k in master},
+            })
+
+    # Exceptions keep their own (possibly moved) times
+    for exception in exceptions.values():
+        if exception.get('isCancelled'):
+            continue
+        exception_start = parse_graph_time(exception['start']['dateTime'])
+        exception_end = parse_graph_time(exception['end']['dateTime'])
+        if exception_start < window_end and exception_end > window_start:
+            occurrences.append(dict(exception, seriesMasterId=master['id'], type='exception'))
+
+    occurrences.sort(key=lambda o: o['start']['dateTime'])
+    return occurrences
+
+
+class SeriesCache:
+    """Series masters per user, kept in .cache/series/<user>.json"""
+
+    def __init__(self, directory=SERIES_CACHE_DIR):
+        self.directory = Path(directory)
+        self.masters = {}
+        self.stats = {'requests': 0, 'refetched': 0}
+
+    def _path(self, user):
+        return self.directory / f"{user.replace('/', '_')}.json"
+
+    def load(self, user):
+        if user not in self.masters:
+            path = self._path(user)
+            self.masters[user] = json.loads(path.read_text()).get('masters', {}) if path.exists() else {}
+        return self.masters[user]
+
+    def save(self, user):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self._path(user).with_suffix('.tmp')
+        tmp.write_text(json.dumps({'refreshed_at': datetime.now(timezone.utc).isoformat(),
+                                   'masters': self.masters[user]}))
+        tmp.replace(self._path(user))
+
+    def refresh(self, user, headers):
+        """
+        Bring a user's masters up to date: one listing of ids + changeKeys,
+        then only new or changed masters are fetched (with their exceptions).
+
+        Returns:
+            dict: masters, refetched, removed
+        """
+        cached = self.load(user)
+        url = f"{GRAPH}/users/{user}/events"
+        params = {'$filter': "type eq 'seriesMaster'", '$select': 'id,changeKey', '$top': 500}
+        current = {}
+        while url:
+            response = requests.get(url, headers=headers, params=params, timeout=30)
+            self.stats['requests'] += 1
+            response.raise_for_status()
+            body = response.json()
+            current.update((e['id'], e.get('changeKey')) for e in body.get('value', []))
+            url, params = body.get('@odata.nextLink'), None
+
+        stale = [i for i, change_key in current.items() if (cached.get(i) or {}).get('changeKey') != change_key]
+        if stale:
+            query = '&'.join(f"{k}={v}" for k, v in select_params('event.series').items())
+            batch = [build_request(n, 'GET', f"/users/{user}/events/{event_id}?{query}")
+                     for n, event_id in enumerate(stale)]
+            results = execute_batches(batch, headers)
+            self.stats['requests'] += -(-len(batch) // 20)
+            for n, event_id in enumerate(stale):
+                result = results.get(str(n)) or {}
+                if result.get('status') == 200:
+                    cached[event_id] = result['body']
+            self.stats['refetched'] += len(stale)
+
+        removed = [i for i in cached if i not in current]
+        for event_id in removed:
+            del cached[event_id]
+        if stale or removed:
+            self.save(user)
+        return {'masters': len(cached), 'refetched': len(stale), 'removed': len(removed)}
+
+    def occurrences(self, user, window_start, window_end):
+        """Every cached series' occurrences for the user in the window, by start"""
+        found = []
+        for master in self.load(user).values():
+            found.extend(expand_series(master, window_start, window_end))
+        found.sort(key=lambda o: o['start']['dateTime'])
+        return found
+
+
+def single_events(user, window_start, window_end, headers, select):
+    """
+    Non-recurring events overlapping the window (small: no occurrences, no
+    bodies), including multi-day and all-day events that started before it.
+    """
+    url = f"{GRAPH}/users/{user}/events"
+    window_start, window_end = window_start.astimezone(timezone.utc), window_end.astimezone(timezone.utc)
+    params = {
+        '$filter': (f"type eq 'singleInstance' and end/dateTime gt '{window_start.strftime(GRAPH_TIME)}' "
+                    f"and start/dateTime lt '{window_end.strftime(GRAPH_TIME)}'"),
+        '$select': select,
+        '$top': 500,
+    }
+    events = []
+    while url:
+        response = requests.get(url, headers=headers, params=params, timeout=30)
+        response.raise_for_status()
+        body = response.json()
+        events.extend(body.get('value', []))
+        url, params = body.get('@odata.nextLink'), None
+    return events
+
+
+def calendar_view(user, window_start, window_end, headers):
+    """Graph's own expansion (calendarView), for verify"""
+    url = f"{GRAPH}/users/{user}/calendarView"
+    params = {'startDateTime': window_start.isoformat(), 'endDateTime': window_end.isoformat(),
+              '$select': 'id,seriesMasterId,type,start,end,subject', '$top': 500}
+    events, requests_made = [], 0
+    while url:
+        response = requests.get(url, headers=headers, params=params, timeout=30)
+        requests_made += 1
+        response.raise_for_status()
+        body = response.json()
+        events.extend(body.get('value', []))
+        url, params = body.get('@odata.nextLink'), None
+    return events, requests_made
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Expand recurring meetings locally from cached series masters")
+    parser.add_argument("--user", default=None, help="Mailbox (default USER_EMAIL)")
+    parser.add_argument("--days", type=int, default=7, help="Days before and after now")
+    subparsers = parser.add_subparsers(dest="command")
+    subparsers.add_parser("expand", help="Refresh the cache and print occurrences in the window")
+    subparsers.add_parser("verify", help="Compare local occurrences with calendarView")
+    args = parser.parse_args()
+    if args.command not in ("expand", "verify"):
+        parser.print_help()
+        return 1
+
+    from auth_helper import get_config, get_graph_headers
+
+    user = args.user or get_config()['user_email']
+    headers = get_graph_headers()
+    now = datetime.now(timezone.utc)
+    window_start, window_end = now - timedelta(days=args.days), now + timedelta(days=args.days)
+
+    cache = SeriesCache()
+    refresh = cache.refresh(user, headers)
+    occurrences = cache.occurrences(user, window_start, window_end)
+    print(f"🔁 {refresh['masters']} series for {user} ({refresh['refetched']} refetched, "
+          f"{refresh['removed']} removed, {cache.stats['requests']} request(s))")
+
+    if args.command == "expand":
+        for o in occurrences:
+            marker = "✏️ " if o['type'] == 'exception' else "  "
+            print(f"   {marker}{o['start']['dateTime'][:16]}  {o.get('subject')}")
+        print(f"\n✅ {len(occurrences)} occurrence(s) in ±{args.days} day(s)")
+        return 0
+
+    view, view_requests = calendar_view(user, window_start, window_end, headers)
+    expected = {(e['seriesMasterId'], e['start']['dateTime'][:16]) for e in view if e.get('seriesMasterId')}
+    local = {(o['seriesMasterId'], o['start']['dateTime'][:16]) for o in occurrences}
+    print(f"📅 calendarView: {len(expected)} series occurrence(s) in {view_requests} request(s)")
+    for label, diff in (("Missing locally", expected - local), ("Extra locally", local - expected)):
+        for master_id, start in sorted(diff, key=lambda d: d[1]):
+            print(f"   ❌ {label}: {start} ({master_id[:20]}...)")
+    if expected == local:
+        print(f"✅ Local expansion matches ({len(local)} occurrence(s))")
+        return 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Replay Stored Webhook Notifications
+
+Streams archived notifications (S3, a compacted day file, or a directory of
+payload JSON files) and POSTs each original Graph body to a webhook URL at a
+controlled rate, then prints latency and status histograms.
+
+Rate modes:
+    --mode constant --rate 20          20 requests/second
+    --mode recorded --scale 0.1        original inter-arrival gaps, 10x faster
+    --mode burst --burst 50 --every 5  50 at once every 5 seconds
+
+Usage:
+    # Against a local stand-in receiver
+    python scripts/graph/replay-webhooks.py --url http://localhost:8080/webhook \\
+        --source s3://tmf-webhook-payloads-dev/webhooks/2026/02/13/ --mode constant --rate 50
+
+    # Against the dev stage, replaying a compacted day at recorded pace
+    python scripts/graph/replay-webhooks.py --source webhooks-compacted/2026/02/13/payloads.jsonl.gz \\
+        --mode recorded --scale 0.05 --client-state "$WEBHOOK_AUTH_SECRET"
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.append(str(REPO_ROOT / "scripts" / "aws"))
+from webhook_payloads import (
+    COMPACTED_PREFIX, compacted_day_matches, compacted_manifests, decompress, get_s3_client,
+    iter_payload_objects, payload_time, read_compacted_day, read_payload,
+)
+from auth_helper import get_config
+from latency_report import LatencyRecorder
+
+PREFETCH = 64
+
+
+def notification_body(raw, client_state=None):
+    """
+    (receivedAt, body) from a stored payload.
+
+    The body is the original Graph POST body; with client_state every
+    notification's clientState is rewritten for the target environment.
+    """
+    data = json.loads(raw)
+    received_at = None
+    body = data
+    if isinstance(data, dict) and 'body' in data and 'receivedAt' in data:
+        received_at = data['receivedAt']
+        body = data['body']
+
+    if client_state is not None:
+        parsed = json.loads(body) if isinstance(body, str) else body
+        for notification in parsed.get('value', []):
+            notification['clientState'] = client_state
+        body = parsed
+
+    if not isinstance(body, str):
+        body = json.dumps(body)
+    return received_at, body
+
+
+def s3_payloads(source, limit=None):
+    """Yield raw payloads under an s3://bucket/prefix URL in receive order"""
+    bucket, _, prefix = source[len("s3://"):].partition("/")
+    s3 = get_s3_client(max_pool_connections=PREFETCH)
+
+    objects = list(iter_payload_objects(s3, bucket, prefix))
+    live = {obj['Key'] for obj in objects}
+    if not prefix.startswith(COMPACTED_PREFIX):
+        for manifest in compacted_manifests(s3, bucket):
+            if compacted_day_matches(manifest, prefix):
+                objects.extend(o for o in read_compacted_day(s3, bucket, manifest)
+                               if o['Key'].startswith(prefix) and o['Key'] not in live)
+
+    objects.sort(key=lambda o: (payload_time(o), o['Key']))
+    objects = objects[:limit] if limit else objects
+    print(f"📥 {len(objects)} payload(s) from s3://{bucket}/{prefix}")
+
+    # Fetch ahead in receive order so the sender never waits on S3
+    with ThreadPoolExecutor(max_workers=PREFETCH // 4) as executor:
+        for i in range(0, len(objects), PREFETCH):
+            yield from executor.map(lambda o: read_payload(s3, bucket, o), objects[i:i + PREFETCH])
+
+
+def local_payloads(source, limit=None):
+    """Yield raw payloads from a compacted JSONL file or a directory of JSON files"""
+    path = Path(source)
+    if path.is_dir():
+        files = sorted(path.rglob("*.json"))[:limit] if limit else sorted(path.rglob("*.json"))
+        print(f"📥 {len(files)} payload(s) from {path}")
+        for file in files:
+            yield file.read_bytes()
+        return
+
+    lines = [line for line in decompress(path.read_bytes(), path.name).splitlines() if line]
+    lines = lines[:limit] if limit else lines
+    print(f"📥 {len(lines)} payload(s) from {path}")
+    for line in lines:
+        yield json.loads(line)['raw'].encode('utf-8')
+
+
+def make_schedule(mode, rate=10.0, scale=1.0, max_gap=60.0, burst=10, every=1.0):
+    """
+    Returns offset(index, received_at) -> seconds after start at which to send.
+    """
+    if mode == 'constant':
+        return lambda index, received_at: index / rate
+
+    if mode == 'burst':
+        return lambda index, received_at: (index // burst) * every
+
+    state = {'previous': None, 'offset': 0.0}
+
+    def recorded(index, received_at):
+        ts = datetime.fromisoformat(received_at.replace('Z', '+00:00')).timestamp() if received_at else None
+        if ts is not None and state['previous'] is not None:
+            state['offset'] += min(max(ts - state['previous'], 0.0) * scale, max_gap)
+        if ts is not None:
+            state['previous'] = ts
+        return state['offset']
+
+    return recorded
+
+
+async def send(client, url, body, recorder, headers):
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, content=body, headers=headers)
+        recorder.record((time.perf_counter() - started) * 1000, status=response.status_code)
+    except httpx.HTTPError as e:
+        recorder.record((time.perf_counter() - started) * 1000, error=type(e).__name__)
+
+
+async def replay(payloads, url, schedule, recorder, concurrency=50, timeout=10.0, client_state=None,
+                 headers=None):
+    """
+    POST every payload at its scheduled offset over pooled keep-alive connections.
+
+    At most `concurrency` requests are in flight; when the target can't keep
+    up, sends fall behind schedule and the lag is reported.
+    """
+    headers = {'Content-Type': 'application/json', **(headers or {})}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    loop = asyncio.get_running_loop()
+    slots = asyncio.Semaphore(concurrency)
+    in_flight = set()
+    max_lag = 0.0
+
+    async def send_and_release(body):
+        try:
+            await send(client, url, body, recorder, headers)
+        finally:
+            slots.release()
+
+    iterator = iter(payloads)
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        started = loop.time()
+        index = 0
+        while True:
+            raw = await asyncio.to_thread(next, iterator, None)
+            if raw is None:
+                break
+            received_at, body = notification_body(raw, client_state)
+
+            due = started + schedule(index, received_at)
+            if due > loop.time():
+                await asyncio.sleep(due - loop.time())
+            await slots.acquire()
+            max_lag = max(max_lag, loop.time() - due)
+
+            task = asyncio.create_task(send_and_release(body))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+            index += 1
+
+            if index % 500 == 0:
+                elapsed = loop.time() - started
+                print(f"   ... {index} sent in {elapsed:.1f}s ({index / elapsed:.0f}/s)")
+
+        await asyncio.gather(*in_flight)
+        elapsed = loop.time() - started
+
+    return index, elapsed, max_lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay stored webhook notifications against an endpoint")
+    parser.add_argument("--url", help="Target webhook URL (default: AWS_WEBHOOK_ENDPOINT or AZURE_WEBHOOK_ENDPOINT)")
+    parser.add_argument("--source", required=True,
+                        help="s3://bucket/prefix, a compacted payloads.jsonl.gz/.zst file, or a directory")
+    parser.add_argument("--mode", choices=["constant", "recorded", "burst"], default="constant")
+    parser.add_argument("--rate", type=float, default=10.0, help="constant: requests per second")
+    parser.add_argument("--scale", type=float, default=1.0, help="recorded: multiply original gaps by this")
+    parser.add_argument("--max-gap", type=float, default=60.0, help="recorded: cap any single gap (seconds)")
+    parser.add_argument("--burst", type=int, default=10, help="burst: requests per burst")
+    parser.add_argument("--every", type=float, default=1.0, help="burst: seconds between bursts")
+    parser.add_argument("--concurrency", type=int, default=50, help="Max requests in flight")
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--limit", type=int, help="Replay at most this many payloads")
+    parser.add_argument("--client-state", help="Rewrite clientState to match the target's secret")
+    parser.add_argument("--report", help="Also write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    url = args.url
+    if not url:
+        url = get_config()['webhook_url']
+    if not url:
+        print("❌ No target URL (use --url or set AWS_WEBHOOK_ENDPOINT / AZURE_WEBHOOK_ENDPOINT)")
+        return 1
+
+    if args.source.startswith("s3://"):
+        payloads = s3_payloads(args.source, args.limit)
+    else:
+        payloads = local_payloads(args.source, args.limit)
+
+    schedule = make_schedule(args.mode, args.rate, args.scale, args.max_gap, args.burst, args.every)
+    recorder = LatencyRecorder()
+
+    print(f"🔁 Replaying to {url} ({args.mode}, concurrency {args.concurrency})")
+    sent, elapsed, max_lag = asyncio.run(
+        replay(payloads, url, schedule, recorder, args.concurrency, args.timeout, args.client_state)
+    )
+
+    recorder.print_report(f"Replayed {sent} notification(s) in {elapsed:.1f}s ({sent / max(elapsed, 1e-9):.1f}/s)")
+    if max_lag > 1:
+        print(f"\n⚠️  Fell up to {max_lag:.1f}s behind schedule (target slower than the requested rate, "
+              f"or --concurrency too low)")
+
+    if args.report:
+        summary = {
+            'url': url, 'source': args.source, 'mode': args.mode,
+            'sent': sent, 'elapsed_s': round(elapsed, 3), 'max_schedule_lag_s': round(max_lag, 3),
+            **recorder.summary(),
+        }
+        Path(args.report).write_text(json.dumps(summary, indent=2))
+        print(f"\n📝 Report written to {args.report}")
+
+    return 0 if recorder.count and recorder.ok == recorder.count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""
+Subscription Tracker Loader
+Gives Graph scripts access to the DynamoDB SubscriptionTracker
+(scripts/aws/subscription-tracker.py) without copying it
+"""
+import importlib.util
+import os
+from pathlib import Path
+
+TRACKER_PATH = Path(__file__).resolve().parents[1] / 'aws' / 'subscription-tracker.py'
+
+_tracker_module = None
+
+
+def load_tracker_module():
+    """Import subscription-tracker.py (hyphenated name, so not importable directly)"""
+    global _tracker_module
+    if _tracker_module is None:
+        spec = importlib.util.spec_from_file_location('subscription_tracker', TRACKER_PATH)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _tracker_module = module
+    return _tracker_module
+
+
+def get_tracker(table_name=None, profile=None):
+    """
+    Return a connected SubscriptionTracker, or None if DynamoDB is not reachable.
+
+    Graph scripts treat the tracker as optional: a missing AWS profile or
+    table should not stop a Graph operation from completing.
+    """
+    table_name = table_name or os.getenv('SUBSCRIPTIONS_TABLE', 'graph-subscriptions')
+    profile = profile or os.getenv('AWS_PROFILE', 'tmf-dev')
+
+    try:
+        module = load_tracker_module()
+        return module.SubscriptionTracker(table_name=table_name, profile=profile)
+    except Exception as e:
+        print(f"⚠️  Subscription tracker unavailable ({e}); continuing without DynamoDB")
+        return None
@@ -0,0 +1,93 @@
+"""
+Webhook Payload Compaction Unit Tests
+Compacts a day of stored payloads in a moto S3 bucket: merge of late payloads, delete after verify
+"""
+import importlib.util
+import json
+import os
+import sys
+from datetime import date
+from unittest.mock import patch
+
+import boto3
+import pytest
+from moto import mock_aws
+
+AWS_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'aws')
+sys.path.insert(0, AWS_DIR)
+
+spec = importlib.util.spec_from_file_location('compact_payloads', os.path.join(AWS_DIR, 'compact-payloads.py'))
+compact = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(compact)
+
+BUCKET = 'webhook-payloads-test'
+DAY = date(2026, 2, 13)
+
+
+@pytest.fixture
+def s3():
+    with mock_aws():
+        client = boto3.client('s3', region_name='us-east-1', aws_access_key_id='testing',
+                              aws_secret_access_key='testing')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def put_payload(s3, i):
+    key = f"{compact.DEFAULT_PREFIX}2026-02-13T02-18-{i:02d}-000Z-req-{i}.json"
+    body = json.dumps({
+        'receivedAt': f"2026-02-13T02:18:{i:02d}.000Z",
+        'requestId': f"req-{i}",
+        'body': json.dumps({'value': [{'subscriptionId': 'sub-1', 'changeType': 'created',
+                                       'resource': f"Users/user-1/Events/E{i}"}]}),
+    }, indent=2)
+    s3.put_object(Bucket=BUCKET, Key=key, Body=body.encode('utf-8'))
+    return key
+
+
+def live_keys(s3):
+    listing = s3.list_objects_v2(Bucket=BUCKET, Prefix=compact.DEFAULT_PREFIX)
+    return sorted(obj['Key'] for obj in listing.get('Contents', []))
+
+
+def compacted_keys(s3, manifest):
+    return [e['key'] for e in compact.read_compacted_entries(s3, BUCKET, manifest)]
+
+
+class TestCompactDay:
+
+    def test_compact_keeps_originals_by_default(self, s3):
+        keys = [put_payload(s3, i) for i in range(3)]
+        manifest = compact.compact_day(s3, DAY, BUCKET, workers=2)
+
+        assert manifest['objects'] == 3 and manifest['originals'] == 'kept'
+        assert compacted_keys(s3, manifest) == keys
+        assert live_keys(s3) == keys
+        # Nothing new under the live prefix: the day is left alone
+        assert compact.compact_day(s3, DAY, BUCKET, workers=2) is None
+
+    def test_late_payload_merged_after_originals_deleted(self, s3):
+        first = [put_payload(s3, i) for i in range(3)]
+        manifest = compact.compact_day(s3, DAY, BUCKET, delete=True, workers=2)
+        assert manifest['originals'] == 'deleted' and live_keys(s3) == []
+
+        late = put_payload(s3, 7)
+        manifest = compact.compact_day(s3, DAY, BUCKET, workers=2)
+        assert manifest['merged']['previous_objects'] == 3 and manifest['merged']['added'] == 1
+        assert compacted_keys(s3, manifest) == first + [late]
+
+    def test_failed_verification_deletes_nothing(self, s3):
+        keys = [put_payload(s3, i) for i in range(2)]
+        with patch.object(compact, 'verify', return_value=(False, "checksum mismatch")):
+            assert compact.compact_day(s3, DAY, BUCKET, delete=True, workers=2) is None
+
+        assert live_keys(s3) == keys
+        manifest_key = f"{compact.compacted_day_prefix(DAY, compact.COMPACTED_PREFIX)}manifest.json"
+        assert compact.load_manifest(s3, BUCKET, manifest_key) is None
+
+    def test_tier_needs_a_readable_storage_class(self, s3):
+        put_payload(s3, 0)
+        with pytest.raises(ValueError, match='GLACIER'):
+            compact.compact_day(s3, DAY, BUCKET, tier='GLACIER', workers=2)
+        manifest = compact.compact_day(s3, DAY, BUCKET, tier='GLACIER_IR', workers=2)
+        assert manifest['originals'] == 'tiered:GLACIER_IR'
@@ -0,0 +1,105 @@
+"""
+Local Webhook Receiver Unit Tests
+Runs the asyncio receiver on a free port and checks the handler.js contract
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+
+import pytest
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'aws'))
+
+from local_webhook_receiver import DirectorySink, WebhookReceiver, serve  # noqa: E402
+
+
+def start_receiver(receiver):
+    """Serve on a free port in a background thread; returns the base URL"""
+    started = threading.Event()
+    port = {}
+
+    def ready(bound_port):
+        port['value'] = bound_port
+        started.set()
+
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=lambda: loop.run_until_complete(serve(receiver, port=0, ready=ready)),
+                              daemon=True)
+    thread.start()
+    assert started.wait(5)
+    return f"http://127.0.0.1:{port['value']}/graph"
+
+
+@pytest.fixture
+def sample_webhook_payload():
+    return {
+        "value": [{
+            "subscriptionId": "00000000-0000-0000-0000-000000000000",
+            "changeType": "created",
+            "resource": "/users/testuser@example.com/events/AAMkATest123",
+            "resourceData": {"@odata.type": "#Microsoft.Graph.event", "id": "AAMkATest123"},
+            "clientState": "test-client-state-12345",
+        }]
+    }
+
+
+@pytest.fixture(scope="module")
+def storage(tmp_path_factory):
+    return tmp_path_factory.mktemp("webhooks")
+
+
+@pytest.fixture(scope="module")
+def tests_url(storage):
+    return start_receiver(WebhookReceiver(DirectorySink(storage), profile='tests'))
+
+
+@pytest.fixture(scope="module")
+def handler_url(tmp_path_factory):
+    sink = DirectorySink(tmp_path_factory.mktemp("handler"))
+    return start_receiver(WebhookReceiver(sink, client_state="test-client-state-12345", profile='handler'))
+
+
+class TestTestsProfile:
+    """Contract expected by test/integration/aws/test_webhook_delivery.py"""
+
+    def test_validation_token_echoed(self, tests_url):
+        response = requests.get(tests_url, params={'validationToken': 'abc 123'}, timeout=5)
+
+        assert response.status_code == 200
+        assert response.text == 'abc 123'
+        assert response.headers['Content-Type'] == 'text/plain'
+
+    def test_post_stores_envelope(self, tests_url, storage, sample_webhook_payload):
+        response = requests.post(tests_url, json=sample_webhook_payload, timeout=5)
+
+        assert response.status_code == 200
+        key = response.json()['key']
+        parts = key.split('/')
+        assert parts[0] == 'webhooks' and len(parts[1]) == 4 and parts[4].startswith('graph-webhook-')
+
+        stored = json.loads((storage / key).read_text())
+        assert stored['source'] == 'graph-webhook'
+        assert stored['body'] == sample_webhook_payload
+
+    def test_invalid_and_empty_bodies_rejected(self, tests_url):
+        assert requests.post(tests_url, data='not-valid-json', timeout=5).status_code == 400
+        assert requests.post(tests_url, json=None, timeout=5).status_code == 400
+
+
+class TestHandlerProfile:
+    """Contract of the deployed apps/aws-lambda/handler.js"""
+
+    def test_matching_client_state_accepted(self, handler_url, sample_webhook_payload):
+        response = requests.post(handler_url, json=sample_webhook_payload, timeout=5)
+
+        assert response.status_code == 202
+        assert '/' not in response.json()['key'][len('webhooks/'):]
+
+    def test_wrong_or_missing_client_state_forbidden(self, handler_url, sample_webhook_payload):
+        sample_webhook_payload['value'][0]['clientState'] = 'wrong'
+
+        assert requests.post(handler_url, json=sample_webhook_payload, timeout=5).status_code == 403
+        assert requests.post(handler_url, json={"value": []}, timeout=5).status_code == 403
@@ -0,0 +1,94 @@
+"""
+Webhook Payload Index Unit Tests
+Tests envelope flattening and the SQLite sidecar index without S3
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'aws'))
+
+from payload_index import PayloadIndex  # noqa: E402
+from webhook_payloads import classify_bytes, payload_records  # noqa: E402
+
+
+def stored_payload(notification, received_at='2026-02-13T02:18:51.000Z', request_id='req-1'):
+    """Envelope as written by apps/aws-lambda/handler.js (body is a JSON string)"""
+    return json.dumps({
+        'receivedAt': received_at,
+        'requestId': request_id,
+        'source': 'graph-webhook',
+        'body': json.dumps({'value': [notification]}),
+    }, indent=2).encode('utf-8')
+
+
+@pytest.fixture
+def transcript_notification():
+    return {
+        'subscriptionId': 'sub-transcripts',
+        'changeType': 'created',
+        'resource': "users/U1/onlineMeetings/MSo1/transcripts/T1",
+        'resourceData': {'id': 'T1'},
+    }
+
+
+@pytest.fixture
+def event_notification():
+    fixture = os.path.join(os.path.dirname(__file__), '..', '..', 'fixtures', 'graph-webhook-created.json')
+    with open(fixture) as f:
+        return json.load(f)['value'][0]
+
+
+class TestPayloadRecords:
+    """Test flattening of stored envelopes"""
+
+    def test_transcript_ids_extracted(self, transcript_notification):
+        [record] = payload_records('webhooks/a.json', stored_payload(transcript_notification))
+
+        assert record['kind'] == 'transcript'
+        assert record['user_id'] == 'U1'
+        assert record['meeting_id'] == 'MSo1'
+        assert record['transcript_id'] == 'T1'
+        assert record['received_at'] == '2026-02-13T02:18:51.000Z'
+
+    def test_event_notification_is_calendar(self, event_notification):
+        [record] = payload_records('webhooks/b.json', stored_payload(event_notification))
+
+        assert record['kind'] == 'calendar'
+        assert record['change_type'] == 'created'
+        assert record['subscription_id'] == event_notification['subscriptionId']
+
+    def test_empty_body_still_yields_record(self):
+        raw = json.dumps({'receivedAt': 'x', 'requestId': 'r', 'body': ''}).encode()
+        [record] = payload_records('webhooks/c.json', raw)
+        assert record['kind'] == 'other'
+
+    def test_classify_from_prefix(self, transcript_notification):
+        assert classify_bytes(stored_payload(transcript_notification)[:300]) == 'transcript'
+        assert classify_bytes(b'{"receivedAt": "2026') is None
+
+
+class TestPayloadIndex:
+    """Test SQLite index queries"""
+
+    def test_latest_and_filters(self, transcript_notification, event_notification):
+        index = PayloadIndex(':memory:')
+        index.add_payload('webhooks/1.json', stored_payload(event_notification, '2026-02-13T01:00:00Z'))
+        index.add_payload('webhooks/2.json', stored_payload(transcript_notification, '2026-02-13T02:00:00Z'))
+        index.add_payload('webhooks/3.json', stored_payload(event_notification, '2026-02-13T03:00:00Z'))
+
+        assert index.latest()[0]['key'] == 'webhooks/3.json'
+        assert [r['key'] for r in index.query(kind='transcript')] == ['webhooks/2.json']
+        assert [r['key'] for r in index.query(since='2026-02-13T02:00:00Z', newest_first=False)] == [
+            'webhooks/2.json', 'webhooks/3.json']
+        assert dict(index.count_by('kind')) == {'calendar': 2, 'transcript': 1}
+
+    def test_reindexing_is_idempotent(self, event_notification):
+        index = PayloadIndex(':memory:')
+        index.add_payload('webhooks/1.json', stored_payload(event_notification))
+        index.add_payload('webhooks/1.json', stored_payload(event_notification))
+
+        assert index.count() == 1
+        assert index.known_keys(['webhooks/1.json', 'webhooks/2.json']) == {'webhooks/1.json'}
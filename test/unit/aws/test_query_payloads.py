@@ -0,0 +1,93 @@
+"""
+Offline Payload Query Unit Tests
+Builds a small local archive (compacted day + raw files) and queries it
+"""
+import gzip
+import importlib.util
+import json
+from pathlib import Path
+
+import pytest
+
+SCRIPT = Path(__file__).resolve().parents[3] / 'scripts' / 'aws' / 'query-payloads.py'
+spec = importlib.util.spec_from_file_location('query_payloads', SCRIPT)
+query_payloads = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(query_payloads)
+
+
+def stored_payload(i, day, subscription_id, change_type='updated'):
+    stamp = f"{day}T{i:02d}-00-00-000Z"
+    key = f"webhooks/{stamp}-req-{i}.json"
+    raw = json.dumps({
+        'receivedAt': f"{day}T{i:02d}:00:00.000Z",
+        'requestId': f"req-{i}",
+        'body': json.dumps({'value': [{
+            'subscriptionId': subscription_id,
+            'changeType': change_type,
+            'resource': f"Users/user-{i % 2}/Events/E{i}",
+            'resourceData': {'id': f"E{i}"},
+        }]}),
+    })
+    return key, raw
+
+
+@pytest.fixture
+def archive(tmp_path):
+    # 2026-02-12 compacted (6 payloads), one original kept as a raw file too
+    compacted = [stored_payload(i, '2026-02-12', f"sub-{i % 2}") for i in range(6)]
+    day_dir = tmp_path / 'webhooks-compacted' / '2026' / '02' / '12'
+    day_dir.mkdir(parents=True)
+    lines = ''.join(json.dumps({'key': k, 'size': len(r), 'last_modified': '2026-02-12T00:00:00+00:00',
+                                'sha256': '', 'raw': r}, separators=(',', ':')) + '\n' for k, r in compacted)
+    (day_dir / 'payloads.jsonl.gz').write_bytes(gzip.compress(lines.encode('utf-8')))
+    (day_dir / 'manifest.json').write_text(json.dumps({
+        'day': '2026-02-12',
+        'payloads': {'key': 'webhooks-compacted/2026/02/12/payloads.jsonl.gz'},
+    }))
+
+    # 2026-02-13 raw only
+    raw = [stored_payload(i, '2026-02-13', 'sub-0', 'created') for i in range(3)] + [compacted[0]]
+    for key, body in raw:
+        path = tmp_path / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(body)
+    return str(tmp_path)
+
+
+def make_plan(archive, **overrides):
+    plan = {
+        'root': archive, 'since': None, 'until': None, 'where': [], 'missing': [], 'on': None,
+        'group_by': [], 'select': [], 'percentiles': None, 'limit': None, 'columns': [], 'pushdown': [],
+    }
+    plan.update(overrides)
+    return plan
+
+
+def test_group_by_counts_each_payload_once(archive):
+    plan = make_plan(archive, group_by=['subscription_id', 'change_type'])
+    partitions = query_payloads.archive_partitions(archive)
+    total = query_payloads.run_query(partitions, plan, workers=1)
+
+    counts = {group: count for group, (count, _) in total['groups'].items()}
+    assert counts == {('sub-0', 'updated'): 3, ('sub-1', 'updated'): 3, ('sub-0', 'created'): 3}
+
+
+def test_pushdown_and_day_pruning(archive):
+    where = [query_payloads.parse_predicate('subscription_id=sub-1')]
+    plan = make_plan(archive, where=where, pushdown=where, group_by=['hour'],
+                     since=query_payloads.day_bound('2026-02-12'),
+                     until=query_payloads.day_bound('2026-02-12', end=True))
+    partitions = query_payloads.archive_partitions(archive, plan['since'], plan['until'])
+    assert [p['day'] for p in partitions] == ['2026-02-12']
+
+    total = query_payloads.run_query(partitions, plan, workers=1)
+    # Lines without sub-1 are never parsed
+    assert total['scanned'] == 3
+    assert sorted(total['groups']) == [('2026-02-12T01',), ('2026-02-12T03',), ('2026-02-12T05',)]
+
+
+def test_missing_on_field(archive):
+    plan = make_plan(archive, where=[('change_type', '=', 'updated')],
+                     missing=[('change_type', '=', 'created')], on='subscription_id')
+    total = query_payloads.run_query(query_payloads.archive_partitions(archive), plan, workers=1)
+    assert [v for v in total['with'] if v not in total['without']] == ['sub-1']
@@ -0,0 +1,100 @@
+"""
+Bulk Availability Unit Tests
+Tests getSchedule chunking and the per-user busy bitmaps
+"""
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+import availability  # noqa: E402
+from availability import probe, schedule_requests  # noqa: E402
+
+START = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc)
+END = START + timedelta(hours=1)
+
+
+def fake_execute(views):
+    """execute_batches stand-in answering getSchedule from {user: availabilityView}"""
+    def execute(items, headers, concurrency, batch_size=20):
+        results = {}
+        for item in items:
+            value = []
+            for user in item['body']['schedules']:
+                if user in views:
+                    value.append({'scheduleId': user, 'availabilityView': views[user]})
+                else:
+                    value.append({'scheduleId': user, 'error': {'message': 'not found', 'responseCode': 'Error'}})
+            results[item['id']] = {'id': item['id'], 'status': 200, 'body': {'value': value}}
+        return results
+    return execute
+
+
+class TestScheduleRequests:
+
+    def test_chunks_users_per_call(self):
+        users = [f"user{n}@contoso.com" for n in range(250)]
+        items = schedule_requests('me@contoso.com', users, START, END, 15)
+        assert [len(i['body']['schedules']) for i in items] == [100, 100, 50]
+        assert items[0]['url'] == '/users/me@contoso.com/calendar/getSchedule'
+        assert items[0]['body']['availabilityViewInterval'] == 15
+
+    def test_spreads_calls_over_requesters(self):
+        users = [f"user{n}@contoso.com" for n in range(250)]
+        items = schedule_requests(['a@contoso.com', 'b@contoso.com'], users, START, END, 15)
+        assert [i['url'].split('/')[2] for i in items] == ['a@contoso.com', 'b@contoso.com', 'a@contoso.com']
+
+    def test_rejects_invalid_window(self):
+        with pytest.raises(ValueError):
+            probe(['a@contoso.com'], START, START + timedelta(days=63), 'me@contoso.com')
+        with pytest.raises(ValueError):
+            probe(['a@contoso.com'], START, END, 'me@contoso.com', interval=1)
+
+
+class TestProbe:
+
+    def test_bitmaps_and_queries(self):
+        views = {'a@contoso.com': '0220', 'B@contoso.com': '1003', 'c@contoso.com': '0000'}
+        users = list(views) + ['gone@contoso.com']
+        with patch.object(availability, 'execute_batches', side_effect=fake_execute(views)):
+            result = probe(users, START, END, 'me@contoso.com', interval=15)
+
+        assert result.busy == {'a@contoso.com': 0b0110, 'b@contoso.com': 0b1000, 'c@contoso.com': 0}
+        assert result.errors == {'gone@contoso.com': 'not found'}
+        assert result.occupancy() == [0, 1, 1, 1]
+        assert result.busy_at(START + timedelta(minutes=50)) == ['b@contoso.com']
+        assert result.is_busy('A@contoso.com', START + timedelta(minutes=20))
+        assert not result.is_busy('a@contoso.com', START + timedelta(hours=2))
+        assert sorted(result.free_during(START, START + timedelta(minutes=30))) == ['b@contoso.com', 'c@contoso.com']
+
+    def test_tentative_optional_and_failed_chunks_reported(self):
+        views = {'a@contoso.com': '1100'}
+        with patch.object(availability, 'execute_batches', side_effect=fake_execute(views)):
+            assert probe(['a@contoso.com'], START, END, 'me@contoso.com').busy['a@contoso.com'] == 0
+            tentative = probe(['a@contoso.com'], START, END, 'me@contoso.com', include_tentative=True)
+        assert tentative.busy['a@contoso.com'] == 0b0011
+
+        with patch.object(availability, 'execute_batches', return_value={'0': {'id': '0', 'status': 429}}):
+            failed = probe(['a@contoso.com', 'b@contoso.com'], START, END, 'me@contoso.com')
+        assert failed.errors == {'a@contoso.com': 'HTTP 429', 'b@contoso.com': 'HTTP 429'}
+
+    def test_in_flight_calls_capped_per_requester(self):
+        calls = []
+
+        def execute(items, headers, concurrency, batch_size):
+            calls.append((items[0]['url'], len(items), concurrency, batch_size))
+            return fake_execute({})(items, headers, concurrency)
+
+        users = [f"user{n}@contoso.com" for n in range(1000)]
+        with patch.object(availability, 'execute_batches', side_effect=execute):
+            result = probe(users, START, END, ['a@contoso.com', 'b@contoso.com'])
+
+        assert len(result.errors) == 1000
+        assert sorted(calls) == [
+            ('/users/a@contoso.com/calendar/getSchedule', 5, 1, availability.MAX_IN_FLIGHT_PER_MAILBOX),
+            ('/users/b@contoso.com/calendar/getSchedule', 5, 1, availability.MAX_IN_FLIGHT_PER_MAILBOX),
+        ]
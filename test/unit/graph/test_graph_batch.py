@@ -0,0 +1,85 @@
+"""
+Graph $batch Helper Unit Tests
+Tests batching, per-item results and 429 retry without calling Graph
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+import graph_batch  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self._body = body or {}
+        self.headers = headers or {}
+        self.text = ''
+
+    def json(self):
+        return self._body
+
+
+class FakeSession:
+    """Answers each $batch POST from a queue of per-call item statuses"""
+
+    def __init__(self, statuses_per_call):
+        self.statuses_per_call = list(statuses_per_call)
+        self.calls = []
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        ids = [item['id'] for item in json['requests']]
+        self.calls.append(ids)
+        statuses = self.statuses_per_call.pop(0)
+        return FakeResponse(200, {
+            'responses': [
+                {'id': i, 'status': statuses.get(i, 200), 'headers': {'Retry-After': '0'}}
+                for i in ids
+            ]
+        })
+
+
+@pytest.fixture
+def delete_requests():
+    return [graph_batch.build_request(i, 'DELETE', f'/subscriptions/{i}') for i in ('a', 'b', 'c')]
+
+
+class TestChunking:
+    """Test envelope sizing"""
+
+    def test_chunks_respect_graph_limit(self):
+        chunks = graph_batch.chunked(list(range(45)))
+        assert [len(c) for c in chunks] == [20, 20, 5]
+
+    def test_build_request_with_body_sets_content_type(self):
+        item = graph_batch.build_request(1, 'PATCH', '/subscriptions/x', {'expirationDateTime': 'z'})
+        assert item['id'] == '1'
+        assert item['headers']['Content-Type'] == 'application/json'
+
+
+class TestSendBatch:
+    """Test per-item results and throttling"""
+
+    def test_per_item_statuses_returned(self, delete_requests):
+        session = FakeSession([{'a': 204, 'b': 404, 'c': 403}])
+        results = graph_batch.send_batch(delete_requests, {}, session)
+
+        assert {k: v['status'] for k, v in results.items()} == {'a': 204, 'b': 404, 'c': 403}
+        assert len(session.calls) == 1
+
+    def test_only_throttled_items_are_retried(self, delete_requests):
+        session = FakeSession([{'a': 204, 'b': 429, 'c': 204}, {'b': 204}])
+        results = graph_batch.send_batch(delete_requests, {}, session)
+
+        assert session.calls == [['a', 'b', 'c'], ['b']]
+        assert results['b']['status'] == 204
+
+    def test_gives_up_after_max_retries(self, delete_requests):
+        session = FakeSession([{'a': 429, 'b': 429, 'c': 429}] * 2)
+        results = graph_batch.send_batch(delete_requests, {}, session, max_retries=1)
+
+        assert all(r['status'] == 429 for r in results.values())
+        assert len(session.calls) == 2
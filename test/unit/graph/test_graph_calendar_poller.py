@@ -0,0 +1,165 @@
+"""
+Graph Calendar Poller Unit Tests
+Tests poll_user / iter_changes / commit against httpx.MockTransport with SQLite state:
+nextLink paging, 410 resync, deltaLinks kept until the sink delivered, meeting index feed
+"""
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+GRAPH_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph')
+sys.path.insert(0, GRAPH_DIR)
+
+SCRIPT = os.path.join(GRAPH_DIR, 'graph-calendar-poller.py')
+spec = importlib.util.spec_from_file_location('graph_calendar_poller', SCRIPT)
+poller_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(poller_module)
+
+from meeting_index import MeetingIndex  # noqa: E402
+from poller_sink import SinkError  # noqa: E402
+
+DELTA_URL = 'https://graph.microsoft.com/v1.0/users/user-1/calendarView/delta'
+
+
+def event(event_id='AAMkEvent1', change_key='ck-1', **fields):
+    return {
+        'id': event_id,
+        'changeKey': change_key,
+        'subject': 'Standup',
+        'isOnlineMeeting': True,
+        'onlineMeeting': {'joinUrl': f"https://teams/{event_id}"},
+        'start': {'dateTime': '2026-02-12T09:00:00.0000000', 'timeZone': 'UTC'},
+        'end': {'dateTime': '2026-02-12T09:30:00.0000000', 'timeZone': 'UTC'},
+        **fields,
+    }
+
+
+def make_poller(**kwargs):
+    with patch.dict(os.environ, {'POLLER_ADAPTIVE': 'false'}):
+        poller = poller_module.GraphCalendarPoller(user_ids=['user-1'], state='sqlite::memory:', **kwargs)
+    poller.access_token, poller.token_expires = 'token', time.time() + 3600
+    poller.limiter = poller_module.RateLimiter(1000)
+    return poller
+
+
+def poll(poller, handler):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await poller.poll_user(client, 'user-1')
+    return asyncio.run(run())
+
+
+def pages(*bodies):
+    """Handler serving a full sync as the given pages, linked by nextLink"""
+    def handler(request):
+        url = str(request.url)
+        i = int(url.rsplit('page=', 1)[1]) if 'page=' in url else 0
+        body = dict(bodies[i])
+        if i + 1 < len(bodies):
+            body['@odata.nextLink'] = f"{DELTA_URL}?page={i + 1}"
+        return httpx.Response(200, json=body)
+    return handler
+
+
+class TestMeetingIndex:
+
+    def test_resync_rebuilds_index_despite_suppression(self):
+        poller = make_poller(index=MeetingIndex())
+        poller.commit(poll(poller, pages({'value': [event('A')], '@odata.deltaLink': 'https://graph/delta/1'})))
+        poller.state.flush()
+        assert len(poller.index) == 1
+
+        # Restart without an index snapshot, then a full resync: every event is
+        # suppressed for the sink, none for the index
+        poller.index = MeetingIndex()
+        full = pages({'value': [event('A')], '@odata.deltaLink': 'https://graph/delta/2'})
+        result = poll(poller, lambda r: httpx.Response(410) if 'delta/1' in str(r.url) else full(r))
+        assert result['full_sync'] and result['changed'] == []
+        poller.commit(result)
+        assert len(poller.index) == 1
+
+
+class RecordingSink:
+    """Sink stand-in that records calls (and fails every add when told to)"""
+
+    def __init__(self, calls, fail=False):
+        self.calls = calls
+        self.fail = fail
+
+    async def add(self, records):
+        self.calls.append(('add', len(records)))
+        if self.fail:
+            raise SinkError("Event Hub send failed: 503")
+
+    async def flush(self):
+        self.calls.append(('flush', None))
+
+
+def sweep(poller, handler):
+    real_client = httpx.AsyncClient
+
+    def client(**kwargs):
+        return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    with patch.object(poller_module.httpx, 'AsyncClient', side_effect=client):
+        return asyncio.run(poller.sweep())
+
+
+class TestPollUser:
+
+    def test_next_link_pages_followed(self):
+        poller = make_poller()
+        removed = {'id': 'C', '@removed': {'reason': 'deleted'}}
+        handler = pages({'value': [event('A')]}, {'value': [event('B')]},
+                        {'value': [removed], '@odata.deltaLink': 'https://graph/delta/1'})
+        result = poll(poller, handler)
+
+        assert result['pages'] == 3 and result['full_sync']
+        assert [e['id'] for e in result['changed']] == ['A', 'B']
+        assert result['delta_link'] == 'https://graph/delta/1'
+
+    def test_expired_delta_link_triggers_full_resync(self):
+        poller = make_poller()
+        poller.commit(poll(poller, pages({'value': [event('A')], '@odata.deltaLink': 'https://graph/delta/1'})))
+        requested = []
+
+        def handler(request):
+            requested.append(str(request.url))
+            if 'delta/1' in str(request.url):
+                return httpx.Response(410, text='SyncStateNotFound')
+            return httpx.Response(200, json={'value': [event('B')], '@odata.deltaLink': 'https://graph/delta/2'})
+
+        result = poll(poller, handler)
+        assert requested[0] == 'https://graph/delta/1' and requested[1].startswith(DELTA_URL)
+        assert result['full_sync'] and result['delta_link'] == 'https://graph/delta/2'
+        assert [e['id'] for e in result['changed']] == ['B']
+
+
+class TestSweep:
+
+    def test_delta_link_kept_when_sink_fails(self):
+        calls = []
+        poller = make_poller(sink=RecordingSink(calls))
+        sweep(poller, pages({'value': [event('A')], '@odata.deltaLink': 'https://graph/delta/1'}))
+        assert calls == [('add', 1), ('flush', None)]
+        assert poller.state.get('user-1')['delta_link'] == 'https://graph/delta/1'
+
+        poller.sink = RecordingSink(calls, fail=True)
+        changed = {'value': [event('A', change_key='ck-2', subject='Moved')],
+                   '@odata.deltaLink': 'https://graph/delta/2'}
+        with pytest.raises(SinkError):
+            sweep(poller, lambda request: httpx.Response(200, json=changed))
+        poller.state.flush()
+        assert poller.state.get('user-1')['delta_link'] == 'https://graph/delta/1'
+
+        # Delivered this time: the deltaLink moves on only after the sink flushed
+        poller.sink = RecordingSink(calls)
+        summary = sweep(poller, lambda request: httpx.Response(200, json=changed))
+        assert len(summary['changes']) == 1 and calls[-2:] == [('add', 1), ('flush', None)]
+        assert poller.state.get('user-1')['delta_link'] == 'https://graph/delta/2'
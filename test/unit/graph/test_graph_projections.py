@@ -0,0 +1,50 @@
+"""
+Graph Field Projection Unit Tests
+Tests query parameter, header and client-side projection building
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+from graph_projections import prefer_headers, project, select_params  # noqa: E402
+
+
+class TestSelectParams:
+
+    def test_merges_select_into_existing_params(self):
+        params = select_params('member.identity', {'$top': 999})
+        assert params == {'$top': 999, '$select': 'id,displayName,mail,userPrincipalName'}
+
+    def test_expand_uses_nested_projection(self):
+        params = select_params('group.members')
+        assert params['$select'] == 'id,displayName'
+        assert params['$expand'] == 'members($select=id,displayName,mail,userPrincipalName)'
+
+    def test_client_side_only_projection_adds_nothing(self):
+        assert select_params('subscription.summary', {'$top': 5}) == {'$top': 5}
+
+    def test_unknown_projection(self):
+        with pytest.raises(ValueError):
+            select_params('event.everything')
+
+
+class TestClientSide:
+
+    def test_prefer_appended_to_existing(self):
+        headers = prefer_headers('event.meeting', {'Prefer': 'odata.maxpagesize=100'})
+        assert headers['Prefer'] == 'odata.maxpagesize=100, outlook.body-content-type="text"'
+        assert 'Prefer' not in prefer_headers('member.identity', {})
+
+    def test_project_drops_unselected_fields(self):
+        event = {'@odata.etag': 'W/"1"', 'id': 'E1', 'subject': 'Standup', 'changeKey': 'ck',
+                 'body': {'contentType': 'html', 'content': '<html>...</html>'}, 'webLink': 'https://...'}
+        assert project('event.meeting', event) == {'@odata.etag': 'W/"1"', 'id': 'E1', 'subject': 'Standup',
+                                                   'changeKey': 'ck'}
+
+    def test_meeting_projection_covers_poller_fingerprint(self):
+        from graph_projections import PROJECTIONS
+        from poller_state import CONTENT_FIELDS
+        assert set(CONTENT_FIELDS) | {'id', 'changeKey', 'attendees'} <= set(PROJECTIONS['event.meeting']['select'])
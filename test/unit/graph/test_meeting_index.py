@@ -0,0 +1,61 @@
+"""
+Meeting Index Unit Tests
+Tests incremental updates and the starting-within / in-progress queries
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+from meeting_index import MeetingIndex  # noqa: E402
+
+T0 = datetime(2026, 3, 2, 9, 0, tzinfo=timezone.utc).timestamp()
+
+
+def event(event_id, start_min, end_min, online=True, **extra):
+    def at(minutes):
+        return datetime.fromtimestamp(T0 + minutes * 60, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.0000000')
+    return {'id': event_id, 'subject': event_id, 'isOnlineMeeting': online,
+            'start': {'dateTime': at(start_min)}, 'end': {'dateTime': at(end_min)},
+            'onlineMeeting': {'joinUrl': f'https://teams/{event_id}'}, **extra}
+
+
+def ids(meetings):
+    return [m.event_id for m in meetings]
+
+
+class TestQueries:
+
+    def test_starting_within_and_in_progress(self):
+        index = MeetingIndex(max_span=4 * 3600)
+        index.apply('u1', [event('standup', 0, 15), event('review', 30, 90), event('offline', 5, 10, online=False),
+                           event('offsite', -24 * 60, 24 * 60)], [])
+        index.apply('u2', [event('sync', 10, 40)], [])
+
+        assert len(index) == 4
+        assert ids(index.starting_within(T0, 30 * 60)) == ['standup', 'sync', 'review']
+        assert ids(index.in_progress(T0 + 12 * 60)) == ['offsite', 'standup', 'sync']
+        assert ids(index.in_progress(T0 + 15 * 60)) == ['offsite', 'sync']
+        assert index.meetings[('u1', 'review')].join_url == 'https://teams/review'
+
+    def test_incremental_updates(self):
+        index = MeetingIndex()
+        index.apply('u1', [event('a', 0, 30), event('b', 0, 30)], [])
+        index.apply('u1', [event('a', 60, 90)], [])                      # moved
+        index.apply('u1', [event('b', 0, 30, isCancelled=True)], [])      # cancelled
+        index.apply_record({'type': 'changed', 'userId': 'u2', 'id': 'c', 'event': event('c', 5, 20)})
+        index.apply_record({'type': 'removed', 'userId': 'u2', 'id': 'c'})
+
+        assert ids(index.starting_within(T0, 3600)) == ['a']
+        assert index.in_progress(T0 + 10 * 60) == []
+        assert index.start_times == [T0 + 3600]
+
+    def test_prune_and_snapshot(self, tmp_path):
+        index = MeetingIndex(tmp_path / 'index.json')
+        index.apply('u1', [event('old', -120, -60), event('next', 10, 40)], [])
+        assert index.prune(T0) == 1
+        index.save()
+
+        reloaded = MeetingIndex(tmp_path / 'index.json').load()
+        assert ids(reloaded.starting_within(T0, 3600)) == ['next']
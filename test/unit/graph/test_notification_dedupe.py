@@ -0,0 +1,105 @@
+"""
+Notification De-duplication Unit Tests
+Tests the windowed Bloom filter, the SQLite TTL store and the deduper without AWS
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+from notification_dedupe import (  # noqa: E402
+    NotificationDeduper, RotatingBloomFilter, SqliteDedupeStore, dedupe_key,
+)
+
+
+def notification(event_id='AAMkEvent1', change_type='updated', subscription_id='sub-1'):
+    return {
+        'subscriptionId': subscription_id,
+        'changeType': change_type,
+        'resource': f"Users/user-1/Events/{event_id}",
+        'resourceData': {'id': event_id},
+    }
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class TestDedupeKey:
+
+    def test_resource_case_and_slashes_ignored(self):
+        a = notification()
+        b = dict(a, resource='/users/USER-1/events/aamkevent1/')
+        assert dedupe_key(a) == dedupe_key(b)
+
+    def test_change_type_distinguishes(self):
+        assert dedupe_key(notification(change_type='created')) != dedupe_key(notification(change_type='updated'))
+
+
+class TestRotatingBloomFilter:
+
+    def test_key_forgotten_after_window(self):
+        clock = FakeClock()
+        bloom = RotatingBloomFilter(window_seconds=400, capacity=1000, generations=4, clock=clock)
+        bloom.add('a')
+        assert 'a' in bloom
+        assert 'b' not in bloom
+
+        clock.now += 250
+        assert 'a' in bloom
+
+        clock.now += 400
+        assert 'a' not in bloom
+        assert bloom.memory_bytes <= 4 * ((bloom.bits + 7) // 8)
+
+
+class TestSqliteDedupeStore:
+
+    def test_claim_duplicate_and_expiry(self):
+        store = SqliteDedupeStore(':memory:')
+        assert store.claim('k', ttl_seconds=60, now=1000)
+        assert not store.claim('k', ttl_seconds=60, now=1010)
+        assert store.stats() == {'keys': 1, 'duplicates': 1}
+
+        assert store.claim('k', ttl_seconds=60, now=1100)
+        assert store.purge(now=2000) == 1
+
+
+class TestNotificationDeduper:
+
+    def test_filter_splits_repeats(self):
+        deduper = NotificationDeduper(SqliteDedupeStore(':memory:'), capacity=1000)
+        batch = [notification('A'), notification('B'), notification('A')]
+
+        new, duplicates = deduper.filter(batch)
+        assert [n['resourceData']['id'] for n in new] == ['A', 'B']
+        assert [n['resourceData']['id'] for n in duplicates] == ['A']
+
+        new, duplicates = deduper.filter([notification('B')])
+        assert new == [] and len(duplicates) == 1
+        assert deduper.stats['duplicates'] == 2
+        assert deduper.stats['bloom_false_positives'] == 0
+
+    def test_store_shared_across_processes(self):
+        store = SqliteDedupeStore(':memory:')
+        assert not NotificationDeduper(store).is_duplicate(notification())
+        # A fresh process has an empty Bloom filter; the store still catches the repeat
+        assert NotificationDeduper(store).is_duplicate(notification())
+
+    def test_lifecycle_events_never_duplicates(self):
+        deduper = NotificationDeduper(SqliteDedupeStore(':memory:'))
+        missed = {'subscriptionId': 'sub-1', 'lifecycleEvent': 'missed'}
+        new, duplicates = deduper.filter([missed, dict(missed)])
+        assert len(new) == 2 and duplicates == []
+
+    def test_released_claim_is_new_again(self):
+        for store in (SqliteDedupeStore(':memory:'), None):
+            deduper = NotificationDeduper(store, capacity=1000)
+            assert not deduper.is_duplicate(notification())
+            deduper.release(notification())
+            assert not deduper.is_duplicate(notification())
+            assert deduper.is_duplicate(notification())
@@ -0,0 +1,157 @@
+"""
+Subscription Plan Unit Tests
+Tests plan building (limits, tenant-wide collapse, lifecycle URL), the diff against existing subscriptions
+and applying it (creates before deletes)
+"""
+import importlib.util
+import os
+import sys
+from unittest.mock import patch
+
+import pytest
+
+GRAPH_DIR = os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph')
+sys.path.insert(0, GRAPH_DIR)
+
+spec = importlib.util.spec_from_file_location('plan_subscriptions', os.path.join(GRAPH_DIR, 'plan-subscriptions.py'))
+plan = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(plan)
+
+URLS = ['https://a.example.com/graph', 'https://b.example.com/graph']
+LIFECYCLE = 'https://a.example.com/lifecycle'
+
+
+def members(n):
+    return [{'id': f"user-{i}"} for i in range(n)]
+
+
+class TestBuildPlan:
+
+    def test_one_subscription_per_member_and_resource(self):
+        desired, notes = plan.build_plan(members(3), ['events', 'transcripts'], URLS, lifecycle_url=LIFECYCLE)
+        assert len(desired) == 6 and notes == []
+        transcripts = [d for d in desired if d['kind'] == 'transcripts']
+        assert all(d['lifecycle_url'] == LIFECYCLE and d['hours'] == 70 for d in transcripts)
+        assert all(d['lifecycle_url'] is None for d in desired if d['kind'] == 'events')
+        assert {d['notification_url'] for d in desired} <= set(URLS)
+
+    def test_shard_url_is_stable(self):
+        first, _ = plan.build_plan(members(20), ['events'], URLS)
+        second, _ = plan.build_plan(members(20), ['events'], URLS)
+        assert [d['notification_url'] for d in first] == [d['notification_url'] for d in second]
+
+    def test_transcripts_without_lifecycle_url_refused(self):
+        with pytest.raises(ValueError, match='transcripts'):
+            plan.build_plan(members(2), ['events', 'transcripts'], URLS)
+        assert plan.lifecycle_url_error(['events'], None) is None
+
+    def test_resource_over_its_limit_collapses_to_tenant_wide(self):
+        desired, notes = plan.build_plan(members(5), ['events', 'transcripts'], URLS, lifecycle_url=LIFECYCLE,
+                                         limits={'transcripts': 3})
+        transcripts = [d for d in desired if d['kind'] == 'transcripts']
+        assert [d['resource'] for d in transcripts] == ['communications/onlineMeetings/getAllTranscripts']
+        assert len([d for d in desired if d['kind'] == 'events']) == 5
+        assert len(notes) == 1 and 'transcripts' in notes[0]
+
+    def test_resource_without_tenant_wide_stays_over_limit(self):
+        desired, notes = plan.build_plan(members(5), ['events'], URLS, limits={'events': 3})
+        assert len(desired) == 5
+        problems = plan.over_limit(desired, plan.plan_limits(['events'], {'events': 3}))
+        assert problems == ["events: 5 subscriptions, over its limit of 3"]
+        assert notes == [f"Plan still over a limit: {problems[0]}"]
+
+    def test_overall_limit_still_applies(self):
+        desired, _ = plan.build_plan(members(4), ['events', 'recordings'], URLS, lifecycle_url=LIFECYCLE,
+                                     max_subscriptions=6)
+        assert len(desired) == 5
+        assert plan.over_limit(desired, plan.plan_limits(['events', 'recordings']), max_subscriptions=6) == []
+
+
+class TestDiffPlan:
+
+    def existing(self, desired, **overrides):
+        sub = {'id': f"sub-{desired['resource']}", 'resource': desired['resource'],
+               'notificationUrl': desired['notification_url'],
+               'lifecycleNotificationUrl': desired['lifecycle_url']}
+        sub.update(overrides)
+        return sub
+
+    def test_create_keep_and_delete(self):
+        desired, _ = plan.build_plan(members(2), ['events'], URLS)
+        left_group = {'id': 'sub-old', 'resource': '/users/user-9/events', 'notificationUrl': URLS[0]}
+        foreign = {'id': 'sub-foreign', 'resource': 'users/user-8/events', 'notificationUrl': 'https://other'}
+        existing = [self.existing(desired[0]), left_group, foreign]
+
+        to_create, to_keep, to_delete, to_recreate = plan.diff_plan(desired, existing, {}, URLS, ['events'])
+        assert to_create == [desired[1]]
+        assert to_keep == [existing[0]]
+        assert to_delete == [left_group]
+        assert to_recreate == []
+
+    def test_aliases_and_case_match_existing(self):
+        desired, _ = plan.build_plan(members(1), ['events'], URLS)
+        existing = [self.existing(desired[0], resource='/Users/Someone@Example.com/Events')]
+        alias_to_id = {'someone@example.com': 'user-0'}
+
+        to_create, to_keep, _, _ = plan.diff_plan(desired, existing, alias_to_id, URLS, ['events'])
+        assert to_create == [] and len(to_keep) == 1
+
+    def test_changed_notification_url_is_recreated(self):
+        desired, _ = plan.build_plan(members(1), ['events'], URLS)
+        moved = self.existing(desired[0], notificationUrl='https://old.example.com/graph')
+
+        to_create, to_keep, to_delete, to_recreate = plan.diff_plan(desired, [moved], {}, URLS, ['events'])
+        assert to_create == desired and to_delete == [moved] and to_keep == []
+        assert to_recreate == [(moved, desired[0])]
+
+    def test_changed_lifecycle_url_is_recreated(self):
+        desired, _ = plan.build_plan(members(1), ['transcripts'], URLS, lifecycle_url=LIFECYCLE)
+        missing = self.existing(desired[0], lifecycleNotificationUrl=None)
+        same = self.existing(desired[0])
+
+        assert len(plan.diff_plan(desired, [missing], {}, URLS, ['transcripts'])[3]) == 1
+        assert plan.diff_plan(desired, [same], {}, URLS, ['transcripts'])[3] == []
+
+
+class TestApplyPlan:
+
+    def run(self, to_create, to_delete, to_recreate, create_status):
+        calls = []
+
+        def execute(batch, headers, concurrency=4):
+            calls.append([r['id'] for r in batch])
+            return {r['id']: {'id': r['id'], 'status': create_status(r) if r['method'] == 'POST' else 204,
+                              'body': {}} for r in batch}
+
+        with patch.object(plan, 'execute_batches', side_effect=execute), \
+                patch.object(plan, 'get_config', return_value={}):
+            return plan.apply_plan(to_create, to_delete, {}, to_recreate=to_recreate), calls
+
+    def test_creates_go_before_deletes(self):
+        desired, _ = plan.build_plan(members(1), ['events'], URLS)
+        gone = {'id': 'sub-gone'}
+        result, calls = self.run(desired, [gone], [], lambda r: 201)
+        assert result == (1, 1, 0)
+        assert calls == [['create-0'], ['delete-sub-gone']]
+
+    def test_recreated_subscription_kept_when_create_fails(self):
+        desired, _ = plan.build_plan(members(2), ['events'], URLS)
+        moved = [{'id': 'sub-0'}, {'id': 'sub-1'}]
+        gone = {'id': 'sub-gone'}
+        to_recreate = list(zip(moved, desired))
+
+        result, calls = self.run(desired, moved + [gone], to_recreate,
+                                 lambda r: 201 if r['id'] == 'create-0' else 500)
+        assert result == (1, 2, 1)
+        assert calls[1] == ['delete-sub-0', 'delete-sub-gone']
+
+    def test_failed_delete_counted(self):
+        desired, _ = plan.build_plan(members(1), ['events'], URLS)
+
+        def execute(batch, headers, concurrency=4):
+            return {r['id']: {'id': r['id'], 'status': 201 if r['method'] == 'POST' else 500, 'body': {}}
+                    for r in batch}
+
+        with patch.object(plan, 'execute_batches', side_effect=execute), \
+                patch.object(plan, 'get_config', return_value={}):
+            assert plan.apply_plan(desired, [{'id': 'sub-x'}], {}) == (1, 0, 1)
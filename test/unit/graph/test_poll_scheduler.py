@@ -0,0 +1,83 @@
+"""
+Adaptive Poll Scheduler Unit Tests
+Tests interval selection, the request budget and the schedule record updates
+"""
+import os
+import sys
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+from poll_scheduler import PollScheduler, meeting_key, simulate  # noqa: E402
+
+NOW = 1_800_000_000.0
+
+
+def scheduler(**overrides):
+    options = {'min_interval': 60, 'max_interval': 3600, 'budget_per_hour': 100_000}
+    options.update(overrides)
+    return PollScheduler(**options)
+
+
+def meeting_event(event_id, starts_in, online=True):
+    start = datetime.fromtimestamp(NOW + starts_in, timezone.utc).replace(tzinfo=None).isoformat()
+    return {'id': event_id, 'isOnlineMeeting': online, 'start': {'dateTime': start, 'timeZone': 'UTC'}}
+
+
+class TestDesiredInterval:
+
+    def test_meeting_proximity(self):
+        s = scheduler()
+        idle = {'polled': NOW, 'rate': 0.0, 'meetings': {}}
+        assert s.desired_interval(idle, NOW) == (3600, False)
+
+        soon = dict(idle, meetings={'m': NOW + 5 * 60})
+        assert s.desired_interval(soon, NOW) == (60, True)
+
+        later = dict(idle, meetings={'m': NOW + 70 * 60})
+        assert s.desired_interval(later, NOW) == (20 * 60, False)
+
+    def test_busy_calendar_polled_more_often(self):
+        s = scheduler()
+        busy = {'polled': NOW, 'rate': 12.0, 'meetings': {}}
+        assert s.desired_interval(busy, NOW) == (300, False)
+
+    def test_new_user_due_immediately(self):
+        assert scheduler().plan({'new': None}, NOW)['due'] == ['new']
+
+
+class TestBudget:
+
+    def test_urgent_users_protected(self):
+        s = scheduler(budget_per_hour=200)
+        schedules = {f"idle{i}": {'polled': NOW - 4000, 'rate': 0.0, 'meetings': {}} for i in range(50)}
+        schedules.update({f"busy{i}": {'polled': NOW - 4000, 'rate': 60.0, 'meetings': {}} for i in range(5)})
+        schedules['urgent'] = {'polled': NOW - 4000, 'rate': 0.0, 'meetings': {'m': NOW + 60}}
+
+        plan = s.plan(schedules, NOW)
+        assert plan['requests_per_hour'] <= 200.5
+        assert plan['intervals']['urgent'] == 60
+        assert plan['intervals']['busy0'] > 60 and plan['floor'] is not None
+
+
+class TestObserve:
+
+    def test_tracks_online_meetings_and_rate(self):
+        s = scheduler()
+        first = s.observe(None, [meeting_event('A', 3600), meeting_event('B', 7200, online=False)], [], NOW)
+        assert first['rate'] == 0.0
+        assert first['meetings'] == {meeting_key('A'): NOW + 3600}
+
+        second = s.observe(first, [meeting_event('C', 1800)], ['A'], NOW + 600)
+        assert second['meetings'] == {meeting_key('C'): NOW + 1800}
+        assert second['rate'] > 0
+
+
+class TestSimulation:
+
+    def test_adaptive_detects_imminent_changes_with_fewer_requests(self):
+        s = scheduler(budget_per_hour=30_000)
+        every_minute = simulate(s, users=40, hours=12, fixed_interval=60)
+        adaptive = simulate(s, users=40, hours=12)
+        assert adaptive['requests'] < every_minute['requests'] / 3
+        assert max(adaptive['critical']) <= 120
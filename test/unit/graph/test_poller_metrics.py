@@ -0,0 +1,80 @@
+"""
+Calendar Poller Metrics Unit Tests
+Tests histogram bucketing and the EMF / Prometheus exports
+"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+from poller_metrics import Histogram, PollerMetrics, emit  # noqa: E402
+
+
+class TestHistogram:
+
+    def test_buckets_and_quantiles(self):
+        histogram = Histogram((10, 100, 1000))
+        for value in (1, 5, 10, 50, 2000):
+            histogram.observe(value)
+        assert histogram.counts == [3, 1, 0, 1]
+        assert (histogram.count, histogram.total, histogram.max) == (5, 2066, 2000)
+        assert histogram.quantile(0.5) == 10
+        assert histogram.quantile(0.8) == 100
+        assert histogram.quantile(0.99) == 2000
+        assert Histogram((1,)).quantile(0.5) is None
+
+    def test_quantile_capped_at_max(self):
+        histogram = Histogram((60, 120))
+        histogram.observe(42.5)
+        assert histogram.quantile(0.95) == 42.5
+
+
+class TestExports:
+
+    def metrics(self):
+        metrics = PollerMetrics()
+        metrics.request(120.0, 200)
+        metrics.request(8.0, 429)
+        metrics.throttle(2)
+        metrics.page(20000)
+        metrics.user(changed=3, removed=1, unchanged=5)
+        metrics.user(error=True)
+        metrics.lag(42)
+        return metrics
+
+    def test_emf_record(self):
+        record = self.metrics().emf(dimensions={'Function': 'poller'})
+        directive = record['_aws']['CloudWatchMetrics'][0]
+        names = {m['Name']: m['Unit'] for m in directive['Metrics']}
+
+        assert directive['Dimensions'] == [['Function']]
+        assert all(name in record for name in names)
+        assert (record['requests'], record['http_errors'], record['throttled']) == (2, 1, 1)
+        assert (record['events'], record['removed'], record['unchanged'], record['user_errors']) == (3, 1, 5, 1)
+        assert record['throttle_wait_seconds_total'] == 2
+        assert names['request_ms_p95'] == 'Milliseconds' and names['bytes'] == 'Bytes'
+        assert record['detection_lag_seconds_max'] == 42
+        assert 'rate_limit_wait_seconds_p50' not in record   # empty histograms emit no metrics
+        assert record['histograms']['page_bytes']['counts'][3] == 1
+        json.dumps(record)
+
+    def test_prometheus_text(self):
+        text = self.metrics().prometheus()
+        assert 'graph_poller_requests_total 2\n' in text
+        assert 'graph_poller_request_ms_bucket{le="100"} 1\n' in text
+        assert 'graph_poller_request_ms_bucket{le="250"} 2\n' in text
+        assert 'graph_poller_request_ms_bucket{le="+Inf"} 2\n' in text
+        assert 'graph_poller_detection_lag_seconds_count 1\n' in text
+
+    def test_emit_targets(self, tmp_path, capsys):
+        metrics = self.metrics()
+        emit(metrics, 'emf')
+        assert json.loads(capsys.readouterr().out)['pages'] == 1
+        emit(metrics, f"prometheus:{tmp_path / 'poller.prom'}")
+        assert 'graph_poller_pages_total 1' in (tmp_path / 'poller.prom').read_text()
+        assert emit(metrics, 'off') is None
+        with pytest.raises(ValueError):
+            emit(metrics, 'statsd')
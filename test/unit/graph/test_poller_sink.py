@@ -0,0 +1,97 @@
+"""
+Calendar Poller Sink Unit Tests
+Tests batching, compression and retries with the file sink and a flaky in-memory sink
+"""
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+from poller_sink import (  # noqa: E402
+    BatchTooLarge, BatchingSink, FileSink, RetryableSend, SinkError, decode_message,
+)
+
+
+def records(n):
+    return [{'type': 'changed', 'userId': 'user-1', 'id': f"E{i}", 'event': {'subject': f"Meeting {i}"}}
+            for i in range(n)]
+
+
+class FlakySink(BatchingSink):
+    """Fails the first sends with the given exceptions, then records every batch"""
+
+    def __init__(self, failures=(), max_size=None, **kwargs):
+        super().__init__(**kwargs)
+        self.failures = list(failures)
+        self.max_size = max_size
+        self.sent = []
+
+    async def _send(self, messages):
+        if self.max_size and len(messages) > self.max_size:
+            raise BatchTooLarge('too many')
+        if self.failures:
+            raise self.failures.pop(0)
+        self.sent.append(messages)
+
+
+def delivered(batches):
+    return [r['id'] for batch in batches for m in batch for r in decode_message(m)]
+
+
+class TestBatchingSink:
+
+    def test_batches_by_count_and_bytes(self):
+        sink = FlakySink(max_batch_count=10, linger=None)
+        asyncio.run(self._add_and_flush(sink, records(25)))
+        assert [len(b) for b in sink.sent] == [10, 10, 5]
+
+        sink = FlakySink(max_batch_bytes=1000, linger=None)
+        asyncio.run(self._add_and_flush(sink, records(25)))
+        assert all(sum(len(json.dumps(m)) for m in b) <= 1000 for b in sink.sent)
+        assert sorted(delivered(sink.sent)) == sorted(r['id'] for r in records(25))
+
+    def test_compressed_packs_round_trip(self):
+        sink = FlakySink(compress=True, pack_records=10, linger=None)
+        asyncio.run(self._add_and_flush(sink, records(25)))
+        messages = [m for b in sink.sent for m in b]
+        assert [m['UserProperties']['records'] for m in messages] == [10, 10, 5]
+        assert delivered(sink.sent) == [r['id'] for r in records(25)]
+
+    def test_retries_then_splits(self):
+        sink = FlakySink(failures=[RetryableSend('429', retry_after=0.01)], max_size=4, linger=None)
+        asyncio.run(self._add_and_flush(sink, records(10)))
+        assert sink.stats['retries'] == 1 and sink.stats['splits'] > 0
+        assert sorted(delivered(sink.sent)) == sorted(r['id'] for r in records(10))
+
+    def test_undelivered_raises(self):
+        sink = FlakySink(failures=[RetryableSend('503', retry_after=0.01)] * 3, max_retries=2, linger=None)
+        with pytest.raises(SinkError):
+            asyncio.run(self._add_and_flush(sink, records(3)))
+        assert sink.stats['failed_records'] == 3
+
+    @staticmethod
+    async def _add_and_flush(sink, batch):
+        await sink.add(batch)
+        await sink.flush()
+
+
+class TestFileSink:
+
+    def test_linger_sends_without_flush(self, tmp_path):
+        path = str(tmp_path / 'events.jsonl')
+
+        async def run():
+            sink = FileSink(path, linger=0.01)
+            await sink.add(records(3))
+            await asyncio.sleep(0.1)
+            return sink
+
+        sink = asyncio.run(run())
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        assert [r['id'] for line in lines for r in decode_message(line)] == ['E0', 'E1', 'E2']
+        assert sink.batches == 1
@@ -0,0 +1,118 @@
+"""
+Calendar Poller State Unit Tests
+Tests change suppression and delta state with the SQLite backend (and DynamoDB under moto)
+"""
+import os
+import sys
+from unittest.mock import patch
+
+import boto3
+from moto import mock_aws
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+from poller_state import DynamoPollerState, SqlitePollerState, content_hash  # noqa: E402
+
+
+def event(event_id='AAMkEvent1', change_key='ck-1', **fields):
+    return {
+        'id': event_id,
+        'changeKey': change_key,
+        'subject': 'Standup',
+        'start': {'dateTime': '2026-02-12T09:00:00.0000000', 'timeZone': 'UTC'},
+        'end': {'dateTime': '2026-02-12T09:30:00.0000000', 'timeZone': 'UTC'},
+        'attendees': [{'emailAddress': {'address': 'a@contoso.com'}, 'type': 'required',
+                       'status': {'response': 'none'}}],
+        **fields,
+    }
+
+
+class TestContentHash:
+
+    def test_attendee_response_ignored(self):
+        responded = event(attendees=[{'emailAddress': {'address': 'A@contoso.com'}, 'type': 'required',
+                                      'status': {'response': 'accepted'}}])
+        assert content_hash(event()) == content_hash(responded)
+        assert content_hash(event()) != content_hash(event(subject='Standup (moved)'))
+
+
+class TestSqlitePollerState:
+
+    def test_only_changed_content_is_emitted(self):
+        state = SqlitePollerState(':memory:')
+        emit, _ = state.filter_changes('user-1', [event('A'), event('B')], [])
+        assert [e['id'] for e in emit] == ['A', 'B']
+        state.put('user-1', 'https://graph/delta/1', '', '')
+        state.flush()
+
+        # Resync returns the same events; a new changeKey with the same content is not emitted
+        emit, _ = state.filter_changes('user-1', [event('A'), event('B', change_key='ck-2')], [])
+        assert emit == []
+
+        emit, _ = state.filter_changes('user-1', [event('A', change_key='ck-3', subject='Moved')], [])
+        assert [e['id'] for e in emit] == ['A']
+
+    def test_removals_only_for_known_events(self):
+        state = SqlitePollerState(':memory:')
+        state.filter_changes('user-1', [event('A')], [])
+        state.put('user-1', 'https://graph/delta/1', '', '')
+        state.flush()
+
+        _, removed = state.filter_changes('user-1', [], ['A', 'never-seen'])
+        assert removed == ['A']
+        state.put('user-1', 'https://graph/delta/2', '', '')
+        state.flush()
+        assert state.counts()['events'] == 0
+
+    def test_repeated_ids_collapse(self):
+        state = SqlitePollerState(':memory:')
+        emit, removed = state.filter_changes('user-1', [event('A'), event('A', subject='Moved'), event('B')],
+                                             ['B', 'B'])
+        assert [e['subject'] for e in emit] == ['Moved'] and removed == []
+
+    def test_fingerprints_wait_for_delta_link(self):
+        state = SqlitePollerState(':memory:')
+        state.filter_changes('user-1', [event('A')], [])
+        state.flush()
+        # Changes not delivered, deltaLink not stored: the event is emitted again next time
+        emit, _ = state.filter_changes('user-1', [event('A')], [])
+        assert len(emit) == 1
+
+    def test_delta_state_round_trip(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite')
+        state = SqlitePollerState(path)
+        state.put('user-1', 'https://graph/delta/1', '2026-02-11T00:00:00+00:00', '2026-03-13T00:00:00+00:00')
+        state.put_members([{'id': 'user-1', 'upn': 'user1@contoso.com'}])
+        state.flush()
+
+        reopened = SqlitePollerState(path)
+        reopened.load_users(['user-1', 'user-2'])
+        assert reopened.get('user-1')['delta_link'] == 'https://graph/delta/1'
+        assert reopened.last_synced('user-2') == ''
+        assert reopened.get_members()[1] == [{'id': 'user-1', 'upn': 'user1@contoso.com'}]
+
+        reopened.drop('user-1')
+        reopened.flush()
+        assert SqlitePollerState(path).known_users() == set()
+
+
+class TestDynamoPollerState:
+
+    @mock_aws
+    def test_duplicate_keys_load_once(self):
+        with patch.dict(os.environ, {'AWS_LAMBDA_FUNCTION_NAME': 'poller', 'AWS_DEFAULT_REGION': 'us-east-1',
+                                     'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing'}):
+            boto3.client('dynamodb', region_name='us-east-1').create_table(
+                TableName='poller-state', KeySchema=[{'AttributeName': 'pk', 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': 'pk', 'AttributeType': 'S'}],
+                BillingMode='PAY_PER_REQUEST')
+            state = DynamoPollerState('poller-state', region='us-east-1')
+            state.filter_changes('user-1', [event('A')], [])
+            state.put('user-1', 'https://graph/delta/1', '', '')
+            state.flush()
+
+            emit, removed = state.filter_changes('user-1', [event('A', change_key='ck-2', subject='Moved'),
+                                                            event('A', change_key='ck-3', subject='Moved')],
+                                                 ['A', 'A'])
+            assert emit == [] and removed == ['A']
+            assert len(state._batch_get(['u#user-1', 'u#user-1'], 'pk, d')) == 1
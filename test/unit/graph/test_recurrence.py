@@ -0,0 +1,113 @@
+"""
+Recurrence Expansion Unit Tests
+Tests local expansion of series masters and the cached master refresh
+"""
+import os
+import sys
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', '..', 'scripts', 'graph'))
+
+import recurrence  # noqa: E402
+from recurrence import SeriesCache, expand_series  # noqa: E402
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def master(pattern, rng, start='2026-03-02T17:00:00.0000000', end='2026-03-02T17:30:00.0000000', **extra):
+    return {
+        'id': 'AAMk-series', 'changeKey': 'ck1', 'subject': 'Standup', 'type': 'seriesMaster',
+        'isOnlineMeeting': True, 'originalStartTimeZone': 'Pacific Standard Time',
+        'start': {'dateTime': start, 'timeZone': 'UTC'}, 'end': {'dateTime': end, 'timeZone': 'UTC'},
+        'recurrence': {'pattern': pattern, 'range': rng}, **extra,
+    }
+
+
+def starts(occurrences):
+    return [o['start']['dateTime'][:16] for o in occurrences]
+
+
+class TestExpandSeries:
+
+    def test_weekly_keeps_wall_clock_time_across_dst(self):
+        # 09:00 Pacific: 17:00 UTC in PST, 16:00 UTC after the 2026-03-08 switch
+        series = master({'type': 'weekly', 'interval': 1, 'daysOfWeek': ['monday'], 'firstDayOfWeek': 'sunday'},
+                        {'type': 'noEnd', 'startDate': '2026-03-02', 'recurrenceTimeZone': 'Pacific Standard Time'})
+        occurrences = expand_series(series, utc(2026, 3, 1), utc(2026, 3, 17))
+        assert starts(occurrences) == ['2026-03-02T17:00', '2026-03-09T16:00', '2026-03-16T16:00']
+        assert occurrences[0]['seriesMasterId'] == 'AAMk-series'
+        assert occurrences[0]['end']['dateTime'][:16] == '2026-03-02T17:30'
+
+    def test_numbered_range_counts_from_series_start(self):
+        series = master({'type': 'daily', 'interval': 2},
+                        {'type': 'numbered', 'startDate': '2026-03-02', 'numberOfOccurrences': 4,
+                         'recurrenceTimeZone': 'UTC'})
+        assert starts(expand_series(series, utc(2026, 3, 5), utc(2026, 4, 1))) == [
+            '2026-03-06T17:00', '2026-03-08T17:00']
+
+    def test_relative_and_absolute_monthly(self):
+        last_friday = master({'type': 'relativeMonthly', 'interval': 1, 'daysOfWeek': ['friday'], 'index': 'last'},
+                             {'type': 'endDate', 'startDate': '2026-01-01', 'endDate': '2026-03-31',
+                              'recurrenceTimeZone': 'UTC'}, start='2026-01-30T17:00:00.0000000',
+                             end='2026-01-30T17:30:00.0000000')
+        assert [s[:10] for s in starts(expand_series(last_friday, utc(2026, 1, 1), utc(2026, 12, 1)))] == [
+            '2026-01-30', '2026-02-27', '2026-03-27']
+
+        day_31 = master({'type': 'absoluteMonthly', 'interval': 1, 'dayOfMonth': 31},
+                        {'type': 'noEnd', 'startDate': '2026-01-31', 'recurrenceTimeZone': 'UTC'},
+                        start='2026-01-31T17:00:00.0000000', end='2026-01-31T17:30:00.0000000')
+        assert [s[:10] for s in starts(expand_series(day_31, utc(2026, 1, 1), utc(2026, 4, 1)))] == [
+            '2026-01-31', '2026-02-28', '2026-03-31']
+
+    def test_exceptions_and_cancellations(self):
+        series = master({'type': 'daily', 'interval': 1},
+                        {'type': 'noEnd', 'startDate': '2026-03-02', 'recurrenceTimeZone': 'UTC'},
+                        cancelledOccurrences=['OID.AAMk-series.2026-03-03'],
+                        exceptionOccurrences=[{
+                            'id': 'AAMk-moved', 'subject': 'Standup (moved)', 'originalStart': '2026-03-04T17:00:00Z',
+                            'start': {'dateTime': '2026-03-04T20:00:00.0000000', 'timeZone': 'UTC'},
+                            'end': {'dateTime': '2026-03-04T20:30:00.0000000', 'timeZone': 'UTC'},
+                        }])
+        occurrences = expand_series(series, utc(2026, 3, 2), utc(2026, 3, 5, 23))
+        assert starts(occurrences) == ['2026-03-02T17:00', '2026-03-04T20:00', '2026-03-05T17:00']
+        assert occurrences[1]['type'] == 'exception'
+        assert occurrences[1]['subject'] == 'Standup (moved)'
+
+
+class TestSeriesCache:
+
+    def test_refresh_refetches_only_changed_masters(self, tmp_path):
+        cache = SeriesCache(tmp_path)
+        listing = MagicMock(status_code=200)
+        listing.json.return_value = {'value': [{'id': 'a', 'changeKey': 'ck1'}, {'id': 'b', 'changeKey': 'ck2'}]}
+
+        def fetched(requests_list, headers):
+            return {r['id']: {'status': 200, 'body': {'id': r['url'].split('/')[4].split('?')[0],
+                                                     'changeKey': 'ck1' if '/a?' in r['url'] else 'ck2'}}
+                    for r in requests_list}
+
+        with patch.object(recurrence.requests, 'get', return_value=listing), \
+                patch.object(recurrence, 'execute_batches', side_effect=fetched) as batches:
+            assert cache.refresh('user@contoso.com', {}) == {'masters': 2, 'refetched': 2, 'removed': 0}
+            listing.json.return_value = {'value': [{'id': 'a', 'changeKey': 'ck1'}]}
+            reloaded = SeriesCache(tmp_path)
+            assert reloaded.refresh('user@contoso.com', {}) == {'masters': 1, 'refetched': 0, 'removed': 1}
+        assert batches.call_count == 1
+        assert '$expand=exceptionOccurrences(' in batches.call_args[0][0][0]['url']
+
+
+class TestSingleEvents:
+
+    def test_filter_selects_events_overlapping_window(self):
+        response = MagicMock()
+        response.json.return_value = {'value': [{'id': 'AAMk-offsite'}]}
+        with patch.object(recurrence.requests, 'get', return_value=response) as get:
+            events = recurrence.single_events('me@contoso.com', utc(2026, 3, 2, 9), utc(2026, 3, 9, 9), {}, 'id')
+
+        assert events == [{'id': 'AAMk-offsite'}]
+        assert get.call_args.kwargs['params']['$filter'] == (
+            "type eq 'singleInstance' and end/dateTime gt '2026-03-02T09:00:00.0000000' "
+            "and start/dateTime lt '2026-03-09T09:00:00.0000000'")
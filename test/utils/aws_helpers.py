@@ -5,9 +5,16 @@ Helper functions for AWS integration tests
 import boto3
 import json
 import os
-from typing import Dict, Any, Optional
+import sys
+from typing import Dict, Any, Iterator, Optional
 from botocore.exceptions import ClientError
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'aws'))
+from webhook_payloads import (  # noqa: E402
+    COMPACTED_PREFIX, compacted_day_matches, compacted_manifests, delete_objects, find_compacted,
+    get_s3_client, list_objects_parallel, read_compacted_day,
+)
+
 
 def get_aws_session(profile: str = 'tmf-dev', region: str = 'us-east-1') -> boto3.Session:
     """Create AWS session with profile"""
@@ -30,7 +37,7 @@ def get_terraform_outputs(iac_dir: str = '../../../iac/aws') -> Dict[str, Any]:
 
 
 def get_s3_object_content(bucket: str, key: str, profile: str = 'tmf-dev') -> Dict[str, Any]:
-    """Retrieve and parse S3 object as JSON"""
+    """Retrieve and parse S3 object as JSON (falls back to compacted webhook days)"""
     session = get_aws_session(profile)
     s3 = session.client('s3')
     
@@ -40,43 +47,79 @@ def get_s3_object_content(bucket: str, key: str, profile: str = 'tmf-dev') -> Di
         return json.loads(content)
     except ClientError as e:
         if e.response['Error']['Code'] == 'NoSuchKey':
+            compacted = find_compacted(s3, bucket, key)
+            if compacted:
+                return json.loads(compacted['Raw'])
             raise FileNotFoundError(f"S3 object not found: s3://{bucket}/{key}")
         raise
 
 
-def list_s3_objects_by_prefix(bucket: str, prefix: str, profile: str = 'tmf-dev') -> list:
-    """List S3 objects with prefix"""
-    session = get_aws_session(profile)
-    s3 = session.client('s3')
-    
-    paginator = s3.get_paginator('list_objects_v2')
-    pages = paginator.paginate(Bucket=bucket, Prefix=prefix)
-    
-    objects = []
-    for page in pages:
-        if 'Contents' in page:
-            objects.extend(page['Contents'])
-    
-    return objects
+def iter_s3_objects_by_prefix(
+    bucket: str,
+    prefix: str,
+    profile: str = 'tmf-dev',
+    include_compacted: bool = True,
+    workers: int = 16
+) -> Iterator[dict]:
+    """
+    Yield S3 objects with prefix, listing date partitions concurrently.
+
+    Objects arrive as pages complete, not in key order. Payloads rolled into
+    compacted days come first; originals kept alongside them are skipped.
+    """
+    s3 = get_s3_client(profile, max_pool_connections=workers)
+    
+    compacted_keys = set()
+    if include_compacted and not prefix.startswith(COMPACTED_PREFIX):
+        for manifest in compacted_manifests(s3, bucket):
+            if compacted_day_matches(manifest, prefix):
+                for obj in read_compacted_day(s3, bucket, manifest):
+                    if obj['Key'].startswith(prefix):
+                        compacted_keys.add(obj['Key'])
+                        yield obj
+    
+    for obj in list_objects_parallel(s3, bucket, prefix, workers):
+        if obj['Key'] not in compacted_keys:
+            yield obj
+
+
+def list_s3_objects_by_prefix(
+    bucket: str,
+    prefix: str,
+    profile: str = 'tmf-dev',
+    include_compacted: bool = True
+) -> list:
+    """List S3 objects with prefix, including payloads rolled into compacted days"""
+    return list(iter_s3_objects_by_prefix(bucket, prefix, profile, include_compacted))
 
 
-def delete_s3_objects(bucket: str, prefix: str, profile: str = 'tmf-dev') -> int:
-    """Delete all S3 objects with prefix (for test cleanup)"""
-    objects = list_s3_objects_by_prefix(bucket, prefix, profile)
-    
-    if not objects:
-        return 0
-    
-    session = get_aws_session(profile)
-    s3 = session.client('s3')
-    
-    delete_keys = [{'Key': obj['Key']} for obj in objects]
-    response = s3.delete_objects(
-        Bucket=bucket,
-        Delete={'Objects': delete_keys}
-    )
-    
-    return len(response.get('Deleted', []))
+def delete_s3_objects(
+    bucket: str,
+    prefix: str,
+    profile: str = 'tmf-dev',
+    dry_run: bool = False,
+    workers: int = 16
+) -> int:
+    """
+    Delete all S3 objects with prefix (for test cleanup).
+    
+    Keys stream from the parallel listing into 1000-key DeleteObjects calls
+    on a thread pool, so memory stays flat however many objects match.
+    With dry_run, only counts what would be deleted.
+    """
+    s3 = get_s3_client(profile, max_pool_connections=workers * 2)
+    keys = (obj['Key'] for obj in list_objects_parallel(s3, bucket, prefix, workers))
+    
+    if dry_run:
+        return sum(1 for _ in keys)
+    
+    deleted, errors = delete_objects(s3, bucket, keys, workers)
+    if errors:
+        raise RuntimeError(
+            f"Failed to delete {len(errors)} object(s) under s3://{bucket}/{prefix}, "
+            f"e.g. {errors[0]['Key']}: {errors[0].get('Message')}"
+        )
+    return deleted
 
 
 def get_lambda_logs(function_name: str, profile: str = 'tmf-dev', limit: int = 10) -> list: